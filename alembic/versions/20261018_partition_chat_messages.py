@@ -0,0 +1,230 @@
+"""Partition chat_messages by month and add the chat message archive manifest
+
+Revision ID: partition_chat_messages_20261018
+Revises: create_live_chat_20250612_030614
+Create Date: 2026-10-18 09:00:00.000000
+
+On Postgres the existing chat_messages table is rebuilt as a table partitioned by
+RANGE (created_at) with monthly partitions plus a DEFAULT partition. The primary
+key becomes (id, created_at), as partitioning requires (ChatMessage declares the
+same key on Postgres), so the foreign keys that referenced chat_messages.id
+(conversation_analysis, response_confidence) are dropped. On SQLite only the
+archive manifest (chat_message_archives, plus chat_message_archive_sessions
+recording which sessions each archive file holds) is created; months are
+emulated as created_at ranges.
+
+Upgrade: the swap (rename, new partitioned table) commits first; rows are then
+copied in id-range chunks outside the migration transaction, one commit per
+chunk, so no lock or transaction spans the whole table. New messages land in the
+partitioned table at once, but older history is missing from it until the copy
+finishes: run it in a low-traffic window. If the copy is interrupted, running
+the upgrade again resumes after the last copied id.
+
+Downgrade copies everything back in a single transaction and needs a
+maintenance window (writes to chat_messages must be stopped). It re-adds the
+dropped foreign keys as NOT VALID, since archived messages are gone.
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'partition_chat_messages_20261018'
+down_revision = 'create_live_chat_20250612_030614'
+branch_labels = None
+depends_on = None
+
+COPY_BATCH_SIZE = 50000
+PREMAKE_MONTHS = 3
+COLUMNS = "id, session_id, content, translated_content, source_language, target_language, is_from_user"
+# Tables whose message_id referenced chat_messages.id before partitioning
+REFERENCING_TABLES = ("conversation_analysis", "response_confidence")
+INDEXES = [
+    ("ix_chat_messages_id", "id"),
+    ("ix_chat_messages_session_id", "session_id"),
+    ("ix_chat_messages_is_from_user", "is_from_user"),
+    ("ix_chat_messages_created_at", "created_at"),
+    ("ix_chat_messages_session_created", "session_id, created_at"),
+]
+
+
+def _add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _create_partition(month):
+    end = _add_months(month, 1)
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS chat_messages_p{month:%Y%m} PARTITION OF chat_messages "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')"
+    )
+
+
+def _copy_in_chunks(bind, source, target, select_columns, low=0):
+    max_id = bind.execute(sa.text(f"SELECT max(id) FROM {source}")).scalar() or 0
+    while low < max_id:
+        high = low + COPY_BATCH_SIZE
+        bind.execute(sa.text(
+            f"INSERT INTO {target} ({COLUMNS}, created_at) "
+            f"SELECT {select_columns} FROM {source} WHERE id > :low AND id <= :high"
+        ), {"low": low, "high": high})
+        low = high
+
+
+def _copy_legacy_rows():
+    """Copy chat_messages_legacy into the partitioned table, committing every chunk, then drop it"""
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        legacy_max = bind.execute(sa.text("SELECT max(id) FROM chat_messages_legacy")).scalar() or 0
+        # Legacy ids all precede the ones the new table hands out, and chunks commit in id order
+        copied = bind.execute(
+            sa.text("SELECT max(id) FROM chat_messages WHERE id <= :legacy_max"), {"legacy_max": legacy_max}
+        ).scalar() or 0
+        _copy_in_chunks(bind, "chat_messages_legacy", "chat_messages",
+                        f"{COLUMNS}, COALESCE(created_at, now())", low=copied)
+        bind.execute(sa.text("DROP TABLE chat_messages_legacy"))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('chat_message_archives'):
+        op.create_table('chat_message_archives',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('tenant_id', sa.Integer(), nullable=False),
+            sa.Column('month', sa.DateTime(), nullable=False),
+            sa.Column('storage_path', sa.String(), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('row_count', sa.Integer(), nullable=False),
+            sa.Column('size_bytes', sa.Integer(), nullable=False),
+            sa.Column('min_message_id', sa.Integer(), nullable=True),
+            sa.Column('max_message_id', sa.Integer(), nullable=True),
+            sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_chat_message_archives_id'), 'chat_message_archives', ['id'], unique=False)
+        op.create_index(op.f('ix_chat_message_archives_tenant_id'), 'chat_message_archives', ['tenant_id'], unique=False)
+        op.create_index(op.f('ix_chat_message_archives_month'), 'chat_message_archives', ['month'], unique=False)
+        op.create_index('ix_chat_message_archives_tenant_month', 'chat_message_archives', ['tenant_id', 'month'], unique=False)
+
+    if not inspector.has_table('chat_message_archive_sessions'):
+        op.create_table('chat_message_archive_sessions',
+            sa.Column('archive_id', sa.Integer(), nullable=False),
+            sa.Column('session_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['archive_id'], ['chat_message_archives.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('archive_id', 'session_id')
+        )
+        op.create_index(op.f('ix_chat_message_archive_sessions_session_id'), 'chat_message_archive_sessions', ['session_id'], unique=False)
+
+    if bind.dialect.name != 'postgresql':
+        return
+
+    relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'chat_messages'")).scalar()
+    if relkind == 'p':
+        # Already swapped; finish a copy that was interrupted
+        if inspector.has_table('chat_messages_legacy'):
+            _copy_legacy_rows()
+        return
+
+    # Partitioned tables can only be referenced through a key that includes the partition column
+    for table in inspector.get_table_names():
+        for fk in inspector.get_foreign_keys(table):
+            if fk['referred_table'] == 'chat_messages' and fk.get('name'):
+                op.drop_constraint(fk['name'], table, type_='foreignkey')
+
+    legacy_indexes = [index['name'] for index in inspector.get_indexes('chat_messages')]
+    pk_name = inspector.get_pk_constraint('chat_messages').get('name') or 'chat_messages_pkey'
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_legacy")
+    op.execute(f"ALTER TABLE chat_messages_legacy RENAME CONSTRAINT {pk_name} TO chat_messages_legacy_pkey")
+    for name in legacy_indexes:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_legacy")
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('chat_messages_legacy', 'id')")).scalar()
+
+    op.execute(f"""
+        CREATE TABLE chat_messages (
+            id integer NOT NULL DEFAULT nextval('{sequence}'),
+            session_id integer REFERENCES chat_sessions(id),
+            content text,
+            translated_content text,
+            source_language varchar(10),
+            target_language varchar(10),
+            is_from_user boolean DEFAULT true,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY chat_messages.id")
+    # Indexes on the parent are created on every partition, present and future
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON chat_messages ({columns})")
+    op.execute("CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT")
+
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM chat_messages_legacy")).scalar()
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if oldest is not None and oldest.tzinfo is not None:
+        oldest = oldest.astimezone(timezone.utc).replace(tzinfo=None)
+    month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0) if oldest else current
+    while month <= _add_months(current, PREMAKE_MONTHS):
+        _create_partition(month)
+        month = _add_months(month, 1)
+
+    _copy_legacy_rows()
+
+
+def _restore_foreign_keys(bind):
+    """
+    Re-add the foreign keys upgrade dropped. NOT VALID: rows may point at messages
+    archived and removed meanwhile, so only new rows are checked.
+    """
+    inspector = sa.inspect(bind)
+    for table in REFERENCING_TABLES:
+        if not inspector.has_table(table):
+            continue
+        if 'message_id' not in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+        if any(fk['referred_table'] == 'chat_messages' for fk in inspector.get_foreign_keys(table)):
+            continue
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_message_id_fkey "
+            f"FOREIGN KEY (message_id) REFERENCES chat_messages(id) NOT VALID"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        relkind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE relname = 'chat_messages'")).scalar()
+        if relkind == 'p':
+            sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('chat_messages', 'id')")).scalar()
+            op.execute(f"""
+                CREATE TABLE chat_messages_plain (
+                    id integer NOT NULL DEFAULT nextval('{sequence}') PRIMARY KEY,
+                    session_id integer REFERENCES chat_sessions(id),
+                    content text,
+                    translated_content text,
+                    source_language varchar(10),
+                    target_language varchar(10),
+                    is_from_user boolean DEFAULT true,
+                    created_at timestamptz DEFAULT now()
+                )
+            """)
+            _copy_in_chunks(bind, "chat_messages", "chat_messages_plain", f"{COLUMNS}, created_at")
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY chat_messages_plain.id")
+            op.execute("DROP TABLE chat_messages CASCADE")
+            op.execute("ALTER TABLE chat_messages_plain RENAME TO chat_messages")
+            op.execute("ALTER TABLE chat_messages RENAME CONSTRAINT chat_messages_plain_pkey TO chat_messages_pkey")
+            for name, columns in INDEXES:
+                op.execute(f"CREATE INDEX {name} ON chat_messages ({columns})")
+            _restore_foreign_keys(bind)
+
+    op.drop_index(op.f('ix_chat_message_archive_sessions_session_id'), table_name='chat_message_archive_sessions')
+    op.drop_table('chat_message_archive_sessions')
+    op.drop_index('ix_chat_message_archives_tenant_month', table_name='chat_message_archives')
+    op.drop_index(op.f('ix_chat_message_archives_month'), table_name='chat_message_archives')
+    op.drop_index(op.f('ix_chat_message_archives_tenant_id'), table_name='chat_message_archives')
+    op.drop_index(op.f('ix_chat_message_archives_id'), table_name='chat_message_archives')
+    op.drop_table('chat_message_archives')
@@ -0,0 +1,31 @@
+"""Add usage_logs.flush_id for write-behind metering recovery
+
+Revision ID: usage_log_flush_id_20261019
+Revises: partition_chat_messages_20261018
+Create Date: 2026-10-19 09:00:00.000000
+
+Each metering flush writes its rows with the flush id; a batch left claimed in
+Redis after a crash is acknowledged when rows with its id exist, requeued
+otherwise.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'usage_log_flush_id_20261019'
+down_revision = 'partition_chat_messages_20261018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('usage_logs')}
+    if 'flush_id' not in columns:
+        op.add_column('usage_logs', sa.Column('flush_id', sa.String(length=32), nullable=True))
+        op.create_index(op.f('ix_usage_logs_flush_id'), 'usage_logs', ['flush_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_usage_logs_flush_id'), table_name='usage_logs')
+    op.drop_column('usage_logs', 'flush_id')
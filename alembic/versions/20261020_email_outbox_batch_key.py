@@ -0,0 +1,40 @@
+"""Add email_outbox.batch_key so batched emails are retried as the same batch
+
+Revision ID: email_outbox_batch_key_20261020
+Revises: usage_log_flush_id_20261019
+Create Date: 2026-10-20 09:00:00.000000
+
+A batch request carries one idempotency key for all its emails. The key is
+stored on the rows before the request goes out, and a batch that may have
+reached the provider is only retried whole under that key, never one by one.
+email_outbox itself is created by create_all; this only adds the column to
+tables created before it existed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'email_outbox_batch_key_20261020'
+down_revision = 'usage_log_flush_id_20261019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'email_outbox' not in inspector.get_table_names():
+        return
+    columns = {column['name'] for column in inspector.get_columns('email_outbox')}
+    if 'batch_key' not in columns:
+        op.add_column('email_outbox', sa.Column('batch_key', sa.String(length=255), nullable=True))
+        op.create_index(op.f('ix_email_outbox_batch_key'), 'email_outbox', ['batch_key'], unique=False)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'email_outbox' not in inspector.get_table_names():
+        return
+    columns = {column['name'] for column in inspector.get_columns('email_outbox')}
+    if 'batch_key' in columns:
+        op.drop_index(op.f('ix_email_outbox_batch_key'), table_name='email_outbox')
+        op.drop_column('email_outbox', 'batch_key')
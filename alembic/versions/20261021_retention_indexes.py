@@ -0,0 +1,67 @@
+"""Add the indexes the retention policies rely on
+
+Revision ID: retention_indexes_20261021
+Revises: email_outbox_batch_key_20261020
+Create Date: 2026-10-21 09:00:00.000000
+
+The "no messages since" and "inactive since" checks of app/services/retention.py
+probe chat_messages by (session_id, created_at), slack_thread_memory by
+(is_active, last_activity) and instagram_messages by (conversation_id,
+created_at). The indexes are declared on the models, so create_all builds them
+on new databases; this adds them to existing tables. On Postgres they are built
+CONCURRENTLY so the tables stay writable. The partitioned chat_messages already
+got its index from the partition migration.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'retention_indexes_20261021'
+down_revision = 'email_outbox_batch_key_20261020'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_chat_messages_session_created", "chat_messages", ["session_id", "created_at"]),
+    ("idx_slack_thread_active_activity", "slack_thread_memory", ["is_active", "last_activity"]),
+    ("idx_instagram_messages_conversation_created", "instagram_messages", ["conversation_id", "created_at"]),
+]
+
+
+def _existing(inspector, table):
+    if not inspector.has_table(table):
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    postgres = bind.dialect.name == 'postgresql'
+    missing = []
+    for name, table, columns in INDEXES:
+        existing = _existing(inspector, table)
+        if existing is not None and name not in existing:
+            missing.append((name, table, columns))
+
+    if not postgres:
+        for name, table, columns in missing:
+            op.create_index(name, table, columns, unique=False)
+        return
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in missing:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for name, table, _ in INDEXES:
+        if table == 'chat_messages' and bind.dialect.name == 'postgresql':
+            # Belongs to the partitioned table built by the partition migration
+            continue
+        existing = _existing(inspector, table)
+        if existing and name in existing:
+            op.drop_index(name, table_name=table)
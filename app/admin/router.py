@@ -1741,4 +1741,61 @@ async def generate_test_secure_id(
             "success": False,
             "error": f"Test failed: {str(e)}",
             "recommendation": "Fix issues before proceeding with bulk operations"
-        }
\ No newline at end of file
+        }
+
+
+# =============================================================================
+# DATA RETENTION
+# =============================================================================
+
+@router.get("/retention/report")
+async def get_retention_report(
+    tenant_id: Optional[int] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Dry run: rows each retention policy would touch right now, without changing anything"""
+    from app.services.retention import get_retention_engine
+    from fastapi.concurrency import run_in_threadpool
+
+    engine = get_retention_engine()
+    report = await run_in_threadpool(engine.run, None, tenant_id, True)
+    return {
+        "policies": engine.describe(),
+        "dry_run": report,
+        "last_run": engine.last_report
+    }
+
+
+@router.post("/retention/run")
+async def run_retention(
+    policy: Optional[str] = None,
+    tenant_id: Optional[int] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Run retention policies now (all tenants unless tenant_id is given)"""
+    from app.services.retention import get_retention_engine, RETENTION_POLICIES
+    from fastapi.concurrency import run_in_threadpool
+
+    if policy and policy not in RETENTION_POLICIES:
+        raise HTTPException(status_code=404, detail=f"Unknown retention policy: {policy}")
+
+    engine = get_retention_engine()
+    return await run_in_threadpool(engine.run, [policy] if policy else None, tenant_id, False)
+
+
+@router.post("/retention/archive-month")
+async def archive_chat_month(
+    month: str = Query(..., description="Month to archive, YYYY-MM"),
+    dry_run: bool = True,
+    current_user: User = Depends(get_admin_user)
+):
+    """Move one month of chat messages to the archive tier (dry run by default)"""
+    from app.chatbot.message_partitions import ChatMessageArchiver
+    from fastapi.concurrency import run_in_threadpool
+
+    try:
+        month_start = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+
+    return await run_in_threadpool(ChatMessageArchiver().archive_month, month_start, dry_run)
@@ -10,6 +10,7 @@ from app.analytics.models import ConversationAnalytics
 from app.chatbot.models import ChatSession, ChatMessage
 from app.live_chat.customer_detection_service import CustomerDetectionService
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
 
 
 try:
@@ -27,11 +28,7 @@ class AnalyticsService:
     def __init__(self, db: Session):
         self.db = db
         if LLM_AVAILABLE and settings.OPENAI_API_KEY:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.3,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("analytics", temperature=0.3)
         else:
             self.llm = None
 
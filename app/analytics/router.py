@@ -532,10 +532,9 @@ async def get_session_details(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get messages
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session.id
-    ).order_by(ChatMessage.created_at.asc()).all()
+    # Get messages (including months moved to the archive tier)
+    from app.chatbot.message_partitions import load_session_messages
+    messages = load_session_messages(db, session)
     
     # Calculate metrics
     first_message_time = messages[0].created_at if messages else None
@@ -13,7 +13,7 @@ from app.chatbot.models import ChatSession, ChatMessage
 from app.config import settings
 from app.utils.language_service import language_service
 from app.chatbot.response_simulator import SimpleHumanDelaySimulator
-from app.chatbot.simple_memory import SimpleChatbotMemory
+from app.chatbot.simple_memory import SimpleChatbotMemory, invalidate_session_cache
 from datetime import datetime
 from app.chatbot.security import build_secure_chatbot_prompt, check_message_security
 
@@ -1198,6 +1198,8 @@ Your detailed, step-by-step response:"""
             )
             self.db.add(security_msg)
             self.db.commit()
+            # Written outside SimpleChatbotMemory: the cached message ring is now stale
+            invalidate_session_cache(session_id=session_id)
             
             return {
                 "session_id": session_id,
@@ -3,7 +3,9 @@ import logging
 from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
 from app.knowledge_base.models import TenantIntentPattern, CentralIntentModel
+from app.chatbot.intent_index import get_tenant_intent_index
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
 
 try:
     from langchain_openai import ChatOpenAI
@@ -21,11 +23,7 @@ class EnhancedIntentClassifier:
         self.db = db
         self.llm_available = LLM_AVAILABLE and bool(settings.OPENAI_API_KEY)
         if self.llm_available:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.2,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("intent_classifier", temperature=0.2)
     
     def classify_intent(self, user_message: str, tenant_id: int) -> Dict[str, Any]:
         """Two-tier classification: tenant-specific first, then central"""
@@ -56,22 +54,28 @@ class EnhancedIntentClassifier:
 
     
     def _classify_tenant_specific(self, user_message: str, tenant_id: int) -> Dict[str, Any]:
-        """LLM-powered semantic pattern matching"""
+        """Local index match; the LLM only arbitrates between the top candidates when unsure"""
         try:
-            # Get tenant patterns
-            patterns = self.db.query(TenantIntentPattern).filter(
-                TenantIntentPattern.tenant_id == tenant_id,
-                TenantIntentPattern.is_active == True
-            ).all()
-            
-            logger.info(f"🔍 Found {len(patterns)} tenant patterns for semantic analysis")
+            index = get_tenant_intent_index(self.db, tenant_id)
             
-            if not patterns:
+            if index.is_empty:
                 logger.warning(f"⚠️ No tenant-specific patterns found for tenant {tenant_id}")
                 return {"intent": "general", "confidence": 0.0, "source": "no_tenant_patterns"}
             
-            # Use LLM for semantic matching
-            return self._semantic_pattern_matching(user_message, patterns)
+            match = index.classify(user_message)
+            if match.confident:
+                logger.info(f"🧭 Index match in {match.elapsed_ms:.1f}ms: pattern {match.pattern.id} "
+                            f"(score {match.score:.2f}, margin {match.margin:.2f})")
+                return match.as_result()
+            
+            if match.rejected:
+                logger.info(f"🧭 No tenant pattern near the message (score {match.score:.2f})")
+                return {"intent": "general", "confidence": 0.0, "source": "index_no_match"}
+            
+            candidates = index.candidates(match)
+            logger.info(f"🔍 Index unsure (score {match.score:.2f}, margin {match.margin:.2f}); "
+                        f"asking LLM about {len(candidates)} of {len(index.patterns)} patterns")
+            return self._semantic_pattern_matching(user_message, candidates)
             
         except Exception as e:
             logger.error(f"Tenant semantic classification error: {e}")
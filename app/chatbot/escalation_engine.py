@@ -8,7 +8,10 @@ from sqlalchemy.orm import Session
 from app.chatbot.models import Escalation, EscalationMessage
 from app.chatbot.simple_memory import SimpleChatbotMemory
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
+from app.chatbot.message_triage import ESCALATION, triage_escalation, record_local, record_llm
 import os
+import time
 
 try:
     from langchain_openai import ChatOpenAI
@@ -29,11 +32,7 @@ class EscalationEngine:
         self.llm_available = LLM_AVAILABLE and bool(settings.OPENAI_API_KEY)
         
         if self.llm_available:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.2,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("escalation", temperature=0.2, tenant_id=tenant_id)
         
         # Email config
         self.resend_api_key = os.getenv("RESEND_API_KEY")
@@ -44,6 +43,21 @@ class EscalationEngine:
     def should_escalate(self, user_message: str, bot_response: str, 
                        conversation_history: List[Dict]) -> Tuple[bool, str, Dict]:
         """Detect if escalation should be offered"""
+        # ⚡ Explicit requests, clear frustration and clearly routine messages skip the LLM
+        verdict = triage_escalation(user_message, bot_response, conversation_history)
+        if verdict.decided:
+            record_local(ESCALATION, verdict)
+            if verdict.decision:
+                logger.info(f"🚨 Escalation trigger: {verdict.rule}")
+                return True, verdict.rule, {
+                    "should_escalate": True,
+                    "confidence": verdict.confidence,
+                    "reason": verdict.rule,
+                    "escalation_type": "general",
+                    "source": "fast_path"
+                }
+            return False, "no_triggers", {}
+        
         if not self.llm_available:
             return self._basic_escalation_check(user_message)
         
@@ -75,11 +89,13 @@ RESPONSE (JSON):
 Analysis:"""
             )
             
+            started = time.perf_counter()
             result = self.llm.invoke(prompt.format(
                 user_message=user_message,
                 bot_response=bot_response,
                 context=context_text
             ))
+            record_llm(ESCALATION, (time.perf_counter() - started) * 1000, verdict.rule)
             
             import re
             json_match = re.search(r'\{.*\}', result.content, re.DOTALL)
@@ -0,0 +1,153 @@
+"""
+Accuracy / latency comparison of tenant intent classification strategies.
+
+    python -m app.chatbot.intent_benchmark                 # local index vs keyword fallback
+    python -m app.chatbot.intent_benchmark --llm           # also the full-pattern LLM prompt
+    python -m app.chatbot.intent_benchmark --fixture path.json --min-score 0.3 --margin 0.05 --reject-score 0.15
+
+The fixture holds TenantIntentPattern-shaped rows and labelled messages
+(document_id null = no tenant document should match); see
+app/chatbot/fixtures/intent_benchmark.json. No database is needed.
+
+Strategies:
+- index: TenantIntentIndex alone; unsure messages count as "deferred"
+- index+fallback: unsure messages resolved by keyword scoring over the top candidates
+  (what production does when the LLM is unavailable)
+- index+llm: unsure messages sent to the LLM with only the top candidates (--llm)
+- keyword: the old keyword scoring over every pattern
+- llm: the old prompt with every pattern serialized into it (--llm)
+"""
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+# app.database imports every model module at its end; loading it first keeps
+# intent_index -> knowledge_base.models from re-entering it half-initialized
+import app.database  # noqa: F401
+from app.chatbot.intent_index import IndexedPattern, TenantIntentIndex
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "intent_benchmark.json")
+
+
+def _load(path: str):
+    with open(path) as handle:
+        fixture = json.load(handle)
+    patterns = [
+        IndexedPattern(
+            id=row["id"],
+            document_id=row.get("document_id"),
+            intent_type=row["intent_type"],
+            pattern_data=row["pattern_data"],
+            confidence=row.get("confidence", 0.8),
+        )
+        for row in fixture["patterns"]
+    ]
+    return patterns, fixture["messages"]
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def _evaluate(name: str, messages: List[Dict], predict: Callable[[str], Optional[object]]) -> Dict:
+    """predict returns a document_id, None for "no match", or "deferred" """
+    correct = deferred = 0
+    latencies = []
+    errors = []
+    for message in messages:
+        started = time.perf_counter()
+        predicted = predict(message["text"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if predicted == "deferred":
+            deferred += 1
+        elif predicted == message["document_id"]:
+            correct += 1
+        else:
+            errors.append((message["text"], message["document_id"], predicted))
+    decided = len(messages) - deferred
+    return {
+        "strategy": name,
+        "accuracy": correct / len(messages),
+        "precision_when_decided": correct / decided if decided else 0.0,
+        "deferred": deferred,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "errors": errors,
+    }
+
+
+def _document(result: Dict) -> Optional[int]:
+    return result.get("document_id") if result.get("intent") != "general" and result.get("confidence", 0) > 0 else None
+
+
+def run(fixture: str, min_score: Optional[float], margin: Optional[float], reject_score: Optional[float],
+        use_llm: bool, verbose: bool):
+    from app.chatbot.enhanced_intent_classifier import EnhancedIntentClassifier
+
+    patterns, messages = _load(fixture)
+    started = time.perf_counter()
+    index = TenantIntentIndex(patterns, min_score=min_score, margin=margin, reject_score=reject_score)
+    build_ms = (time.perf_counter() - started) * 1000
+    classifier = EnhancedIntentClassifier(db=None)
+
+    def index_only(text):
+        match = index.classify(text)
+        if match.confident:
+            return match.pattern.document_id
+        return None if match.rejected else "deferred"
+
+    def index_with(resolve):
+        def predict(text):
+            match = index.classify(text)
+            if match.confident:
+                return match.pattern.document_id
+            if match.rejected:
+                return None
+            return _document(resolve(text, index.candidates(match)))
+        return predict
+
+    results = [
+        _evaluate("index", messages, index_only),
+        _evaluate("index+fallback", messages, index_with(classifier._fallback_pattern_matching)),
+        _evaluate("keyword", messages, lambda text: _document(classifier._fallback_pattern_matching(text, patterns))),
+    ]
+    if use_llm:
+        if not classifier.llm_available:
+            print("⚠️ --llm given but no OPENAI_API_KEY / langchain; skipping LLM strategies")
+        else:
+            results.append(_evaluate("index+llm", messages, index_with(classifier._semantic_pattern_matching)))
+            results.append(_evaluate(
+                "llm", messages, lambda text: _document(classifier._semantic_pattern_matching(text, patterns))
+            ))
+
+    print(f"{len(messages)} messages, {len(patterns)} patterns, {index.example_count} examples; "
+          f"index built in {build_ms:.1f}ms (min_score={index.min_score}, margin={index.margin}, "
+          f"reject_score={index.reject_score})")
+    print(f"{'strategy':<16}{'accuracy':>10}{'precision':>11}{'deferred':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for result in results:
+        print(f"{result['strategy']:<16}{result['accuracy']:>10.1%}{result['precision_when_decided']:>11.1%}"
+              f"{result['deferred']:>10}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}")
+    if verbose:
+        for result in results:
+            for text, expected, predicted in result["errors"]:
+                print(f"  [{result['strategy']}] {text!r}: expected {expected}, got {predicted}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--margin", type=float, default=None)
+    parser.add_argument("--reject-score", type=float, default=None)
+    parser.add_argument("--llm", action="store_true", help="also run the LLM-backed strategies")
+    parser.add_argument("-v", "--verbose", action="store_true", help="list misclassified messages")
+    args = parser.parse_args()
+    run(args.fixture, args.min_score, args.margin, args.reject_score, args.llm, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
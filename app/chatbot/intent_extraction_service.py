@@ -3,6 +3,7 @@ from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
 from app.knowledge_base.models import KnowledgeBase, TenantIntentPattern, ProcessingStatus
 from app.config import settings
+from app.chatbot.intent_index import invalidate_intent_index
 
 try:
     from langchain_openai import ChatOpenAI
@@ -194,6 +195,7 @@ JSON Response:"""
             
             self.db.add(pattern_record)
             self.db.commit()
+            invalidate_intent_index(tenant_id)
             
             logger.info(f"✅ Stored intent patterns for document {document_id}: {patterns['intent_type']}")
             
@@ -227,11 +229,16 @@ JSON Response:"""
     def delete_document_patterns(self, document_id: int):
         """Delete patterns when document is removed"""
         try:
+            tenant_ids = {tenant_id for (tenant_id,) in self.db.query(TenantIntentPattern.tenant_id).filter(
+                TenantIntentPattern.document_id == document_id
+            ).distinct()}
             deleted = self.db.query(TenantIntentPattern).filter(
                 TenantIntentPattern.document_id == document_id
             ).delete()
             
             self.db.commit()
+            for tenant_id in tenant_ids:
+                invalidate_intent_index(tenant_id)
             logger.info(f"🗑️ Deleted {deleted} intent patterns for document {document_id}")
             
         except Exception as e:
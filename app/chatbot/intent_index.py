@@ -0,0 +1,287 @@
+"""
+Per-tenant intent index over TenantIntentPattern rows.
+
+Each pattern row (one per knowledge-base document) is compiled into:
+- example vectors: one per keyword / question pattern / problem pattern /
+  trigger phrase, using TF-IDF weighted word, word-bigram and character
+  trigram features (trigrams tolerate typos and inflections)
+- a centroid: the normalized mean of the pattern's example vectors
+
+A message is scored against every pattern as a blend of its centroid similarity
+and its best example similarity. Scoring goes through inverted indexes, so only
+features the message shares with a pattern are touched and a lookup takes a
+few milliseconds even for tenants with many documents.
+
+    index = get_tenant_intent_index(db, tenant_id)
+    match = index.classify("my card keeps getting declined")
+    if match.confident:
+        ...  # no LLM call
+    elif match.rejected:
+        ...  # nothing in the tenant's documents is close; also no LLM call
+    else:
+        candidates = index.candidates(match)  # the few patterns worth asking the LLM about
+
+Indexes are cached per tenant and rebuilt after intent_extraction_service
+writes or deletes patterns (invalidate_intent_index), or after
+INTENT_INDEX_TTL_SECONDS so other workers pick up changes too.
+"""
+import math
+import re
+import time
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.knowledge_base.models import TenantIntentPattern
+from app.utils.bounded_cache import BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_FIELDS = ("keywords", "question_patterns", "problem_patterns", "trigger_phrases", "questions", "problems")
+CENTROID_WEIGHT = 0.4  # the rest goes to the best single example
+CANDIDATES = 3  # patterns handed to the LLM when the index is unsure
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_STOPWORDS = frozenset(
+    "a an the i me my we our you your it its is are was were be been am do does did to of in on at for "
+    "with and or but so if this that these those can could would should will how what why when where "
+    "please hi hello hey there just about".split()
+)
+_SUFFIXES = ("ing", "ed", "es", "s", "ly")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def extract_features(text: str) -> Dict[str, float]:
+    """Term counts: stemmed words, word bigrams and character trigrams"""
+    words = [_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+    features: Dict[str, float] = defaultdict(float)
+    for word in words:
+        features["w:" + word] += 1.0
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += 0.25
+    for first, second in zip(words, words[1:]):
+        features[f"b:{first}_{second}"] += 1.0
+    return features
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+    return {feature: weight / norm for feature, weight in vector.items()}
+
+
+@dataclass
+class IndexedPattern:
+    """Detached copy of a TenantIntentPattern row (same attribute names)"""
+    id: int
+    document_id: Optional[int]
+    intent_type: str
+    pattern_data: Dict[str, Any]
+    confidence: float = 0.0
+
+
+@dataclass
+class IntentMatch:
+    pattern: Optional[IndexedPattern]
+    score: float
+    margin: float
+    confident: bool
+    rejected: bool = False
+    ranked: List[Tuple[float, int]] = field(default_factory=list)  # (score, pattern index)
+    elapsed_ms: float = 0.0
+
+    def as_result(self) -> Dict[str, Any]:
+        """Same shape as EnhancedIntentClassifier's tenant-specific results"""
+        confidence = min(0.95, 0.7 + 0.25 * self.score + 0.5 * self.margin)
+        return {
+            "intent": self.pattern.intent_type,
+            "confidence": round(confidence, 3),
+            "source": "tenant_specific_index",
+            "document_id": self.pattern.document_id,
+            "pattern_id": self.pattern.id,
+            "similarity": round(self.score, 3),
+            "margin": round(self.margin, 3),
+        }
+
+
+class TenantIntentIndex:
+
+    def __init__(self, patterns: List[IndexedPattern], min_score: Optional[float] = None,
+                 margin: Optional[float] = None, reject_score: Optional[float] = None):
+        self.patterns = patterns
+        self.min_score = settings.INTENT_INDEX_MIN_SCORE if min_score is None else min_score
+        self.margin = settings.INTENT_INDEX_MARGIN if margin is None else margin
+        self.reject_score = settings.INTENT_INDEX_REJECT_SCORE if reject_score is None else reject_score
+        self.built_at = time.time()
+
+        example_features: List[Tuple[int, Dict[str, float]]] = []
+        for position, pattern in enumerate(patterns):
+            for text in self._examples(pattern):
+                features = extract_features(text)
+                if features:
+                    example_features.append((position, features))
+
+        # Smoothed IDF over examples: features shared by every document carry little signal
+        document_frequency: Dict[str, int] = defaultdict(int)
+        for _, features in example_features:
+            for feature in features:
+                document_frequency[feature] += 1
+        total = len(example_features) + 1
+        self.idf = {feature: math.log(total / (1 + count)) + 1.0 for feature, count in document_frequency.items()}
+
+        # feature -> [(example index, weight)] and feature -> [(pattern index, weight)]
+        self._example_postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self._example_owner: List[int] = []
+        centroid_sums: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for example_index, (position, features) in enumerate(example_features):
+            vector = self._weigh(features)
+            self._example_owner.append(position)
+            for feature, weight in vector.items():
+                self._example_postings[feature].append((example_index, weight))
+                centroid_sums[position][feature] += weight
+
+        self._centroid_postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for position, summed in centroid_sums.items():
+            for feature, weight in _normalize(summed).items():
+                self._centroid_postings[feature].append((position, weight))
+
+        self.example_count = len(example_features)
+
+    @staticmethod
+    def _examples(pattern: IndexedPattern) -> List[str]:
+        data = pattern.pattern_data or {}
+        examples = []
+        for key in EXAMPLE_FIELDS:
+            values = data.get(key) or []
+            if isinstance(values, list):
+                examples.extend(str(value) for value in values if value)
+        return examples
+
+    def _weigh(self, features: Dict[str, float]) -> Dict[str, float]:
+        return _normalize({
+            feature: (1.0 + math.log(count)) * self.idf[feature] if count >= 1 else count * self.idf[feature]
+            for feature, count in features.items()
+            if feature in self.idf
+        })
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.patterns
+
+    def score(self, message: str) -> List[Tuple[float, int]]:
+        """(score, pattern index) for every pattern sharing a feature with the message, best first"""
+        query = self._weigh(extract_features(message))
+        centroid_scores: Dict[int, float] = defaultdict(float)
+        example_scores: Dict[int, float] = defaultdict(float)
+        for feature, weight in query.items():
+            for position, centroid_weight in self._centroid_postings.get(feature, ()):
+                centroid_scores[position] += weight * centroid_weight
+            for example_index, example_weight in self._example_postings.get(feature, ()):
+                example_scores[example_index] += weight * example_weight
+
+        best_example: Dict[int, float] = defaultdict(float)
+        for example_index, value in example_scores.items():
+            owner = self._example_owner[example_index]
+            best_example[owner] = max(best_example[owner], value)
+
+        ranked = [
+            (CENTROID_WEIGHT * centroid_scores.get(position, 0.0)
+             + (1 - CENTROID_WEIGHT) * best_example.get(position, 0.0), position)
+            for position in set(centroid_scores) | set(best_example)
+        ]
+        ranked.sort(reverse=True)
+        return ranked
+
+    def classify(self, message: str) -> IntentMatch:
+        started = time.perf_counter()
+        ranked = self.score(message)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not ranked:
+            return IntentMatch(None, 0.0, 0.0, False, True, ranked, elapsed_ms)
+
+        top_score, top_position = ranked[0]
+        top = self.patterns[top_position]
+        # Margin against the best pattern that would route elsewhere
+        runner_up = next(
+            (score for score, position in ranked[1:]
+             if self.patterns[position].document_id != top.document_id),
+            0.0,
+        )
+        margin = top_score - runner_up
+        confident = top_score >= self.min_score and margin >= self.margin
+        rejected = top_score < self.reject_score
+        return IntentMatch(top, top_score, margin, confident, rejected, ranked, elapsed_ms)
+
+    def candidates(self, match: IntentMatch, limit: int = CANDIDATES) -> List[IndexedPattern]:
+        """Best-scoring patterns for an ambiguous message; every pattern if nothing scored"""
+        if not match.ranked:
+            return list(self.patterns)
+        return [self.patterns[position] for _, position in match.ranked[:limit]]
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs) -> "TenantIntentIndex":
+        return cls([
+            IndexedPattern(
+                id=row.id,
+                document_id=row.document_id,
+                intent_type=row.intent_type,
+                pattern_data=row.pattern_data or {},
+                confidence=row.confidence or 0.0,
+            )
+            for row in rows
+        ], **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "patterns": len(self.patterns),
+            "examples": self.example_count,
+            "features": len(self.idf),
+            "built_at": self.built_at,
+        }
+
+
+_indexes = BoundedTTLCache(
+    max_entries=settings.INTENT_INDEX_MAX_TENANTS,
+    ttl_seconds=settings.INTENT_INDEX_TTL_SECONDS,
+)
+
+
+def get_tenant_intent_index(db: Session, tenant_id: int) -> TenantIntentIndex:
+    index = _indexes.get(tenant_id)
+    if index is None:
+        started = time.perf_counter()
+        rows = db.query(TenantIntentPattern).filter(
+            TenantIntentPattern.tenant_id == tenant_id,
+            TenantIntentPattern.is_active == True
+        ).all()
+        index = TenantIntentIndex.from_rows(rows)
+        _indexes.set(tenant_id, index)
+        logger.info(
+            f"🧭 Built intent index for tenant {tenant_id}: {len(index.patterns)} patterns, "
+            f"{index.example_count} examples in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+    return index
+
+
+def invalidate_intent_index(tenant_id: Optional[int] = None):
+    """Drop a tenant's index (or all) so the next message rebuilds it"""
+    if tenant_id is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(tenant_id)
+
+
+def get_intent_index_stats() -> Dict[str, Any]:
+    return _indexes.stats()
@@ -11,6 +11,7 @@ import json
 import logging
 import hashlib
 from app.chatbot.models import ChatSession, ChatMessage
+from app.chatbot.simple_memory import invalidate_session_cache
 
 logger = logging.getLogger(__name__)
 
@@ -242,6 +243,8 @@ class EnhancedChatbotMemory:
             
             self.db.add(message)
             self.db.commit()
+            # Written outside SimpleChatbotMemory: the cached message ring is now stale
+            invalidate_session_cache(session_id=session_id)
             
             logger.info(f"Stored message for session {session_id}")
             return True
@@ -399,31 +402,10 @@ class EnhancedChatbotMemory:
         """
         Clean up old inactive sessions to manage memory with improved logic
         """
-        cutoff_date = datetime.utcnow() - timedelta(days=days_old)
+        from app.services.retention import get_retention_engine
         
         # Only deactivate sessions that haven't had messages recently
-        old_sessions = self.db.query(ChatSession).filter(
-            and_(
-                ChatSession.tenant_id == self.tenant_id,
-                ChatSession.created_at < cutoff_date,
-                ChatSession.is_active == True
-            )
-        ).all()
-        
-        deactivated_count = 0
-        for session in old_sessions:
-            # Check if session has recent messages
-            recent_message = self.db.query(ChatMessage).filter(
-                and_(
-                    ChatMessage.session_id == session.id,
-                    ChatMessage.created_at > cutoff_date
-                )
-            ).first()
-            
-            if not recent_message:
-                session.is_active = False
-                deactivated_count += 1
-        
-        self.db.commit()
+        result = get_retention_engine().run_policy("chat_sessions", tenant_id=self.tenant_id, days=days_old)
+        deactivated_count = result["affected"]
         logger.info(f"Deactivated {deactivated_count} old sessions")
         return deactivated_count
\ No newline at end of file
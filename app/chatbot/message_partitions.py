@@ -0,0 +1,428 @@
+"""
+Monthly partitions and cold archive for chat_messages.
+
+On Postgres, chat_messages is a table partitioned by RANGE (created_at), with one
+partition per month (chat_messages_pYYYYMM) and a DEFAULT partition. The
+partition migration converts the existing table. Each partition has its own
+small indexes, so vacuum and reindex work month by month, and old months can
+be dropped without deleting rows one by one. ensure_partitions() creates the
+coming months ahead of time.
+
+SQLite has no partitioning, so months are emulated as created_at ranges over
+the single table. Archiving works the same way there, but removes the rows
+with chunked deletes instead of dropping a partition.
+
+Archiving a month writes each tenant's messages to
+tenant_<id>/chat_messages/<YYYY-MM>.jsonl.gz in the storage service. It records
+the file in chat_message_archives, and the sessions it holds in
+chat_message_archive_sessions, then removes the month from the database.
+load_session_messages() merges live rows with the archive files of that
+session only, so history, transcript and export endpoints keep returning
+complete conversations.
+"""
+import os
+import gzip
+import json
+import logging
+import tempfile
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.chatbot.models import (
+    ChatSession, ChatMessage, ChatMessageArchive, ChatMessageArchiveSession, is_partitioned
+)
+
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "chat_messages_p"
+DEFAULT_PARTITION = "chat_messages_default"
+EXPORT_BATCH_SIZE = 5000
+DELETE_BATCH_SIZE = 5000
+MESSAGE_FIELDS = ("id", "session_id", "content", "translated_content", "source_language",
+                  "target_language", "is_from_user", "created_at")
+
+
+# ----- month arithmetic -----
+
+def month_start(value: datetime) -> datetime:
+    """First instant of value's month as a naive UTC datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + (month.month - 1) + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_ddl(month: datetime) -> str:
+    start, end = month_start(month), add_months(month_start(month), 1)
+    return (f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF chat_messages "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d} 00:00:00+00') TO ('{end:%Y-%m-%d} 00:00:00+00')")
+
+
+# ----- partition management -----
+
+def ensure_partitions(engine=None, months_ahead: Optional[int] = None) -> List[str]:
+    """Create partitions for the current month and the next months_ahead; no-op unless partitioned"""
+    if engine is None:
+        from app.database import engine
+    months_ahead = settings.CHAT_PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'chat_messages'"
+        ))}
+    current = month_start(datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(partition_ddl(month)))
+            created.append(partition_name(month))
+        except Exception as e:
+            # Fails if the DEFAULT partition already holds rows for this month
+            logger.error(f"❌ Could not create partition {partition_name(month)}: {e}")
+    if created:
+        logger.info(f"🗓️ Created chat_messages partitions: {', '.join(created)}")
+    return created
+
+
+def list_months(db: Session) -> List[Dict[str, Any]]:
+    """Months currently stored in chat_messages with their row counts (partitions or emulated ranges)"""
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        bucket = func.date_trunc("month", func.timezone("UTC", ChatMessage.created_at))
+    else:
+        bucket = func.strftime("%Y-%m-01 00:00:00", ChatMessage.created_at)
+    rows = db.execute(
+        select(bucket.label("month"), func.count(ChatMessage.id)).group_by(bucket).order_by(bucket)
+    ).all()
+    months = []
+    for month, count in rows:
+        if isinstance(month, str):
+            month = datetime.strptime(month, "%Y-%m-%d %H:%M:%S")
+        months.append({"month": month_start(month), "rows": count, "partition": partition_name(month)})
+    return months
+
+
+# ----- archive tier -----
+
+@dataclass
+class ArchivedChatMessage:
+    """A chat message read back from the archive; quacks like ChatMessage for readers"""
+    id: int
+    session_id: int
+    content: Optional[str]
+    translated_content: Optional[str]
+    source_language: Optional[str]
+    target_language: Optional[str]
+    is_from_user: bool
+    created_at: datetime
+    archived: bool = True
+
+
+def _archive_path(tenant_id: int, month: datetime, part: int = 0) -> str:
+    suffix = f".part{part}" if part else ""
+    return f"tenant_{tenant_id}/chat_messages/{month:%Y-%m}{suffix}.jsonl.gz"
+
+
+def _serialize(row) -> str:
+    record = {field: getattr(row, field) for field in MESSAGE_FIELDS}
+    record["created_at"] = row.created_at.isoformat() if row.created_at else None
+    return json.dumps(record, ensure_ascii=False)
+
+
+class ChatMessageArchiver:
+    """Moves whole months of chat_messages to compressed files in object storage"""
+
+    def __init__(self, session_factory=None, storage=None):
+        if session_factory is None:
+            from app.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self._storage = storage
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from app.services.storage import storage_service
+            self._storage = storage_service
+        return self._storage
+
+    def _upload(self, db: Session, tenant_id: int, month: datetime, local_path: str, stats: Dict[str, Any]):
+        from app.services.storage_cache import file_sha256
+
+        # Rows that arrive late for an archived month go to an extra part file
+        part = db.query(func.count(ChatMessageArchive.id)).filter(
+            ChatMessageArchive.tenant_id == tenant_id,
+            ChatMessageArchive.month == month
+        ).scalar() or 0
+        path = _archive_path(tenant_id, month, part)
+        self.storage.upload_file(self.storage.chat_archive_bucket, path, local_path, upsert=True)
+        archive = ChatMessageArchive(
+            tenant_id=tenant_id,
+            month=month,
+            storage_path=path,
+            sha256=file_sha256(local_path),
+            row_count=stats["rows"],
+            size_bytes=os.path.getsize(local_path),
+            min_message_id=stats["min_id"],
+            max_message_id=stats["max_id"],
+        )
+        db.add(archive)
+        db.flush()
+        session_ids = sorted(stats["sessions"])
+        for start in range(0, len(session_ids), EXPORT_BATCH_SIZE):
+            db.execute(insert(ChatMessageArchiveSession), [
+                {"archive_id": archive.id, "session_id": session_id}
+                for session_id in session_ids[start:start + EXPORT_BATCH_SIZE]
+            ])
+        db.commit()
+
+    def _export_month(self, db: Session, start: datetime, end: datetime) -> Dict[str, int]:
+        """Write one gzip file per tenant, streaming rows in (tenant, id) keyset order"""
+        tenant_key = func.coalesce(ChatSession.tenant_id, 0)
+        columns = [getattr(ChatMessage, field) for field in MESSAGE_FIELDS]
+        exported: Dict[int, int] = {}
+        last_tenant, last_id = -1, 0
+        current_tenant, handle, temp_path, stats = None, None, None, None
+
+        def finish():
+            handle.close()
+            try:
+                self._upload(db, current_tenant, month_start(start), temp_path, stats)
+                exported[current_tenant] = stats["rows"]
+            finally:
+                os.unlink(temp_path)
+
+        try:
+            while True:
+                rows = db.execute(
+                    select(tenant_key.label("tenant_id"), *columns)
+                    .select_from(ChatMessage)
+                    .outerjoin(ChatSession, ChatSession.id == ChatMessage.session_id)
+                    .where(and_(
+                        ChatMessage.created_at >= start,
+                        ChatMessage.created_at < end,
+                        or_(tenant_key > last_tenant, and_(tenant_key == last_tenant, ChatMessage.id > last_id))
+                    ))
+                    .order_by(tenant_key, ChatMessage.id)
+                    .limit(EXPORT_BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    if row.tenant_id != current_tenant:
+                        if handle is not None:
+                            finish()
+                            handle = None
+                        current_tenant = row.tenant_id
+                        fd, temp_path = tempfile.mkstemp(suffix=".jsonl.gz")
+                        os.close(fd)
+                        handle = gzip.open(temp_path, "wt", encoding="utf-8")
+                        stats = {"rows": 0, "min_id": row.id, "max_id": row.id, "sessions": set()}
+                    handle.write(_serialize(row) + "\n")
+                    stats["rows"] += 1
+                    if row.session_id is not None:
+                        stats["sessions"].add(row.session_id)
+                    stats["max_id"] = row.id
+                last_tenant, last_id = rows[-1].tenant_id, rows[-1].id
+            if handle is not None:
+                finish()
+                handle = None
+        finally:
+            if handle is not None:
+                handle.close()
+                os.unlink(temp_path)
+        return exported
+
+    def _remove_month(self, db: Session, start: datetime, end: datetime, exported_rows: int) -> str:
+        name = partition_name(month_start(start))
+        if is_partitioned(db.connection()):
+            partition_exists = db.execute(text(
+                "SELECT count(*) FROM pg_class WHERE relname = :name"
+            ), {"name": name}).scalar()
+            if partition_exists:
+                live_rows = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                if live_rows > exported_rows:
+                    raise RuntimeError(f"{name} gained rows during export ({live_rows} > {exported_rows})")
+                db.execute(text(f"ALTER TABLE chat_messages DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+                db.commit()
+                method = "drop_partition"
+            else:
+                method = "delete"
+        else:
+            method = "delete"
+
+        # Rows of this month that landed in the DEFAULT partition, or the whole
+        # month when partitioning is emulated
+        while True:
+            ids = (select(ChatMessage.id)
+                   .where(and_(ChatMessage.created_at >= start, ChatMessage.created_at < end))
+                   .limit(DELETE_BATCH_SIZE).correlate(None))
+            deleted = db.execute(
+                delete(ChatMessage).where(ChatMessage.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if not deleted or deleted < DELETE_BATCH_SIZE:
+                break
+        return method
+
+    def archive_month(self, month: datetime, dry_run: bool = False) -> Dict[str, Any]:
+        month = month_start(month)
+        # Aware bounds so Postgres compares timestamptz in UTC whatever the session TimeZone
+        start = month.replace(tzinfo=timezone.utc)
+        end = add_months(month, 1).replace(tzinfo=timezone.utc)
+        db = self.session_factory()
+        try:
+            rows = db.query(func.count(ChatMessage.id)).filter(
+                ChatMessage.created_at >= start, ChatMessage.created_at < end
+            ).scalar() or 0
+            result = {"month": f"{start:%Y-%m}", "rows": rows, "dry_run": dry_run}
+            if dry_run or not rows:
+                return result
+
+            exported = self._export_month(db, start, end)
+            exported_rows = sum(exported.values())
+            result["tenants"] = len(exported)
+            result["archived_rows"] = exported_rows
+            result["method"] = self._remove_month(db, start, end, exported_rows)
+            logger.info(f"🗄️ Archived chat_messages {start:%Y-%m}: {exported_rows} rows "
+                        f"for {len(exported)} tenants ({result['method']})")
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def archive_cold_months(self, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Archive every month older than CHAT_ARCHIVE_AFTER_MONTHS"""
+        if settings.CHAT_ARCHIVE_AFTER_MONTHS <= 0:
+            return []
+        cutoff = add_months(month_start(datetime.utcnow()), -settings.CHAT_ARCHIVE_AFTER_MONTHS)
+        db = self.session_factory()
+        try:
+            months = [entry["month"] for entry in list_months(db) if entry["month"] < cutoff]
+        finally:
+            db.close()
+
+        results = []
+        for month in months:
+            try:
+                results.append(self.archive_month(month, dry_run=dry_run))
+            except Exception as e:
+                logger.error(f"❌ Archiving chat_messages {month:%Y-%m} failed: {e}")
+                results.append({"month": f"{month:%Y-%m}", "error": str(e)})
+        return results
+
+
+# ----- readers -----
+
+def _read_archive(archive: ChatMessageArchive, session_pk: int) -> List[ArchivedChatMessage]:
+    from app.services.storage import storage_service
+
+    fd, local_path = tempfile.mkstemp(suffix=".jsonl.gz")
+    os.close(fd)
+    try:
+        # Checksum-addressed, so repeated transcript reads hit the local storage cache
+        storage_service.download_to_path(storage_service.chat_archive_bucket, archive.storage_path,
+                                         local_path, expected_sha256=archive.sha256)
+        messages = []
+        with gzip.open(local_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["session_id"] != session_pk:
+                    continue
+                created_at = record["created_at"]
+                record["created_at"] = datetime.fromisoformat(created_at) if created_at else None
+                messages.append(ArchivedChatMessage(**record))
+        return messages
+    finally:
+        os.unlink(local_path)
+
+
+def load_session_messages(db: Session, session: ChatSession) -> List[Any]:
+    """All messages of a session in chronological order, including archived months"""
+    messages: List[Any] = db.query(ChatMessage).filter(
+        ChatMessage.session_id == session.id
+    ).order_by(ChatMessage.created_at, ChatMessage.id).all()
+
+    # Only the files that hold this session's messages, from its first month on
+    since = month_start(session.created_at) if session.created_at else datetime.min
+    archives = db.query(ChatMessageArchive).join(
+        ChatMessageArchiveSession, ChatMessageArchiveSession.archive_id == ChatMessageArchive.id
+    ).filter(
+        ChatMessageArchiveSession.session_id == session.id,
+        ChatMessageArchive.tenant_id == (session.tenant_id or 0),
+        ChatMessageArchive.month >= since
+    ).order_by(ChatMessageArchive.month, ChatMessageArchive.id).all()
+    if not archives:
+        return messages
+
+    # A month whose removal failed after its files were recorded is exported again on
+    # retry, so a message can be in two files, or in a file and still live: keep one copy
+    seen_ids = {msg.id for msg in messages}
+    archived: List[Any] = []
+    for archive in archives:
+        try:
+            for msg in _read_archive(archive, session.id):
+                if msg.id not in seen_ids:
+                    seen_ids.add(msg.id)
+                    archived.append(msg)
+        except Exception as e:
+            logger.error(f"❌ Could not read chat archive {archive.storage_path}: {e}")
+
+    def sort_key(msg):
+        created_at = msg.created_at
+        if created_at is not None and created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return (created_at or datetime.min.replace(tzinfo=timezone.utc), msg.id)
+
+    return sorted(archived + messages, key=sort_key)
+
+
+# ----- maintenance loop -----
+
+_maintenance_running = False
+
+
+async def start_partition_maintenance():
+    """Create upcoming partitions daily and archive cold months - called from main.py startup"""
+    global _maintenance_running
+    _maintenance_running = True
+    archiver = ChatMessageArchiver()
+    while _maintenance_running:
+        try:
+            await asyncio.to_thread(ensure_partitions)
+            if settings.CHAT_ARCHIVE_AFTER_MONTHS > 0:
+                await asyncio.to_thread(archiver.archive_cold_months)
+        except Exception as e:
+            logger.error(f"❌ chat_messages partition maintenance failed: {e}")
+        await asyncio.sleep(24 * 3600)
+
+
+def stop_partition_maintenance():
+    global _maintenance_running
+    _maintenance_running = False
@@ -0,0 +1,262 @@
+"""
+Deterministic first tier for the yes/no questions the engine used to send to the LLM
+on every message: "is this a pure greeting?" and "does this customer need a human?".
+
+Each triage function returns a TriageVerdict. Clear cases are decided locally
+from the text (a bare "hi", "let me talk to a real person", a long product
+question with no greeting words); ambiguous ones come back with decision=None
+and the caller asks the LLM as before.
+
+    verdict = triage_greeting(user_message)
+    if verdict.decided:
+        record_local("greeting", verdict)
+    else:
+        ...  # LLM call, then record_llm("greeting", elapsed_ms)
+
+Every rule carries a confidence; verdicts below FAST_PATH_MIN_CONFIDENCE are
+deferred to the LLM. The confidences were set from the labelled corpus in
+app/chatbot/fixtures/triage_corpus.json, re-check them with
+python -m app.chatbot.triage_benchmark after changing a lexicon.
+"""
+import re
+import time
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GREETING = "greeting"
+ESCALATION = "escalation"
+
+_TOKEN = re.compile(r"[a-z0-9']+|\?")
+
+# ============ GREETING LEXICON ============
+
+GREETING_WORDS = frozenset(
+    "hi hello hey heya hiya howdy hallo hola yo sup wagwan greetings morning afternoon evening "
+    "bonjour salut ciao namaste".split()
+)
+# Social phrases that keep a message a pure greeting ("Hello, how are you?")
+SOCIAL_PHRASES = (
+    "good morning", "good afternoon", "good evening", "good day",
+    "how are you doing", "how are you", "how r u", "how's it going", "hows it going", "how is it going",
+    "how are things", "what's up", "whats up", "how do you do", "nice to meet you",
+    "just checking in", "just wanted to say hello", "just wanted to say hi", "just saying hi",
+    "just saying hello", "hope you're well", "hope you are well",
+)
+# Words that can sit next to a greeting without adding content
+FILLER_WORDS = frozenset(
+    "there all everyone everybody guys team folks friend friends bot again and you today doing well "
+    "oh um hmm good".split()
+)
+# Any of these after the greeting words means the user wants something
+REQUEST_WORDS = frozenset(
+    "tell about can could would will help need want wanted looking what why when where which who how "
+    "price pricing cost order account problem issue error question info information explain show send "
+    "buy cancel refund login password".split()
+)
+# Replies to a question the bot asked
+ANSWER_WORDS = frozenset("yes yeah yep no nope nah tried did done ok okay sure correct right".split())
+
+# ============ ESCALATION LEXICON ============
+
+_HUMAN_REQUEST = re.compile(
+    r"\b(speak|talk|chat|connect|transfer|put)\w*\s+(me\s+)?(to|with|through to)\s+"
+    r"(a|an|the|your|some)?\s*(real\s+|live\s+|actual\s+)?"
+    r"(human|person|someone|somebody|agent|representative|rep|manager|supervisor|staff|operator)\b"
+    r"|\b(real|live|actual)\s+(human|person|agent)\b"
+    r"|\bhuman\s+(agent|support|help|being)\b"
+    r"|\bcustomer\s+(service|support)\s+(agent|rep|team)\b"
+)
+# The phrases _basic_escalation_check has always escalated on, less "customer service"
+# which is as often "what are your customer service hours?"
+ESCALATION_PHRASES = (
+    "speak to human", "talk to human", "human agent",
+    "not helpful", "doesn't work", "frustrated", "speak to someone",
+)
+FRUSTRATION_PHRASES = (
+    "useless", "waste of time", "wasting my time", "ridiculous", "terrible", "worst", "fed up",
+    "sick of", "not helping", "isn't helping", "you don't understand", "you're not understanding",
+    "this is not working", "this isn't working", "still not working", "not working again",
+    "stop repeating", "same answer", "already told you", "asked you already", "angry", "unacceptable",
+)
+# Weaker signals: worth an LLM opinion, not worth escalating on alone
+CONTACT_PHRASES = ("customer service", "support team", "contact", "call me", "phone number", "email you")
+TROUBLE_WORDS = frozenset(
+    "not can't cannot won't doesn't didn't isn't wasn't still again error broken wrong fail failed "
+    "failing issue problem bug crash crashed stuck urgent asap complaint charged lost missing".split()
+)
+BOT_INABILITY_PHRASES = (
+    "i don't have", "i do not have", "i'm not sure", "i am not sure", "i couldn't find", "i could not find",
+    "unable to", "i can't help", "i cannot help", "don't have that information", "not able to",
+)
+
+
+@dataclass
+class TriageVerdict:
+    decision: Optional[bool]  # None = ambiguous, ask the LLM
+    confidence: float
+    rule: str
+    elapsed_ms: float = 0.0
+
+    @property
+    def decided(self) -> bool:
+        return self.decision is not None
+
+
+def _decide(decision: Optional[bool], confidence: float, rule: str, started: float) -> TriageVerdict:
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if decision is not None and confidence < settings.FAST_PATH_MIN_CONFIDENCE:
+        return TriageVerdict(None, confidence, f"{rule}:below_threshold", elapsed_ms)
+    return TriageVerdict(decision, confidence, rule, elapsed_ms)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower().replace("’", "'")).strip()
+
+
+def triage_greeting(user_message: str) -> TriageVerdict:
+    """Is the message purely social (treat as a greeting) or does it carry content?"""
+    started = time.perf_counter()
+    if not settings.FAST_PATH_ENABLED:
+        return TriageVerdict(None, 0.0, "disabled")
+
+    text = _normalize(user_message)
+    social = False
+    for phrase in SOCIAL_PHRASES:
+        if phrase in text:
+            text = text.replace(phrase, " ")
+            social = True
+    tokens = _TOKEN.findall(text)
+    greeting = social or any(token in GREETING_WORDS for token in tokens)
+
+    if not greeting:
+        if not tokens:
+            return _decide(False, 0.95, "empty", started)
+        return _decide(False, 0.98, "no_greeting_words", started)
+
+    # A bare "?" is just "how are you?" punctuation; a question mark with content is a question
+    rest = [token for token in tokens if token not in GREETING_WORDS and token not in FILLER_WORDS]
+    if not [token for token in rest if token != "?"]:
+        return _decide(True, 0.97, "pure_greeting", started)
+    if any(token in REQUEST_WORDS for token in rest) or "?" in rest:
+        return _decide(False, 0.95, "greeting_plus_request", started)
+    if any(token in ANSWER_WORDS for token in rest):
+        return _decide(False, 0.9, "greeting_plus_answer", started)
+    if len(rest) > 3:
+        return _decide(False, 0.9, "greeting_plus_content", started)
+    # e.g. "hi from london", "hello lyra": a couple of unknown words
+    return _decide(None, 0.5, "ambiguous", started)
+
+
+def _bot_inability(text: str) -> bool:
+    text = _normalize(text)
+    return any(phrase in text for phrase in BOT_INABILITY_PHRASES)
+
+
+def triage_escalation(user_message: str, bot_response: str = "",
+                      conversation_history: Optional[List[Dict]] = None) -> TriageVerdict:
+    """Does the customer clearly need (or clearly not need) a human?"""
+    started = time.perf_counter()
+    if not settings.FAST_PATH_ENABLED:
+        return TriageVerdict(None, 0.0, "disabled")
+
+    text = _normalize(user_message)
+    if _HUMAN_REQUEST.search(text):
+        return _decide(True, 0.96, "user_requested", started)
+    if any(phrase in text for phrase in ESCALATION_PHRASES):
+        return _decide(True, 0.9, "keyword_match", started)
+    if any(phrase in text for phrase in FRUSTRATION_PHRASES):
+        return _decide(True, 0.88, "frustrated", started)
+
+    tokens = set(_TOKEN.findall(text))
+    shouting = sum(1 for char in user_message or "" if char.isupper()) > 8 and (user_message or "").isupper()
+    if tokens & TROUBLE_WORDS or shouting or "!!" in text or any(phrase in text for phrase in CONTACT_PHRASES):
+        return _decide(None, 0.5, "trouble_signals", started)
+
+    # "Bot unable to solve after multiple attempts" needs the conversation, leave it to the LLM
+    if _bot_inability(bot_response):
+        return _decide(None, 0.5, "bot_unable", started)
+    recent_bot_turns = [
+        message.get("content", "") for message in (conversation_history or [])[-6:]
+        if message.get("role") != "user"
+    ]
+    if sum(1 for content in recent_bot_turns if _bot_inability(content)) >= 2:
+        return _decide(None, 0.5, "repeated_bot_unable", started)
+
+    return _decide(False, 0.93, "no_signals", started)
+
+
+# ============ STATS ============
+
+class TriageStats:
+    """Share of decisions made locally and the LLM time that saved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = defaultdict(int)
+        self._local_ms = defaultdict(float)
+        self._llm = defaultdict(int)
+        self._llm_ms = defaultdict(float)
+        self._rules = defaultdict(lambda: defaultdict(int))
+
+    def record_local(self, task: str, verdict: TriageVerdict):
+        with self._lock:
+            self._local[task] += 1
+            self._local_ms[task] += verdict.elapsed_ms
+            self._rules[task][verdict.rule] += 1
+
+    def record_llm(self, task: str, elapsed_ms: float, rule: str = "ambiguous"):
+        with self._lock:
+            self._llm[task] += 1
+            self._llm_ms[task] += elapsed_ms
+            self._rules[task][rule] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tasks = {}
+            for task in sorted(set(self._local) | set(self._llm)):
+                local, llm = self._local[task], self._llm[task]
+                avg_llm_ms = self._llm_ms[task] / llm if llm else None
+                avg_local_ms = self._local_ms[task] / local if local else 0.0
+                tasks[task] = {
+                    "local": local,
+                    "llm": llm,
+                    "local_share": round(local / (local + llm), 4) if local + llm else 0.0,
+                    "avg_local_ms": round(avg_local_ms, 3),
+                    "avg_llm_ms": round(avg_llm_ms, 1) if avg_llm_ms is not None else None,
+                    # Each local decision avoided one LLM round trip of average length
+                    "estimated_saved_ms": round(local * (avg_llm_ms - avg_local_ms), 1) if avg_llm_ms else None,
+                    "rules": dict(self._rules[task]),
+                }
+            return {
+                "enabled": settings.FAST_PATH_ENABLED,
+                "min_confidence": settings.FAST_PATH_MIN_CONFIDENCE,
+                "tasks": tasks,
+            }
+
+    def reset(self):
+        with self._lock:
+            for counter in (self._local, self._local_ms, self._llm, self._llm_ms, self._rules):
+                counter.clear()
+
+
+_stats = TriageStats()
+
+
+def record_local(task: str, verdict: TriageVerdict):
+    _stats.record_local(task, verdict)
+    logger.info(f"⚡ {task} decided locally: {verdict.decision} ({verdict.rule}, {verdict.elapsed_ms:.2f}ms)")
+
+
+def record_llm(task: str, elapsed_ms: float, rule: str = "ambiguous"):
+    _stats.record_llm(task, elapsed_ms, rule)
+
+
+def get_triage_stats() -> Dict[str, Any]:
+    return _stats.snapshot()
@@ -1,8 +1,39 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime, Boolean, JSON, Enum
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime, Boolean, JSON, Enum, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.database import Base
+from app.database import Base, engine
 import enum
+import logging
+
+
+def is_partitioned(conn) -> bool:
+    """Whether chat_messages is the partitioned table built by the partition migration"""
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'chat_messages' AND n.nspname = current_schema()"
+    )).scalar()
+    return relkind == "p"
+
+
+def _detect_partitioned() -> bool:
+    """
+    Read from the schema once at import: the partitioned table's primary key includes
+    created_at, so the ORM key must too. A plain table (migration not run, SQLite) or
+    an unreachable database keeps the id key, which still identifies a row.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as conn:
+            return is_partitioned(conn)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"⚠️ Could not inspect chat_messages partitioning: {e}")
+        return False
+
+
+CHAT_MESSAGES_PARTITIONED = _detect_partitioned()
 
 
 
@@ -52,17 +83,52 @@ class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), index=True)
     content = Column(Text)
     translated_content = Column(Text, nullable=True)  # Add translated content
     source_language = Column(String(10), nullable=True)  # Source language code
     target_language = Column(String(10), nullable=True)  # Target language code (if translated)
     is_from_user = Column(Boolean, default=True, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key on Postgres (monthly ranges, see app/chatbot/message_partitions.py)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True,
+                        primary_key=CHAT_MESSAGES_PARTITIONED)
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    __table_args__ = (
+        # Per-session time window reads and "no messages since" retention checks
+        Index('ix_chat_messages_session_created', 'session_id', 'created_at'),
+    )
+
+
+class ChatMessageArchive(Base):
+    """One month of one tenant's chat messages moved to compressed JSONL in object storage"""
+    __tablename__ = "chat_message_archives"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, nullable=False, index=True)  # 0 for messages without a session
+    month = Column(DateTime, nullable=False, index=True)  # first day of the month, UTC
+    storage_path = Column(String, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    min_message_id = Column(Integer, nullable=True)
+    max_message_id = Column(Integer, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_chat_message_archives_tenant_month', 'tenant_id', 'month'),
+    )
+
+
+class ChatMessageArchiveSession(Base):
+    """Which sessions have messages in an archive file, so history reads open only those files"""
+    __tablename__ = "chat_message_archive_sessions"
+    
+    archive_id = Column(Integer, ForeignKey("chat_message_archives.id", ondelete="CASCADE"), primary_key=True)
+    session_id = Column(Integer, primary_key=True, index=True)
 
 
 
@@ -21,7 +21,7 @@ from fastapi import Request
 from fastapi.responses import StreamingResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 import json
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.chatbot.engine import ChatbotEngine
 from app.chatbot.models import ChatSession, ChatMessage
 from app.knowledge_base.models import FAQ 
@@ -51,7 +51,7 @@ from app.pricing.integration_helpers import (
     track_conversation_started,
     track_message_sent
 )
-from app.tenants.router import get_tenant_from_api_key
+from app.tenants.router import get_tenant_from_api_key, get_tenant_from_api_key_async
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -335,7 +335,9 @@ async def chat(request: ChatRequest, api_key: str = Header(..., alias="X-API-Key
         
         # 🔒 PRICING CHECK - Get tenant and check conversation limits (UPDATED)
         logger.info("🔍 Getting tenant from API key...")
-        tenant = get_tenant_from_api_key(api_key, db)
+        # Short-lived async session: its connection is back in the pool before the LLM call
+        async with AsyncSessionLocal() as adb:
+            tenant = await get_tenant_from_api_key_async(api_key, adb)
         logger.info(f"✅ Found tenant: {tenant.name} (ID: {tenant.id})")
         
         logger.info("🚦 Checking conversation limits...")
@@ -401,8 +403,9 @@ async def get_chat_history(session_id: str, api_key: str = Header(..., alias="X-
     if not session or session.tenant_id != tenant.id:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get messages
-    messages = db.query(ChatMessage).filter(ChatMessage.session_id == session.id).order_by(ChatMessage.created_at).all()
+    # Get messages (including months moved to the archive tier)
+    from app.chatbot.message_partitions import load_session_messages
+    messages = load_session_messages(db, session)
     
     return {
         "session_id": session_id,
@@ -583,7 +586,8 @@ async def chat_with_simple_memory(
         logger.info(f"🧠 Simple memory chat for: {request.user_identifier}")
         
         # Pricing check (UPDATED)
-        tenant = get_tenant_from_api_key(api_key, db)
+        async with AsyncSessionLocal() as adb:
+            tenant = await get_tenant_from_api_key_async(api_key, adb)
         check_conversation_limit_dependency_with_super_tenant(tenant.id, db)  # UPDATED
         
         # Initialize chatbot engine
@@ -1760,8 +1764,7 @@ async def smart_chat_with_followup_streaming(
                 logger.info(f"🔄 Sending greeting response with delay simulation")
                 
                 session_id, _ = memory.get_or_create_session(user_id, "web")
-                memory.store_message(session_id, request.message, True)
-                memory.store_message(session_id, topic_change_response, False)
+                memory.store_exchange(session_id, request.message, topic_change_response)
                 
                 # ⭐ Calculate and apply delay for greeting
                 if delay_simulator:
@@ -2264,8 +2267,7 @@ async def super_tenant_admin_chat(
                 logger.info(f"🔄 Sending admin greeting response with delay")
                 
                 session_id, _ = memory.get_or_create_session(user_id, "admin_web")
-                memory.store_message(session_id, request.message, True)
-                memory.store_message(session_id, topic_change_response, False)
+                memory.store_exchange(session_id, request.message, topic_change_response)
                 
                 # ⭐ Calculate delay for admin greeting
                 if delay_simulator:
@@ -2943,8 +2945,7 @@ async def smart_chat_with_followup_streaming(
                     acknowledgment = f"Perfect! I've noted your email as {extracted_email}. How can I assist you today?"
                     
                     # 🧠 Store both user message and bot response in memory
-                    memory.store_message(session_id, request.message, True)
-                    memory.store_message(session_id, acknowledgment, False)
+                    memory.store_exchange(session_id, request.message, acknowledgment)
                     
                     # Send immediate response for email capture
                     main_response = {
@@ -3481,7 +3482,8 @@ async def smart_chat_unified(
         logger.info(f"🚀 Unified smart chat for: {request.user_identifier}")
         
         # Get tenant and check limits
-        tenant = get_tenant_from_api_key(api_key, db)
+        async with AsyncSessionLocal() as adb:
+            tenant = await get_tenant_from_api_key_async(api_key, adb)
         check_conversation_limit_dependency_with_super_tenant(tenant.id, db)
         
         # Initialize unified intelligent engine
@@ -4,19 +4,82 @@ Implements: Active → Idle → Dormant → Expired session states
 Adds: 3-hour context windows, automatic cleanup, performance optimization
 """
 
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Union
 from datetime import datetime, timedelta, timezone
+from collections import deque
+from dataclasses import dataclass, field
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 import logging
 import uuid
 from app.chatbot.models import ChatSession, ChatMessage
+from app.config import settings
+from app.utils.bounded_cache import BoundedTTLCache
 import traceback
 from sqlalchemy.orm.attributes import flag_modified
 
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_WINDOW = timedelta(hours=3)
+_UNKNOWN = object()
+
+
+@dataclass
+class _SessionState:
+    """Cached bookkeeping for a user's active session plus a ring of its latest messages"""
+    session_pk: int
+    session_id: str
+    tenant_id: int
+    user_identifier: str
+    # (content, is_from_user, created_at as aware UTC), oldest first
+    messages: deque = field(default_factory=lambda: deque(maxlen=settings.SESSION_CACHE_RING_SIZE))
+    # True when the ring holds every message of the session, so shorter DB history can't exist
+    complete: bool = True
+
+    @property
+    def last_message_at(self) -> Optional[datetime]:
+        return self.messages[-1][2] if self.messages else None
+
+
+# Process-wide so the per-request SimpleChatbotMemory instances share it. Entries
+# expire CONTEXT_WINDOW after the last write; history reads still filter by the
+# window, and get_or_create_session still checks dormancy on a hit.
+_session_cache = BoundedTTLCache(
+    max_entries=settings.SESSION_CACHE_MAX_SESSIONS,
+    ttl_seconds=CONTEXT_WINDOW.total_seconds()
+)
+_session_keys = BoundedTTLCache(
+    max_entries=settings.SESSION_CACHE_MAX_SESSIONS,
+    ttl_seconds=CONTEXT_WINDOW.total_seconds()
+)  # session_id -> (tenant_id, user_identifier)
+
+
+def _as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def invalidate_session_cache(tenant_id: Optional[int] = None, user_identifier: Optional[str] = None,
+                             session_id: Optional[str] = None):
+    """Drop cached session state when a session ends or is archived outside store_message"""
+    if session_id is not None:
+        key = _session_keys.pop(session_id)
+        if key is not None:
+            _session_cache.pop(key)
+    if tenant_id is not None and user_identifier is not None:
+        state = _session_cache.pop((tenant_id, user_identifier))
+        if state is not None:
+            _session_keys.pop(state.session_id)
+    elif tenant_id is not None and session_id is None:
+        # Leftover session_id entries are harmless: lookups also require the state
+        _session_cache.discard_where(lambda key: key[0] == tenant_id)
+
+
+def get_session_cache_stats() -> Dict[str, Any]:
+    return {"sessions": _session_cache.stats(), "session_ids": _session_keys.stats()}
+
 
 
 
@@ -62,7 +125,50 @@ class SimpleChatbotMemory:
         self.IDLE_THRESHOLD = timedelta(minutes=30)
         self.DORMANT_THRESHOLD = timedelta(hours=3)
         self.EXPIRED_THRESHOLD = timedelta(days=7)
-        self.CONTEXT_WINDOW = timedelta(hours=3)
+        self.CONTEXT_WINDOW = CONTEXT_WINDOW
+    
+    # ----- session state cache -----
+    
+    def _cache_session(self, session: ChatSession, recent_messages: List[ChatMessage]) -> Optional[_SessionState]:
+        """Cache a session with its latest messages (newest first, as queried)"""
+        if not settings.SESSION_CACHE_ENABLED:
+            return None
+        state = _SessionState(
+            session_pk=session.id,
+            session_id=session.session_id,
+            tenant_id=self.tenant_id,
+            user_identifier=session.user_identifier,
+            complete=len(recent_messages) < settings.SESSION_CACHE_RING_SIZE
+        )
+        for msg in reversed(recent_messages):
+            state.messages.append((msg.content, msg.is_from_user, _as_utc(msg.created_at)))
+        _session_cache.set((self.tenant_id, session.user_identifier), state)
+        _session_keys.set(session.session_id, (self.tenant_id, session.user_identifier))
+        return state
+    
+    def _cached_state(self, session_id: str) -> Optional[_SessionState]:
+        key = _session_keys.get(session_id)
+        if key is None or key[0] != self.tenant_id:
+            return None
+        state = _session_cache.get(key)
+        if state is None or state.session_id != session_id:
+            return None
+        return state
+    
+    def _load_recent_messages(self, session_pk: int) -> List[ChatMessage]:
+        return self.db.query(ChatMessage).filter(
+            ChatMessage.session_id == session_pk
+        ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(
+            settings.SESSION_CACHE_RING_SIZE
+        ).all()
+    
+    def _history_from_cache(self, state: _SessionState, limit: int) -> Optional[List[Tuple[str, bool, datetime]]]:
+        """Messages within the context window, oldest first; None if the ring can't answer"""
+        if limit > state.messages.maxlen and not state.complete:
+            return None
+        cutoff = datetime.now(timezone.utc) - self.CONTEXT_WINDOW
+        window = [msg for msg in state.messages if msg[2] is not None and msg[2] >= cutoff]
+        return window[-limit:] if limit > 0 else []
     
     def get_or_create_session(self, user_identifier: str, platform: str = "web") -> Tuple[str, bool]:
         """
@@ -70,6 +176,16 @@ class SimpleChatbotMemory:
         Returns: (session_id, is_new_session)
         """
         
+        cached = _session_cache.get((self.tenant_id, user_identifier))
+        if cached is not None:
+            # An entry cached while the session was idle outlives its dormancy, so
+            # the state is still checked, against the ring's last message (no query)
+            session_state = self._get_session_state(cached, last_message_at=cached.last_message_at)
+            if session_state != "expired":
+                return cached.session_id, False
+            # Expired: the lookup below archives it and starts a new session
+            invalidate_session_cache(session_id=cached.session_id)
+        
         existing_session = self.db.query(ChatSession).filter(
             ChatSession.tenant_id == self.tenant_id,
             ChatSession.user_identifier == user_identifier,
@@ -77,17 +193,22 @@ class SimpleChatbotMemory:
         ).first()
         
         if existing_session:
-           
-            session_state = self._get_session_state(existing_session)
+            
+            recent_messages = self._load_recent_messages(existing_session.id)
+            last_message_at = recent_messages[0].created_at if recent_messages else None
+            session_state = self._get_session_state(existing_session, last_message_at=last_message_at)
             
             if session_state == "expired":
                 
                 logger.info(f"Archiving expired session {existing_session.session_id}")
                 existing_session.is_active = False
                 self.db.commit()
+                invalidate_session_cache(session_id=existing_session.session_id)
                 return self._create_new_session(user_identifier, platform)
             
-            elif session_state == "dormant":
+            self._cache_session(existing_session, recent_messages)
+            
+            if session_state == "dormant":
                
                 logger.info(f"Reactivating dormant session {existing_session.session_id}")
                 
@@ -115,25 +236,29 @@ class SimpleChatbotMemory:
         self.db.add(new_session)
         self.db.commit()
         self.db.refresh(new_session)
+        self._cache_session(new_session, [])
         
         logger.info(f"Created new session {session_id} for {user_identifier}")
         return session_id, True
     
-    def _get_session_state(self, session: ChatSession) -> str:
+    def _get_session_state(self, session: Union[ChatSession, _SessionState], last_message_at: Any = _UNKNOWN) -> str:
         """
         Determine session lifecycle state based on last activity
         Returns: 'active', 'idle', 'dormant', or 'expired'
+        A cached _SessionState must come with its last_message_at
         """
-        # Get last message timestamp
-        last_message = self.db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at.desc()).first()
-        
-        if not last_message:
+        if last_message_at is _UNKNOWN:
+            # Get last message timestamp
+            last_message = self.db.query(ChatMessage).filter(
+                ChatMessage.session_id == session.id
+            ).order_by(ChatMessage.created_at.desc()).first()
+            last_message_at = last_message.created_at if last_message else None
+        
+        if last_message_at is None:
             # No messages yet - consider active
             return "active"
         
-        time_since_last = safe_datetime_subtract(datetime.now(timezone.utc), last_message.created_at)
+        time_since_last = safe_datetime_subtract(datetime.now(timezone.utc), last_message_at)
         
         if time_since_last >= self.EXPIRED_THRESHOLD:
             return "expired"
@@ -188,6 +313,18 @@ class SimpleChatbotMemory:
         Returns messages in chronological order (oldest first)
         """
 
+        cached = _session_cache.get((self.tenant_id, user_identifier))
+        history = self._history_from_cache(cached, max_messages) if cached is not None else None
+        if history is not None:
+            return [
+                {
+                    "role": "user" if is_user else "assistant",
+                    "content": content,
+                    "timestamp": created_at.isoformat(),
+                    "is_user": is_user
+                }
+                for content, is_user, created_at in history
+            ]
         
         # Get the user's active session
         session = self.db.query(ChatSession).filter(
@@ -241,6 +378,19 @@ class SimpleChatbotMemory:
             List of message dictionaries with keys: content, is_user, role, timestamp
         """
         try:
+            cached = self._cached_state(session_id)
+            history = self._history_from_cache(cached, limit) if cached is not None else None
+            if history is not None:
+                return [
+                    {
+                        "content": content,
+                        "is_user": is_user,
+                        "role": "user" if is_user else "bot",
+                        "timestamp": created_at
+                    }
+                    for content, is_user, created_at in history
+                ]
+            
             # Get session by session_id (string)
             session = self.db.query(ChatSession).filter(
                 ChatSession.session_id == session_id
@@ -286,31 +436,57 @@ class SimpleChatbotMemory:
         """
         Store a message in the conversation - enhanced with session state update
         """
+        return self.store_messages(session_id, [(content, is_from_user)])
+    
+    def store_exchange(self, session_id: str, user_message: str, bot_message: str) -> bool:
+        """Store a user message and the bot's reply in one insert and one commit"""
+        return self.store_messages(session_id, [(user_message, True), (bot_message, False)])
+    
+    def store_messages(self, session_id: str, messages: List[Tuple[str, bool]]) -> bool:
+        """
+        Write-through store of (content, is_from_user) pairs: one commit, then the
+        cached ring is updated so the next turn reads history without a query
+        """
         try:
-            # Get session by session_id
-            session = self.db.query(ChatSession).filter(
-                ChatSession.session_id == session_id
-            ).first()
-            
-            if not session:
-                logger.error(f"Session {session_id} not found")
-                return False
-            
-            # Create and store message
-            message = ChatMessage(
-                session_id=session.id,
-                content=content,
-                is_from_user=is_from_user
-            )
-            
-            self.db.add(message)
-            
-            # 🆕 ENHANCED: Update session activity (optional - could add last_activity field)
-            # For now, the session state is determined by message timestamps
+            cached = self._cached_state(session_id)
+            if cached is not None:
+                session_pk = cached.session_pk
+            else:
+                session = self.db.query(ChatSession).filter(
+                    ChatSession.session_id == session_id
+                ).first()
+                
+                if not session:
+                    logger.error(f"Session {session_id} not found")
+                    return False
+                session_pk = session.id
+            
+            # Explicit timestamps keep a batched exchange ordered; a server default
+            # would give both rows the same transaction time
+            now = datetime.now(timezone.utc)
+            rows = [
+                ChatMessage(
+                    session_id=session_pk,
+                    content=content,
+                    is_from_user=is_from_user,
+                    created_at=now + timedelta(microseconds=offset)
+                )
+                for offset, (content, is_from_user) in enumerate(messages)
+            ]
             
+            self.db.add_all(rows)
             self.db.commit()
             
-            logger.info(f"Stored {'user' if is_from_user else 'bot'} message for session {session_id}")
+            if cached is not None:
+                for row in rows:
+                    cached.messages.append((row.content, row.is_from_user, _as_utc(row.created_at)))
+                if len(cached.messages) == cached.messages.maxlen:
+                    cached.complete = False
+                # Re-set to extend the TTL from this write
+                _session_cache.set((cached.tenant_id, cached.user_identifier), cached)
+                _session_keys.set(session_id, (cached.tenant_id, cached.user_identifier))
+            
+            logger.info(f"Stored {len(rows)} message(s) for session {session_id}")
             return True
             
         except Exception as e:
@@ -318,6 +494,24 @@ class SimpleChatbotMemory:
             self.db.rollback()
             return False
     
+    def end_session(self, session_id: str) -> bool:
+        """Deactivate a session (e.g. a user reset) and drop its cached state"""
+        try:
+            session = self.db.query(ChatSession).filter(
+                ChatSession.session_id == session_id,
+                ChatSession.tenant_id == self.tenant_id
+            ).first()
+            if not session:
+                return False
+            session.is_active = False
+            self.db.commit()
+            invalidate_session_cache(self.tenant_id, session.user_identifier, session_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error ending session {session_id}: {e}")
+            self.db.rollback()
+            return False
+    
     def build_context_prompt(self, user_message: str, conversation_history: List[Dict], system_prompt: str = None) -> str:
         """
         Enhanced context prompt building with better token management
@@ -354,37 +548,21 @@ class SimpleChatbotMemory:
     
     def cleanup_old_sessions(self, days_old: int = 30) -> int:
         """
-        Enhanced cleanup with session lifecycle awareness
+        Enhanced cleanup with session lifecycle awareness - archives sessions older
+        than days_old days that are expired (last message over 7 days ago), in
+        chunked set-based updates
         """
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days_old)
-            
-            # Find sessions older than cutoff
-            old_sessions = self.db.query(ChatSession).filter(
-                and_(
-                    ChatSession.tenant_id == self.tenant_id,
-                    ChatSession.created_at < cutoff_date,
-                    ChatSession.is_active == True
-                )
-            ).all()
-            
-            archived_count = 0
-            for session in old_sessions:
-                session_state = self._get_session_state(session)
-                
-                # Archive expired sessions
-                if session_state == "expired":
-                    session.is_active = False
-                    archived_count += 1
-                    logger.info(f"Archived expired session {session.session_id}")
-            
-            self.db.commit()
+            from app.services.retention import EXPIRED_CHAT_SESSIONS, get_retention_engine
+            result = get_retention_engine().apply(EXPIRED_CHAT_SESSIONS, tenant_id=self.tenant_id, days=days_old)
+            archived_count = result["affected"]
+            if archived_count:
+                invalidate_session_cache(self.tenant_id)
             logger.info(f"Enhanced cleanup: Archived {archived_count} expired sessions")
             return archived_count
             
         except Exception as e:
             logger.error(f"Enhanced cleanup error: {e}")
-            self.db.rollback()
             return 0
     
     def cleanup_old_messages(self, days_old: int = 90) -> int:
@@ -393,30 +571,17 @@ class SimpleChatbotMemory:
         Keep message metadata but clear content for messages older than specified days
         """
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days_old)
-            
-            # Find old messages to clean up
-            old_messages = self.db.query(ChatMessage).join(ChatSession).filter(
-                and_(
-                    ChatSession.tenant_id == self.tenant_id,
-                    ChatMessage.created_at < cutoff_date,
-                    ChatMessage.content.isnot(None)  # Only messages that still have content
-                )
-            ).all()
-            
-            cleaned_count = 0
-            for message in old_messages:
-                # Clear content but keep metadata for analytics
-                message.content = "[CONTENT_CLEANED_FOR_PRIVACY]"
-                cleaned_count += 1
-            
-            self.db.commit()
+            from app.services.retention import get_retention_engine
+            # Clear content but keep metadata for analytics
+            result = get_retention_engine().run_policy("chat_message_content", tenant_id=self.tenant_id, days=days_old)
+            cleaned_count = result["affected"]
+            if cleaned_count:
+                invalidate_session_cache(self.tenant_id)
             logger.info(f"Privacy cleanup: Cleaned content from {cleaned_count} old messages")
             return cleaned_count
             
         except Exception as e:
             logger.error(f"Message cleanup error: {e}")
-            self.db.rollback()
             return 0
     
     def get_session_stats(self, user_identifier: str) -> Dict:
@@ -506,6 +671,7 @@ class SimpleChatbotMemory:
             
             if new_state == "expired":
                 session.is_active = False
+                invalidate_session_cache(self.tenant_id, session.user_identifier, session_id)
                 logger.info(f"Manually expired session {session_id}")
             elif new_state in ["active", "idle", "dormant"]:
                 session.is_active = True
@@ -792,6 +792,7 @@ from app.chatbot.tenant_data_manager import TenantDataManager, TenantSecurityErr
 from app.chatbot.simple_memory import SimpleChatbotMemory
 from app.tenants.models import Tenant
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
 
 try:
     from langchain_openai import ChatOpenAI
@@ -852,11 +853,7 @@ class RefactoredSuperTenantAdminEngine:
 
         self.llm_available = LLM_AVAILABLE and bool(settings.OPENAI_API_KEY)
         if self.llm_available:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.4,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("super_tenant_admin", temperature=0.4)
         logger.info("🤖 SuperTenantAdminEngine initialized with Foundation + Mediator Layer.")
 
     def _get_or_create_conversation_state(self, user_identifier: str, tenant_id: int) -> AdminConversationState:
@@ -0,0 +1,98 @@
+"""
+Coverage / precision / latency of the deterministic greeting and escalation tier.
+
+    python -m app.chatbot.triage_benchmark
+    python -m app.chatbot.triage_benchmark --fixture path.json --llm-ms 900 -v
+
+For each task it reports how many messages the local tier decided, how many
+of those decisions were correct, per-rule precision (compare with the rule's
+confidence in message_triage), local latency, and the LLM time saved at
+--llm-ms per avoided call. No database or API key is needed.
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List
+
+from app.chatbot.message_triage import ESCALATION, GREETING, triage_escalation, triage_greeting
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "triage_corpus.json")
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def _evaluate(task: str, rows: List[Dict], llm_ms: float) -> Dict:
+    decided = correct = 0
+    latencies = []
+    rules = defaultdict(lambda: [0, 0, 0.0])  # decided, correct, confidence
+    errors = []
+    for row in rows:
+        if task == GREETING:
+            verdict = triage_greeting(row["text"])
+        else:
+            verdict = triage_escalation(row["text"], row.get("bot_response", ""), row.get("history"))
+        latencies.append(verdict.elapsed_ms)
+        if not verdict.decided:
+            continue
+        decided += 1
+        rule = rules[verdict.rule]
+        rule[0] += 1
+        rule[2] = verdict.confidence
+        if verdict.decision == row["expected"]:
+            correct += 1
+            rule[1] += 1
+        else:
+            errors.append((row["text"], row["expected"], verdict.rule))
+    return {
+        "task": task,
+        "messages": len(rows),
+        "local_share": decided / len(rows) if rows else 0.0,
+        "precision": correct / decided if decided else 0.0,
+        "deferred": len(rows) - decided,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "saved_ms": decided * llm_ms,
+        "rules": rules,
+        "errors": errors,
+    }
+
+
+def run(fixture: str, llm_ms: float, verbose: bool):
+    with open(fixture) as handle:
+        corpus = json.load(handle)
+    results = [
+        _evaluate(GREETING, corpus.get("greeting", []), llm_ms),
+        _evaluate(ESCALATION, corpus.get("escalation", []), llm_ms),
+    ]
+
+    print(f"{'task':<12}{'messages':>9}{'local':>8}{'precision':>11}{'deferred':>10}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'saved s':>9}")
+    for result in results:
+        print(f"{result['task']:<12}{result['messages']:>9}{result['local_share']:>8.0%}{result['precision']:>11.1%}"
+              f"{result['deferred']:>10}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}"
+              f"{result['saved_ms'] / 1000:>9.1f}")
+    print(f"(saved assumes {llm_ms:.0f}ms per avoided LLM call)")
+    if verbose:
+        for result in results:
+            for rule, (decided, correct, confidence) in sorted(result["rules"].items()):
+                print(f"  [{result['task']}] {rule:<24} {correct}/{decided} correct, confidence {confidence:.2f}")
+            for text, expected, rule in result["errors"]:
+                print(f"  [{result['task']}] {text!r}: expected {expected}, rule {rule}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--llm-ms", type=float, default=900.0, help="typical LLM round trip for the saved estimate")
+    parser.add_argument("-v", "--verbose", action="store_true", help="per-rule precision and misclassified messages")
+    args = parser.parse_args()
+    run(args.fixture, args.llm_ms, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import logging
 import re
+import time
 from typing import Dict, Any, Optional, List, Tuple
 import json
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
 
-from app.chatbot.simple_memory import SimpleChatbotMemory
+from app.chatbot.simple_memory import SimpleChatbotMemory, invalidate_session_cache
 from app.knowledge_base.processor import DocumentProcessor
 from app.tenants.models import Tenant
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
+from app.chatbot.message_triage import GREETING, triage_greeting, record_local, record_llm
 from app.chatbot.security import SecurityPromptManager, build_secure_chatbot_prompt
 from app.chatbot.security import fix_response_formatting
 from app.chatbot.security import check_message_security
@@ -58,11 +61,7 @@ class UnifiedIntelligentEngine:
         # Initialize LLM
         self.llm_available = LLM_AVAILABLE and bool(settings.OPENAI_API_KEY)
         if self.llm_available:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.3,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("unified_engine", temperature=0.3, tenant_id=tenant_id)
         
         # Privacy filters - world's best security
         self.privacy_patterns = self._initialize_privacy_filters()
@@ -129,8 +128,7 @@ class UnifiedIntelligentEngine:
             # 🚨 CHECK FOR PENDING TEAM MESSAGES FIRST
             pending_team_message = self._get_pending_team_message(session_id)
             if pending_team_message:
-                memory.store_message(session_id, user_message, True)
-                memory.store_message(session_id, pending_team_message, False)
+                memory.store_exchange(session_id, user_message, pending_team_message)
                 return {
                     "success": True,
                     "response": pending_team_message,
@@ -144,8 +142,7 @@ class UnifiedIntelligentEngine:
             
             if smart_greeting_response:
                 # Store the greeting exchange
-                memory.store_message(session_id, user_message, True)
-                memory.store_message(session_id, smart_greeting_response, False)
+                memory.store_exchange(session_id, user_message, smart_greeting_response)
                 
                 return {
                     "success": True,
@@ -173,13 +170,11 @@ class UnifiedIntelligentEngine:
             # 🚨 ESCALATION CHECK
             escalation_response = self._check_escalation_triggers(user_message, final_content, conversation_history, session_id, user_identifier)
             if escalation_response:
-                memory.store_message(session_id, user_message, True)
-                memory.store_message(session_id, escalation_response["response"], False)
+                memory.store_exchange(session_id, user_message, escalation_response["response"])
                 return escalation_response
             
             # Store messages
-            memory.store_message(session_id, user_message, True)
-            memory.store_message(session_id, final_content, False)
+            memory.store_exchange(session_id, user_message, final_content)
 
             return {
                 "success": True,
@@ -358,6 +353,7 @@ class UnifiedIntelligentEngine:
                     # Expired: Archive session
                     session.is_active = False
                     self.db.commit()
+                    invalidate_session_cache(session_id=session_id)
                     logger.info(f"Session {session_id} archived due to 7-day inactivity")
                     
                 elif time_since_last > timedelta(hours=3):
@@ -381,6 +377,17 @@ class UnifiedIntelligentEngine:
         """
         Improved LLM-powered greeting analysis with better logic
         """
+        # ⚡ Clear cases ("hi", or no greeting words at all) are decided without the LLM
+        verdict = triage_greeting(user_message)
+        if verdict.decided:
+            record_local(GREETING, verdict)
+            return {
+                "is_pure_greeting": verdict.decision,
+                "suggested_action": "treat_as_greeting" if verdict.decision else "process_normally",
+                "reasoning": f"fast path: {verdict.rule}",
+                "source": "fast_path"
+            }
+        
         if not self.llm_available:
             return {"is_pure_greeting": False}
         
@@ -442,11 +449,13 @@ class UnifiedIntelligentEngine:
         )
         
         try:
+            started = time.perf_counter()
             result = self.llm.invoke(prompt.format(
                 user_message=user_message,
                 conversation_context=conversation_context,
                 timing_context=timing_context
             ))
+            record_llm(GREETING, (time.perf_counter() - started) * 1000, verdict.rule)
             
             response_text = result.content.strip()
             
@@ -732,36 +741,26 @@ class UnifiedIntelligentEngine:
     def _apply_learned_patterns(self, user_message: str, tenant_id: int) -> Optional[str]:
         """Apply learned patterns to improve responses"""
         try:
-            from app.fine_tuning.models import LearningPattern, AutoImprovement
-            
-            # Check for learned patterns that match this message
-            patterns = self.db.query(LearningPattern).filter(
-                LearningPattern.tenant_id == tenant_id,
-                LearningPattern.is_active == True,
-                LearningPattern.confidence_score > 0.7
-            ).all()
-            
-            user_lower = user_message.lower()
-            best_match = None
-            best_score = 0.0
-            
-            for pattern in patterns:
-                pattern_text = pattern.user_message_pattern.lower()
-                
-                # Simple similarity check (could be enhanced with NLP)
-                if pattern_text in user_lower or any(word in user_lower for word in pattern_text.split() if len(word) > 3):
-                    score = pattern.confidence_score * pattern.success_rate if pattern.success_rate > 0 else pattern.confidence_score
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_match = pattern
+            from app.fine_tuning.models import LearningPattern
+            from app.fine_tuning.pattern_index import get_learned_pattern_index
+            
+            # Check for learned patterns that match this message (indexed, no table scan)
+            match = get_learned_pattern_index(self.db, tenant_id).lookup(user_message)
+            if not match:
+                return None
+            
+            pattern_id, best_score = match
+            best_match = self.db.query(LearningPattern).filter(
+                LearningPattern.id == pattern_id,
+                LearningPattern.is_active == True
+            ).first()
             
-            if best_match and best_score > 0.8:
+            if best_match:
                 # Apply learned improvement
                 improved_response = best_match.improved_response
                 
                 # Update usage stats
-                best_match.usage_count += 1
+                best_match.usage_count = LearningPattern.usage_count + 1
                 best_match.last_used = datetime.utcnow()
                 self.db.commit()
                 
@@ -772,6 +771,7 @@ class UnifiedIntelligentEngine:
             
         except Exception as e:
             logger.error(f"❌ Failed to apply learned patterns: {e}")
+            self.db.rollback()
             return None
 
 
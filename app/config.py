@@ -59,6 +59,174 @@ class Settings(BaseSettings):
     SUPABASE_STORAGE_URL: str = os.getenv("SUPABASE_STORAGE_URL", "")
     SUPABASE_STORAGE_BUCKET: str = 'tenant-logos'
     
+    # Object storage backend ("supabase" or "local") and local read-through cache
+    STORAGE_BACKEND: str = "supabase"
+    STORAGE_LOCAL_ROOT: str = "./local_storage"
+    STORAGE_CACHE_DIR: str = "./storage_cache"
+    STORAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 2GB
+    STORAGE_TRANSFER_WORKERS: int = 8
+    
+    # Vector index selection: "auto" picks flat / hnsw / ivfpq by chunk count
+    VECTOR_INDEX_TYPE: str = "auto"
+    VECTOR_INDEX_FLAT_MAX_CHUNKS: int = 20000
+    VECTOR_INDEX_HNSW_MAX_CHUNKS: int = 200000
+    
+    # Write-behind usage metering: off until USAGE_METERING_REDIS_URL is set (counters shared by
+    # workers and kept across restarts). "memory" is per process and loses unflushed usage on a
+    # restart, so it must be chosen explicitly and only suits single-process development.
+    USAGE_METERING_ENABLED: bool = True
+    USAGE_METERING_BACKEND: str = "redis"
+    USAGE_METERING_REDIS_URL: Optional[str] = None
+    USAGE_METERING_FLUSH_SECONDS: float = 5.0
+    USAGE_METERING_BATCH_LEASE_SECONDS: float = 300  # a claimed flush batch older than this is recovered
+
+    # Shared outbound HTTP client (third-party APIs)
+    OUTBOUND_HTTP2: bool = True
+    OUTBOUND_HTTP_MAX_CONNECTIONS: int = 100
+    OUTBOUND_HTTP_MAX_KEEPALIVE: int = 40
+    OUTBOUND_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+
+    # Inbound webhook ingestion queue (Telegram, Instagram, Slack)
+    WEBHOOK_WORKERS: int = 32  # concurrent handler calls per process
+    WEBHOOK_TENANT_CONCURRENCY: int = 4  # concurrent handler calls per tenant
+    WEBHOOK_MAX_INFLIGHT: int = 500  # claimed but unfinished events per process
+    WEBHOOK_COALESCE_MS: int = 750  # wait for bursts from the same chat
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    WEBHOOK_POLL_SECONDS: float = 1.0
+    WEBHOOK_LEASE_SECONDS: int = 300
+    WEBHOOK_RETENTION_HOURS: int = 72  # handled rows kept for redelivery dedupe
+
+    # Slack thread memory cache (shared by all tenants in a process)
+    SLACK_THREAD_CACHE_MAX_THREADS: int = 5000
+    SLACK_THREAD_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SLACK_THREAD_CACHE_TTL_SECONDS: int = 3600
+    SLACK_CHANNEL_CACHE_MAX_CHANNELS: int = 2000
+    SLACK_THREAD_FLUSH_SECONDS: float = 2.0
+    SLACK_THREAD_FLUSH_BATCH: int = 100
+
+    # Bot redelivery dedup ("memory" per process, or "redis" shared by workers)
+    DEDUP_BACKEND: str = "memory"
+    DEDUP_REDIS_URL: str = "redis://localhost:6379/1"
+
+    # Discord message dispatch (per tenant bot)
+    DISCORD_MAX_CONCURRENT_HANDLERS: int = 8
+    DISCORD_MAX_PENDING_PER_CHANNEL: int = 50
+
+    # Chat session state cache (per process; disable when one user's turns can
+    # land on several workers without sticky routing)
+    SESSION_CACHE_ENABLED: bool = True
+    SESSION_CACHE_MAX_SESSIONS: int = 10000
+    SESSION_CACHE_RING_SIZE: int = 30
+
+    # Retention sweep: off by default, cleanup otherwise runs only on demand. days <= 0 disables a
+    # policy; content scrubbing and message deletion are opt-in (scrub after the archive tier runs)
+    RETENTION_ENABLED: bool = False
+    RETENTION_INTERVAL_HOURS: float = 24
+    RETENTION_INITIAL_DELAY_SECONDS: float = 600
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_MAX_BATCHES_PER_RUN: int = 10000
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.2
+    RETENTION_DUTY_CYCLE: float = 0.5
+    RETENTION_LOCK_TIMEOUT_MS: int = 2000
+    RETENTION_SESSION_INACTIVE_DAYS: int = 7
+    RETENTION_MESSAGE_CONTENT_DAYS: int = 0
+    RETENTION_MESSAGE_DELETE_DAYS: int = 0
+    RETENTION_SLACK_THREAD_DAYS: int = 30
+    RETENTION_INSTAGRAM_DAYS: int = 90
+
+    # chat_messages monthly partitions and cold archive (0 months disables archiving)
+    CHAT_PARTITION_PREMAKE_MONTHS: int = 3
+    CHAT_ARCHIVE_AFTER_MONTHS: int = 0
+    CHAT_ARCHIVE_BUCKET: str = "chat-archives"
+
+    # Async engine (asyncpg) used by webhook, live-chat and chat endpoints; pooled separately
+    ASYNC_DB_POOL_SIZE: int = 10
+    ASYNC_DB_MAX_OVERFLOW: int = 20
+    ASYNC_DB_POOL_TIMEOUT: float = 10
+
+    # Sync pool sizing (unset keeps the per-environment defaults) and pool instrumentation
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_MONITOR_INTERVAL_SECONDS: float = 30
+    DB_POOL_LEAK_SECONDS: float = 120  # 0 disables leak reports
+    DB_POOL_LEAK_CAPTURE_STACK: bool = False
+    DB_POOL_ADAPTIVE: bool = False
+    DB_POOL_ADAPTIVE_MIN_TOTAL: int = 10
+    DB_POOL_ADAPTIVE_MAX_TOTAL: int = 80
+
+    # Shared LLM gateway: concurrency caps, call timeout and circuit breaker
+    LLM_MAX_CONCURRENT: int = 32
+    LLM_MAX_CONCURRENT_PER_TENANT: int = 6
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 20
+    LLM_TIMEOUT_SECONDS: float = 45
+    LLM_UPSTREAM_RETRIES: int = 1
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30
+
+    # Local tenant intent index: below INTENT_INDEX_MIN_SCORE or INTENT_INDEX_MARGIN the LLM decides,
+    # below INTENT_INDEX_REJECT_SCORE nothing matches and the LLM is skipped
+    INTENT_INDEX_MIN_SCORE: float = 0.35
+    INTENT_INDEX_MARGIN: float = 0.08
+    INTENT_INDEX_REJECT_SCORE: float = 0.2
+    INTENT_INDEX_TTL_SECONDS: float = 600
+    INTENT_INDEX_MAX_TENANTS: int = 2000
+
+    # Deterministic greeting / escalation tier; verdicts below FAST_PATH_MIN_CONFIDENCE go to the LLM
+    FAST_PATH_ENABLED: bool = True
+    FAST_PATH_MIN_CONFIDENCE: float = 0.85
+
+    # Background trainer: tenants trained in parallel, each from its last watermark
+    TRAINER_MAX_WORKERS: int = 4
+    TRAINER_LLM_CONCURRENCY: int = 4  # per tenant; LLM_MAX_CONCURRENT still caps the total
+    TRAINER_INITIAL_LOOKBACK_HOURS: float = 2
+    TRAINER_MAX_LOOKBACK_HOURS: float = 24
+    TRAINER_MAX_SUCCESSFUL_SESSIONS: int = 20
+
+    # Learned-pattern index used by _apply_learned_patterns
+    LEARNED_PATTERN_MIN_SCORE: float = 0.8  # patterns scoring at or below this are never applied
+    LEARNED_PATTERN_REFRESH_SECONDS: float = 30
+    LEARNED_PATTERN_REBUILD_SECONDS: float = 900
+    LEARNED_PATTERN_MAX_TENANTS: int = 2000
+
+    # GeoIP: local memory-mapped MaxMind database, per-prefix caches, rate-limited background enrichment
+    GEOIP_DATABASE_PATH: Optional[str] = None
+    GEOIP_CACHE_MAX_ENTRIES: int = 50000
+    GEOIP_CACHE_TTL_SECONDS: float = 86400
+    GEOIP_NEGATIVE_TTL_SECONDS: float = 3600
+    GEOIP_CACHE_PREFIX_V4: int = 24
+    GEOIP_CACHE_PREFIX_V6: int = 64
+    GEOIP_ENRICH_PER_MINUTE: int = 40
+    GEOIP_ENRICH_QUEUE_SIZE: int = 1000
+
+    # Language detection / translation: cached detection, per-tenant translation memory, batched backend calls
+    TRANSLATION_BACKEND: str = "google"  # "google" or "local" (offline, see app.utils.language_service)
+    TRANSLATION_MEMORY_MAX_ENTRIES: int = 20000
+    TRANSLATION_MEMORY_TTL_SECONDS: float = 7 * 86400
+    LANGUAGE_DETECT_CACHE_MAX_ENTRIES: int = 20000
+    LANGUAGE_DETECT_MIN_CHARS: int = 12  # langdetect guesses wildly below this; such text is not detected
+    TRANSLATION_BATCH_MAX_CHARS: int = 4500  # Google rejects requests over 5000 characters
+    TRANSLATION_MAX_WORKERS: int = 4
+
+    # Email outbox: transactional email is queued in email_outbox and delivered by a background worker
+    EMAIL_PROVIDER: str = "resend"  # "resend" or "fake" (in-memory, for local runs and tests)
+    EMAIL_OUTBOX_POLL_SECONDS: float = 2.0
+    EMAIL_OUTBOX_CLAIM_LIMIT: int = 200
+    EMAIL_MAX_ATTEMPTS: int = 8
+    EMAIL_RETRY_BASE_SECONDS: float = 30
+    EMAIL_RETRY_MAX_SECONDS: float = 3600
+    EMAIL_RESEND_RATE_PER_SECOND: float = 2.0  # Resend's default API rate limit
+    EMAIL_LEASE_SECONDS: int = 300
+    EMAIL_RETENTION_HOURS: int = 168
+
+    # Transcript rendering (app.live_chat.email_transcript_service)
+    TRANSCRIPT_CHUNK_SIZE: int = 500  # messages read per keyset page
+    TRANSCRIPT_STREAM_FLUSH_CHARS: int = 64 * 1024  # download response chunk size
+
+    # Dashboard metrics (app.dashboard.metrics): per-tenant result cache
+    DASHBOARD_CACHE_TTL_SECONDS: float = 30
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 5000
+    
     # Logo upload settings
     MAX_LOGO_SIZE: int = 2 * 1024 * 1024  # 2MB
     ALLOWED_LOGO_TYPES: List[str] = [
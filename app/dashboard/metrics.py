@@ -0,0 +1,298 @@
+"""
+Dashboard metrics as grouped, time-bucketed queries.
+
+Each metric is one round trip whatever the window: per-day series group by
+the UTC day of created_at. On Postgres, generate_series fills empty days in
+the same query. Other databases (SQLite in development) get the grouped rows
+and the gaps are filled here.
+
+    metrics = cached_metric(tenant_id, "performance", (days,), lambda: performance_metrics(db, tenant_id, days))
+
+Results are cached per tenant for DASHBOARD_CACHE_TTL_SECONDS: the dashboard
+polls, and a few seconds of staleness is fine for charts. Committed knowledge
+base and FAQ writes drop the tenant's entries at once (in this process; other
+workers catch up within the TTL), so counts shown right after an upload or a
+delete are current.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import case, distinct, event, func, inspect, literal_column, select
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.chatbot.models import ChatSession, ChatMessage
+from app.knowledge_base.models import KnowledgeBase, FAQ
+from app.utils.bounded_cache import BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+_cache = BoundedTTLCache(
+    max_entries=settings.DASHBOARD_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS,
+)
+
+
+def cached_metric(tenant_id: int, name: str, params: Tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+    key = (tenant_id, name, params)
+    result = _cache.get(key)
+    if result is None:
+        result = compute()
+        _cache.set(key, result)
+    return result
+
+
+def invalidate_dashboard_metrics(tenant_id: Optional[int] = None):
+    """Drop cached metrics for a tenant (or all)"""
+    if tenant_id is None:
+        _cache.clear()
+    else:
+        _cache.discard_where(lambda key: key[0] == tenant_id)
+
+
+def get_dashboard_cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+# ============ INVALIDATION ============
+
+# session.info key: tenants whose knowledge bases or FAQs the session changed (None = unknown tenant)
+_CHANGED_TENANTS = "dashboard_metrics_changed_tenants"
+
+
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        # Loaded state only: a deleted row can't be refreshed from the database
+        tenant_id = inspect(target).dict.get("tenant_id")
+        session.info.setdefault(_CHANGED_TENANTS, set()).add(tenant_id)
+
+
+for _model in (KnowledgeBase, FAQ):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _mark_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed(session):
+    changed = session.info.pop(_CHANGED_TENANTS, None)
+    if not changed:
+        return
+    if None in changed:
+        invalidate_dashboard_metrics()
+        return
+    for tenant_id in changed:
+        invalidate_dashboard_metrics(tenant_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed(session):
+    session.info.pop(_CHANGED_TENANTS, None)
+
+
+# ============ TIME BUCKETS ============
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _day(db: Session, column):
+    """UTC day of a timestamp column"""
+    if _is_postgres(db):
+        # Literals, not bind parameters: GROUP BY must repeat the selected expression exactly
+        return func.date_trunc(literal_column("'day'"), func.timezone(literal_column("'UTC'"), column))
+    return func.date(column)
+
+
+def _day_key(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+def _daily_series(db: Session, counts, first_day: datetime, days: int) -> List[Tuple[str, int]]:
+    """(YYYY-MM-DD, count) for each of days days from first_day, zero where counts has no row
+
+    counts is a grouped select with columns day and count.
+    """
+    counts = counts.subquery()
+    if _is_postgres(db):
+        series = func.generate_series(
+            first_day, first_day + timedelta(days=days - 1), timedelta(days=1)
+        ).table_valued("day").render_derived(name="series")
+        rows = db.execute(
+            select(series.c.day, func.coalesce(counts.c.count, 0))
+            .select_from(series.outerjoin(counts, counts.c.day == series.c.day))
+            .order_by(series.c.day)
+        ).all()
+        return [(_day_key(day), count) for day, count in rows]
+
+    found = {_day_key(day): count for day, count in db.execute(select(counts.c.day, counts.c.count)).all()}
+    keys = [_day_key(first_day + timedelta(days=offset)) for offset in range(days)]
+    return [(key, found.get(key, 0)) for key in keys]
+
+
+# ============ METRICS ============
+
+def tenant_summary(db: Session, tenant_id: int) -> Dict[str, int]:
+    sessions = db.execute(
+        select(
+            func.count(ChatSession.id),
+            func.count(case((ChatSession.is_active == True, 1))),
+            func.count(distinct(ChatSession.user_identifier))
+        ).where(ChatSession.tenant_id == tenant_id)
+    ).one()
+
+    total_messages = db.execute(
+        select(func.count(ChatMessage.id))
+        .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+        .where(ChatSession.tenant_id == tenant_id)
+    ).scalar()
+
+    knowledge_base_count = db.execute(
+        select(func.count(KnowledgeBase.id)).where(KnowledgeBase.tenant_id == tenant_id)
+    ).scalar()
+
+    faq_count = db.execute(select(func.count(FAQ.id)).where(FAQ.tenant_id == tenant_id)).scalar()
+
+    return {
+        "total_conversations": sessions[0] or 0,
+        "total_messages": total_messages or 0,
+        "knowledge_base_count": knowledge_base_count or 0,
+        "faq_count": faq_count or 0,
+        "active_sessions": sessions[1] or 0,
+        "unique_users": sessions[2] or 0
+    }
+
+
+def performance_metrics(db: Session, tenant_id: int, days: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Messages per conversation over the last days, and conversations/messages per UTC day"""
+    now = now or datetime.utcnow()
+    days = max(days, 1)
+    first_day = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = first_day + timedelta(days=days)
+
+    # Sessions without messages don't count, as before (inner join)
+    message_total, session_total = db.execute(
+        select(func.count(ChatMessage.id), func.count(distinct(ChatSession.id)))
+        .join(ChatMessage, ChatMessage.session_id == ChatSession.id)
+        .where(ChatSession.tenant_id == tenant_id, ChatSession.created_at >= now - timedelta(days=days))
+    ).one()
+
+    session_day = _day(db, ChatSession.created_at)
+    conversations = _daily_series(db, (
+        select(session_day.label("day"), func.count(ChatSession.id).label("count"))
+        .where(ChatSession.tenant_id == tenant_id, ChatSession.created_at >= first_day, ChatSession.created_at < end)
+        .group_by(session_day)
+    ), first_day, days)
+
+    message_day = _day(db, ChatMessage.created_at)
+    messages = _daily_series(db, (
+        select(message_day.label("day"), func.count(ChatMessage.id).label("count"))
+        .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+        .where(ChatSession.tenant_id == tenant_id, ChatMessage.created_at >= first_day, ChatMessage.created_at < end)
+        .group_by(message_day)
+    ), first_day, days)
+
+    return {
+        "messages_per_conversation": round(message_total / session_total, 2) if session_total else 0,
+        "daily_metrics": [
+            {"date": day, "conversations": conversation_count, "messages": message_count}
+            for (day, conversation_count), (_, message_count) in zip(conversations, messages)
+        ]
+    }
+
+
+def recent_conversations(db: Session, tenant_id: int, limit: int) -> List[Dict[str, Any]]:
+    """Latest sessions with their message count, first user message and last message time: three queries"""
+    sessions = db.query(ChatSession) \
+        .filter(ChatSession.tenant_id == tenant_id) \
+        .order_by(ChatSession.created_at.desc()) \
+        .limit(limit) \
+        .all()
+    if not sessions:
+        return []
+    ids = [session.id for session in sessions]
+
+    activity = {
+        session_id: (message_count, last_message_at)
+        for session_id, message_count, last_message_at in db.execute(
+            select(ChatMessage.session_id, func.count(ChatMessage.id), func.max(ChatMessage.created_at))
+            .where(ChatMessage.session_id.in_(ids))
+            .group_by(ChatMessage.session_id)
+        ).all()
+    }
+
+    ranked = select(
+        ChatMessage.session_id,
+        ChatMessage.content,
+        func.row_number().over(
+            partition_by=ChatMessage.session_id,
+            order_by=(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+        ).label("position")
+    ).where(ChatMessage.session_id.in_(ids), ChatMessage.is_from_user == True).subquery()
+    first_messages = dict(db.execute(
+        select(ranked.c.session_id, ranked.c.content).where(ranked.c.position == 1)
+    ).all())
+
+    result = []
+    for session in sessions:
+        message_count, last_message_at = activity.get(session.id, (0, None))
+        result.append({
+            "session_id": session.session_id,
+            "user_identifier": session.user_identifier,
+            "started_at": session.created_at.isoformat(),
+            "is_active": session.is_active,
+            "message_count": message_count,
+            "first_message": first_messages.get(session.id),
+            "last_message_time": last_message_at.isoformat() if last_message_at else None
+        })
+    return result
+
+
+def _first_word(db: Session, column):
+    """Lower-cased first space-separated word of a text column, 'other' when blank"""
+    text = func.trim(column)
+    if _is_postgres(db):
+        word = func.split_part(text, " ", 1)
+    else:
+        space = func.instr(text, " ")
+        word = case((space > 0, func.substr(text, 1, space - 1)), else_=text)
+    return func.coalesce(func.nullif(func.lower(word), ""), "other")
+
+
+def faq_metrics(db: Session, tenant_id: int, top: int = 10) -> Dict[str, Any]:
+    """FAQ count and the top categories (first word of the question), grouped in the database"""
+    faq_count = db.execute(select(func.count(FAQ.id)).where(FAQ.tenant_id == tenant_id)).scalar() or 0
+
+    category = _first_word(db, FAQ.question)
+    count = func.count(FAQ.id)
+    rows = db.execute(
+        select(category.label("name"), count.label("count"))
+        .where(FAQ.tenant_id == tenant_id, FAQ.question.isnot(None), FAQ.question != "")
+        .group_by(category)
+        .order_by(count.desc())
+        .limit(top)
+    ).all()
+
+    return {
+        "total_count": faq_count,
+        "categories": [{"name": name, "count": category_count} for name, category_count in rows]
+    }
+
+
+def knowledge_base_metrics(db: Session, tenant_id: int) -> Dict[str, Any]:
+    kb_types = db.execute(
+        select(KnowledgeBase.document_type, func.count(KnowledgeBase.id))
+        .where(KnowledgeBase.tenant_id == tenant_id)
+        .group_by(KnowledgeBase.document_type)
+    ).all()
+
+    return {
+        "total_count": sum(count for _, count in kb_types),
+        "by_type": [
+            {"type": document_type.value if document_type else None, "count": count}
+            for document_type, count in kb_types
+        ]
+    }
@@ -0,0 +1,155 @@
+"""
+Latency of the dashboard performance metrics: grouped queries vs the old per-day loop.
+
+    python -m app.dashboard.metrics_benchmark
+    python -m app.dashboard.metrics_benchmark --database-url postgresql://localhost/scratch --sessions 50000
+
+Seeds one tenant with --sessions chat sessions spread over the last year (1-12
+messages each, plus a second tenant of the same size as noise), then times
+performance_metrics and the pre-rewrite loop (two COUNTs per day) for each
+window in --windows, and a cached read. Defaults to an in-memory SQLite
+database; a Postgres URL exercises the date_trunc/generate_series path.
+The tables are created in and dropped from that database, so point it at a
+scratch one.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+# app.database imports the core models at its end; load it, then the modules whose
+# models Tenant's relationships name, before importing any model module directly
+import app.database  # noqa: F401
+import app.pricing.models  # noqa: F401
+import app.telegram.models  # noqa: F401
+import app.live_chat.models  # noqa: F401
+from app.chatbot.models import ChatSession, ChatMessage
+from app.dashboard.metrics import cached_metric, performance_metrics
+from app.tenants.models import Tenant
+
+TENANT_ID = 1
+TABLES = [Tenant.__table__, ChatSession.__table__, ChatMessage.__table__]
+
+
+def _seed(db, sessions: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    db.execute(insert(Tenant), [
+        {"id": tenant_id, "name": f"bench-{tenant_id}", "business_name": "Bench", "email": f"bench-{tenant_id}@example.com"}
+        for tenant_id in (TENANT_ID, TENANT_ID + 1)
+    ])
+    session_rows, message_rows = [], []
+    message_id = 0
+    for session_id in range(1, 2 * sessions + 1):
+        started = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        session_rows.append({
+            "id": session_id,
+            "session_id": f"bench-{session_id}",
+            "tenant_id": TENANT_ID if session_id <= sessions else TENANT_ID + 1,
+            "user_identifier": f"user-{rng.randint(1, sessions // 3 + 1)}",
+            "is_active": rng.random() < 0.1,
+            "created_at": started,
+        })
+        for position in range(rng.randint(1, 12)):
+            message_id += 1
+            message_rows.append({
+                "id": message_id,
+                "session_id": session_id,
+                "content": "benchmark message",
+                "is_from_user": position % 2 == 0,
+                "created_at": started + timedelta(seconds=30 * position),
+            })
+    for start in range(0, len(session_rows), 5000):
+        db.execute(insert(ChatSession), session_rows[start:start + 5000])
+    for start in range(0, len(message_rows), 5000):
+        db.execute(insert(ChatMessage), message_rows[start:start + 5000])
+    db.commit()
+    return len(message_rows)
+
+
+def _per_day_loop(db, tenant_id: int, days: int):
+    """The pre-rewrite /dashboard/performance: two COUNT queries per day"""
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+    session_messages = db.query(ChatSession.id, func.count(ChatMessage.id).label("message_count")) \
+        .join(ChatMessage, ChatMessage.session_id == ChatSession.id) \
+        .filter(ChatSession.tenant_id == tenant_id, ChatSession.created_at >= start_date) \
+        .group_by(ChatSession.id).all()
+    daily = []
+    for day_offset in range(days):
+        day_start = (end_date - timedelta(days=day_offset)).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        conversations = db.query(func.count(ChatSession.id)).filter(
+            ChatSession.tenant_id == tenant_id,
+            ChatSession.created_at >= day_start,
+            ChatSession.created_at < day_end
+        ).scalar() or 0
+        messages = db.query(func.count(ChatMessage.id)).join(ChatSession, ChatSession.id == ChatMessage.session_id).filter(
+            ChatSession.tenant_id == tenant_id,
+            ChatMessage.created_at >= day_start,
+            ChatMessage.created_at < day_end
+        ).scalar() or 0
+        daily.append({"date": day_start.strftime("%Y-%m-%d"), "conversations": conversations, "messages": messages})
+    daily.reverse()
+    return len(session_messages), daily
+
+
+def _median_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def run(database_url: str, sessions: int, windows: List[int], repeat: int, seed: int):
+    engine = create_engine(database_url)
+    for table in reversed(TABLES):
+        table.drop(engine, checkfirst=True)
+    for table in TABLES:
+        table.create(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        messages = _seed(db, sessions, seed)
+        print(f"seeded {2 * sessions} sessions / {messages} messages (2 tenants) "
+              f"in {time.perf_counter() - started:.1f}s on {engine.dialect.name}")
+
+        print(f"{'days':>5}{'grouped ms':>12}{'per-day ms':>12}{'queries':>10}{'cached us':>11}{'match':>7}")
+        for days in windows:
+            grouped = performance_metrics(db, TENANT_ID, days)
+            _, legacy = _per_day_loop(db, TENANT_ID, days)
+            match = grouped["daily_metrics"] == legacy
+
+            grouped_ms = _median_ms(lambda: performance_metrics(db, TENANT_ID, days), repeat)
+            legacy_ms = _median_ms(lambda: _per_day_loop(db, TENANT_ID, days), max(1, repeat // 5))
+            cached_metric(TENANT_ID, "benchmark", (days,), lambda: grouped)
+            cached_us = _median_ms(
+                lambda: cached_metric(TENANT_ID, "benchmark", (days,), lambda: None), repeat
+            ) * 1000
+            print(f"{days:>5}{grouped_ms:>12.1f}{legacy_ms:>12.1f}{f'3 vs {2 * days + 1}':>10}"
+                  f"{cached_us:>11.1f}{'yes' if match else 'NO':>7}")
+    finally:
+        db.close()
+        for table in reversed(TABLES):
+            table.drop(engine, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--sessions", type=int, default=20000, help="sessions per tenant")
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 30, 365])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.database_url, args.sessions, args.windows, args.repeat, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,16 @@
 Dashboard router for tenant metrics and analytics
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, distinct
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
-import datetime
 
 from app.database import get_db
 from app.auth.router import get_current_user
 from app.auth.models import User
-from app.tenants.models import Tenant
-from app.knowledge_base.models import KnowledgeBase, FAQ
-from app.chatbot.models import ChatSession, ChatMessage
+from app.dashboard.metrics import (
+    cached_metric, tenant_summary, performance_metrics, recent_conversations,
+    faq_metrics, knowledge_base_metrics
+)
 
 router = APIRouter()
 
@@ -64,45 +63,7 @@ async def get_tenant_metrics(
     """
     tenant_id = await get_tenant_id_from_user(current_user, tenant_id)
     
-    # Get total conversations (chat sessions)
-    total_conversations = db.query(func.count(ChatSession.id)) \
-        .filter(ChatSession.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    # Get total messages
-    total_messages = db.query(func.count(ChatMessage.id)) \
-        .join(ChatSession, ChatSession.id == ChatMessage.session_id) \
-        .filter(ChatSession.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    # Get knowledge base metrics
-    knowledge_base_count = db.query(func.count(KnowledgeBase.id)) \
-        .filter(KnowledgeBase.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    # Get FAQ count
-    faq_count = db.query(func.count(FAQ.id)) \
-        .filter(FAQ.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    # Get active sessions
-    active_sessions = db.query(func.count(ChatSession.id)) \
-        .filter(ChatSession.tenant_id == tenant_id, ChatSession.is_active == True) \
-        .scalar() or 0
-    
-    # Get unique users
-    unique_users = db.query(func.count(distinct(ChatSession.user_identifier))) \
-        .filter(ChatSession.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    return {
-        "total_conversations": total_conversations,
-        "total_messages": total_messages,
-        "knowledge_base_count": knowledge_base_count,
-        "faq_count": faq_count,
-        "active_sessions": active_sessions,
-        "unique_users": unique_users
-    }
+    return cached_metric(tenant_id, "summary", (), lambda: tenant_summary(db, tenant_id))
 
 @router.get("/performance")
 async def get_performance_metrics(
@@ -121,72 +82,12 @@ async def get_performance_metrics(
     Returns:
         - average_response_time: Average time to generate a response
         - messages_per_conversation: Average number of messages per conversation
-        - daily_metrics: Daily breakdown of conversations and messages
+        - daily_metrics: Daily breakdown of conversations and messages (UTC days, oldest first)
     """
     tenant_id = await get_tenant_id_from_user(current_user, tenant_id)
     
-    # Calculate date range
-    end_date = datetime.datetime.now()
-    start_date = end_date - datetime.timedelta(days=days)
-    
-    # Get message count per session
-    session_messages = db.query(
-        ChatSession.id,
-        func.count(ChatMessage.id).label('message_count')
-    ).join(
-        ChatMessage, ChatMessage.session_id == ChatSession.id
-    ).filter(
-        ChatSession.tenant_id == tenant_id,
-        ChatSession.created_at >= start_date
-    ).group_by(
-        ChatSession.id
-    ).all()
-    
-    # Calculate average messages per conversation
-    if session_messages:
-        messages_per_conversation = sum(sm.message_count for sm in session_messages) / len(session_messages)
-    else:
-        messages_per_conversation = 0
-    
-    # Get daily metrics
-    daily_metrics = []
-    for day_offset in range(days):
-        day_date = end_date - datetime.timedelta(days=day_offset)
-        day_start = day_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + datetime.timedelta(days=1)
-        
-        # Count conversations started on this day
-        conversations = db.query(func.count(ChatSession.id)) \
-            .filter(
-                ChatSession.tenant_id == tenant_id,
-                ChatSession.created_at >= day_start,
-                ChatSession.created_at < day_end
-            ) \
-            .scalar() or 0
-        
-        # Count messages sent on this day
-        messages = db.query(func.count(ChatMessage.id)) \
-            .join(ChatSession, ChatSession.id == ChatMessage.session_id) \
-            .filter(
-                ChatSession.tenant_id == tenant_id,
-                ChatMessage.created_at >= day_start,
-                ChatMessage.created_at < day_end
-            ) \
-            .scalar() or 0
-        
-        daily_metrics.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "conversations": conversations,
-            "messages": messages
-        })
-    
-    # Reverse to get chronological order
-    daily_metrics.reverse()
-    
-    return {
-        "messages_per_conversation": round(messages_per_conversation, 2),
-        "daily_metrics": daily_metrics
-    }
+    # One grouped query per series instead of two COUNTs per day
+    return cached_metric(tenant_id, "performance", (days,), lambda: performance_metrics(db, tenant_id, days))
 
 @router.get("/recent-conversations")
 async def get_recent_conversations(
@@ -207,42 +108,7 @@ async def get_recent_conversations(
     """
     tenant_id = await get_tenant_id_from_user(current_user, tenant_id)
     
-    # Get recent sessions
-    recent_sessions = db.query(ChatSession) \
-        .filter(ChatSession.tenant_id == tenant_id) \
-        .order_by(ChatSession.created_at.desc()) \
-        .limit(limit) \
-        .all()
-    
-    result = []
-    for session in recent_sessions:
-        # Count messages in this session
-        message_count = db.query(func.count(ChatMessage.id)) \
-            .filter(ChatMessage.session_id == session.id) \
-            .scalar() or 0
-        
-        # Get first and last message
-        first_message = db.query(ChatMessage) \
-            .filter(ChatMessage.session_id == session.id, ChatMessage.is_from_user == True) \
-            .order_by(ChatMessage.created_at.asc()) \
-            .first()
-        
-        last_message = db.query(ChatMessage) \
-            .filter(ChatMessage.session_id == session.id) \
-            .order_by(ChatMessage.created_at.desc()) \
-            .first()
-        
-        result.append({
-            "session_id": session.session_id,
-            "user_identifier": session.user_identifier,
-            "started_at": session.created_at.isoformat(),
-            "is_active": session.is_active,
-            "message_count": message_count,
-            "first_message": first_message.content if first_message else None,
-            "last_message_time": last_message.created_at.isoformat() if last_message else None
-        })
-    
-    return result
+    return cached_metric(tenant_id, "recent_conversations", (limit,), lambda: recent_conversations(db, tenant_id, limit))
 
 @router.get("/faq-metrics")
 async def get_faq_metrics(
@@ -261,33 +127,7 @@ async def get_faq_metrics(
     """
     tenant_id = await get_tenant_id_from_user(current_user, tenant_id)
     
-    # Get total FAQ count
-    faq_count = db.query(func.count(FAQ.id)) \
-        .filter(FAQ.tenant_id == tenant_id) \
-        .scalar() or 0
-    
-    # Get FAQ categories (simple implementation - uses first word of question)
-    faqs = db.query(FAQ.question) \
-        .filter(FAQ.tenant_id == tenant_id) \
-        .all()
-    
-    # Simple categorization by first word
-    categories = {}
-    for faq in faqs:
-        # Use first word as a simple category
-        if faq.question:
-            category = faq.question.split()[0].lower() if faq.question.split() else "other"
-            categories[category] = categories.get(category, 0) + 1
-    
-    # Convert to list for output
-    category_list = [{"name": k, "count": v} for k, v in categories.items()]
-    # Sort by count descending
-    category_list.sort(key=lambda x: x["count"], reverse=True)
-    
-    return {
-        "total_count": faq_count,
-        "categories": category_list[:10]  # Return top 10 categories
-    }
+    return cached_metric(tenant_id, "faq", (), lambda: faq_metrics(db, tenant_id))
 
 @router.get("/knowledge-base-metrics")
 async def get_knowledge_base_metrics(
@@ -306,20 +146,4 @@ async def get_knowledge_base_metrics(
     """
     tenant_id = await get_tenant_id_from_user(current_user, tenant_id)
     
-    # Get knowledge base count by document type
-    kb_types = db.query(
-        KnowledgeBase.document_type, 
-        func.count(KnowledgeBase.id).label('count')
-    ).filter(
-        KnowledgeBase.tenant_id == tenant_id
-    ).group_by(
-        KnowledgeBase.document_type
-    ).all()
-    
-    # Format the result
-    result = {
-        "total_count": sum(kb.count for kb in kb_types),
-        "by_type": [{"type": kb.document_type.value, "count": kb.count} for kb in kb_types]
-    }
-    
-    return result
\ No newline at end of file
+    return cached_metric(tenant_id, "knowledge_base", (), lambda: knowledge_base_metrics(db, tenant_id))
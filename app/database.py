@@ -2,6 +2,8 @@
 
 
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import DisconnectionError, TimeoutError, OperationalError, DatabaseError
@@ -9,6 +11,7 @@ from contextlib import contextmanager
 import logging
 import time
 from app.config import settings
+from app.services.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool
 from typing import Callable, Any
 
 
@@ -31,12 +34,13 @@ def get_engine_config():
     base_config = {
         "pool_pre_ping": True,
         "pool_recycle": 1800,     # 1 hour
-        "pool_timeout": 30,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
         "echo": False,
     }
     
     # Only add PostgreSQL-specific connect_args if using PostgreSQL
     if is_postgresql:
+        base_config["poolclass"] = InstrumentedQueuePool  # times checkout waits
         base_config["connect_args"] = {
             "application_name": "lyra",
             "connect_timeout": 10,
@@ -74,6 +78,11 @@ def get_engine_config():
                 "poolclass": None,  # Disable connection pooling for SQLite
             })
     
+    if settings.DB_POOL_SIZE is not None:
+        config["pool_size"] = settings.DB_POOL_SIZE
+    if settings.DB_MAX_OVERFLOW is not None:
+        config["max_overflow"] = settings.DB_MAX_OVERFLOW
+    
     return config
 
 # Create engine
@@ -87,13 +96,8 @@ Base = declarative_base()
 def log_connection(dbapi_conn, connection_record):
     db_logger.info("New database connection established")
 
-@event.listens_for(engine.pool, "checkout")
-def log_checkout(dbapi_conn, connection_record, connection_proxy):
-    db_logger.debug("Connection checked out from pool")
-
-@event.listens_for(engine.pool, "checkin")
-def log_checkin(dbapi_conn, connection_record):
-    db_logger.debug("Connection returned to pool")
+# Checkout waits, hold time per route and leak tracking (see app.services.pool_metrics)
+instrument_pool(engine.pool, "sync")
 
 # Robust connection context manager
 @contextmanager
@@ -143,22 +147,139 @@ def get_db():
         except:
             pass
 
+def get_pool_status(pool) -> dict:
+    """Pool counters reported by both health checks"""
+    try:
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "total_connections": pool.size() + pool.overflow()
+        }
+    except AttributeError:
+        # NullPool / StaticPool keep no counters
+        return {"pool_class": type(pool).__name__}
+
 # Health check function
 def database_health_check():
     """Health check for monitoring"""
     try:
         with get_db_connection() as conn:
             conn.execute(text("SELECT 1"))
-        return {
-            "status": "healthy", 
-            "pool_size": engine.pool.size(),
-            "checked_out": engine.pool.checkedout(),
-            "overflow": engine.pool.overflow(),
-            "total_connections": engine.pool.size() + engine.pool.overflow()
+        return {"status": "healthy", **get_pool_status(engine.pool)}
+    except Exception as e:
+        return {"status": "unhealthy", "error": str(e)}
+
+
+# Async engine for async endpoints. It has its own pool, so a burst on the
+# async path never waits behind sync sessions held by the chatbot engines.
+_async_engine = None
+_async_sessionmaker = None
+
+def get_async_database_url(url: str = None):
+    """Map DATABASE_URL onto the asyncpg / aiosqlite drivers"""
+    url = make_url(url or settings.DATABASE_URL)
+    if url.drivername.startswith("postgres"):
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes ssl=<mode> rather than libpq's sslmode
+        query = dict(url.query)
+        query.pop("sslmode", None)
+        url = url.set(query=query)
+    elif url.drivername.startswith("sqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+def get_async_engine_config():
+    """Async engine configuration, pooled separately from the sync engine"""
+    url = make_url(settings.DATABASE_URL)
+    is_postgresql = url.drivername.startswith("postgres")
+
+    config = {
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "pool_timeout": settings.ASYNC_DB_POOL_TIMEOUT,
+        "echo": False,
+    }
+
+    if is_postgresql:
+        connect_args = {
+            "server_settings": {"application_name": "lyra-async"},
+            "timeout": 10,
+            # The transaction pooler can't keep prepared statements across transactions
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
         }
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        config["connect_args"] = connect_args
+        config["poolclass"] = InstrumentedAsyncQueuePool
+        config["pool_size"] = settings.ASYNC_DB_POOL_SIZE
+        config["max_overflow"] = settings.ASYNC_DB_MAX_OVERFLOW
+
+    return config
+
+def get_async_engine():
+    """Create the async engine on first use"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(get_async_database_url(), **get_async_engine_config())
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+
+        @event.listens_for(_async_engine.sync_engine.pool, "connect")
+        def log_async_connection(dbapi_conn, connection_record):
+            db_logger.info("New async database connection established")
+
+        instrument_pool(_async_engine.sync_engine.pool, "async")
+
+        db_logger.info("⚡ Async database engine created")
+    return _async_engine
+
+def AsyncSessionLocal() -> AsyncSession:
+    """New AsyncSession bound to the async engine"""
+    get_async_engine()
+    return _async_sessionmaker()
+
+# Async session dependency
+async def get_async_db():
+    """Async database session with error handling"""
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    except (DisconnectionError, TimeoutError, OperationalError) as e:
+        db_logger.error(f"Async database session error: {e}")
+        try:
+            await db.rollback()
+        except:
+            pass
+        raise
+    finally:
+        try:
+            await db.close()
+        except:
+            pass
+
+async def async_database_health_check():
+    """Health check for the async engine, same shape as database_health_check"""
+    try:
+        async_engine = get_async_engine()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return {"status": "healthy", **get_pool_status(async_engine.sync_engine.pool)}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
+async def dispose_async_engine():
+    """Close pooled async connections on shutdown"""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+        db_logger.info("Async database pool closed")
+
 # Safe table creation function
 def create_tables_safely():
     """Create tables with retry logic"""
@@ -8,11 +8,15 @@ import ssl
 import aiohttp
 import certifi
 import math
-from typing import Optional, Dict, Any, Callable
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Deque, Tuple
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
+from app.config import settings
 from app.database import get_db, SessionLocal
 from app.tenants.models import Tenant
+from app.services.dedup import get_dedup_store
 
 from app.chatbot.unified_intelligent_engine import UnifiedIntelligentEngine
 
@@ -22,51 +26,144 @@ from app.pricing.service import PricingService
 
 logger = logging.getLogger(__name__)
 
-class RateLimiter:
-    def __init__(self, calls_per_second=5):
-        self.calls_per_second = calls_per_second
-        self.call_times = []
+class RouteBucketLimiter:
+    """
+    Per-route rate limit state learned from Discord's 429 responses.
+    discord.py already paces requests with the X-RateLimit-* headers of
+    successful calls; when a 429 still reaches us we park only the bucket it
+    names (one channel's message route) or everything for a global limit,
+    instead of throttling the whole bot.
+    """
     
-    async def wait_if_needed(self):
-        now = asyncio.get_event_loop().time()
-        self.call_times = [t for t in self.call_times if now - t < 1.0]
+    def __init__(self):
+        self._blocked_until: Dict[str, float] = {}
+        self._bucket_ids: Dict[str, str] = {}  # route -> X-RateLimit-Bucket
+        self._global_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+    
+    async def acquire(self, route: str):
+        loop_time = asyncio.get_event_loop().time()
+        bucket = self._bucket_ids.get(route, route)
+        resume_at = max(self._global_until, self._blocked_until.get(bucket, 0.0))
+        if resume_at > loop_time:
+            delay = resume_at - loop_time
+            self.waits += 1
+            self.wait_seconds += delay
+            logger.debug(f"Rate limiting {route}: waiting {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    def on_rate_limited(self, route: str, error: discord.HTTPException, fallback: float) -> float:
+        """Record a 429 and return how long the route is blocked"""
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        retry_after = getattr(error, 'retry_after', None)
+        try:
+            retry_after = float(headers.get('Retry-After') or headers.get('X-RateLimit-Reset-After') or retry_after)
+        except (TypeError, ValueError):
+            retry_after = fallback
         
-        if len(self.call_times) >= self.calls_per_second:
-            sleep_time = 1.0 - (now - self.call_times[0])
-            if sleep_time > 0:
-                logger.debug(f"Rate limiting: waiting {sleep_time:.2f}s")
-                await asyncio.sleep(sleep_time)
+        resume_at = asyncio.get_event_loop().time() + retry_after
+        if headers.get('X-RateLimit-Global') == 'true' or headers.get('X-RateLimit-Scope') == 'global':
+            self._global_until = max(self._global_until, resume_at)
+        else:
+            bucket = headers.get('X-RateLimit-Bucket') or route
+            self._bucket_ids[route] = bucket
+            self._blocked_until[bucket] = max(self._blocked_until.get(bucket, 0.0), resume_at)
         
-        self.call_times.append(now)
+        # Keep the maps from growing with every channel ever limited
+        if len(self._blocked_until) > 1000:
+            now = asyncio.get_event_loop().time()
+            self._blocked_until = {b: t for b, t in self._blocked_until.items() if t > now}
+        return retry_after
+    
+    def stats(self) -> Dict[str, Any]:
+        now = asyncio.get_event_loop().time()
+        return {
+            "blocked_buckets": sum(1 for t in self._blocked_until.values() if t > now),
+            "global_blocked": self._global_until > now,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
 
-class MessageQueue:
-    def __init__(self, max_concurrent=1):
-        self.queue = asyncio.Queue()
-        self.processing = False
-        self.max_concurrent = max_concurrent
-        self.active_tasks = 0
+class ChannelDispatcher:
+    """
+    Runs message handlers concurrently across channels and in arrival order
+    within a channel. Each channel with pending messages has one drain task;
+    a semaphore caps handlers running at once and each channel's backlog is
+    bounded, so a flood in one channel cannot starve the others.
+    """
     
-    async def add_message(self, handler_func, *args, **kwargs):
-        await self.queue.put((handler_func, args, kwargs))
-        if not self.processing:
-            asyncio.create_task(self.process_queue())
+    def __init__(self, max_concurrent: int = 8, max_pending_per_channel: int = 50):
+        self.max_concurrent = max_concurrent
+        self.max_pending_per_channel = max_pending_per_channel
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._lanes: Dict[int, Deque[Tuple[Callable, tuple, dict, float]]] = {}
+        self._drains: Dict[int, asyncio.Task] = {}
+        self._queue_waits: Deque[float] = deque(maxlen=256)
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
     
-    async def process_queue(self):
-        self.processing = True
-        while not self.queue.empty() and self.active_tasks < self.max_concurrent:
-            try:
-                handler_func, args, kwargs = await self.queue.get()
-                self.active_tasks += 1
-                asyncio.create_task(self._execute_handler(handler_func, args, kwargs))
-            except Exception as e:
-                logger.error(f"Queue processing error: {e}")
-        self.processing = False
+    def submit(self, channel_id: int, handler_func: Callable, *args, **kwargs) -> bool:
+        """Queue a handler behind earlier messages of the same channel; False if the backlog is full"""
+        lane = self._lanes.get(channel_id)
+        if lane is None:
+            lane = self._lanes[channel_id] = deque()
+        if len(lane) >= self.max_pending_per_channel:
+            self.dropped += 1
+            return False
+        
+        lane.append((handler_func, args, kwargs, time.monotonic()))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(lane))
+        if channel_id not in self._drains:
+            self._drains[channel_id] = asyncio.create_task(self._drain(channel_id))
+        return True
     
-    async def _execute_handler(self, handler_func, args, kwargs):
+    async def _drain(self, channel_id: int):
+        lane = self._lanes[channel_id]
         try:
-            await handler_func(*args, **kwargs)
+            while lane:
+                handler_func, args, kwargs, queued_at = lane.popleft()
+                async with self._slots:
+                    self._queue_waits.append(time.monotonic() - queued_at)
+                    self.active += 1
+                    try:
+                        await handler_func(*args, **kwargs)
+                        self.completed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        logger.error(f"Discord handler error in channel {channel_id}: {e}", exc_info=True)
+                    finally:
+                        self.active -= 1
         finally:
-            self.active_tasks -= 1
+            self._drains.pop(channel_id, None)
+            self._lanes.pop(channel_id, None)
+    
+    async def stop(self):
+        for task in list(self._drains.values()):
+            task.cancel()
+        self._drains.clear()
+        self._lanes.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._queue_waits)
+        return {
+            "active_handlers": self.active,
+            "max_concurrent": self.max_concurrent,
+            "busy_channels": len(self._drains),
+            "queued": sum(len(lane) for lane in self._lanes.values()),
+            "max_channel_depth": self.max_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "queue_wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "queue_wait_p95_ms": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+        }
 
 class BotMetrics:
     def __init__(self):
@@ -95,9 +192,13 @@ class TenantDiscordBot:
         self.is_running = False
         
         # Rate limiting and queue management
-        self.rate_limiter = RateLimiter(calls_per_second=2)
-        self.message_queue = MessageQueue(max_concurrent=1)
+        self.route_limiter = RouteBucketLimiter()
+        self.dispatcher = ChannelDispatcher(
+            max_concurrent=settings.DISCORD_MAX_CONCURRENT_HANDLERS,
+            max_pending_per_channel=settings.DISCORD_MAX_PENDING_PER_CHANNEL
+        )
         self.metrics = BotMetrics()
+        self.dedup = get_dedup_store("discord", ttl_seconds=600)
         
         # Bot configuration
         intents = discord.Intents.default()
@@ -139,11 +240,18 @@ class TenantDiscordBot:
         finally:
             db.close()
     
+    @staticmethod
+    def _message_route(target) -> str:
+        """Rate limit route for sending to target's channel (Discord buckets it per channel)"""
+        channel = getattr(target, 'channel', None) or target
+        return f"POST /channels/{getattr(channel, 'id', 'unknown')}/messages"
+    
     async def send_with_retry(self, target, content=None, embed=None, max_retries=3):
-        """Send message with exponential backoff on rate limits"""
+        """Send message, waiting out only this channel's rate limit bucket on 429s"""
+        route = self._message_route(target)
         for attempt in range(max_retries):
             try:
-                await self.rate_limiter.wait_if_needed()
+                await self.route_limiter.acquire(route)
                 
                 if content and len(content) > 2000:
                     chunks = [content[i:i+1900] for i in range(0, len(content), 1900)]
@@ -170,9 +278,8 @@ class TenantDiscordBot:
             except discord.HTTPException as e:
                 if e.status == 429:
                     self.metrics.log_rate_limit()
-                    retry_after = getattr(e, 'retry_after', 2 ** attempt)
-                    logger.warning(f"Rate limited, waiting {retry_after}s (attempt {attempt + 1})")
-                    await asyncio.sleep(retry_after)
+                    retry_after = self.route_limiter.on_rate_limited(route, e, fallback=2 ** attempt)
+                    logger.warning(f"Rate limited on {route}, retrying in {retry_after}s (attempt {attempt + 1})")
                 else:
                     self.metrics.api_errors += 1
                     logger.error(f"Discord API error: {e}")
@@ -200,7 +307,6 @@ class TenantDiscordBot:
                 try:
                     tenant = db.query(Tenant).filter(Tenant.id == self.tenant_id).first()
                     if tenant and hasattr(tenant, 'discord_status_message') and tenant.discord_status_message:
-                        await self.rate_limiter.wait_if_needed()
                         activity = discord.Activity(
                             type=discord.ActivityType.playing,
                             name=tenant.discord_status_message
@@ -223,7 +329,14 @@ class TenantDiscordBot:
             if message.content.startswith('!'):
                 return
             
-            await self.message_queue.add_message(self._process_message_unified, message)
+            # Gateway RESUMEs can replay MESSAGE_CREATE; answer each message once
+            if not self.dedup.claim(f"{self.tenant_id}:{message.id}"):
+                logger.info(f"⏭️ Skipping replayed Discord message {message.id}")
+                return
+            
+            if not self.dispatcher.submit(message.channel.id, self._process_message_unified, message):
+                logger.warning(f"🚧 Channel {message.channel.id} backlog full for tenant {self.tenant_id}, "
+                               f"dropping message {message.id}")
         
         @self.bot.event
         async def on_error(event, *args, **kwargs):
@@ -270,6 +383,9 @@ class TenantDiscordBot:
             embed.add_field(name="Context Checks", value=self.metrics.context_checks, inline=True)
             embed.add_field(name="Rate Limit Hits", value=self.metrics.rate_limit_hits, inline=True)
             embed.add_field(name="API Errors", value=self.metrics.api_errors, inline=True)
+            dispatch = self.dispatcher.stats()
+            embed.add_field(name="Busy Channels", value=dispatch["busy_channels"], inline=True)
+            embed.add_field(name="Queued Messages", value=dispatch["queued"], inline=True)
             embed.add_field(name="Token Efficiency", value="~80% reduction", inline=True)
             
             await self.send_with_retry(ctx, embed=embed)
@@ -293,11 +409,7 @@ class TenantDiscordBot:
                     
                     if session_id:
                         # End session
-                        from app.chatbot.models import ChatSession
-                        session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-                        if session:
-                            session.is_active = False
-                            db.commit()
+                        memory.end_session(session_id)
                         
                         await self.send_with_retry(ctx, "✅ Reset conversation history! Let's start fresh with intelligent processing.")
                     else:
@@ -463,6 +575,7 @@ class TenantDiscordBot:
     async def stop(self):
         """Stop the Discord bot"""
         try:
+            await self.dispatcher.stop()
             if self.bot and not self.bot.is_closed():
                 logger.info(f"Stopping Discord bot for tenant {self.tenant_id}")
                 await self.bot.close()
@@ -633,7 +746,9 @@ class DiscordBotManager:
                     "context_checks": bot.metrics.context_checks,
                     "rate_limit_hits": bot.metrics.rate_limit_hits,
                     "api_errors": bot.metrics.api_errors
-                }
+                },
+                "dispatch": bot.dispatcher.stats(),
+                "rate_limits": bot.route_limiter.stats()
             }
             
             if bot.bot and not bot.bot.is_closed():
@@ -0,0 +1,36 @@
+# app/email/__init__.py
+"""
+Transactional email: Resend templates and the durable outbox that delivers them
+"""
+
+from .models import EmailOutboxMessage
+from .outbox import (
+    DeliveryResult,
+    EmailOutboxWorker,
+    EmailProvider,
+    FakeEmailProvider,
+    OutboxEmail,
+    enqueue_email,
+    get_email_outbox,
+    get_email_provider,
+    make_idempotency_key,
+    queue_email,
+    register_email_provider,
+    register_email_renderer,
+)
+
+__all__ = [
+    "EmailOutboxMessage",
+    "DeliveryResult",
+    "EmailOutboxWorker",
+    "EmailProvider",
+    "FakeEmailProvider",
+    "OutboxEmail",
+    "enqueue_email",
+    "get_email_outbox",
+    "get_email_provider",
+    "make_idempotency_key",
+    "queue_email",
+    "register_email_provider",
+    "register_email_renderer",
+]
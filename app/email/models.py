@@ -0,0 +1,52 @@
+# app/email/models.py
+"""
+Durable outbox for transactional email
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, UniqueConstraint, Index
+from datetime import datetime
+from app.database import Base
+
+
+class EmailOutboxMessage(Base):
+    """
+    One outgoing email. Rows are written by the request that wants the email sent
+    and delivered by EmailOutboxWorker, so handlers never wait on the provider.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, nullable=True, index=True)
+    kind = Column(String(50), nullable=False)  # agent_invitation, account_activation, conversation_transcript, ...
+    provider = Column(String(20), nullable=False, default="resend")
+
+    # Enqueueing the same key twice sends one email; also sent to the provider so retries never duplicate
+    idempotency_key = Column(String(255), nullable=False)
+
+    # Provider-ready message (from, to, cc, bcc, subject, html, text, tags)
+    payload = Column(JSON, nullable=False)
+    # Set when the body is rendered by the worker (register_email_renderer); cleared once rendered into payload
+    template = Column(String(50), nullable=True)
+    context = Column(JSON, nullable=True)
+
+    # Delivery state: pending, sending, sent, failed
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String(255), nullable=True)
+    claimed_by = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    # Idempotency key of the batch request this email went out in; the batch is only retried whole
+    batch_key = Column(String(255), nullable=True, index=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("idempotency_key", name="uq_email_outbox_idempotency_key"),
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutboxMessage {self.kind} {self.id} {self.status}>"
@@ -0,0 +1,719 @@
+# app/email/outbox.py
+"""
+Transactional email outbox.
+
+Handlers build the message and call enqueue_email() (or queue_email() when
+they have no session), which writes a row to email_outbox and returns; nothing
+on the request path waits on the provider. One worker per process delivers:
+
+- pending rows are claimed in bounded batches (SKIP LOCKED on Postgres), so
+  several processes can share the outbox
+- template emails (transcripts) are rendered by the worker, once, and stored
+  back so a retry sends the same content
+- first attempts go out through the provider's batch endpoint (Resend takes
+  100 emails per request); retries go one by one
+- every email carries its idempotency key to the provider, so a retry after a
+  timeout cannot deliver twice, and enqueueing the same key twice is a no-op.
+  A batch request is keyed as a whole: its key is stored on the rows before it
+  is sent, and a batch that may have reached the provider is only ever retried
+  whole, under the same key
+- transient failures (429, 5xx, network) are retried with exponential backoff
+  up to EMAIL_MAX_ATTEMPTS; rejected messages fail immediately
+- each provider has a token-bucket rate limit
+
+Rows claimed by a process that died are reclaimed after EMAIL_LEASE_SECONDS;
+sent and failed rows are purged after EMAIL_RETENTION_HOURS.
+
+EMAIL_PROVIDER=fake swaps Resend for FakeEmailProvider, which records messages
+in memory for local runs and tests (register_email_provider adds others).
+"""
+
+import os
+import uuid
+import time
+import random
+import socket
+import hashlib
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.exc import DisconnectionError, IntegrityError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.email.models import EmailOutboxMessage
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+RESULT_RETRY = "retry"
+
+MAINTENANCE_INTERVAL = 60  # seconds between lease recovery / purge passes
+
+
+def make_idempotency_key(kind: str, *parts: Any) -> str:
+    """Key for "the same email": enqueueing it again, or retrying it at the provider, sends it once"""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:40]
+    return f"{kind}:{digest}"
+
+
+def batch_idempotency_key(emails: List["OutboxEmail"]) -> str:
+    """Key for one batch request; the same emails in the same order give the same key"""
+    return make_idempotency_key("batch", *(email.idempotency_key for email in emails))
+
+
+@dataclass
+class OutboxEmail:
+    """Detached copy of a claimed outbox row handed to providers"""
+    id: int
+    tenant_id: Optional[int]
+    kind: str
+    provider: str
+    idempotency_key: str
+    payload: Dict[str, Any]
+    template: Optional[str]
+    context: Optional[Dict[str, Any]]
+    attempts: int
+    batch_key: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: EmailOutboxMessage) -> "OutboxEmail":
+        return cls(
+            id=row.id,
+            tenant_id=row.tenant_id,
+            kind=row.kind,
+            provider=row.provider,
+            idempotency_key=row.idempotency_key,
+            payload=row.payload,
+            template=row.template,
+            context=row.context,
+            attempts=row.attempts,
+            batch_key=row.batch_key,
+        )
+
+
+@dataclass
+class DeliveryResult:
+    status: str  # sent, retry, failed
+    provider_message_id: Optional[str] = None
+    error: Optional[str] = None
+    retry_after: Optional[float] = None
+
+
+# ============ PROVIDERS ============
+
+class EmailProvider:
+    name = "base"
+    max_batch = 1  # emails per request
+    rate_per_second = 1.0  # requests
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    async def send(self, email: OutboxEmail) -> DeliveryResult:
+        raise NotImplementedError
+
+    async def send_batch(self, emails: List[OutboxEmail]) -> List[DeliveryResult]:
+        return [await self.send(email) for email in emails]
+
+
+class ResendProvider(EmailProvider):
+    """Resend REST API over the shared outbound HTTP client"""
+    name = "resend"
+    max_batch = 100
+    API_URL = "https://api.resend.com"
+
+    def __init__(self):
+        self.api_key = os.getenv("RESEND_API_KEY") or settings.RESEND_API_KEY
+        self.rate_per_second = settings.EMAIL_RESEND_RATE_PER_SECOND
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    async def _post(self, path: str, body: Any, idempotency_key: str) -> Tuple[Optional[httpx.Response], Optional[str]]:
+        from app.services.http_client import get_http_client
+
+        try:
+            response = await get_http_client().request(
+                "resend", "POST", f"{self.API_URL}{path}", json=body,
+                headers={"Authorization": f"Bearer {self.api_key}", "Idempotency-Key": idempotency_key[:256]}
+            )
+            return response, None
+        except httpx.HTTPError as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    @staticmethod
+    def _failure(response: httpx.Response) -> DeliveryResult:
+        error = f"{response.status_code}: {response.text[:500]}"
+        # 409: the same idempotency key is still being processed
+        if response.status_code in (409, 429) or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            return DeliveryResult(RESULT_RETRY, error=error, retry_after=retry_after)
+        return DeliveryResult(STATUS_FAILED, error=error)
+
+    async def send(self, email: OutboxEmail) -> DeliveryResult:
+        if not self.configured:
+            return DeliveryResult(STATUS_FAILED, error="RESEND_API_KEY not set")
+        response, error = await self._post("/emails", email.payload, email.idempotency_key)
+        if response is None:
+            return DeliveryResult(RESULT_RETRY, error=error)
+        if response.status_code == 200:
+            return DeliveryResult(STATUS_SENT, provider_message_id=response.json().get("id"))
+        return self._failure(response)
+
+    async def send_batch(self, emails: List[OutboxEmail]) -> List[DeliveryResult]:
+        if not self.configured:
+            return [DeliveryResult(STATUS_FAILED, error="RESEND_API_KEY not set")] * len(emails)
+        response, error = await self._post("/emails/batch", [email.payload for email in emails],
+                                           batch_idempotency_key(emails))
+        if response is None:
+            return [DeliveryResult(RESULT_RETRY, error=error)] * len(emails)
+        if response.status_code == 200:
+            data = response.json().get("data") or []
+            ids = [item.get("id") for item in data] if len(data) == len(emails) else [None] * len(emails)
+            return [DeliveryResult(STATUS_SENT, provider_message_id=message_id) for message_id in ids]
+        return [self._failure(response)] * len(emails)
+
+
+class FakeEmailProvider(EmailProvider):
+    """In-memory provider for local runs and tests; honours idempotency keys like Resend
+    (a single send under the email's key, a batch under one key for the whole request)
+
+        provider = FakeEmailProvider()
+        register_email_provider(provider)  # with EMAIL_PROVIDER=fake
+        provider.fail_next(2)              # next two deliveries are transient failures
+        ...
+        provider.sent                      # delivered payloads, in order
+    """
+    name = "fake"
+    max_batch = 100
+
+    def __init__(self, rate_per_second: float = 1000.0):
+        self.rate_per_second = rate_per_second
+        self.sent: List[Dict[str, Any]] = []
+        self.requests = 0
+        self._by_key: Dict[str, Any] = {}
+        self._failures: List[DeliveryResult] = []
+
+    def fail_next(self, count: int = 1, status: str = RESULT_RETRY, error: str = "simulated failure"):
+        self._failures.extend(DeliveryResult(status, error=error) for _ in range(count))
+
+    def _deliver(self, email: OutboxEmail) -> str:
+        message_id = f"fake-{len(self.sent) + 1}"
+        self.sent.append({"id": message_id, "kind": email.kind, **email.payload})
+        return message_id
+
+    async def send(self, email: OutboxEmail) -> DeliveryResult:
+        self.requests += 1
+        if self._failures:
+            return self._failures.pop(0)
+        message_id = self._by_key.get(email.idempotency_key)
+        if message_id is None:
+            message_id = self._by_key[email.idempotency_key] = self._deliver(email)
+        return DeliveryResult(STATUS_SENT, provider_message_id=message_id)
+
+    async def send_batch(self, emails: List[OutboxEmail]) -> List[DeliveryResult]:
+        self.requests += 1
+        if self._failures:
+            return [self._failures.pop(0)] * len(emails)
+        key = batch_idempotency_key(emails)
+        message_ids = self._by_key.get(key)
+        if message_ids is None:
+            message_ids = self._by_key[key] = [self._deliver(email) for email in emails]
+        return [DeliveryResult(STATUS_SENT, provider_message_id=message_id) for message_id in message_ids]
+
+
+_provider_factories: Dict[str, Callable[[], EmailProvider]] = {
+    "resend": ResendProvider,
+    "fake": FakeEmailProvider,
+}
+_providers: Dict[str, EmailProvider] = {}
+
+
+def register_email_provider(provider: EmailProvider):
+    """Use this instance for rows with provider == provider.name"""
+    _providers[provider.name] = provider
+
+
+def get_email_provider(name: Optional[str] = None) -> EmailProvider:
+    name = name or settings.EMAIL_PROVIDER
+    provider = _providers.get(name)
+    if provider is None:
+        factory = _provider_factories.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown email provider {name!r}")
+        provider = _providers[name] = factory()
+    return provider
+
+
+# ============ RENDERERS ============
+
+# A renderer receives its own session and the row's context and returns payload
+# fields (html, text, optionally subject); it runs in a worker thread.
+EmailRenderer = Callable[[Session, Dict[str, Any]], Dict[str, Any]]
+
+_renderers: Dict[str, EmailRenderer] = {}
+
+
+def register_email_renderer(template: str, renderer: EmailRenderer):
+    """Called by the owning service at import time"""
+    _renderers[template] = renderer
+
+
+# ============ ENQUEUE ============
+
+def _new_outbox_row(kind: str, payload: Dict[str, Any], idempotency_key: Optional[str], tenant_id: Optional[int],
+                    template: Optional[str], context: Optional[Dict[str, Any]],
+                    provider: Optional[str]) -> EmailOutboxMessage:
+    now = datetime.utcnow()
+    return EmailOutboxMessage(
+        tenant_id=tenant_id,
+        kind=kind,
+        provider=provider or settings.EMAIL_PROVIDER,
+        idempotency_key=(idempotency_key or f"{kind}:{uuid.uuid4().hex}")[:255],
+        payload=payload,
+        template=template,
+        context=context,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+
+
+def _notify_worker():
+    worker = _global_worker
+    if worker is not None:
+        worker.notify()
+
+
+def enqueue_email(db: Session, kind: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None,
+                  tenant_id: Optional[int] = None, template: Optional[str] = None,
+                  context: Optional[Dict[str, Any]] = None, provider: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Durably queue an email and return (outbox id, created). created is False
+    when the idempotency key was already queued; nothing new is sent then.
+    Without a key every call is a distinct email.
+    """
+    row = _new_outbox_row(kind, payload, idempotency_key, tenant_id, template, context, provider)
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing_id = db.query(EmailOutboxMessage.id).filter(
+            EmailOutboxMessage.idempotency_key == row.idempotency_key
+        ).scalar()
+        logger.info(f"🔁 Duplicate {kind} email {row.idempotency_key} ignored")
+        return existing_id, False
+
+    _notify_worker()
+    return row.id, True
+
+
+async def queue_email(kind: str, payload: Dict[str, Any], **kwargs) -> Tuple[int, bool]:
+    """enqueue_email for callers without a session; the insert runs in a worker thread"""
+    def write():
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            return enqueue_email(db, kind, payload, **kwargs)
+        finally:
+            db.close()
+
+    return await asyncio.to_thread(write)
+
+
+# ============ WORKER ============
+
+class RateLimiter:
+    """Token bucket: rate requests per second on average, bursts of up to one second's worth"""
+
+    def __init__(self, rate: float):
+        self.rate = max(rate, 0.01)
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EmailOutboxWorker:
+    """Delivers email_outbox rows with batching, retries and per-provider rate limits"""
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from app.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.claim_limit = settings.EMAIL_OUTBOX_CLAIM_LIMIT
+        self.max_attempts = settings.EMAIL_MAX_ATTEMPTS
+        self.poll_interval = settings.EMAIL_OUTBOX_POLL_SECONDS
+
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_maintenance = 0.0
+        self.is_running = False
+
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "requests": 0, "batched_requests": 0, "rendered": 0}
+
+    # ----- wakeups -----
+
+    def notify(self):
+        """Wake the worker after an enqueue instead of waiting for the next poll (any thread)"""
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+
+    # ----- database bookkeeping (runs in a worker thread) -----
+
+    def _claim_batch(self) -> List[OutboxEmail]:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            query = db.query(EmailOutboxMessage).filter(
+                EmailOutboxMessage.status == STATUS_PENDING,
+                EmailOutboxMessage.next_attempt_at <= now
+            ).order_by(EmailOutboxMessage.next_attempt_at, EmailOutboxMessage.id).limit(self.claim_limit)
+
+            if db.bind.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+
+            rows = query.all()
+            # A batch is retried whole: never leave part of one behind at the claim limit
+            batch_keys = {row.batch_key for row in rows if row.batch_key}
+            if batch_keys:
+                claimed_ids = {row.id for row in rows}
+                members = db.query(EmailOutboxMessage).filter(
+                    EmailOutboxMessage.status == STATUS_PENDING,
+                    EmailOutboxMessage.batch_key.in_(batch_keys)
+                )
+                if db.bind.dialect.name == "postgresql":
+                    members = members.with_for_update(skip_locked=True)
+                rows += [row for row in members.all() if row.id not in claimed_ids]
+            for row in rows:
+                row.status = STATUS_SENDING
+                row.claimed_by = self.worker_id
+                row.claimed_at = now
+                row.attempts = (row.attempts or 0) + 1
+            emails = [OutboxEmail.from_row(row) for row in rows]
+            db.commit()
+            return emails
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error claiming outbox emails: {e}")
+            return []
+        finally:
+            db.close()
+
+    def _render(self, email: OutboxEmail) -> Optional[DeliveryResult]:
+        """Render a template email into its payload and store it; the delivery result on failure"""
+        renderer = _renderers.get(email.template)
+        if renderer is None:
+            return DeliveryResult(STATUS_FAILED, error=f"no renderer registered for {email.template}")
+        db = self.session_factory()
+        try:
+            payload = {**email.payload, **renderer(db, email.context or {})}
+            db.query(EmailOutboxMessage).filter(
+                EmailOutboxMessage.id == email.id
+            ).update({
+                EmailOutboxMessage.payload: payload,
+                EmailOutboxMessage.template: None,
+            }, synchronize_session=False)
+            db.commit()
+            email.payload, email.template = payload, None
+            return None
+        except (OperationalError, DisconnectionError, PoolTimeoutError) as e:
+            # The database was unavailable, not the template broken: try again later
+            db.rollback()
+            return DeliveryResult(RESULT_RETRY, error=f"render failed: {e}")
+        except Exception as e:
+            db.rollback()
+            return DeliveryResult(STATUS_FAILED, error=f"render failed: {e}")
+        finally:
+            db.close()
+
+    def _assign_batch(self, batch: List[OutboxEmail], batch_key: str) -> bool:
+        """Store the batch key on its rows before the request, so a crash cannot split the batch"""
+        db = self.session_factory()
+        try:
+            db.query(EmailOutboxMessage).filter(
+                EmailOutboxMessage.id.in_([email.id for email in batch])
+            ).update({EmailOutboxMessage.batch_key: batch_key}, synchronize_session=False)
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error recording outbox batch {batch_key}: {e}")
+            return False
+        finally:
+            db.close()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(settings.EMAIL_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), settings.EMAIL_RETRY_MAX_SECONDS)
+        return delay * (0.5 + random.random() / 2)
+
+    def _record(self, results: List[Tuple[OutboxEmail, DeliveryResult]]):
+        now = datetime.utcnow()
+        mappings = []
+        delays: Dict[Any, float] = {}
+        for email, result in results:
+            if result.status == STATUS_SENT:
+                mappings.append({"id": email.id, "status": STATUS_SENT, "sent_at": now, "last_error": None,
+                                 "batch_key": email.batch_key, "provider_message_id": result.provider_message_id})
+            elif result.status == RESULT_RETRY and email.attempts < self.max_attempts:
+                # Members of a batch share one backoff so they come due (and are claimed) together
+                delay = delays.setdefault(email.batch_key or email.id,
+                                          result.retry_after or self._backoff(email.attempts))
+                mappings.append({"id": email.id, "status": STATUS_PENDING, "claimed_by": None,
+                                 "batch_key": email.batch_key,
+                                 "next_attempt_at": now + timedelta(seconds=delay),
+                                 "last_error": (result.error or "")[:2000]})
+            else:
+                mappings.append({"id": email.id, "status": STATUS_FAILED, "batch_key": email.batch_key,
+                                 "last_error": (result.error or "")[:2000]})
+
+        db = self.session_factory()
+        try:
+            db.bulk_update_mappings(EmailOutboxMessage, mappings)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error updating outbox emails {[email.id for email, _ in results][:5]}: {e}")
+        finally:
+            db.close()
+
+    def _maintenance(self):
+        """Reclaim rows whose lease ran out and purge delivered/failed rows past retention"""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            # Runs between delivery passes, when this worker holds nothing in flight, so an
+            # expired lease is stale whoever owns it (e.g. our own rows after a failed _record)
+            reclaimed = db.query(EmailOutboxMessage).filter(
+                EmailOutboxMessage.status == STATUS_SENDING,
+                EmailOutboxMessage.claimed_at < now - timedelta(seconds=settings.EMAIL_LEASE_SECONDS)
+            ).update({
+                EmailOutboxMessage.status: STATUS_PENDING,
+                EmailOutboxMessage.claimed_by: None,
+            }, synchronize_session=False)
+
+            purged = db.query(EmailOutboxMessage).filter(
+                EmailOutboxMessage.status.in_([STATUS_SENT, STATUS_FAILED]),
+                EmailOutboxMessage.created_at < now - timedelta(hours=settings.EMAIL_RETENTION_HOURS)
+            ).delete(synchronize_session=False)
+            db.commit()
+
+            if reclaimed or purged:
+                logger.info(f"🧹 Email outbox: reclaimed {reclaimed} stale, purged {purged} finished emails")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Email outbox maintenance error: {e}")
+        finally:
+            db.close()
+
+    # ----- delivery -----
+
+    def _limiter(self, provider: EmailProvider) -> RateLimiter:
+        limiter = self._limiters.get(provider.name)
+        if limiter is None:
+            limiter = self._limiters[provider.name] = RateLimiter(provider.rate_per_second)
+        return limiter
+
+    async def _send(self, provider: EmailProvider, batch: List[OutboxEmail]) -> List[DeliveryResult]:
+        await self._limiter(provider).acquire()
+        self.stats["requests"] += 1
+        try:
+            if len(batch) == 1 and not batch[0].batch_key:
+                results = [await provider.send(batch[0])]
+            else:
+                self.stats["batched_requests"] += 1
+                results = await provider.send_batch(batch)
+        except Exception as e:
+            return [DeliveryResult(RESULT_RETRY, error=f"{type(e).__name__}: {e}")] * len(batch)
+
+        if len(batch) > 1 and all(result.status == STATUS_FAILED for result in results):
+            # A batch is rejected as a whole for one bad message: resend one by one so only that one fails.
+            # Nothing of it was accepted, so from here each email goes under its own key
+            results = []
+            for email in batch:
+                email.batch_key = None
+                results.extend(await self._send(provider, [email]))
+        return results
+
+    async def _finish(self, results: List[Tuple[OutboxEmail, DeliveryResult]]):
+        for email, result in results:
+            if result.status == STATUS_SENT:
+                self.stats["sent"] += 1
+            elif result.status == RESULT_RETRY and email.attempts < self.max_attempts:
+                self.stats["retried"] += 1
+                logger.warning(f"🔁 {email.kind} email {email.id} will be retried (attempt {email.attempts}): {result.error}")
+            else:
+                self.stats["failed"] += 1
+                logger.error(f"❌ {email.kind} email {email.id} failed after {email.attempts} attempts: {result.error}")
+        await asyncio.to_thread(self._record, results)
+
+    async def _deliver(self, emails: List[OutboxEmail]):
+        by_provider: Dict[str, List[OutboxEmail]] = defaultdict(list)
+        unrenderable = []
+        for email in emails:
+            if email.template:
+                failure = await asyncio.to_thread(self._render, email)
+                if failure:
+                    unrenderable.append((email, failure))
+                    continue
+                self.stats["rendered"] += 1
+            by_provider[email.provider].append(email)
+        if unrenderable:
+            await self._finish(unrenderable)
+
+        for provider_name, group in by_provider.items():
+            try:
+                provider = get_email_provider(provider_name)
+            except ValueError as e:
+                await self._finish([(email, DeliveryResult(STATUS_FAILED, error=str(e))) for email in group])
+                continue
+
+            # First attempts go out in batches; a batch that may have reached the provider is retried
+            # whole under its batch key, other retries one by one under their own idempotency key
+            fresh = sorted((email for email in group if email.attempts == 1 and not email.batch_key),
+                           key=lambda email: email.id)
+            size = max(provider.max_batch, 1)
+            new_batches = [fresh[start:start + size] for start in range(0, len(fresh), size)]
+            retried_batches: Dict[str, List[OutboxEmail]] = defaultdict(list)
+            for email in sorted(group, key=lambda email: email.id):
+                if email.batch_key:
+                    retried_batches[email.batch_key].append(email)
+            singles = [[email] for email in group if email.attempts > 1 and not email.batch_key]
+
+            for batch in new_batches:
+                if len(batch) > 1:
+                    batch_key = batch_idempotency_key(batch)
+                    if not await asyncio.to_thread(self._assign_batch, batch, batch_key):
+                        await self._finish([(email, DeliveryResult(RESULT_RETRY, error="could not record batch"))
+                                            for email in batch])
+                        continue
+                    for email in batch:
+                        email.batch_key = batch_key
+                await self._finish(list(zip(batch, await self._send(provider, batch))))
+            for batch in list(retried_batches.values()) + singles:
+                await self._finish(list(zip(batch, await self._send(provider, batch))))
+
+    async def run(self):
+        """Worker loop started from main.py"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info(f"📧 Email outbox worker started ({self.worker_id}, provider {settings.EMAIL_PROVIDER})")
+
+        while self.is_running:
+            try:
+                if time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL:
+                    self._last_maintenance = time.monotonic()
+                    await asyncio.to_thread(self._maintenance)
+
+                emails = await asyncio.to_thread(self._claim_batch)
+                if emails:
+                    await self._deliver(emails)
+                    if len(emails) == self.claim_limit:
+                        continue  # more are waiting
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"💥 Email outbox worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        """Stop claiming; emails mid-send are finished or reclaimed after the lease"""
+        self.is_running = False
+        self.notify()
+        logger.info("📧 Email outbox worker stopped")
+
+    def get_status(self) -> Dict[str, Any]:
+        provider = get_email_provider()
+        status = {
+            "running": self.is_running,
+            "worker_id": self.worker_id,
+            "provider": provider.name,
+            "provider_configured": provider.configured,
+            "rate_per_second": provider.rate_per_second,
+            "max_batch": provider.max_batch,
+            **self.stats,
+        }
+        db = self.session_factory()
+        try:
+            counts = db.query(
+                EmailOutboxMessage.status, func.count(EmailOutboxMessage.id)
+            ).group_by(EmailOutboxMessage.status).all()
+            status["outbox"] = {row[0]: row[1] for row in counts}
+            oldest = db.query(func.min(EmailOutboxMessage.created_at)).filter(
+                EmailOutboxMessage.status == STATUS_PENDING
+            ).scalar()
+            status["oldest_pending_seconds"] = (
+                round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None
+            )
+        except Exception as e:
+            status["outbox_error"] = str(e)
+        finally:
+            db.close()
+        return status
+
+
+_global_worker: Optional[EmailOutboxWorker] = None
+
+
+def get_email_outbox() -> EmailOutboxWorker:
+    global _global_worker
+    if _global_worker is None:
+        _global_worker = EmailOutboxWorker()
+    return _global_worker
+
+
+async def start_email_outbox():
+    """Start the worker - called from main.py startup"""
+    await get_email_outbox().run()
+
+
+def stop_email_outbox():
+    if _global_worker:
+        _global_worker.stop()
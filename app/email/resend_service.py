@@ -1,14 +1,15 @@
 # app/email/resend_service.py - UPDATED with Dynamic FROM_NAME
 
 import os
+import uuid
 import logging
 from typing import Dict, Optional, List
-import httpx
 from datetime import datetime
-import resend
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
 
+from app.email.outbox import OutboxEmail, get_email_provider, queue_email
+
 logger = logging.getLogger(__name__)
 
 class ResendEmailService:
@@ -23,7 +24,6 @@ class ResendEmailService:
             logger.warning("RESEND_API_KEY not set - email sending will be disabled")
             self.enabled = False
         else:
-            resend.api_key = self.api_key
             self.enabled = True
         
         # Initialize Jinja2 for email templates
@@ -31,9 +31,16 @@ class ResendEmailService:
         template_dir.mkdir(exist_ok=True)
         self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
     
+    async def _queue(self, kind: str, params: Dict, idempotency_key: Optional[str] = None,
+                     tenant_id: Optional[int] = None) -> Dict:
+        """Write the message to the email outbox; the outbox worker delivers it"""
+        outbox_id, created = await queue_email(kind, params, idempotency_key=idempotency_key, tenant_id=tenant_id)
+        return {"outbox_id": outbox_id, "duplicate": not created, "email_id": None}
+    
     async def send_agent_invitation(self, to_email: str, agent_name: str, 
-                                  business_name: str, invite_url: str) -> Dict:
-        """Send agent invitation email with dynamic FROM_NAME"""
+                                  business_name: str, invite_url: str,
+                                  idempotency_key: Optional[str] = None) -> Dict:
+        """Queue agent invitation email with dynamic FROM_NAME"""
         try:
             if not self.enabled:
                 logger.warning("Email service disabled - cannot send invitation")
@@ -54,7 +61,7 @@ class ResendEmailService:
             
             # Send email via Resend with dynamic FROM_NAME
             params = {
-                "from": f"{self.from_name} <{self.from_email}>",
+                "from": f"{dynamic_from_name} <{self.from_email}>",
                 "to": [to_email],
                 "subject": f"Join {business_name}'s Support Team - Set Up Your Agent Account",
                 "html": html_content,
@@ -64,20 +71,20 @@ class ResendEmailService:
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("agent_invitation", params, idempotency_key)
             
-            logger.info(f"✅ Agent invitation sent to {to_email} from '{dynamic_from_name}', ID: {response.get('id')}")
+            logger.info(f"📧 Agent invitation to {to_email} from '{dynamic_from_name}' queued, outbox ID: {queued['outbox_id']}")
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email,
                 "from_name": dynamic_from_name,  # Include in response
-                "message": "Invitation sent successfully"
+                "message": "Invitation queued for delivery"
             }
             
         except Exception as e:
-            logger.error(f"❌ Failed to send agent invitation to {to_email}: {str(e)}")
+            logger.error(f"❌ Failed to queue agent invitation to {to_email}: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
@@ -85,8 +92,8 @@ class ResendEmailService:
             }
     
     async def send_password_reset_notification(self, to_email: str, agent_name: str, 
-                                             business_name: str) -> Dict:
-        """Send notification when agent password is reset with dynamic FROM_NAME"""
+                                             business_name: str, idempotency_key: Optional[str] = None) -> Dict:
+        """Queue notification when agent password is reset with dynamic FROM_NAME"""
         try:
             if not self.enabled:
                 return {"success": False, "error": "Email service not configured"}
@@ -145,28 +152,28 @@ class ResendEmailService:
                 "html": html_content,
                 "tags": [
                     {"name": "type", "value": "account_activation"},
-                    {"name": "business", "value": business_name}
+                    {"name": "business", "value": self._sanitize_tag_value(business_name)}
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("account_activation", params, idempotency_key)
             
-            logger.info(f"✅ Account activation email sent to {to_email} from '{dynamic_from_name}'")
+            logger.info(f"📧 Account activation email to {to_email} from '{dynamic_from_name}' queued")
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email,
                 "from_name": dynamic_from_name
             }
             
         except Exception as e:
-            logger.error(f"Failed to send activation email: {str(e)}")
+            logger.error(f"Failed to queue activation email: {str(e)}")
             return {"success": False, "error": str(e)}
     
     async def send_agent_revoked_notification(self, to_email: str, agent_name: str, 
-                                            business_name: str) -> Dict:
-        """Send notification when agent access is revoked with dynamic FROM_NAME"""
+                                            business_name: str, idempotency_key: Optional[str] = None) -> Dict:
+        """Queue notification when agent access is revoked with dynamic FROM_NAME"""
         try:
             if not self.enabled:
                 return {"success": False, "error": "Email service not configured"}
@@ -215,23 +222,23 @@ class ResendEmailService:
                 "html": html_content,
                 "tags": [
                     {"name": "type", "value": "account_revoked"},
-                    {"name": "business", "value": business_name}
+                    {"name": "business", "value": self._sanitize_tag_value(business_name)}
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("account_revoked", params, idempotency_key)
             
-            logger.info(f"✅ Account revocation email sent to {to_email} from '{dynamic_from_name}'")
+            logger.info(f"📧 Account revocation email to {to_email} from '{dynamic_from_name}' queued")
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email,
                 "from_name": dynamic_from_name
             }
             
         except Exception as e:
-            logger.error(f"Failed to send revocation email: {str(e)}")
+            logger.error(f"Failed to queue revocation email: {str(e)}")
             return {"success": False, "error": str(e)}
     
     async def test_email_connection(self) -> Dict:
@@ -255,12 +262,18 @@ class ResendEmailService:
                 "tags": [{"name": "type", "value": "test"}]
             }
             
-            response = resend.Emails.send(test_params)
+            # Sent directly (not queued) so the caller sees the provider's answer
+            result = await get_email_provider().send(OutboxEmail(
+                id=0, tenant_id=None, kind="test", provider="", idempotency_key=f"test:{uuid.uuid4().hex}",
+                payload=test_params, template=None, context=None, attempts=1
+            ))
+            if result.status != "sent":
+                return {"success": False, "error": f"Email service test failed: {result.error}"}
             
             return {
                 "success": True,
                 "message": "Email service is working correctly",
-                "test_email_id": response.get("id"),
+                "test_email_id": result.provider_message_id,
                 "from_name": test_from_name
             }
             
@@ -403,6 +416,36 @@ class ResendEmailService:
         """
 
 
+    def conversation_transcript_params(
+        self,
+        to_email: str,
+        subject: str,
+        conversation_id: int,
+        agent_name: str,
+        cc_emails: Optional[List[str]] = None,
+        bcc_emails: Optional[List[str]] = None
+    ) -> Dict:
+        """Resend payload for a transcript email, without the body"""
+        email_data = {
+            "from": self.from_email,
+            "to": [to_email],
+            "subject": subject,
+            "tags": [
+                {"name": "type", "value": "conversation_transcript"},
+                {"name": "conversation_id", "value": str(conversation_id)},
+                {"name": "agent", "value": self._sanitize_tag_value(agent_name)}
+            ]
+        }
+        
+        # Add CC/BCC if provided
+        if cc_emails:
+            email_data["cc"] = cc_emails
+        
+        if bcc_emails:
+            email_data["bcc"] = bcc_emails
+        
+        return email_data
+
     async def send_conversation_transcript(
         self,
         to_email: str,
@@ -412,10 +455,11 @@ class ResendEmailService:
         conversation_id: int,
         agent_name: str,
         cc_emails: Optional[List[str]] = None,
-        bcc_emails: Optional[List[str]] = None
+        bcc_emails: Optional[List[str]] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, any]:
         """
-        Send conversation transcript email
+        Queue an already rendered conversation transcript email
         
         Args:
             to_email: Recipient email address
@@ -426,6 +470,7 @@ class ResendEmailService:
             agent_name: Name of agent sending the transcript
             cc_emails: Optional CC recipients
             bcc_emails: Optional BCC recipients
+            idempotency_key: Optional key; queueing the same key twice sends one email
         """
         if not self.enabled:
             return {
@@ -434,75 +479,24 @@ class ResendEmailService:
             }
         
         try:
-            # Prepare email payload
-            email_data = {
-                "from": self.from_email,
-                "to": [to_email],
-                "subject": subject,
-                "html": html_content,
-                "text": plain_content,
-                "tags": [
-                    {"name": "type", "value": "conversation_transcript"},
-                    {"name": "conversation_id", "value": str(conversation_id)},
-                    {"name": "agent", "value": agent_name}
-                ]
-            }
-            
-            # Add CC/BCC if provided
-            if cc_emails:
-                email_data["cc"] = cc_emails
+            email_data = self.conversation_transcript_params(
+                to_email, subject, conversation_id, agent_name, cc_emails, bcc_emails
+            )
+            email_data.update({"html": html_content, "text": plain_content})
             
-            if bcc_emails:
-                email_data["bcc"] = bcc_emails
+            queued = await self._queue("conversation_transcript", email_data, idempotency_key)
+            logger.info(f"📧 Transcript email to {to_email} queued, outbox ID: {queued['outbox_id']}")
             
-            # Send email via Resend API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/emails",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json=email_data,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"✅ Transcript email sent successfully to {to_email}, ID: {result.get('id')}")
-                    
-                    return {
-                        "success": True,
-                        "email_id": result.get("id"),
-                        "to_email": to_email,
-                        "subject": subject,
-                        "conversation_id": conversation_id,
-                        "sent_at": datetime.utcnow().isoformat()
-                    }
-                else:
-                    error_detail = response.text
-                    logger.error(f"❌ Failed to send transcript email: {response.status_code} - {error_detail}")
-                    
-                    return {
-                        "success": False,
-                        "error": f"Email send failed: {response.status_code}",
-                        "details": error_detail
-                    }
-                    
-        except httpx.TimeoutException:
-            logger.error("❌ Email send timeout")
-            return {
-                "success": False,
-                "error": "Email send timeout"
-            }
-        except httpx.RequestError as e:
-            logger.error(f"❌ Email send request error: {str(e)}")
             return {
-                "success": False,
-                "error": f"Request error: {str(e)}"
+                "success": True,
+                **queued,
+                "to_email": to_email,
+                "subject": subject,
+                "conversation_id": conversation_id,
+                "queued_at": datetime.utcnow().isoformat()
             }
         except Exception as e:
-            logger.error(f"❌ Unexpected error sending transcript email: {str(e)}")
+            logger.error(f"❌ Failed to queue transcript email: {str(e)}")
             return {
                 "success": False,
                 "error": f"Unexpected error: {str(e)}"
@@ -76,7 +76,7 @@ class ConversationAnalysis(Base):
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), index=True)
     session_id = Column(String(50), index=True)
-    message_id = Column(Integer, ForeignKey("chat_messages.id"))
+    message_id = Column(Integer, index=True)  # chat_messages.id; no FK since chat_messages is partitioned
     sentiment_score = Column(Float, default=0.0)  # -1 to 1
     confusion_detected = Column(Boolean, default=False)
     satisfaction_level = Column(String(20))  # 'positive', 'neutral', 'negative'
@@ -92,7 +92,7 @@ class ResponseConfidence(Base):
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), index=True)
     session_id = Column(String(50), index=True)
-    message_id = Column(Integer, ForeignKey("chat_messages.id"))
+    message_id = Column(Integer, index=True)  # chat_messages.id; no FK since chat_messages is partitioned
     bot_response = Column(Text)
     confidence_score = Column(Float, default=0.0)  # 0 to 1
     uncertainty_reasons = Column(JSON, nullable=True)  # Why confidence is low
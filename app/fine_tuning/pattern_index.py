@@ -0,0 +1,215 @@
+"""
+In-process per-tenant index over LearningPattern rows for
+UnifiedIntelligentEngine._apply_learned_patterns.
+
+Matching keeps the engine's rule: a pattern applies when the message contains
+one of its words longer than three characters (or, for patterns without such
+words, the whole pattern), and the best-scoring match wins if its score
+(confidence * success_rate, or confidence when there is no success rate yet)
+beats LEARNED_PATTERN_MIN_SCORE. Only patterns that could ever win are indexed.
+
+Each word's posting list is kept sorted best-first, so a lookup reads the head
+of one list per message word: cost depends on the message, not on how many
+patterns the trainer has written.
+
+    index = get_learned_pattern_index(db, tenant_id)
+    hit = index.lookup(user_message)  # (pattern id, score) or None
+
+Indexes are loaded lazily per tenant, pick up rows with a higher id every
+LEARNED_PATTERN_REFRESH_SECONDS (add_learned_pattern makes the trainer's own
+rows visible immediately), and are rebuilt from scratch after
+LEARNED_PATTERN_REBUILD_SECONDS or invalidate_learned_pattern_index() so
+deactivations and score changes land too.
+"""
+import re
+import time
+import logging
+import threading
+from bisect import insort
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.fine_tuning.models import LearningPattern
+from app.utils.bounded_cache import BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+MAX_PHRASE_TOKENS = 4  # longest short-word pattern matched as a phrase
+
+_WORD = re.compile(r"[a-z0-9']+")
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def pattern_score(confidence: Optional[float], success_rate: Optional[float]) -> float:
+    confidence = confidence or 0.0
+    return confidence * success_rate if success_rate and success_rate > 0 else confidence
+
+
+class LearnedPatternIndex:
+
+    def __init__(self, tenant_id: int, min_score: Optional[float] = None):
+        self.tenant_id = tenant_id
+        self.min_score = settings.LEARNED_PATTERN_MIN_SCORE if min_score is None else min_score
+        # token -> [(-score, pattern id)], best first
+        self._postings: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        # phrase of short words -> best (-score, pattern id)
+        self._phrases: Dict[Tuple[str, ...], Tuple[float, int]] = {}
+        self._ids = set()
+        self._lock = threading.Lock()
+        self.max_id = 0  # highest id read from the database; refresh() continues after it
+        self.size = 0
+        self.built_at = time.time()
+        self.refreshed_at = 0.0
+
+    def add(self, pattern_id: int, text: str, score: float, touched: Optional[set] = None) -> bool:
+        """Index one pattern; False if it could never be applied
+
+        With touched, postings are appended unsorted and the tokens collected so
+        a bulk load sorts each list once instead of inserting in order.
+        """
+        if score <= self.min_score or not text or pattern_id in self._ids:
+            return False
+        words = _words(text)
+        tokens = {_stem(word) for word in words if len(word) > 3}
+        entry = (-score, pattern_id)
+        with self._lock:
+            if tokens:
+                for token in tokens:
+                    if touched is None:
+                        insort(self._postings[token], entry)
+                    else:
+                        self._postings[token].append(entry)
+                        touched.add(token)
+            elif 0 < len(words) <= MAX_PHRASE_TOKENS:
+                phrase = tuple(words)
+                current = self._phrases.get(phrase)
+                if current is None or entry < current:
+                    self._phrases[phrase] = entry
+            else:
+                return False
+            self._ids.add(pattern_id)
+            self.size += 1
+        return True
+
+    def add_rows(self, rows: Iterable[Tuple[int, str, float, float]]) -> int:
+        """(id, user_message_pattern, confidence_score, success_rate) rows"""
+        added = 0
+        touched = set()
+        for pattern_id, text, confidence, success_rate in rows:
+            added += self.add(pattern_id, text, pattern_score(confidence, success_rate), touched)
+            self.max_id = max(self.max_id, pattern_id)
+        with self._lock:
+            for token in touched:
+                self._postings[token].sort()
+        return added
+
+    def lookup(self, message: str) -> Optional[Tuple[int, float]]:
+        """Best (pattern id, score) among patterns sharing a word with the message"""
+        words = _words(message)
+        best: Optional[Tuple[float, int]] = None
+        for token in {_stem(word) for word in words if len(word) > 3}:
+            postings = self._postings.get(token)
+            if postings and (best is None or postings[0] < best):
+                best = postings[0]
+        if self._phrases:
+            for length in range(1, min(MAX_PHRASE_TOKENS, len(words)) + 1):
+                for start in range(len(words) - length + 1):
+                    entry = self._phrases.get(tuple(words[start:start + length]))
+                    if entry and (best is None or entry < best):
+                        best = entry
+        if best is None:
+            return None
+        return best[1], -best[0]
+
+    def refresh(self, db: Session) -> int:
+        """Pull patterns written since the last load"""
+        rows = _pattern_rows(db, self.tenant_id, self.min_score, after_id=self.max_id)
+        added = self.add_rows(rows)
+        self.refreshed_at = time.time()
+        if added:
+            logger.info(f"🧠 Learned pattern index for tenant {self.tenant_id}: +{added} patterns ({self.size} total)")
+        return added
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "patterns": self.size,
+            "tokens": len(self._postings),
+            "phrases": len(self._phrases),
+            "max_id": self.max_id,
+            "built_at": self.built_at,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+def _pattern_rows(db: Session, tenant_id: int, min_score: float, after_id: int = 0):
+    # A pattern's score never exceeds its confidence, so weaker ones are not even read
+    return db.query(
+        LearningPattern.id,
+        LearningPattern.user_message_pattern,
+        LearningPattern.confidence_score,
+        LearningPattern.success_rate
+    ).filter(
+        LearningPattern.tenant_id == tenant_id,
+        LearningPattern.is_active == True,
+        LearningPattern.confidence_score > min_score,
+        LearningPattern.id > after_id
+    ).order_by(LearningPattern.id).yield_per(5000)
+
+
+_indexes = BoundedTTLCache(
+    max_entries=settings.LEARNED_PATTERN_MAX_TENANTS,
+    ttl_seconds=settings.LEARNED_PATTERN_REBUILD_SECONDS,
+)
+_build_lock = threading.Lock()
+
+
+def get_learned_pattern_index(db: Session, tenant_id: int) -> LearnedPatternIndex:
+    index = _indexes.get(tenant_id)
+    if index is None:
+        with _build_lock:
+            index = _indexes.get(tenant_id)
+            if index is None:
+                started = time.perf_counter()
+                index = LearnedPatternIndex(tenant_id)
+                index.refresh(db)
+                _indexes.set(tenant_id, index)
+                logger.info(
+                    f"🧠 Built learned pattern index for tenant {tenant_id}: {index.size} patterns "
+                    f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+                )
+    elif time.time() - index.refreshed_at >= settings.LEARNED_PATTERN_REFRESH_SECONDS:
+        index.refresh(db)
+    return index
+
+
+def add_learned_pattern(tenant_id: int, pattern: LearningPattern):
+    """Make a freshly committed pattern visible to this process without waiting for the refresh"""
+    index = _indexes.get(tenant_id)
+    if index is not None and pattern.is_active is not False:
+        index.add(pattern.id, pattern.user_message_pattern, pattern_score(pattern.confidence_score, pattern.success_rate))
+
+
+def invalidate_learned_pattern_index(tenant_id: Optional[int] = None):
+    """Drop a tenant's index (or all) so the next message rebuilds it"""
+    if tenant_id is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(tenant_id)
+
+
+def get_learned_pattern_index_stats() -> Dict[str, Any]:
+    return _indexes.stats()
@@ -0,0 +1,113 @@
+"""
+Microbenchmark: LearnedPatternIndex lookups vs the old linear scan, by pattern count.
+
+    python -m app.fine_tuning.pattern_index_benchmark
+    python -m app.fine_tuning.pattern_index_benchmark --sizes 1000 100000 --messages 2000
+
+Patterns and messages are synthetic (Zipf-distributed vocabulary, so common
+words have long posting lists, as in real tenants). The scan baseline is the
+loop _apply_learned_patterns used before the index, run on a sample of the
+messages because it gets slow. "agree" counts messages where both pick a
+pattern with the same score; the scan also matched inside longer words
+("jax fax" in "rojax fax"), the index matches whole words, so a rare miss there
+is expected. No database is needed.
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from app.fine_tuning.pattern_index import LearnedPatternIndex, pattern_score
+
+VOCABULARY = 5000
+
+
+def _word(rank: int) -> str:
+    # Pronounceable, distinct, and not trivially substrings of each other
+    consonants, vowels = "bcdfghjklmnprstvz", "aeiou"
+    word = ""
+    rank += 1
+    while rank:
+        rank, c = divmod(rank, len(consonants))
+        rank, v = divmod(rank, len(vowels))
+        word += consonants[c] + vowels[v]
+    return word + "x"
+
+
+def _corpus(size: int, messages: int, seed: int) -> Tuple[List[Tuple[int, str, float, float]], List[str]]:
+    rng = random.Random(seed)
+    words = [_word(rank) for rank in range(VOCABULARY)]
+    weights = [1.0 / (rank + 1) for rank in range(VOCABULARY)]
+    rows = []
+    for pattern_id in range(1, size + 1):
+        text = " ".join(rng.choices(words, weights, k=rng.randint(3, 8)))
+        rows.append((pattern_id, text, round(rng.uniform(0.5, 1.0), 3), rng.choice([0.0, round(rng.random(), 3)])))
+    queries = [" ".join(rng.choices(words, weights, k=rng.randint(5, 15))) for _ in range(messages)]
+    return rows, queries
+
+
+def _linear_scan(rows, message: str, min_score: float):
+    """The pre-index loop from UnifiedIntelligentEngine._apply_learned_patterns"""
+    user_lower = message.lower()
+    best_id, best_score = None, 0.0
+    for pattern_id, text, confidence, success_rate in rows:
+        if confidence <= 0.7:
+            continue
+        pattern_text = text.lower()
+        if pattern_text in user_lower or any(word in user_lower for word in pattern_text.split() if len(word) > 3):
+            score = pattern_score(confidence, success_rate)
+            if score > best_score:
+                best_id, best_score = pattern_id, score
+    return (best_id, best_score) if best_score > min_score else None
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def run(sizes: List[int], messages: int, scan_messages: int, min_score: float, seed: int):
+    print(f"{'patterns':>9}{'indexed':>9}{'build ms':>10}{'p50 us':>9}{'p99 us':>9}{'max us':>9}"
+          f"{'scan p50 ms':>13}{'agree':>8}")
+    for size in sizes:
+        rows, queries = _corpus(size, messages, seed)
+        started = time.perf_counter()
+        index = LearnedPatternIndex(tenant_id=0, min_score=min_score)
+        index.add_rows(rows)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        for message in queries:
+            started = time.perf_counter()
+            index.lookup(message)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+
+        scan_latencies = []
+        agree = 0
+        for message in queries[:scan_messages]:
+            started = time.perf_counter()
+            expected = _linear_scan(rows, message, min_score)
+            scan_latencies.append((time.perf_counter() - started) * 1000)
+            got = index.lookup(message)
+            agree += (expected is None and got is None) or (
+                expected is not None and got is not None and abs(expected[1] - got[1]) < 1e-9
+            )
+
+        print(f"{size:>9}{index.size:>9}{build_ms:>10.0f}{_percentile(latencies, 0.5):>9.1f}"
+              f"{_percentile(latencies, 0.99):>9.1f}{max(latencies):>9.1f}"
+              f"{_percentile(scan_latencies, 0.5):>13.2f}{agree:>5}/{len(scan_latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--scan-messages", type=int, default=50, help="messages also run through the linear scan")
+    parser.add_argument("--min-score", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.sizes, args.messages, args.scan_messages, args.min_score, args.seed)
+
+
+if __name__ == "__main__":
+    main()
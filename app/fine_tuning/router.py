@@ -17,6 +17,7 @@ from app.auth.router import get_admin_user
 from app.tenants.models import Tenant
 from app.fine_tuning.trainer import get_background_trainer
 from app.fine_tuning.models import LearningPattern, TrainingMetrics, AutoImprovement
+from app.fine_tuning.pattern_index import invalidate_learned_pattern_index
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -317,6 +318,8 @@ async def admin_control_tenant_fine_tuning(
             improvements_affected = 0
         
         db.commit()
+        if not request.enabled:
+            invalidate_learned_pattern_index(request.tenant_id)
         
         return {
             "success": True,
@@ -9,6 +9,8 @@ import logging
 import asyncio
 import json
 import re
+import time
+from bisect import bisect_left
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
@@ -21,6 +23,7 @@ from app.chatbot.smart_feedback import PendingFeedback
 from app.knowledge_base.models import FAQ, KnowledgeBase
 from app.tenants.models import Tenant
 from app.fine_tuning.models import LearningPattern, TrainingMetrics, AutoImprovement, ConversationAnalysis, ResponseConfidence, ProactiveLearning
+from app.fine_tuning.pattern_index import add_learned_pattern
 
 # LLM Integration
 try:
@@ -31,6 +34,7 @@ except ImportError:
     LLM_AVAILABLE = False
 
 from app.config import settings
+from app.services.llm_gateway import get_llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -187,7 +191,7 @@ Generate a more confident, specific, and helpful response:
 """
         
         try:
-            result = self.llm.invoke(prompt)
+            result = await self.llm.ainvoke(prompt)
             return result.content.strip()
         except:
             return original_response
@@ -270,14 +274,11 @@ class BackgroundTrainer:
         self.db = None  # Remove persistent session
         self.training_interval = 30 * 60  # 30 minutes in seconds
         self.is_running = False
+        self.last_cycle: Optional[Dict] = None  # summary of the most recent training cycle
         self.llm_available = LLM_AVAILABLE and bool(settings.OPENAI_API_KEY)
         
         if self.llm_available:
-            self.llm = ChatOpenAI(
-                model_name="gpt-3.5-turbo",
-                temperature=0.2,
-                openai_api_key=settings.OPENAI_API_KEY
-            )
+            self.llm = get_llm_gateway().chat_model("fine_tuning", temperature=0.2)
         
         # Add these new analyzers
         self.semantic_analyzer = SemanticAnalyzer(self.llm if self.llm_available else None)
@@ -361,124 +362,223 @@ class BackgroundTrainer:
 
 
     async def _training_cycle(self):
-        """Complete training cycle - analyze, learn, improve"""
+        """Complete training cycle - tenants fanned out over a bounded worker pool"""
         cycle_start = datetime.utcnow()
+        started = time.perf_counter()
         logger.info("🔄 Starting training cycle")
         
         db = self._get_fresh_db()
         try:
             # Get ALL active tenants INCLUDING super tenants
-            tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-            
-            # 🆕 EXPLICIT: Include super tenants in learning
-            super_tenant_ids = [324112833]  # Add your super tenant IDs
-            
-            logger.info(f"🧠 Training {len(tenants)} tenants (including super tenants)")
-            
-            total_patterns = 0
-            total_improvements = 0
-            
-            for tenant in tenants:
-                try:
-                    # 🆕 Log if processing super tenant
-                    if tenant.id in super_tenant_ids:
-                        logger.info(f"🎯 Processing SUPER TENANT: {tenant.name} (ID: {tenant.id})")
-                    
-                    tenant_patterns, tenant_improvements = await self._train_tenant(tenant, db)
-                    total_patterns += tenant_patterns
-                    total_improvements += tenant_improvements
-                    
-                except Exception as e:
-                    logger.error(f"❌ Tenant {tenant.id} training failed: {e}")
-                    try:
-                        db.rollback()
-                    except:
-                        pass
-            
-            cycle_time = (datetime.utcnow() - cycle_start).total_seconds()
-            logger.info(f"✅ Training cycle complete: {total_patterns} patterns, {total_improvements} improvements, {cycle_time:.2f}s")
-            
+            tenants = db.query(Tenant.id, Tenant.name).filter(Tenant.is_active == True).all()
+            watermarks = self._load_watermarks([tenant.id for tenant in tenants], db)
         except Exception as e:
             logger.error(f"💥 Training cycle failed: {e}")
-            try:
-                db.rollback()
-            except:
-                pass
+            return
         finally:
             self._close_db(db)
+        
+        # 🆕 EXPLICIT: Include super tenants in learning
+        super_tenant_ids = [324112833]  # Add your super tenant IDs
+        
+        logger.info(f"🧠 Training {len(tenants)} tenants (including super tenants), "
+                    f"{settings.TRAINER_MAX_WORKERS} at a time")
+        
+        workers = asyncio.Semaphore(settings.TRAINER_MAX_WORKERS)
+        
+        async def run(tenant_id: int, tenant_name: str) -> Dict:
+            async with workers:
+                # 🆕 Log if processing super tenant
+                if tenant_id in super_tenant_ids:
+                    logger.info(f"🎯 Processing SUPER TENANT: {tenant_name} (ID: {tenant_id})")
+                return await self._train_tenant(tenant_id, tenant_name, watermarks.get(tenant_id), cycle_start)
+        
+        results = await asyncio.gather(
+            *(run(tenant.id, tenant.name) for tenant in tenants), return_exceptions=True
+        )
+        
+        summary = {
+            'started_at': cycle_start.isoformat(),
+            'tenants': len(tenants),
+            'tenants_trained': 0,
+            'tenants_skipped': 0,
+            'tenants_failed': 0,
+            'conversations_analyzed': 0,
+            'patterns_learned': 0,
+            'improvements_made': 0,
+        }
+        for tenant, result in zip(tenants, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Tenant {tenant.id} training failed: {result}")
+                summary['tenants_failed'] += 1
+                continue
+            summary[f"tenants_{result['status']}"] += 1
+            summary['conversations_analyzed'] += result['conversations']
+            summary['patterns_learned'] += result['patterns']
+            summary['improvements_made'] += result['improvements']
+        
+        cycle_time = time.perf_counter() - started
+        summary['duration_seconds'] = round(cycle_time, 2)
+        summary['conversations_per_second'] = round(summary['conversations_analyzed'] / cycle_time, 2) if cycle_time else 0.0
+        summary['tenants_per_minute'] = round(len(tenants) * 60 / cycle_time, 1) if cycle_time else 0.0
+        self.last_cycle = summary
+        
+        logger.info(
+            f"✅ Training cycle complete: {summary['tenants_trained']} trained, {summary['tenants_skipped']} "
+            f"without new conversations, {summary['tenants_failed']} failed; "
+            f"{summary['conversations_analyzed']} conversations, {summary['patterns_learned']} patterns, "
+            f"{summary['improvements_made']} improvements in {cycle_time:.2f}s "
+            f"({summary['conversations_per_second']} conv/s, {summary['tenants_per_minute']} tenants/min)"
+        )
 
+    def _load_watermarks(self, tenant_ids: List[int], db: Session) -> Dict[int, datetime]:
+        """Per tenant, the point up to which conversations were analysed by the last cycle"""
+        if not tenant_ids:
+            return {}
+        
+        latest = db.query(
+            TrainingMetrics.tenant_id, func.max(TrainingMetrics.id).label('id')
+        ).filter(
+            TrainingMetrics.tenant_id.in_(tenant_ids)
+        ).group_by(TrainingMetrics.tenant_id).subquery()
+        
+        rows = db.query(TrainingMetrics.tenant_id, TrainingMetrics.training_data).join(
+            latest, TrainingMetrics.id == latest.c.id
+        ).all()
+        
+        watermarks = {}
+        for tenant_id, training_data in rows:
+            watermark = (training_data or {}).get('watermark')
+            if watermark:
+                try:
+                    watermarks[tenant_id] = datetime.fromisoformat(watermark)
+                except ValueError:
+                    pass
+        return watermarks
+
+    def _window_start(self, watermark: Optional[datetime], until: datetime) -> datetime:
+        """Resume from the watermark, bounded so a long outage doesn't turn into one huge cycle"""
+        oldest = until - timedelta(hours=settings.TRAINER_MAX_LOOKBACK_HOURS)
+        if watermark is None:
+            return until - timedelta(hours=settings.TRAINER_INITIAL_LOOKBACK_HOURS)
+        return max(watermark, oldest)
 
-    async def _train_tenant(self, tenant: Tenant, db: Session) -> Tuple[int, int]:
-        """Enhanced tenant training with semantic and confidence analysis"""
-        logger.info(f"🎯 Enhanced training for tenant: {tenant.name} (ID: {tenant.id})")
+    async def _train_tenant(self, tenant_id: int, tenant_name: str, watermark: Optional[datetime],
+                            until: datetime) -> Dict:
+        """Enhanced tenant training with semantic and confidence analysis, on conversations since the watermark"""
+        since = self._window_start(watermark, until)
+        started = time.perf_counter()
+        result = {'status': 'skipped', 'conversations': 0, 'patterns': 0, 'improvements': 0}
         
         patterns_learned = 0
         improvements_made = 0
         
+        db = self._get_fresh_db()
         try:
+            # 1. Get conversations (set-based, off the event loop)
+            failed_conversations, successful_conversations, bot_replies = await asyncio.to_thread(
+                self._load_tenant_window, tenant_id, since, until, db
+            )
+            conversations = len(failed_conversations) + len(successful_conversations)
+            if not conversations and not bot_replies:
+                return result
+            
+            logger.info(f"🎯 Enhanced training for tenant: {tenant_name} (ID: {tenant_id}), "
+                        f"{conversations} conversations since {since.isoformat()}")
+            
             # Create ProactiveLearner with this db session
             self.proactive_learner = ProactiveLearner(db)
             
-            # 1. Get conversations
-            failed_conversations = self._get_failed_conversations(tenant.id, db)
-            successful_conversations = self._get_successful_conversations(tenant.id, db)
-            
             # 2. Enhanced semantic analysis
-            semantic_failures = await self._enhanced_conversation_analysis(tenant.id, failed_conversations + successful_conversations, db)
+            semantic_failures = await self._enhanced_conversation_analysis(tenant_id, failed_conversations + successful_conversations, db)
             failed_conversations.extend(semantic_failures)
             
             # 3. Confidence analysis
-            low_confidence_responses = await self._analyze_response_confidence(tenant.id, db)
+            low_confidence_responses = await self._analyze_response_confidence(tenant_id, bot_replies, db)
             improvements_made += len(low_confidence_responses)
             
             # 4. Original learning process
-            failure_patterns = await self._learn_from_failures(tenant.id, failed_conversations, db)
+            failure_patterns = await self._learn_from_failures(tenant_id, failed_conversations, db)
             patterns_learned += len(failure_patterns)
             
-            success_patterns = await self._learn_from_successes(tenant.id, successful_conversations, db)
+            success_patterns = await self._learn_from_successes(tenant_id, successful_conversations, db)
             patterns_learned += len(success_patterns)
             
             # 5. Auto-improve responses
-            improvements = await self._auto_improve_responses(tenant.id, failure_patterns, db)
+            improvements = await self._auto_improve_responses(tenant_id, failure_patterns, db)
             improvements_made += len(improvements)
             
             # 6. Update knowledge base
-            kb_updates = await self._update_knowledge_base(tenant.id, failure_patterns, success_patterns, db)
+            kb_updates = await self._update_knowledge_base(tenant_id, failure_patterns, success_patterns, db)
             improvements_made += len(kb_updates)
             
-            # 7. Record metrics
-            self._record_training_metrics(tenant.id, patterns_learned, improvements_made, db)
+            # 7. Record metrics (and the watermark the next cycle resumes from)
+            self._record_training_metrics(
+                tenant_id, patterns_learned, improvements_made, db,
+                conversations_analyzed=conversations,
+                processing_time_seconds=time.perf_counter() - started,
+                watermark=until
+            )
             
-            logger.info(f"✅ Enhanced training complete for tenant {tenant.id}: {patterns_learned} patterns, {improvements_made} improvements")
+            logger.info(f"✅ Enhanced training complete for tenant {tenant_id}: {patterns_learned} patterns, {improvements_made} improvements")
+            result.update(status='trained', conversations=conversations, patterns=patterns_learned,
+                          improvements=improvements_made)
+            return result
             
         except Exception as e:
-            logger.error(f"❌ Enhanced training failed for tenant {tenant.id}: {e}")
+            logger.error(f"❌ Enhanced training failed for tenant {tenant_id}: {e}")
             db.rollback()
-        
-        return patterns_learned, improvements_made
-    
-    def _get_failed_conversations(self, tenant_id: int, db: Session) -> List[Dict]:
+            raise
+        finally:
+            self._close_db(db)
+
+    def _load_tenant_window(self, tenant_id: int, since: datetime, until: datetime,
+                            db: Session) -> Tuple[List[Dict], List[Dict], List[Tuple]]:
+        failed = self._get_failed_conversations(tenant_id, db, since, until)
+        successful = self._get_successful_conversations(tenant_id, db, since, until)
+        bot_replies = self._get_bot_replies(tenant_id, db, since, until)
+        return failed, successful, bot_replies
+
+    def _load_conversations(self, session_pks: List[int], db: Session) -> Dict[int, List[ChatMessage]]:
+        """Messages of many sessions in one query, grouped by session and ordered by time"""
+        grouped = defaultdict(list)
+        if not session_pks:
+            return grouped
+        
+        messages = db.query(ChatMessage).filter(
+            ChatMessage.session_id.in_(session_pks)
+        ).order_by(ChatMessage.session_id, ChatMessage.created_at, ChatMessage.id).all()
+        
+        for message in messages:
+            grouped[message.session_id].append(message)
+        return grouped
+
+    def _get_failed_conversations(self, tenant_id: int, db: Session, since: datetime, until: datetime) -> List[Dict]:
         """Get conversations that failed (escalated or negative feedback)"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=2)  # Last 2 hours
-        
         failed_conversations = []
         
         # Get escalated conversations
         escalations = db.query(Escalation).filter(
             Escalation.tenant_id == tenant_id,
-            Escalation.created_at >= cutoff_time
+            Escalation.created_at >= since,
+            Escalation.created_at < until
         ).all()
         
+        sessions = {}
+        if escalations:
+            sessions = {
+                session.session_id: session for session in db.query(ChatSession).filter(
+                    ChatSession.session_id.in_({escalation.session_id for escalation in escalations})
+                ).all()
+            }
+        conversations = self._load_conversations([session.id for session in sessions.values()], db)
+        
         for escalation in escalations:
             # Get conversation context
-            session = db.query(ChatSession).filter(
-                ChatSession.session_id == escalation.session_id
-            ).first()
+            session = sessions.get(escalation.session_id)
             
             if session:
-                messages = db.query(ChatMessage).filter(
-                    ChatMessage.session_id == session.id
-                ).order_by(ChatMessage.created_at).all()
+                messages = conversations.get(session.id, [])
                 
                 failed_conversations.append({
                     'type': 'escalation',
@@ -491,7 +591,8 @@ class BackgroundTrainer:
         # Get negative feedback conversations
         negative_feedback = db.query(PendingFeedback).filter(
             PendingFeedback.tenant_id == tenant_id,
-            PendingFeedback.created_at >= cutoff_time,
+            PendingFeedback.created_at >= since,
+            PendingFeedback.created_at < until,
             PendingFeedback.status.in_(['responded', 'pending'])
         ).all()
         
@@ -506,37 +607,68 @@ class BackgroundTrainer:
         
         return failed_conversations
     
-    def _get_successful_conversations(self, tenant_id: int, db: Session) -> List[Dict]:
+    def _get_successful_conversations(self, tenant_id: int, db: Session, since: datetime, until: datetime) -> List[Dict]:
         """Get conversations that succeeded (no escalation, completed naturally)"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=2)
+        # Sessions completed in the window (updated_at is set when they are closed) with no escalations
+        last_activity = func.coalesce(ChatSession.updated_at, ChatSession.created_at)
+        escalated = db.query(Escalation.id).filter(Escalation.session_id == ChatSession.session_id).exists()
         
-        # Get sessions with no escalations
         successful_sessions = db.query(ChatSession).filter(
             ChatSession.tenant_id == tenant_id,
-            ChatSession.created_at >= cutoff_time,
-            ChatSession.is_active == False  # Completed sessions
-        ).all()
+            last_activity >= since,
+            last_activity < until,
+            ChatSession.is_active == False,  # Completed sessions
+            ~escalated
+        ).order_by(desc(last_activity)).limit(settings.TRAINER_MAX_SUCCESSFUL_SESSIONS * 2).all()
+        
+        conversations = self._load_conversations([session.id for session in successful_sessions], db)
         
         successful_conversations = []
         
         for session in successful_sessions:
-            # Check if no escalation occurred
-            escalation_exists = db.query(Escalation).filter(
-                Escalation.session_id == session.session_id
-            ).first()
+            messages = conversations.get(session.id, [])
             
-            if not escalation_exists:
-                messages = db.query(ChatMessage).filter(
-                    ChatMessage.session_id == session.id
-                ).order_by(ChatMessage.created_at).all()
-                
-                if len(messages) >= 2:  # At least one exchange
-                    successful_conversations.append({
-                        'session_id': session.session_id,
-                        'conversation': [{'content': m.content, 'is_user': m.is_from_user} for m in messages]
-                    })
+            if len(messages) >= 2:  # At least one exchange
+                successful_conversations.append({
+                    'session_id': session.session_id,
+                    'conversation': [{'content': m.content, 'is_user': m.is_from_user} for m in messages]
+                })
         
-        return successful_conversations[:20]  # Limit to prevent overload
+        return successful_conversations[:settings.TRAINER_MAX_SUCCESSFUL_SESSIONS]  # Limit to prevent overload
+
+    def _get_bot_replies(self, tenant_id: int, db: Session, since: datetime, until: datetime) -> List[Tuple]:
+        """(bot message, preceding user message content) for bot replies in the window"""
+        recent_messages = db.query(ChatMessage).join(ChatSession).filter(
+            ChatSession.tenant_id == tenant_id,
+            ChatMessage.is_from_user == False,
+            ChatMessage.created_at >= since,
+            ChatMessage.created_at < until
+        ).order_by(ChatMessage.session_id, ChatMessage.created_at).all()
+        
+        if not recent_messages:
+            return []
+        
+        # The user messages that could precede them, one query for all sessions
+        user_messages = db.query(
+            ChatMessage.session_id, ChatMessage.created_at, ChatMessage.content
+        ).filter(
+            ChatMessage.session_id.in_({message.session_id for message in recent_messages}),
+            ChatMessage.is_from_user == True,
+            ChatMessage.created_at < until
+        ).order_by(ChatMessage.session_id, ChatMessage.created_at).all()
+        
+        times, contents = defaultdict(list), defaultdict(list)
+        for session_id, created_at, content in user_messages:
+            times[session_id].append(created_at)
+            contents[session_id].append(content)
+        
+        replies = []
+        for message in recent_messages:
+            # Latest user message strictly before the reply
+            position = bisect_left(times[message.session_id], message.created_at)
+            if position:
+                replies.append((message, contents[message.session_id][position - 1]))
+        return replies
     
     async def _enhanced_conversation_analysis(self, tenant_id: int, conversations: List[Dict], db: Session) -> List[Dict]:
         """Enhanced analysis using semantic and confidence analysis"""
@@ -573,71 +705,65 @@ class BackgroundTrainer:
         
         return enhanced_failures
 
-    async def _analyze_response_confidence(self, tenant_id: int, db: Session):
+    async def _analyze_response_confidence(self, tenant_id: int, bot_replies: List[Tuple], db: Session):
         """Analyze bot response confidence and flag improvements"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=2)
-        
-        # Get recent bot responses through ChatSession relationship
-        recent_messages = db.query(ChatMessage).join(ChatSession).filter(
-            ChatSession.tenant_id == tenant_id,  # Use session's tenant_id
-            ChatMessage.is_from_user == False,
-            ChatMessage.created_at >= cutoff_time
-        ).all()
-        
-        low_confidence_responses = []
+        flagged = []
         
-        for message in recent_messages:
+        for message, user_content in bot_replies:
             try:
-                # Get corresponding user message
-                user_message = db.query(ChatMessage).filter(
-                    ChatMessage.session_id == message.session_id,
-                    ChatMessage.is_from_user == True,
-                    ChatMessage.created_at < message.created_at
-                ).order_by(desc(ChatMessage.created_at)).first()
-                
-                if not user_message:
-                    continue
-                
-                # Get session to get tenant_id
-                session = db.query(ChatSession).filter(
-                    ChatSession.id == message.session_id
-                ).first()
-                
-                if not session or session.tenant_id != tenant_id:
-                    continue
-                
                 # Analyze confidence
                 confidence_analysis = self.confidence_analyzer.score_response_confidence(
                     message.content, 
-                    user_message.content
+                    user_content
                 )
                 
                 # Store confidence analysis
-                self._store_response_confidence(session.tenant_id, message, confidence_analysis, db)
+                self._store_response_confidence(tenant_id, message, confidence_analysis, db)
                 
                 # Flag for improvement if low confidence
                 if confidence_analysis['needs_improvement']:
-                    improved_response = await self.confidence_analyzer.generate_improved_response(
-                        message.content, user_message.content, confidence_analysis
-                    )
-                    
-                    # Update stored confidence record with improvement
-                    self._update_confidence_with_improvement(
-                        session.tenant_id, message.id, improved_response, db
-                    )
-                    
-                    low_confidence_responses.append({
-                        'original_response': message.content,
-                        'improved_response': improved_response,
-                        'confidence_score': confidence_analysis['confidence_score'],
-                        'user_message': user_message.content
-                    })
+                    flagged.append((message, user_content, confidence_analysis))
             
             except Exception as e:
                 logger.error(f"❌ Confidence analysis failed: {e}")
         
+        # LLM rewrites run concurrently, bounded per tenant; the gateway caps the total
+        improved_responses = await self._gather_bounded(
+            self.confidence_analyzer.generate_improved_response(message.content, user_content, analysis)
+            for message, user_content, analysis in flagged
+        )
+        
+        low_confidence_responses = []
+        
+        for (message, user_content, confidence_analysis), improved_response in zip(flagged, improved_responses):
+            if isinstance(improved_response, Exception):
+                logger.error(f"❌ Confidence analysis failed: {improved_response}")
+                continue
+            
+            # Update stored confidence record with improvement
+            self._update_confidence_with_improvement(
+                tenant_id, message.id, improved_response, db
+            )
+            
+            low_confidence_responses.append({
+                'original_response': message.content,
+                'improved_response': improved_response,
+                'confidence_score': confidence_analysis['confidence_score'],
+                'user_message': user_content
+            })
+        
         return low_confidence_responses
 
+    async def _gather_bounded(self, coroutines) -> List[Any]:
+        """Await coroutines with at most TRAINER_LLM_CONCURRENCY in flight; exceptions are returned"""
+        limit = asyncio.Semaphore(settings.TRAINER_LLM_CONCURRENCY)
+        
+        async def bounded(coroutine):
+            async with limit:
+                return await coroutine
+        
+        return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines), return_exceptions=True)
+
     def _store_conversation_analysis(self, tenant_id: int, conversation: Dict, sentiment_analysis: Dict, confusion_signals: List, db: Session):
         """Store conversation semantic analysis"""
         try:
@@ -706,14 +832,15 @@ class BackgroundTrainer:
         
         learned_patterns = []
         
-        for conversation in failed_conversations:
-            try:
-                pattern = await self._extract_failure_pattern(tenant_id, conversation)
-                if pattern:
-                    learned_patterns.append(pattern)
-                    self._store_learning_pattern(tenant_id, pattern, db)
-            except Exception as e:
-                logger.error(f"❌ Failed to learn from conversation: {e}")
+        patterns = await self._gather_bounded(
+            self._extract_failure_pattern(tenant_id, conversation) for conversation in failed_conversations
+        )
+        for pattern in patterns:
+            if isinstance(pattern, Exception):
+                logger.error(f"❌ Failed to learn from conversation: {pattern}")
+            elif pattern:
+                learned_patterns.append(pattern)
+                self._store_learning_pattern(tenant_id, pattern, db)
         
         return learned_patterns
     
@@ -760,7 +887,7 @@ JSON Response:"""
                     bot_response = msg.get('content', '')
                     break
             
-            result = self.llm.invoke(prompt.format(
+            result = await self.llm.ainvoke(prompt.format(
                 user_message=user_msg,
                 bot_response=bot_response,
                 failure_reason=conversation.get('failure_reason', 'unknown')
@@ -835,6 +962,7 @@ JSON Response:"""
             
             db.add(learning_pattern)
             db.commit()
+            add_learned_pattern(tenant_id, learning_pattern)
             
         except Exception as e:
             logger.error(f"❌ Failed to store pattern: {e}")
@@ -940,14 +1068,18 @@ JSON Response:"""
         
         return cleaned
     
-    def _record_training_metrics(self, tenant_id: int, patterns_learned: int, improvements_made: int, db: Session):
+    def _record_training_metrics(self, tenant_id: int, patterns_learned: int, improvements_made: int, db: Session,
+                                 conversations_analyzed: int = 0, processing_time_seconds: float = 0.0,
+                                 watermark: Optional[datetime] = None):
         """Record training cycle metrics"""
         try:
             metrics = TrainingMetrics(
                 tenant_id=tenant_id,
+                conversations_analyzed=conversations_analyzed,
                 patterns_learned=patterns_learned,
                 responses_improved=improvements_made,
-                processing_time_seconds=0.0  # Could be calculated if needed
+                processing_time_seconds=round(processing_time_seconds, 3),
+                training_data={'watermark': watermark.isoformat()} if watermark else None
             )
             
             db.add(metrics)
@@ -1006,7 +1138,8 @@ JSON Response:"""
                     'tenants_with_fine_tuning': tenants_with_fine_tuning,  # Should now include super tenant
                     'total_patterns_learned': total_patterns,
                     'total_improvements_made': total_improvements,
-                    'training_interval_minutes': self.training_interval // 60
+                    'training_interval_minutes': self.training_interval // 60,
+                    'last_cycle': self.last_cycle
                 }
         
         except Exception as e:
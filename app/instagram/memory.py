@@ -14,7 +14,7 @@ from sqlalchemy import and_
 
 from app.instagram.models import InstagramConversation, InstagramMessage, InstagramIntegration
 from app.chatbot.models import ChatSession, ChatMessage
-from app.chatbot.simple_memory import SimpleChatbotMemory
+from app.chatbot.simple_memory import SimpleChatbotMemory, invalidate_session_cache
 
 logger = logging.getLogger(__name__)
 
@@ -365,6 +365,8 @@ class InstagramMemoryManager:
             
             self.db.add(chat_message)
             self.db.commit()
+            # Written outside SimpleChatbotMemory: the cached message ring is now stale
+            invalidate_session_cache(session_id=chat_session.session_id)
             
             logger.info(f"✅ Synced Instagram message to core memory: {instagram_message.id}")
             return True
@@ -512,31 +514,13 @@ class InstagramMemoryManager:
     def cleanup_old_sessions(self, days_old: int = 90) -> int:
         """Clean up old Instagram conversations and corresponding chat sessions"""
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days_old)
-            
-            old_conversations = self.db.query(InstagramConversation).filter(
-                InstagramConversation.tenant_id == self.tenant_id,
-                InstagramConversation.created_at < cutoff_date,
-                InstagramConversation.is_active == True
-            ).all()
-            
-            cleaned_count = 0
-            
-            for conversation in old_conversations:
-                recent_message = self.db.query(InstagramMessage).filter(
-                    and_(
-                        InstagramMessage.conversation_id == conversation.id,
-                        InstagramMessage.created_at > cutoff_date
-                    )
-                ).first()
-                
-                if not recent_message:
-                    conversation.is_active = False
-                    conversation.conversation_status = "archived"
-                    cleaned_count += 1
+            from app.services.retention import get_retention_engine
+            result = get_retention_engine().run_policy(
+                "instagram_conversations", tenant_id=self.tenant_id, days=days_old
+            )
+            cleaned_count = result["affected"]
             
             core_cleaned = self.core_memory.cleanup_old_sessions(days_old)
-            self.db.commit()
             
             logger.info(f"🧹 Cleaned up {cleaned_count} Instagram conversations and {core_cleaned} core sessions")
             return cleaned_count + core_cleaned
@@ -4,7 +4,7 @@ Instagram Integration Database Models
 Handles Instagram business account connections and messaging
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from app.database import Base
@@ -202,6 +202,10 @@ class InstagramMessage(Base):
     conversation = relationship("InstagramConversation", back_populates="messages")
     tenant = relationship("Tenant")
     
+    __table_args__ = (
+        Index('idx_instagram_messages_conversation_created', 'conversation_id', 'created_at'),
+    )
+    
     def get_display_content(self) -> str:
         """Get appropriate content for display"""
         if self.message_type == "text":
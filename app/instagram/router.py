@@ -2,16 +2,20 @@
 
 import logging
 import json
+import hashlib
 from typing import Dict, Any, Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Header, Request, status, BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, validator
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.tenants.router import get_tenant_from_api_key
 from app.instagram.models import InstagramIntegration, InstagramConversation, InstagramMessage
 from app.instagram.service import InstagramAPIService, InstagramWebhookProcessor, InstagramConversationManager
 from app.instagram.bot_manager import get_instagram_bot_manager
+from app.webhooks.queue import InboxEvent, enqueue_webhook_event_async, register_webhook_handler
 from app.pricing.integration_helpers import (
     check_integration_limit_dependency_with_super_tenant
 )
@@ -330,9 +334,8 @@ async def instagram_webhook_verify(request: Request):
 @router.post("/webhook")
 async def instagram_webhook_handler(
     request: Request,
-    background_tasks: BackgroundTasks,
     x_hub_signature_256: str = Header(None, alias="X-Hub-Signature-256"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle Instagram webhook events"""
     try:
@@ -347,6 +350,16 @@ async def instagram_webhook_handler(
             logger.error("Invalid JSON in webhook payload")
             raise HTTPException(status_code=400, detail="Invalid JSON payload")
         
+        # One lookup per page, shared by signature checks and tenant attribution
+        page_integrations: Dict[str, Optional[InstagramIntegration]] = {}
+        
+        async def integration_for_page(page_id: str) -> Optional[InstagramIntegration]:
+            if page_id not in page_integrations:
+                page_integrations[page_id] = (await db.execute(
+                    select(InstagramIntegration).where(InstagramIntegration.facebook_page_id == page_id)
+                )).scalars().first()
+            return page_integrations[page_id]
+        
         # Verify webhook signature (Meta requirement)
         if x_hub_signature_256:
             # Find the integration to verify signature
@@ -356,12 +369,10 @@ async def instagram_webhook_handler(
                 break
             
             if page_id:
-                integration = db.query(InstagramIntegration).filter(
-                    InstagramIntegration.facebook_page_id == page_id
-                ).first()
+                integration = await integration_for_page(page_id)
                 
                 if integration:
-                    api_service = InstagramAPIService(integration, db)
+                    api_service = InstagramAPIService(integration, None)
                     signature_valid = api_service.verify_webhook_signature(
                         body.decode('utf-8'), x_hub_signature_256
                     )
@@ -370,14 +381,30 @@ async def instagram_webhook_handler(
                         logger.warning("Invalid webhook signature")
                         raise HTTPException(status_code=403, detail="Invalid signature")
         
-        # Process webhook in background
-        background_tasks.add_task(
-            process_instagram_webhook_background,
-            payload,
-            headers
-        )
-        
-        logger.info("📨 Instagram webhook received and queued for processing")
+        # Resolve tenants up front: a duplicate's rollback expires the loaded integrations
+        events = split_instagram_webhook(payload)
+        tenant_ids: Dict[str, Optional[int]] = {}
+        for _, _, ordering_key in events:
+            page_id = ordering_key.split(":", 1)[0]
+            if page_id not in tenant_ids:
+                page_integration = await integration_for_page(page_id)
+                tenant_ids[page_id] = page_integration.tenant_id if page_integration else None
+        
+        # Persist one inbox row per messaging event; the ingestion queue processes them
+        queued = 0
+        for entry_payload, dedupe_key, ordering_key in events:
+            if await enqueue_webhook_event_async(
+                db,
+                platform="instagram",
+                dedupe_key=dedupe_key,
+                ordering_key=ordering_key,
+                payload=entry_payload,
+                tenant_id=tenant_ids[ordering_key.split(":", 1)[0]],
+                headers=headers
+            ):
+                queued += 1
+        
+        logger.info(f"📨 Instagram webhook received, {queued} events queued for processing")
         return {"status": "received"}
         
     except HTTPException:
@@ -386,69 +413,124 @@ async def instagram_webhook_handler(
         logger.error(f"Error handling Instagram webhook: {str(e)}")
         raise HTTPException(status_code=500, detail="Webhook processing error")
 
-async def process_instagram_webhook_background(payload: Dict, headers: Dict):
-    """Background task to process Instagram webhook"""
-    db = None
+def split_instagram_webhook(payload: Dict) -> List[tuple]:
+    """
+    Split a webhook delivery into single-event payloads.
+    Returns (payload, dedupe_key, ordering_key) with ordering per page and sender.
+    """
+    events = []
+    for entry in payload.get("entry", []):
+        page_id = str(entry.get("id"))
+        base_entry = {key: value for key, value in entry.items() if key != "messaging"}
+        
+        messaging_events = entry.get("messaging") or []
+        if not messaging_events:
+            digest = hashlib.sha256(json.dumps(entry, sort_keys=True).encode()).hexdigest()
+            events.append(({"object": payload.get("object"), "entry": [entry]}, f"entry:{digest}", page_id))
+            continue
+        
+        for messaging in messaging_events:
+            sender_id = messaging.get("sender", {}).get("id")
+            mid = (messaging.get("message") or messaging.get("postback") or {}).get("mid")
+            dedupe_key = mid or hashlib.sha256(json.dumps(messaging, sort_keys=True).encode()).hexdigest()
+            event_payload = {"object": payload.get("object"), "entry": [{**base_entry, "messaging": [messaging]}]}
+            events.append((event_payload, f"{page_id}:{dedupe_key}", f"{page_id}:{sender_id}"))
+    
+    return events
+
+async def process_instagram_inbox_batch(events: List[InboxEvent]) -> bool:
+    """
+    Handle queued events from one Instagram user. A burst is merged into one
+    payload so every message is stored, then the bot answers once per sender,
+    to the latest message.
+    """
+    merged_entry = None
+    other_entries = []
+    for event in events:
+        for entry in event.payload.get("entry", []):
+            if entry.get("messaging"):
+                if merged_entry is None:
+                    merged_entry = {**entry, "messaging": list(entry["messaging"])}
+                else:
+                    merged_entry["messaging"].extend(entry["messaging"])
+            else:
+                other_entries.append(entry)
+    
+    entries = other_entries + ([merged_entry] if merged_entry else [])
+    payload = {"object": events[0].payload.get("object"), "entry": entries}
+    return await process_instagram_webhook_background(payload, events[-1].headers or {})
+
+register_webhook_handler("instagram", process_instagram_inbox_batch)
+
+async def process_instagram_webhook_background(payload: Dict, headers: Dict) -> bool:
+    """Store a webhook payload and reply once per (integration, sender)
+    
+    False when the payload could not be stored or a reply failed; unexpected
+    errors propagate so the webhook queue retries the batch (stored messages
+    are deduplicated by Meta message id).
+    """
+    db = next(get_db())
     try:
-        db = next(get_db())
-        
         webhook_processor = InstagramWebhookProcessor(db)
         success, message = webhook_processor.process_webhook_event(payload, headers)
         
-        if success:
-            logger.info(f"✅ Instagram webhook processed: {message}")
+        if not success:
+            logger.error(f"❌ Instagram webhook processing failed: {message}")
+            return False
+        
+        logger.info(f"✅ Instagram webhook processed: {message}")
+        
+        # Process any incoming messages with bot manager
+        bot_manager = get_instagram_bot_manager()
+        replied = True
+        
+        for entry in payload.get("entry", []):
+            page_id = entry.get("id")
             
-            # Process any incoming messages with bot manager
-            bot_manager = get_instagram_bot_manager()
+            # Find integration
+            integration = db.query(InstagramIntegration).filter(
+                InstagramIntegration.facebook_page_id == page_id,
+                InstagramIntegration.bot_enabled == True
+            ).first()
             
-            for entry in payload.get("entry", []):
-                page_id = entry.get("id")
-                
-                # Find integration
-                integration = db.query(InstagramIntegration).filter(
-                    InstagramIntegration.facebook_page_id == page_id,
-                    InstagramIntegration.bot_enabled == True
+            if not integration:
+                continue
+            
+            tenant_id = integration.tenant_id
+            
+            # One reply per sender, however many of their messages the burst held
+            senders = []
+            for messaging in entry.get("messaging", []):
+                sender_id = messaging.get("sender", {}).get("id")
+                # Skip if we're the sender
+                if sender_id and sender_id != page_id and sender_id not in senders:
+                    senders.append(sender_id)
+            
+            for sender_id in senders:
+                # Find conversation
+                conversation = db.query(InstagramConversation).filter(
+                    InstagramConversation.integration_id == integration.id,
+                    InstagramConversation.instagram_user_id == sender_id,
+                    InstagramConversation.is_active == True
                 ).first()
                 
-                if not integration:
+                if not conversation:
                     continue
                 
-                tenant_id = integration.tenant_id
+                # Get the latest message
+                latest_message = db.query(InstagramMessage).filter(
+                    InstagramMessage.conversation_id == conversation.id,
+                    InstagramMessage.is_from_user == True
+                ).order_by(InstagramMessage.created_at.desc()).first()
                 
-                # Process messaging events
-                for messaging in entry.get("messaging", []):
-                    sender_id = messaging.get("sender", {}).get("id")
-                    
-                    # Skip if we're the sender
-                    if sender_id == page_id:
-                        continue
-                    
-                    # Find conversation
-                    conversation = db.query(InstagramConversation).filter(
-                        InstagramConversation.integration_id == integration.id,
-                        InstagramConversation.instagram_user_id == sender_id,
-                        InstagramConversation.is_active == True
-                    ).first()
-                    
-                    if conversation:
-                        # Get the latest message
-                        latest_message = db.query(InstagramMessage).filter(
-                            InstagramMessage.conversation_id == conversation.id,
-                            InstagramMessage.is_from_user == True
-                        ).order_by(InstagramMessage.created_at.desc()).first()
-                        
-                        if latest_message:
-                            await bot_manager.process_incoming_message(
-                                tenant_id, conversation, latest_message
-                            )
-        else:
-            logger.error(f"❌ Instagram webhook processing failed: {message}")
-            
-    except Exception as e:
-        logger.error(f"💥 Error in background webhook processing: {str(e)}")
+                if latest_message:
+                    replied = await bot_manager.process_incoming_message(
+                        tenant_id, conversation, latest_message
+                    ) and replied
+        
+        return replied
     finally:
-        if db:
-            db.close()
+        db.close()
 
 # Conversation Management
 @router.get("/conversations", response_model=List[InstagramConversationResponse])
@@ -1,7 +1,7 @@
 # app/instagram/service.py
 
 import logging
-import requests
+import httpx
 import json
 import uuid
 import hashlib
@@ -18,6 +18,7 @@ from app.instagram.models import (
     InstagramWebhookEvent
 )
 from app.config import settings
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,7 @@ class InstagramAPIService:
         self.db = db
         self.api_version = "v18.0"
         self.base_url = f"https://graph.facebook.com/{self.api_version}"
+        self.http = get_http_client()
         
     def _get_headers(self) -> Dict[str, str]:
         """Get API request headers"""
@@ -42,9 +44,8 @@ class InstagramAPIService:
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            response = requests.request(
-                method=method,
-                url=url,
+            response = self.http.request_sync(
+                "instagram", method, url,
                 headers=self._get_headers(),
                 json=data,
                 params=params,
@@ -60,7 +61,7 @@ class InstagramAPIService:
                 logger.error(f"Instagram API error: {error_msg}")
                 return False, response_data
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Instagram API request failed: {str(e)}")
             return False, {"error": {"message": str(e)}}
     
@@ -208,7 +209,8 @@ class InstagramAPIService:
                 "fb_exchange_token": self.integration.page_access_token
             }
             
-            response = requests.get(
+            response = self.http.request_sync(
+                "instagram", "GET",
                 f"{self.base_url}/oauth/access_token",
                 params=params,
                 timeout=30
@@ -393,6 +395,15 @@ class InstagramWebhookProcessor:
         message_id = message_data.get("mid")
         text_content = message_data.get("text")
         
+        # Redelivered or retried webhook: the message is already stored
+        if message_id:
+            existing = self.db.query(InstagramMessage).filter(
+                InstagramMessage.conversation_id == conversation.id,
+                InstagramMessage.instagram_message_id == message_id
+            ).first()
+            if existing:
+                return existing
+        
         # Determine message type
         message_type = "text"
         media_url = None
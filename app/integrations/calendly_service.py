@@ -1,6 +1,6 @@
 # Replace your app/integrations/calendly_service.py with this fixed version
 
-import requests
+import httpx
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from app.tenants.models import Tenant
 import re
 from urllib.parse import urlencode
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -21,24 +22,27 @@ class CalendlyService:
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        self.http = get_http_client()
     
     def get_user_info(self) -> Dict[str, Any]:
         """Get current user information from Calendly"""
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "calendly", "GET",
                 f"{self.base_url}/users/me",
                 headers=self.headers
             )
             response.raise_for_status()
             return response.json()
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching user info: {e}")
             return {}
     
     def get_event_types(self, user_uri: str) -> List[Dict[str, Any]]:
         """Get available event types for a user"""
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "calendly", "GET",
                 f"{self.base_url}/event_types",
                 headers=self.headers,
                 params={"user": user_uri}
@@ -46,14 +50,15 @@ class CalendlyService:
             response.raise_for_status()
             data = response.json()
             return data.get("collection", [])
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching event types: {e}")
             return []
     
     def get_scheduled_events(self, user_uri: str, count: int = 20) -> List[Dict[str, Any]]:
         """Get scheduled events for a user"""
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "calendly", "GET",
                 f"{self.base_url}/scheduled_events",
                 headers=self.headers,
                 params={
@@ -65,7 +70,7 @@ class CalendlyService:
             response.raise_for_status()
             data = response.json()
             return data.get("collection", [])
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching scheduled events: {e}")
             return []
 
@@ -0,0 +1,283 @@
+import os
+import io
+import asyncio
+import hashlib
+import logging
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain.schema import Document
+from app.knowledge_base.models import DocumentType
+from app.knowledge_base.loaders import (
+    get_document_loader,
+    split_documents_into_chunks,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_OVERLAP
+)
+
+
+logger = logging.getLogger(__name__)
+
+BULK_DOCUMENT_TYPES = {
+    DocumentType.PDF, DocumentType.DOC, DocumentType.DOCX,
+    DocumentType.TXT, DocumentType.CSV, DocumentType.XLSX
+}
+ARCHIVE_EXTENSIONS = {"zip"}
+MAX_BULK_FILES = 200
+MAX_ARCHIVE_UNCOMPRESSED_BYTES = 500 * 1024 * 1024  # 500MB
+
+INDEX_MODE_PER_FILE = "per_file"
+INDEX_MODE_COMBINED = "combined"
+
+
+# ----- Worker process side -----
+
+def parse_and_chunk_file(local_path: str, doc_type_value: str, source_name: str,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         chunk_overlap: int = DEFAULT_CHUNK_OVERLAP) -> Dict[str, Any]:
+    """
+    Load and split one file. Runs inside a pool worker, so it only takes and
+    returns plain picklable values (text + metadata tuples, not Documents).
+    """
+    try:
+        loader = get_document_loader(local_path, DocumentType(doc_type_value))
+        documents = loader.load()
+        if not documents:
+            return {"source": source_name, "chunks": [], "error": "No content extracted from document"}
+
+        splits = split_documents_into_chunks(documents, chunk_size, chunk_overlap)
+        chunks = []
+        for split in splits:
+            metadata = dict(split.metadata or {})
+            # Temp paths are meaningless once the worker is done
+            metadata["source"] = source_name
+            chunks.append((split.page_content, metadata))
+
+        return {"source": source_name, "chunks": chunks, "error": None}
+    except Exception as e:
+        return {"source": source_name, "chunks": [], "error": str(e)}
+
+
+def chunk_content_hash(text: str) -> str:
+    """Hash chunk text with whitespace normalized so re-exported copies still collide"""
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# ----- Shared process pool -----
+
+_ingestion_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_ingestion_pool() -> ProcessPoolExecutor:
+    """Process-wide pool for CPU-bound parsing, sized by BULK_INGESTION_WORKERS or CPU count"""
+    global _ingestion_pool
+    if _ingestion_pool is None:
+        max_workers = int(os.getenv("BULK_INGESTION_WORKERS", "0")) or (os.cpu_count() or 2)
+        _ingestion_pool = ProcessPoolExecutor(max_workers=max_workers)
+        logger.info(f"📦 Bulk ingestion pool started with {max_workers} workers")
+    return _ingestion_pool
+
+
+def shutdown_ingestion_pool():
+    """Stop the ingestion pool (called on application shutdown)"""
+    global _ingestion_pool
+    if _ingestion_pool is not None:
+        _ingestion_pool.shutdown(wait=False, cancel_futures=True)
+        _ingestion_pool = None
+        logger.info("📦 Bulk ingestion pool stopped")
+
+
+# ----- Request side -----
+
+@dataclass
+class BulkSourceFile:
+    filename: str
+    doc_type: DocumentType
+    content: bytes
+    cloud_path: Optional[str] = None
+
+
+@dataclass
+class BulkChunkResult:
+    """Deduplicated chunks grouped by source file, plus batch statistics"""
+    chunks_by_source: Dict[str, List[Document]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    total_chunks: int = 0
+    duplicate_chunks: int = 0
+
+    @property
+    def unique_chunks(self) -> int:
+        return self.total_chunks - self.duplicate_chunks
+
+    def all_chunks(self) -> List[Document]:
+        return [doc for docs in self.chunks_by_source.values() for doc in docs]
+
+
+class BulkIngestionService:
+    """Parses and chunks many uploaded files in parallel and dedups chunks across the batch"""
+
+    def __init__(self, tenant_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 chunk_overlap: int = DEFAULT_CHUNK_OVERLAP):
+        self.tenant_id = tenant_id
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def expand_uploads(self, uploads: List[Tuple[str, bytes]]) -> Tuple[List[BulkSourceFile], Dict[str, str]]:
+        """Unpack archives and resolve document types; returns (files, rejected filename -> reason)"""
+        files: List[BulkSourceFile] = []
+        rejected: Dict[str, str] = {}
+
+        for filename, content in uploads:
+            extension = self._get_extension(filename)
+            if extension in ARCHIVE_EXTENSIONS:
+                archive_files, archive_rejected = self._expand_archive(filename, content)
+                files.extend(archive_files)
+                rejected.update(archive_rejected)
+                continue
+
+            doc_type = self._resolve_doc_type(extension)
+            if doc_type is None:
+                rejected[filename] = f"Unsupported file type: {extension}"
+                continue
+            files.append(BulkSourceFile(filename=filename, doc_type=doc_type, content=content))
+
+        # Same name from two archives would collide as a dedup/source key; the new
+        # name must not be one an upload already uses (a.pdf, a.pdf, a_1.pdf)
+        taken = {source_file.filename for source_file in files}
+        seen_names = set()
+        for source_file in files:
+            if source_file.filename in seen_names:
+                stem, ext = os.path.splitext(source_file.filename)
+                count = 1
+                while f"{stem}_{count}{ext}" in taken:
+                    count += 1
+                source_file.filename = f"{stem}_{count}{ext}"
+                taken.add(source_file.filename)
+            seen_names.add(source_file.filename)
+
+        if len(files) > MAX_BULK_FILES:
+            raise ValueError(f"Too many files in one bulk upload ({len(files)} > {MAX_BULK_FILES})")
+
+        return files, rejected
+
+    def _expand_archive(self, archive_name: str, content: bytes) -> Tuple[List[BulkSourceFile], Dict[str, str]]:
+        files: List[BulkSourceFile] = []
+        rejected: Dict[str, str] = {}
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                members = [m for m in archive.infolist() if not m.is_dir()]
+                uncompressed = sum(m.file_size for m in members)
+                if uncompressed > MAX_ARCHIVE_UNCOMPRESSED_BYTES:
+                    rejected[archive_name] = "Archive too large when uncompressed"
+                    return files, rejected
+
+                for member in members:
+                    member_name = os.path.basename(member.filename)
+                    # Skip OS metadata such as __MACOSX/._foo.pdf
+                    if not member_name or member_name.startswith(".") or "__MACOSX" in member.filename:
+                        continue
+
+                    doc_type = self._resolve_doc_type(self._get_extension(member_name))
+                    if doc_type is None:
+                        rejected[f"{archive_name}/{member.filename}"] = "Unsupported file type"
+                        continue
+
+                    files.append(BulkSourceFile(
+                        filename=member_name,
+                        doc_type=doc_type,
+                        content=archive.read(member)
+                    ))
+        except zipfile.BadZipFile:
+            rejected[archive_name] = "Invalid zip archive"
+
+        return files, rejected
+
+    async def chunk_files(self, files: List[BulkSourceFile], across_files: bool = True) -> BulkChunkResult:
+        """Fan parsing/chunking out to the process pool, then dedup chunks by content hash"""
+        temp_dir = tempfile.mkdtemp(prefix=f"bulk_{self.tenant_id}_")
+        try:
+            loop = asyncio.get_running_loop()
+            pool = get_ingestion_pool()
+            futures = []
+
+            for index, source_file in enumerate(files):
+                # Index prefix keeps identical basenames apart on disk
+                local_path = os.path.join(temp_dir, f"{index}_{source_file.filename}")
+                with open(local_path, "wb") as f:
+                    f.write(source_file.content)
+
+                futures.append(loop.run_in_executor(
+                    pool,
+                    parse_and_chunk_file,
+                    local_path,
+                    source_file.doc_type.value,
+                    source_file.filename,
+                    self.chunk_size,
+                    self.chunk_overlap
+                ))
+
+            worker_results = await asyncio.gather(*futures)
+            return self.deduplicate_chunks(worker_results, across_files)
+
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def deduplicate_chunks(self, worker_results: List[Dict[str, Any]], across_files: bool = True) -> BulkChunkResult:
+        """
+        Keep the first occurrence of each chunk across the whole batch (in upload order),
+        or only within each file when across_files is False: per-file knowledge bases must
+        each keep their own copy, or deleting one would take shared content from another
+        """
+        result = BulkChunkResult()
+        seen_hashes = set()
+
+        for worker_result in worker_results:
+            source = worker_result["source"]
+            if worker_result.get("error"):
+                result.errors[source] = worker_result["error"]
+                continue
+            if not across_files:
+                seen_hashes = set()
+
+            documents = []
+            for text, metadata in worker_result["chunks"]:
+                result.total_chunks += 1
+                content_hash = chunk_content_hash(text)
+                if content_hash in seen_hashes:
+                    result.duplicate_chunks += 1
+                    continue
+                seen_hashes.add(content_hash)
+                metadata["content_hash"] = content_hash
+                documents.append(Document(page_content=text, metadata=metadata))
+
+            if documents:
+                result.chunks_by_source[source] = documents
+            elif worker_result["chunks"]:
+                result.errors[source] = "All chunks duplicated content from other files in this batch"
+            else:
+                result.errors[source] = "No content extracted from document"
+
+        logger.info(
+            f"📦 Bulk chunking for tenant {self.tenant_id}: {result.total_chunks} chunks, "
+            f"{result.duplicate_chunks} duplicates removed, {len(result.errors)} files failed"
+        )
+        return result
+
+    @staticmethod
+    def _get_extension(filename: str) -> str:
+        return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+    @staticmethod
+    def _resolve_doc_type(extension: str) -> Optional[DocumentType]:
+        try:
+            doc_type = DocumentType(extension)
+        except ValueError:
+            return None
+        return doc_type if doc_type in BULK_DOCUMENT_TYPES else None
@@ -0,0 +1,163 @@
+import math
+import time
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import faiss
+import numpy as np
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_FLAT = "flat"
+INDEX_HNSW = "hnsw"
+INDEX_IVFPQ = "ivfpq"
+INDEX_TYPES = [INDEX_FLAT, INDEX_HNSW, INDEX_IVFPQ]
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+PQ_NBITS = 8
+PQ_MIN_TRAIN_POINTS = 256 * 4  # 2**PQ_NBITS centroids need a few points each
+MAX_TRAIN_POINTS = 100_000
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Pick the index type from settings, falling back to flat when a KB is too small to train"""
+    configured = (settings.VECTOR_INDEX_TYPE or "auto").lower()
+    if configured != "auto":
+        if configured == INDEX_IVFPQ and num_vectors < PQ_MIN_TRAIN_POINTS:
+            return INDEX_FLAT
+        return configured
+
+    if num_vectors <= settings.VECTOR_INDEX_FLAT_MAX_CHUNKS:
+        return INDEX_FLAT
+    if num_vectors <= settings.VECTOR_INDEX_HNSW_MAX_CHUNKS:
+        return INDEX_HNSW
+    return INDEX_IVFPQ
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Largest divisor of the dimension giving >= 8 dims per sub-quantizer (1536 -> 192)"""
+    for m in range(min(dimension // 8, 256), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def build_index(vectors: np.ndarray, index_type: Optional[str] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build a FAISS index over vectors (float32, shape [n, d]), training quantized
+    indexes on the KB's own vectors. Returns (index, info for the store header).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimension = vectors.shape
+    index_type = index_type or choose_index_type(num_vectors)
+    info: Dict[str, Any] = {"index_type": index_type, "dimension": dimension}
+    started = time.perf_counter()
+
+    if index_type == INDEX_FLAT:
+        index = faiss.IndexFlatL2(dimension)
+
+    elif index_type == INDEX_HNSW:
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        info.update({"m": HNSW_M, "ef_search": HNSW_EF_SEARCH})
+
+    elif index_type == INDEX_IVFPQ:
+        nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+        m = _pq_subquantizers(dimension)
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, PQ_NBITS)
+
+        if num_vectors > MAX_TRAIN_POINTS:
+            sample = np.random.default_rng(0).choice(num_vectors, MAX_TRAIN_POINTS, replace=False)
+            training_vectors = vectors[sample]
+        else:
+            training_vectors = vectors
+        index.train(training_vectors)
+
+        nprobe = max(1, nlist // 16)
+        index.nprobe = nprobe
+        info.update({"nlist": nlist, "pq_m": m, "nprobe": nprobe})
+
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    index.add(vectors)
+    info["build_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Built {index_type} index over {num_vectors} vectors in {info['build_seconds']}s")
+    return index, info
+
+
+def apply_search_params(index, info: Dict[str, Any]):
+    """Restore runtime search parameters recorded in the store header"""
+    index_type = info.get("index_type", INDEX_FLAT)
+    if index_type == INDEX_IVFPQ and info.get("nprobe"):
+        faiss.extract_index_ivf(index).nprobe = info["nprobe"]
+    elif index_type == INDEX_HNSW and info.get("ef_search"):
+        index.hnsw.efSearch = info["ef_search"]
+
+
+# ----- Recall vs latency benchmark -----
+
+def benchmark_index_types(vectors: np.ndarray,
+                          index_types: Optional[List[str]] = None,
+                          k: int = 4,
+                          num_queries: int = 200,
+                          seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Hold out num_queries of the KB's own vectors as queries, index the rest with
+    each index type and report recall@k against exact search plus per-query latency.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors = vectors.shape[0]
+    num_queries = min(num_queries, max(1, num_vectors // 10))
+
+    order = np.random.default_rng(seed).permutation(num_vectors)
+    queries = vectors[order[:num_queries]]
+    base = vectors[order[num_queries:]]
+    k = min(k, base.shape[0])
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types or INDEX_TYPES:
+        if index_type == INDEX_IVFPQ and base.shape[0] < PQ_MIN_TRAIN_POINTS:
+            results.append({"index_type": index_type, "skipped": f"needs >= {PQ_MIN_TRAIN_POINTS} vectors"})
+            continue
+
+        index, info = build_index(base, index_type)
+        latencies = []
+        hits = 0
+        for query, truth in zip(queries, ground_truth):
+            started = time.perf_counter()
+            _, found = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(set(found[0].tolist()) & set(truth.tolist()))
+
+        latencies.sort()
+        results.append({
+            "index_type": index_type,
+            "vectors": int(base.shape[0]),
+            "queries": num_queries,
+            "k": k,
+            "recall_at_k": round(hits / (num_queries * k), 4),
+            "p50_ms": round(latencies[len(latencies) // 2], 3),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+            "build_seconds": info["build_seconds"],
+            "params": {key: value for key, value in info.items() if key not in ("index_type", "build_seconds")},
+        })
+
+    return results
+
+
+def reconstruct_vectors(index) -> np.ndarray:
+    """Recover stored vectors from a flat or HNSW-flat index (used to benchmark existing KBs)"""
+    if isinstance(index, faiss.IndexIVF):
+        raise ValueError("Quantized indexes cannot reproduce their input vectors; benchmark from the source KB")
+    return index.reconstruct_n(0, index.ntotal)
@@ -0,0 +1,69 @@
+import logging
+from typing import List
+
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    TextLoader,
+    Docx2txtLoader,
+    CSVLoader,
+    UnstructuredExcelLoader
+)
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.knowledge_base.models import DocumentType
+
+
+logger = logging.getLogger(__name__)
+
+# Kept free of storage/LLM imports so ingestion worker processes stay cheap to start
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+class PandasExcelLoader:
+    """Fallback Excel loader used when UnstructuredExcelLoader is unavailable"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        import pandas as pd
+        df = pd.read_excel(self.file_path)
+        text = df.to_string()
+        metadata = {"source": self.file_path}
+        return [Document(page_content=text, metadata=metadata)]
+
+
+def get_document_loader(file_path: str, doc_type: DocumentType):
+    """Get the appropriate document loader based on file type"""
+    logger.info(f"Loading document: {file_path} (type: {doc_type.value})")
+
+    if doc_type == DocumentType.PDF:
+        return PyPDFLoader(file_path)
+    elif doc_type == DocumentType.TXT:
+        return TextLoader(file_path)
+    elif doc_type in [DocumentType.DOC, DocumentType.DOCX]:
+        return Docx2txtLoader(file_path)
+    elif doc_type == DocumentType.CSV:
+        return CSVLoader(file_path)
+    elif doc_type == DocumentType.XLSX:
+        try:
+            return UnstructuredExcelLoader(file_path)
+        except Exception as e:
+            logger.error(f"Error loading Excel with UnstructuredExcelLoader: {str(e)}")
+            logger.info(f"Using PandasExcelLoader as fallback")
+            return PandasExcelLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported document type: {doc_type}")
+
+
+def split_documents_into_chunks(documents: List[Document],
+                                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                chunk_overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Document]:
+    """Split loaded documents into overlapping chunks ready for embedding"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    return text_splitter.split_documents(documents)
@@ -1,5 +1,6 @@
 import os
 import uuid
+import numpy as np
 import pandas as pd
 import logging
 import tempfile
@@ -7,19 +8,22 @@ import shutil
 import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    TextLoader,
-    Docx2txtLoader,
-    CSVLoader,
-    UnstructuredExcelLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from app.config import settings
 from app.knowledge_base.models import DocumentType
 from app.knowledge_base.js_crawler import JSWebsiteCrawler
+from app.knowledge_base.loaders import get_document_loader, split_documents_into_chunks
+from app.knowledge_base.vector_store_format import (
+    COMPACT_FILES,
+    LEGACY_DOCSTORE_FILE,
+    convert_legacy_store,
+    is_compact_store,
+    load_compact_vector_store,
+    write_compact_store
+)
+from app.knowledge_base.index_builder import build_index
 from app.services.storage import storage_service
 
 
@@ -66,7 +70,6 @@ class DocumentProcessor:
         
         # Download source file to temp location
         temp_file_path = None
-        temp_vector_dir = None
         
         try:
             # Download source file
@@ -89,37 +92,15 @@ class DocumentProcessor:
                 logger.info(f"First document content preview: {content_preview}...")
             
             # Split into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-            )
-            splits = text_splitter.split_documents(documents)
+            splits = split_documents_into_chunks(documents)
             
             if not splits:
                 raise ValueError("No text chunks created from document")
             
             logger.info(f"Split into {len(splits)} chunks")
             
-            # Create vector store in temp directory
-            temp_vector_dir = tempfile.mkdtemp()
-            logger.info(f"Creating vector store in temp dir: {temp_vector_dir}")
-            
-            # Create and save vector store locally first
-            vector_store = FAISS.from_documents(documents=splits, embedding=self.embeddings)
-            vector_store.save_local(temp_vector_dir)
-            logger.info(f"Vector store saved to temp directory")
-            
-            # Verify local creation
-            required_files = ["index.faiss", "index.pkl"]
-            for file in required_files:
-                file_path = os.path.join(temp_vector_dir, file)
-                if not os.path.exists(file_path):
-                    raise ValueError(f"Required vector store file not created: {file}")
-            
-            # Upload vector store files to cloud
-            self.storage.upload_vector_store_files(self.tenant_id, vector_store_id, temp_vector_dir)
-            logger.info(f"Vector store uploaded to cloud successfully")
+            # Build vector store and upload it to cloud
+            self.build_vector_store_from_chunks(splits, vector_store_id)
             
             return vector_store_id
             
@@ -140,13 +121,6 @@ class DocumentProcessor:
                     logger.info(f"Cleaned up temp source file: {temp_file_path}")
                 except:
                     pass
-                    
-            if temp_vector_dir and os.path.exists(temp_vector_dir):
-                try:
-                    shutil.rmtree(temp_vector_dir)
-                    logger.info(f"Cleaned up temp vector dir: {temp_vector_dir}")
-                except:
-                    pass
 
     async def process_website(self, 
                             base_url: str, 
@@ -157,8 +131,6 @@ class DocumentProcessor:
         """Process website content and store in vector store"""
         logger.info(f"Processing website: {base_url} -> {vector_store_id}")
         
-        temp_vector_dir = None
-        
         try:
             # Initialize JS-enabled crawler
             crawler = JSWebsiteCrawler(
@@ -187,37 +159,15 @@ class DocumentProcessor:
             logger.info(f"Created {len(documents)} documents from {len(crawl_results)} crawled pages")
             
             # Split into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-            )
-            splits = text_splitter.split_documents(documents)
+            splits = split_documents_into_chunks(documents)
             
             if not splits:
                 raise ValueError("No text chunks created from website content")
             
             logger.info(f"Split into {len(splits)} chunks")
             
-            # Create vector store in temp directory
-            temp_vector_dir = tempfile.mkdtemp()
-            logger.info(f"Creating vector store in temp dir: {temp_vector_dir}")
-            
-            # Create and save vector store locally first
-            vector_store = FAISS.from_documents(documents=splits, embedding=self.embeddings)
-            vector_store.save_local(temp_vector_dir)
-            logger.info(f"Vector store saved to temp directory")
-            
-            # Verify local creation
-            required_files = ["index.faiss", "index.pkl"]
-            for file in required_files:
-                file_path = os.path.join(temp_vector_dir, file)
-                if not os.path.exists(file_path):
-                    raise ValueError(f"Required vector store file not created: {file}")
-            
-            # Upload vector store files to cloud
-            self.storage.upload_vector_store_files(self.tenant_id, vector_store_id, temp_vector_dir)
-            logger.info(f"Vector store uploaded to cloud successfully")
+            # Build vector store and upload it to cloud
+            self.build_vector_store_from_chunks(splits, vector_store_id)
             
             # Store crawl metadata in cloud
             metadata = {
@@ -253,9 +203,39 @@ class DocumentProcessor:
             except:
                 pass  # Ignore cleanup errors
             raise
+    
+    def build_vector_store_from_chunks(self, splits: List[Document], vector_store_id: str) -> str:
+        """Embed pre-split chunks, save the FAISS index and upload it to cloud storage"""
+        if not splits:
+            raise ValueError("No text chunks to index")
+        
+        temp_vector_dir = None
+        try:
+            # Create vector store in temp directory
+            temp_vector_dir = tempfile.mkdtemp()
+            logger.info(f"Creating vector store in temp dir: {temp_vector_dir}")
+            
+            # Embed, then build an index sized for the KB (flat / HNSW / IVF-PQ)
+            vectors = np.array(
+                self.embeddings.embed_documents([split.page_content for split in splits]),
+                dtype=np.float32
+            )
+            index, index_info = build_index(vectors)
+            write_compact_store(index, splits, temp_vector_dir, index_info)
+            logger.info(f"Vector store saved to temp directory ({index_info['index_type']} index)")
+            
+            # Verify local creation
+            for file in COMPACT_FILES:
+                file_path = os.path.join(temp_vector_dir, file)
+                if not os.path.exists(file_path):
+                    raise ValueError(f"Required vector store file not created: {file}")
+            
+            # Upload vector store files to cloud
+            self.storage.upload_vector_store_files(self.tenant_id, vector_store_id, temp_vector_dir)
+            logger.info(f"Vector store uploaded to cloud successfully")
+            return vector_store_id
             
         finally:
-            # Clean up temp files
             if temp_vector_dir and os.path.exists(temp_vector_dir):
                 try:
                     shutil.rmtree(temp_vector_dir)
@@ -265,38 +245,7 @@ class DocumentProcessor:
     
     def _get_loader(self, file_path: str, doc_type: DocumentType):
         """Get the appropriate document loader based on file type"""
-        logger.info(f"Loading document: {file_path} (type: {doc_type.value})")
-        
-        if doc_type == DocumentType.PDF:
-            return PyPDFLoader(file_path)
-        elif doc_type == DocumentType.TXT:
-            return TextLoader(file_path)
-        elif doc_type in [DocumentType.DOC, DocumentType.DOCX]:
-            return Docx2txtLoader(file_path)
-        elif doc_type == DocumentType.CSV:
-            return CSVLoader(file_path)
-        elif doc_type == DocumentType.XLSX:
-            try:
-                return UnstructuredExcelLoader(file_path)
-            except Exception as e:
-                logger.error(f"Error loading Excel with UnstructuredExcelLoader: {str(e)}")
-                # Alternative loading using pandas
-                class PandasExcelLoader:
-                    def __init__(self, file_path):
-                        self.file_path = file_path
-                    
-                    def load(self):
-                        from langchain.schema import Document
-                        import pandas as pd
-                        df = pd.read_excel(self.file_path)
-                        text = df.to_string()
-                        metadata = {"source": self.file_path}
-                        return [Document(page_content=text, metadata=metadata)]
-                
-                logger.info(f"Using PandasExcelLoader as fallback")
-                return PandasExcelLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported document type: {doc_type}")
+        return get_document_loader(file_path, doc_type)
     
     def get_vector_store(self, vector_store_id: str):
         """Load a vector store from cloud storage"""
@@ -307,12 +256,16 @@ class DocumentProcessor:
             # Download vector store files to temp directory
             temp_dir = self.storage.download_vector_store_files(self.tenant_id, vector_store_id)
             
-            # Load FAISS from temp directory
-            vector_store = FAISS.load_local(
-                temp_dir, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
+            # Compact stores map their chunk blobs, so removing temp_dir below is safe
+            if is_compact_store(temp_dir):
+                vector_store = load_compact_vector_store(temp_dir, self.embeddings)
+            else:
+                # Stores written before the compact format; see convert_vector_store
+                vector_store = FAISS.load_local(
+                    temp_dir, 
+                    self.embeddings, 
+                    allow_dangerous_deserialization=True
+                )
             logger.info(f"Vector store loaded successfully from cloud")
             return vector_store
             
@@ -329,6 +282,27 @@ class DocumentProcessor:
                 except:
                     pass
     
+    def convert_vector_store(self, vector_store_id: str) -> bool:
+        """Rewrite a legacy pickled vector store in the compact format; False if already compact"""
+        temp_dir = None
+        try:
+            temp_dir = self.storage.download_vector_store_files(self.tenant_id, vector_store_id)
+            if not convert_legacy_store(temp_dir, self.embeddings):
+                return False
+            
+            # Upload over the legacy copy and check it before anything is removed. The
+            # rewritten index.faiss holds the same index, so the legacy index.pkl keeps
+            # loading until the manifest (written last) switches readers to the compact files
+            self.storage.upload_vector_store_files(self.tenant_id, vector_store_id, temp_dir, upsert=True)
+            self.storage.verify_vector_store_files(self.tenant_id, vector_store_id, temp_dir)
+            self.storage.delete_vector_store_file(self.tenant_id, vector_store_id, LEGACY_DOCSTORE_FILE)
+            logger.info(f"Converted vector store {vector_store_id} to compact format")
+            return True
+            
+        finally:
+            if temp_dir and os.path.exists(temp_dir):
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    
     def delete_vector_store(self, vector_store_id: str):
         """Delete a vector store from cloud storage"""
         try:
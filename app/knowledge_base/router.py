@@ -16,6 +16,7 @@ from sqlalchemy.exc import IntegrityError
 from app.database import get_db
 from app.knowledge_base.models import KnowledgeBase, FAQ, DocumentType, ProcessingStatus
 from app.knowledge_base.processor import DocumentProcessor
+from app.knowledge_base.bulk_ingestion import BulkIngestionService, INDEX_MODE_PER_FILE, INDEX_MODE_COMBINED
 from app.tenants.models import Tenant
 from app.auth.models import User
 from app.auth.router import get_current_user, get_admin_user
@@ -333,6 +334,136 @@ async def upload_knowledge_base(
 
 
 
+class BulkUploadOut(BaseModel):
+    index_mode: str
+    knowledge_bases: List[KnowledgeBaseOut]
+    files_received: int
+    files_indexed: int
+    total_chunks: int
+    duplicate_chunks: int
+    failed_files: dict
+
+
+@router.post("/bulk-upload", response_model=BulkUploadOut)
+async def bulk_upload_knowledge_base(
+    files: List[UploadFile] = File(...),
+    name: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    index_mode: str = Form(INDEX_MODE_PER_FILE),
+    x_api_key: str = Header(..., alias="X-API-Key"),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload many documents (or .zip archives of documents) in one request.
+    Parsing and chunking run in a process pool; identical chunks are dropped.
+    index_mode="per_file" creates one KB per document (chunks deduplicated within each file),
+    "combined" builds a single KB/index (chunks deduplicated across files).
+    """
+    tenant = get_tenant_from_api_key(x_api_key, db)
+    tenant_id = tenant.id
+    
+    if index_mode not in (INDEX_MODE_PER_FILE, INDEX_MODE_COMBINED):
+        raise HTTPException(status_code=400, detail=f"index_mode must be '{INDEX_MODE_PER_FILE}' or '{INDEX_MODE_COMBINED}'")
+    if index_mode == INDEX_MODE_COMBINED and not name:
+        raise HTTPException(status_code=400, detail="name is required for a combined knowledge base")
+    
+    logger.info(f"📦 Bulk knowledge base upload for tenant {tenant_id}: {len(files)} uploads ({index_mode})")
+    
+    ingestion = BulkIngestionService(tenant_id)
+    uploads = [(upload.filename, await upload.read()) for upload in files]
+    try:
+        source_files, failed_files = ingestion.expand_uploads(uploads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not source_files:
+        raise HTTPException(status_code=400, detail={"message": "No supported documents found", "failed_files": failed_files})
+    
+    chunk_result = await ingestion.chunk_files(source_files, across_files=index_mode == INDEX_MODE_COMBINED)
+    failed_files.update(chunk_result.errors)
+    
+    indexed_files = [f for f in source_files if f.filename in chunk_result.chunks_by_source]
+    if not indexed_files:
+        raise HTTPException(status_code=400, detail={"message": "No content extracted from uploaded documents", "failed_files": failed_files})
+    
+    # Keep source documents in cloud storage so per-file KBs can be reprocessed later
+    for source_file in indexed_files:
+        try:
+            source_file.cloud_path = await asyncio.to_thread(
+                storage_service.upload_knowledge_base_file, tenant_id, source_file.filename, source_file.content
+            )
+        except Exception as e:
+            logger.error(f"Failed to upload {source_file.filename} to cloud storage: {e}")
+            failed_files[source_file.filename] = "Failed to upload file to cloud storage"
+    indexed_files = [f for f in indexed_files if f.cloud_path]
+    
+    # (kb, chunks) pairs to embed; one index per KB
+    pending = []
+    if index_mode == INDEX_MODE_COMBINED:
+        kb = KnowledgeBase(
+            tenant_id=tenant_id,
+            name=name,
+            description=description or f"Combined from {len(indexed_files)} documents",
+            file_path=None,  # Spans many sources; re-ingest through /bulk-upload
+            document_type=indexed_files[0].doc_type,
+            vector_store_id=f"kb_{tenant_id}_{uuid.uuid4()}",
+            processing_status=ProcessingStatus.PROCESSING
+        )
+        db.add(kb)
+        chunks = [doc for f in indexed_files for doc in chunk_result.chunks_by_source[f.filename]]
+        pending.append((kb, chunks))
+    else:
+        for source_file in indexed_files:
+            kb = KnowledgeBase(
+                tenant_id=tenant_id,
+                name=f"{name} - {source_file.filename}" if name else source_file.filename,
+                description=description,
+                file_path=source_file.cloud_path,
+                document_type=source_file.doc_type,
+                vector_store_id=f"kb_{tenant_id}_{uuid.uuid4()}",
+                processing_status=ProcessingStatus.PROCESSING
+            )
+            db.add(kb)
+            pending.append((kb, chunk_result.chunks_by_source[source_file.filename]))
+    db.commit()
+    
+    processor = DocumentProcessor(tenant_id)
+    knowledge_bases = []
+    for kb, chunks in pending:
+        try:
+            await asyncio.to_thread(processor.build_vector_store_from_chunks, chunks, kb.vector_store_id)
+            kb.processing_status = ProcessingStatus.COMPLETED
+            kb.processed_at = datetime.utcnow()
+            kb.processing_error = None
+        except Exception as e:
+            kb.processing_status = ProcessingStatus.FAILED
+            kb.processing_error = str(e)
+            logger.error(f"Failed to build vector store for bulk KB {kb.name}: {e}")
+        db.commit()
+        db.refresh(kb)
+        knowledge_bases.append(kb)
+        
+        if kb.processing_status == ProcessingStatus.COMPLETED:
+            try:
+                from app.chatbot.intent_extraction_service import get_tenant_intent_extraction_service
+                extraction_service = get_tenant_intent_extraction_service(db)
+                asyncio.create_task(extraction_service.extract_intents_from_document(kb.id))
+            except Exception as e:
+                logger.warning(f"Intent extraction failed to start for bulk KB {kb.id}: {e}")
+    
+    logger.info(f"📦 Bulk upload finished for tenant {tenant_id}: {len(knowledge_bases)} KBs, {len(failed_files)} failed files")
+    
+    return BulkUploadOut(
+        index_mode=index_mode,
+        knowledge_bases=knowledge_bases,
+        files_received=len(source_files),
+        files_indexed=len(indexed_files),
+        total_chunks=chunk_result.total_chunks,
+        duplicate_chunks=chunk_result.duplicate_chunks,
+        failed_files=failed_files
+    )
+
+
 # NEW WEBSITE CRAWLING ENDPOINTS
 
 @router.post("/website", response_model=KnowledgeBaseOut)
@@ -944,6 +1075,10 @@ async def reprocess_knowledge_base(
         # Redirect to recrawl endpoint
         return await recrawl_website(kb_id, x_api_key, db)
     
+    # Combined bulk KBs span many source files
+    if not kb.file_path:
+        raise HTTPException(status_code=400, detail="Knowledge base has no single source file; re-ingest it through /bulk-upload")
+    
     # Check if source file exists in cloud storage
     try:
         if not storage_service.file_exists("knowledge-base-files", kb.file_path):
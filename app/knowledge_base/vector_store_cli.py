@@ -0,0 +1,106 @@
+"""
+CLI for converting pickled vector stores to the compact format
+
+    python -m app.knowledge_base.vector_store_cli convert --tenant-id 12
+    python -m app.knowledge_base.vector_store_cli convert --all --dry-run
+    python -m app.knowledge_base.vector_store_cli benchmark --tenant-id 12 --vector-store-id kb_12_...
+"""
+
+import os
+import json
+import shutil
+import click
+import logging
+from typing import Optional
+
+from app.database import SessionLocal
+from app.knowledge_base.models import KnowledgeBase, ProcessingStatus
+from app.knowledge_base.processor import DocumentProcessor
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@click.group()
+def vector_store_cli():
+    """Vector store maintenance commands"""
+    pass
+
+
+@vector_store_cli.command()
+@click.option('--tenant-id', type=int, help='Only convert this tenant')
+@click.option('--all', 'all_tenants', is_flag=True, help='Convert every tenant')
+@click.option('--dry-run', is_flag=True, help='List the stores that would be converted')
+def convert(tenant_id: Optional[int], all_tenants: bool, dry_run: bool):
+    """Rewrite legacy index.pkl vector stores in the compact format"""
+    if not tenant_id and not all_tenants:
+        click.echo("❌ Pass --tenant-id or --all")
+        return
+
+    db = SessionLocal()
+    try:
+        query = db.query(KnowledgeBase).filter(
+            KnowledgeBase.processing_status == ProcessingStatus.COMPLETED
+        )
+        if tenant_id:
+            query = query.filter(KnowledgeBase.tenant_id == tenant_id)
+        knowledge_bases = query.order_by(KnowledgeBase.tenant_id, KnowledgeBase.id).all()
+
+        click.echo(f"🔍 Found {len(knowledge_bases)} processed knowledge bases")
+        if dry_run:
+            for kb in knowledge_bases:
+                click.echo(f"   tenant {kb.tenant_id}: {kb.name} ({kb.vector_store_id})")
+            return
+
+        converted = skipped = failed = 0
+        processors = {}
+        for kb in knowledge_bases:
+            processor = processors.setdefault(kb.tenant_id, DocumentProcessor(kb.tenant_id))
+            try:
+                if processor.convert_vector_store(kb.vector_store_id):
+                    converted += 1
+                    click.echo(f"✅ Converted {kb.vector_store_id}")
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                click.echo(f"❌ Failed {kb.vector_store_id}: {e}")
+
+        click.echo(f"🎉 Converted {converted}, already compact {skipped}, failed {failed}")
+    finally:
+        db.close()
+
+
+@vector_store_cli.command()
+@click.option('--tenant-id', type=int, required=True, help='Tenant owning the vector store')
+@click.option('--vector-store-id', type=str, required=True, help='Vector store to benchmark')
+@click.option('--k', type=int, default=4, help='Neighbours per query (matches retriever k)')
+@click.option('--queries', 'num_queries', type=int, default=200, help='Held-out query vectors')
+def benchmark(tenant_id: int, vector_store_id: str, k: int, num_queries: int):
+    """Compare recall@k and search latency of flat, HNSW and IVF-PQ on a KB's own vectors"""
+    import faiss
+    from app.services.storage import storage_service
+    from app.knowledge_base.index_builder import benchmark_index_types, reconstruct_vectors
+    
+    temp_dir = storage_service.download_vector_store_files(tenant_id, vector_store_id)
+    try:
+        index = faiss.read_index(os.path.join(temp_dir, "index.faiss"))
+        vectors = reconstruct_vectors(index)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    click.echo(f"📊 Benchmarking {vectors.shape[0]} vectors (dim {vectors.shape[1]}), k={k}")
+    for result in benchmark_index_types(vectors, k=k, num_queries=num_queries):
+        if result.get("skipped"):
+            click.echo(f"   {result['index_type']:>6}: skipped ({result['skipped']})")
+            continue
+        click.echo(
+            f"   {result['index_type']:>6}: recall@{result['k']}={result['recall_at_k']:.3f} "
+            f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+            f"build={result['build_seconds']:.1f}s {json.dumps(result['params'])}"
+        )
+
+
+if __name__ == '__main__':
+    vector_store_cli()
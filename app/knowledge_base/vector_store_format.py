@@ -0,0 +1,234 @@
+"""
+Compact on-disk vector store format.
+
+    index.faiss   raw FAISS index (faiss.write_index)
+    text.zst      chunk texts, zstd-compressed in frames of FRAME_SIZE chunks
+    meta.zst      chunk metadata as JSON, framed the same way
+    frames.npy    uint64 [n_frames, 4]: text offset/length, meta offset/length of each frame
+    chunks.npy    uint64 [n_chunks, 4]: text start/length, meta start/length inside its frame
+    store.json    format header
+
+Nothing is pickled. Loading maps the blobs and tables into memory and only
+decompresses the frames that hold search hits, so large knowledge bases load
+in roughly the time it takes to read the FAISS index.
+"""
+import os
+import json
+import mmap
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+import faiss
+import numpy as np
+import zstandard
+from langchain.docstore.base import Docstore
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from app.knowledge_base.index_builder import apply_search_params
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "lyra-compact-v1"
+FRAME_SIZE = 64  # chunks per zstd frame
+ZSTD_LEVEL = 9
+FRAME_CACHE_SIZE = 32  # decompressed frames kept per store
+
+INDEX_FILE = "index.faiss"
+TEXT_BLOB_FILE = "text.zst"
+META_BLOB_FILE = "meta.zst"
+FRAMES_TABLE_FILE = "frames.npy"
+CHUNKS_TABLE_FILE = "chunks.npy"
+HEADER_FILE = "store.json"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+COMPACT_FILES = [INDEX_FILE, TEXT_BLOB_FILE, META_BLOB_FILE, FRAMES_TABLE_FILE, CHUNKS_TABLE_FILE, HEADER_FILE]
+
+
+def is_compact_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, HEADER_FILE))
+
+
+def _write_framed_blob(records: List[bytes], path: str):
+    """Write records as zstd frames of FRAME_SIZE; returns (frame table, per-record table)"""
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    frames = []
+    chunks = []
+
+    with open(path, 'wb') as f:
+        offset = 0
+        for frame_start in range(0, len(records), FRAME_SIZE):
+            frame_records = records[frame_start:frame_start + FRAME_SIZE]
+            inner_offset = 0
+            for record in frame_records:
+                chunks.append((inner_offset, len(record)))
+                inner_offset += len(record)
+
+            compressed = compressor.compress(b"".join(frame_records))
+            f.write(compressed)
+            frames.append((offset, len(compressed)))
+            offset += len(compressed)
+
+    return frames, chunks
+
+
+def write_compact_store(index, documents: List[Document], directory: str,
+                        index_info: Optional[Dict] = None):
+    """Save a FAISS index and its documents (in index order) in the compact format"""
+    if index.ntotal != len(documents):
+        raise ValueError(f"Index has {index.ntotal} vectors but {len(documents)} documents were given")
+
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+
+    text_records = [doc.page_content.encode("utf-8") for doc in documents]
+    meta_records = [json.dumps(doc.metadata or {}, default=str).encode("utf-8") for doc in documents]
+
+    text_frames, text_chunks = _write_framed_blob(text_records, os.path.join(directory, TEXT_BLOB_FILE))
+    meta_frames, meta_chunks = _write_framed_blob(meta_records, os.path.join(directory, META_BLOB_FILE))
+
+    frames_table = np.array(
+        [t + m for t, m in zip(text_frames, meta_frames)], dtype=np.uint64
+    ).reshape(-1, 4)
+    chunks_table = np.array(
+        [t + m for t, m in zip(text_chunks, meta_chunks)], dtype=np.uint64
+    ).reshape(-1, 4)
+    np.save(os.path.join(directory, FRAMES_TABLE_FILE), frames_table)
+    np.save(os.path.join(directory, CHUNKS_TABLE_FILE), chunks_table)
+
+    header = {
+        "format": FORMAT_NAME,
+        "count": len(documents),
+        "frame_size": FRAME_SIZE,
+        "compression": "zstd",
+        "index": index_info or {"index_type": "flat"},
+    }
+    with open(os.path.join(directory, HEADER_FILE), 'w') as f:
+        json.dump(header, f)
+
+    logger.info(f"Wrote compact vector store with {len(documents)} chunks to {directory}")
+
+
+def save_compact_vector_store(vector_store: FAISS, directory: str):
+    """Save a langchain FAISS store in the compact format"""
+    documents = []
+    for position in range(vector_store.index.ntotal):
+        doc_id = vector_store.index_to_docstore_id[position]
+        doc = vector_store.docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f"Docstore is missing document {doc_id}")
+        documents.append(doc)
+    write_compact_store(vector_store.index, documents, directory)
+
+
+class _FramedBlobReader:
+    """mmap-backed reader for one framed zstd blob with a small LRU of decompressed frames"""
+
+    def __init__(self, path: str, frame_columns: np.ndarray):
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._frames = frame_columns
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def frame(self, frame_id: int) -> bytes:
+        with self._lock:
+            cached = self._cache.get(frame_id)
+            if cached is not None:
+                self._cache.move_to_end(frame_id)
+                return cached
+
+        offset, length = (int(v) for v in self._frames[frame_id])
+        data = self._decompressor.decompress(self._mmap[offset:offset + length])
+
+        with self._lock:
+            self._cache[frame_id] = data
+            if len(self._cache) > FRAME_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return data
+
+    def record(self, frame_id: int, start: int, length: int) -> bytes:
+        return self.frame(frame_id)[start:start + length]
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+class CompactDocstore(Docstore):
+    """Read-only docstore that materializes chunks on demand; ids are index positions as strings"""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            self.header = json.load(f)
+        if self.header.get("format") != FORMAT_NAME:
+            raise ValueError(f"Unsupported vector store format: {self.header.get('format')}")
+
+        self.count = self.header["count"]
+        self.frame_size = self.header["frame_size"]
+        frames = np.load(os.path.join(directory, FRAMES_TABLE_FILE), mmap_mode='r')
+        self._chunks = np.load(os.path.join(directory, CHUNKS_TABLE_FILE), mmap_mode='r')
+        self._text = _FramedBlobReader(os.path.join(directory, TEXT_BLOB_FILE), frames[:, 0:2])
+        self._meta = _FramedBlobReader(os.path.join(directory, META_BLOB_FILE), frames[:, 2:4])
+
+    def get(self, position: int) -> Document:
+        if position < 0 or position >= self.count:
+            raise KeyError(position)
+        frame_id = position // self.frame_size
+        text_start, text_len, meta_start, meta_len = (int(v) for v in self._chunks[position])
+        text = self._text.record(frame_id, text_start, text_len).decode("utf-8")
+        metadata = json.loads(self._meta.record(frame_id, meta_start, meta_len))
+        return Document(page_content=text, metadata=metadata)
+
+    def search(self, search: str) -> Union[str, Document]:
+        try:
+            return self.get(int(search))
+        except (ValueError, KeyError):
+            return f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        raise NotImplementedError("Compact vector stores are read-only; rebuild the knowledge base instead")
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("Compact vector stores are read-only; rebuild the knowledge base instead")
+
+    def close(self):
+        self._text.close()
+        self._meta.close()
+
+
+def load_compact_vector_store(directory: str, embeddings) -> FAISS:
+    """
+    Load a compact store as a regular langchain FAISS object.
+    The blobs are mapped at load time, so the directory may be removed afterwards.
+    """
+    index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+    docstore = CompactDocstore(directory)
+    apply_search_params(index, docstore.header.get("index", {}))
+    index_to_docstore_id = {position: str(position) for position in range(docstore.count)}
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+
+def convert_legacy_store(directory: str, embeddings) -> bool:
+    """
+    Rewrite a save_local() store (index.faiss + pickled index.pkl) in place.
+    Only run on stores this application wrote: loading the pickle executes it.
+    Returns False if the directory is already compact.
+    """
+    if is_compact_store(directory):
+        return False
+
+    legacy_store = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+    save_compact_vector_store(legacy_store, directory)
+    os.unlink(os.path.join(directory, LEGACY_DOCSTORE_FILE))
+    return True
@@ -146,18 +146,20 @@ class AgentAuthService:
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
             invite_url = f"{frontend_url}/agent/accept-invite/{agent.invite_token}"
             
-            # Send email via Resend
+            # Queue email for delivery via Resend; the same invite token is only ever sent once
             from app.email.resend_service import email_service
+            from app.email.outbox import make_idempotency_key
             
             result = await email_service.send_agent_invitation(
                 to_email=agent.email,
                 agent_name=agent.full_name,
                 business_name=tenant.business_name or tenant.name,
-                invite_url=invite_url
+                invite_url=invite_url,
+                idempotency_key=make_idempotency_key("agent_invitation", agent.id, agent.invite_token)
             )
             
             if result["success"]:
-                logger.info(f"✅ Invitation email sent to {agent.email}, ID: {result.get('email_id')}")
+                logger.info(f"✅ Invitation email queued for {agent.email}, outbox ID: {result.get('outbox_id')}")
                 return True
             else:
                 logger.error(f"❌ Failed to send invitation email: {result.get('error')}")
@@ -224,10 +226,12 @@ class AgentAuthService:
             tenant = self.db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
             if tenant:
                 from app.email.resend_service import email_service
+                from app.email.outbox import make_idempotency_key
                 await email_service.send_password_reset_notification(
                     to_email=agent.email,
                     agent_name=agent.full_name,
-                    business_name=tenant.business_name or tenant.name
+                    business_name=tenant.business_name or tenant.name,
+                    idempotency_key=make_idempotency_key("account_activation", agent.id, agent.password_set_at)
                 )
             
             logger.info(f"Agent password set and activated: {agent.email}")
@@ -347,10 +351,12 @@ class AgentAuthService:
             tenant = self.db.query(Tenant).filter(Tenant.id == tenant_id).first()
             if tenant:
                 from app.email.resend_service import email_service
+                from app.email.outbox import make_idempotency_key
                 await email_service.send_agent_revoked_notification(
                     to_email=agent.email,
                     agent_name=agent.full_name,
-                    business_name=tenant.business_name or tenant.name
+                    business_name=tenant.business_name or tenant.name,
+                    idempotency_key=make_idempotency_key("account_revoked", agent.id, agent.updated_at)
                 )
             
             logger.info(f"Agent revoked: {agent.email} by user {revoked_by_id}")
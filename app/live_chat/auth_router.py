@@ -1172,8 +1172,9 @@ async def resend_agent_invitation(
         if result["success"]:
             return {
                 "success": True,
-                "message": f"Invitation resent to {agent.email}",
+                "message": f"Invitation queued for {agent.email}",
                 "email_id": result.get("email_id"),
+                "outbox_id": result.get("outbox_id"),
                 "agent_id": agent_id
             }
         else:
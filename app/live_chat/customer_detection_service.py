@@ -9,13 +9,10 @@ from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc
 from fastapi import Request
-import httpx
 import asyncio
 from user_agents import parse as parse_user_agent
-import geoip2.database
-import geoip2.errors
-from pathlib import Path
 from app.live_chat.free_geolocation_service import FreeGeolocationService
+from app.live_chat.geoip_resolver import get_geoip_resolver
 
 from app.live_chat.models import (
     LiveChatConversation, CustomerProfile, CustomerSession, 
@@ -37,29 +34,6 @@ class CustomerDetectionService:
         self.session_timeout_hours = 24
         self.device_fingerprint_ttl_days = 30
     
-    def _initialize_geoip(self):
-        """Initialize GeoIP2 database reader with error handling"""
-        try:
-            # Check for GeoLite2 database files
-            possible_paths = [
-                Path("data/GeoLite2-City.mmdb"),
-                Path("/opt/geoip/GeoLite2-City.mmdb"),
-                Path("./GeoLite2-City.mmdb"),
-                Path(getattr(settings, 'GEOIP_DATABASE_PATH', ''))
-            ]
-            
-            for path in possible_paths:
-                if path.exists() and path.is_file():
-                    logger.info(f"Loading GeoIP database from: {path}")
-                    return geoip2.database.Reader(str(path))
-            
-            logger.warning("GeoIP database not found. Geolocation features disabled.")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize GeoIP database: {str(e)}")
-            return None
-    
     async def detect_customer(self, request: Request, tenant_id: int, 
                             customer_identifier: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -80,7 +54,9 @@ class CustomerDetectionService:
             )
             
             # Detect geolocation
-            geolocation = await self._detect_geolocation(request_info['ip_address'])
+            geolocation = await self._detect_geolocation(
+                request_info['ip_address'], request_info.get('accept_language', '')
+            )
             
             # Analyze device and browser
             device_info = self._analyze_device(request_info['user_agent'])
@@ -216,7 +192,7 @@ class CustomerDetectionService:
 
 
     
-    async def _detect_geolocation(self, ip_address: str) -> Dict[str, Any]:
+    async def _detect_geolocation(self, ip_address: str, accept_language: str = '') -> Dict[str, Any]:
         """Detect customer geolocation with multiple fallback methods"""
         geolocation = {
             "ip_address": ip_address,
@@ -248,45 +224,20 @@ class CustomerDetectionService:
             })
             return geolocation  # Return the fallback data instead of skipping
         
-        # Method 1: Local GeoIP2 database (fastest, most private)
-        # if self.geoip_reader:
-        #     try:
-        #         response = self.geoip_reader.city(ip_address)
-        #         geolocation.update({
-        #             "country": response.country.name,
-        #             "country_code": response.country.iso_code,
-        #             "region": response.subdivisions.most_specific.name,
-        #             "city": response.city.name,
-        #             "latitude": float(response.location.latitude) if response.location.latitude else None,
-        #             "longitude": float(response.location.longitude) if response.location.longitude else None,
-        #             "timezone": response.location.time_zone,
-        #             "detection_method": "geoip2_local",
-        #             "accuracy": "high"
-        #         })
-        #         return geolocation
-        #     except geoip2.errors.AddressNotFoundError:
-        #         logger.debug(f"IP {ip_address} not found in GeoIP database")
-        #     except Exception as e:
-        #         logger.error(f"GeoIP2 lookup error: {str(e)}")
-        
-
-        
-        try:
-            geolocation_api = await self._fetch_external_geolocation(ip_address)
-            if geolocation_api:
-                geolocation.update(geolocation_api)
-                return geolocation
-        except Exception as e:
-            logger.error(f"External geolocation API error: {str(e)}")
+        # Method 1: Local GeoIP2 database (fastest, most private) or a cached result;
+        # unknown prefixes are enriched from external APIs in the background
+        location = get_geoip_resolver().resolve(ip_address)
+        if location:
+            geolocation.update(location)
+            return geolocation
         
        
         if not geolocation["country"]:
-            country_from_lang = self._guess_country_from_language(
-                self.request_info.get('accept_language', '')
-            )
-            if country_from_lang:
+            country_code = self._guess_country_from_language(accept_language)
+            if country_code:
                 geolocation.update({
-                    "country": country_from_lang,
+                    "country": country_code,
+                    "country_code": country_code,
                     "detection_method": "language_hint",
                     "accuracy": "low"
                 })
@@ -302,33 +253,12 @@ class CustomerDetectionService:
 
 
     
-    async def _fetch_external_geolocation(self, ip_address: str) -> Optional[Dict]:
-        """Fetch geolocation from external API with rate limiting"""
-        try:
-            # Use ip-api.com (free tier: 1000 requests/month)
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"http://ip-api.com/json/{ip_address}?fields=status,message,country,countryCode,region,regionName,city,lat,lon,timezone,isp"
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('status') == 'success':
-                        return {
-                            "country": data.get('country'),
-                            "country_code": data.get('countryCode'),
-                            "region": data.get('regionName'),
-                            "city": data.get('city'),
-                            "latitude": data.get('lat'),
-                            "longitude": data.get('lon'),
-                            "timezone": data.get('timezone'),
-                            "isp": data.get('isp'),
-                            "detection_method": "external_api",
-                            "accuracy": "medium"
-                        }
-        except Exception as e:
-            logger.error(f"External geolocation API failed: {str(e)}")
-        
+    def _guess_country_from_language(self, accept_language: str) -> Optional[str]:
+        """Region subtag of the preferred Accept-Language entry ("en-GB,en;q=0.9" -> "GB")"""
+        primary = (accept_language or "").split(',')[0].split(';')[0].strip()
+        parts = primary.replace('_', '-').split('-')
+        if len(parts) >= 2 and len(parts[-1]) == 2 and parts[-1].isalpha():
+            return parts[-1].upper()
         return None
     
     def _analyze_device(self, user_agent: str) -> Dict[str, Any]:
@@ -1,10 +1,12 @@
 import os
+import uuid
 import logging
 from typing import Dict, Optional, List
-import resend
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
 
+from app.email.outbox import OutboxEmail, get_email_provider, queue_email
+
 logger = logging.getLogger(__name__)
 
 class ResendEmailService:
@@ -19,7 +21,6 @@ class ResendEmailService:
             logger.warning("RESEND_API_KEY not set - email sending will be disabled")
             self.enabled = False
         else:
-            resend.api_key = self.api_key
             self.enabled = True
         
         # Initialize Jinja2 for email templates
@@ -27,14 +28,21 @@ class ResendEmailService:
         template_dir.mkdir(exist_ok=True)
         self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
     
+    async def _queue(self, kind: str, params: Dict, idempotency_key: Optional[str] = None,
+                     tenant_id: Optional[int] = None) -> Dict:
+        """Write the message to the email outbox; the outbox worker delivers it"""
+        outbox_id, created = await queue_email(kind, params, idempotency_key=idempotency_key, tenant_id=tenant_id)
+        return {"outbox_id": outbox_id, "duplicate": not created, "email_id": None}
+    
 
 
     async def send_agent_invitation(self, to_email: str, agent_name: str, 
                               business_name: str, invite_url: str,
                               role_title: str = "Support Member",
                               role_description: str = "You've been invited to join as a Support Member", 
-                              responsibilities: List[str] = None) -> Dict:
-        """Send agent invitation email"""
+                              responsibilities: List[str] = None,
+                              idempotency_key: Optional[str] = None) -> Dict:
+        """Queue agent invitation email"""
         try:
             if not self.enabled:
                 logger.warning("Email service disabled - cannot send invitation")
@@ -73,19 +81,19 @@ class ResendEmailService:
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("agent_invitation", params, idempotency_key)
             
-            logger.info(f"✅ Agent invitation sent to {to_email}, ID: {response.get('id')}")
+            logger.info(f"📧 Agent invitation to {to_email} queued, outbox ID: {queued['outbox_id']}")
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email,
-                "message": "Invitation sent successfully"
+                "message": "Invitation queued for delivery"
             }
             
         except Exception as e:
-            logger.error(f"❌ Failed to send agent invitation to {to_email}: {str(e)}")
+            logger.error(f"❌ Failed to queue agent invitation to {to_email}: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
@@ -353,8 +361,8 @@ class ResendEmailService:
         """
     
     async def send_password_reset_notification(self, to_email: str, agent_name: str, 
-                                             business_name: str) -> Dict:
-        """Send notification when agent password is reset"""
+                                             business_name: str, idempotency_key: Optional[str] = None) -> Dict:
+        """Queue notification when agent password is reset"""
         try:
             if not self.enabled:
                 return {"success": False, "error": "Email service not configured"}
@@ -408,25 +416,25 @@ class ResendEmailService:
                 "html": html_content,
                 "tags": [
                     {"name": "type", "value": "account_activation"},
-                    {"name": "business", "value": business_name}
+                    {"name": "business", "value": self._sanitize_tag_value(business_name)}
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("account_activation", params, idempotency_key)
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email
             }
             
         except Exception as e:
-            logger.error(f"Failed to send activation email: {str(e)}")
+            logger.error(f"Failed to queue activation email: {str(e)}")
             return {"success": False, "error": str(e)}
     
     async def send_agent_revoked_notification(self, to_email: str, agent_name: str, 
-                                            business_name: str) -> Dict:
-        """Send notification when agent access is revoked"""
+                                            business_name: str, idempotency_key: Optional[str] = None) -> Dict:
+        """Queue notification when agent access is revoked"""
         try:
             if not self.enabled:
                 return {"success": False, "error": "Email service not configured"}
@@ -476,16 +484,16 @@ class ResendEmailService:
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("account_revoked", params, idempotency_key)
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email
             }
             
         except Exception as e:
-            logger.error(f"Failed to send revocation email: {str(e)}")
+            logger.error(f"Failed to queue revocation email: {str(e)}")
             return {"success": False, "error": str(e)}
     
     async def test_email_connection(self) -> Dict:
@@ -506,12 +514,18 @@ class ResendEmailService:
                 "tags": [{"name": "type", "value": "test"}]
             }
             
-            response = resend.Emails.send(test_params)
+            # Sent directly (not queued) so the caller sees the provider's answer
+            result = await get_email_provider().send(OutboxEmail(
+                id=0, tenant_id=None, kind="test", provider="", idempotency_key=f"test:{uuid.uuid4().hex}",
+                payload=test_params, template=None, context=None, attempts=1
+            ))
+            if result.status != "sent":
+                return {"success": False, "error": f"Email service test failed: {result.error}"}
             
             return {
                 "success": True,
                 "message": "Email service is working correctly",
-                "test_email_id": response.get("id")
+                "test_email_id": result.provider_message_id
             }
             
         except Exception as e:
@@ -523,8 +537,8 @@ class ResendEmailService:
 
     async def send_promotion_notification(self, to_email: str, agent_name: str, 
                                         business_name: str, new_role: str, 
-                                        new_permissions: List) -> Dict:
-        """Send email notification about agent promotion"""
+                                        new_permissions: List, idempotency_key: Optional[str] = None) -> Dict:
+        """Queue email notification about agent promotion"""
         try:
             if not self.enabled:
                 logger.warning("Email service disabled - cannot send promotion notification")
@@ -554,19 +568,19 @@ class ResendEmailService:
                 ]
             }
             
-            response = resend.Emails.send(params)
+            queued = await self._queue("agent_promotion", params, idempotency_key)
             
-            logger.info(f"✅ Promotion notification sent to {to_email}, ID: {response.get('id')}")
+            logger.info(f"📧 Promotion notification to {to_email} queued, outbox ID: {queued['outbox_id']}")
             
             return {
                 "success": True,
-                "email_id": response.get("id"),
+                **queued,
                 "to_email": to_email,
-                "message": "Promotion notification sent successfully"
+                "message": "Promotion notification queued for delivery"
             }
             
         except Exception as e:
-            logger.error(f"❌ Failed to send promotion notification to {to_email}: {str(e)}")
+            logger.error(f"❌ Failed to queue promotion notification to {to_email}: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
@@ -2,24 +2,116 @@
 
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from html import escape
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, or_, func, desc
 import json
 
+from app.config import settings
+from app.database import SessionLocal
+
 from app.live_chat.models import (
     LiveChatConversation, LiveChatMessage, Agent, SenderType, MessageType
 )
+from app.email.outbox import enqueue_email, make_idempotency_key, register_email_renderer
 from app.email.resend_service import email_service
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_TEMPLATE = "conversation_transcript"
+
+TRANSCRIPT_FORMATS = {
+    "html": ("text/html; charset=utf-8", "html"),
+    "plain_text": ("text/plain; charset=utf-8", "txt"),
+}
+
+# Only what a transcript shows; full rows drag every column through each page
+_MESSAGE_COLUMNS = (
+    LiveChatMessage.id,
+    LiveChatMessage.content,
+    LiveChatMessage.sender_type,
+    LiveChatMessage.sender_name,
+    LiveChatMessage.sent_at,
+    LiveChatMessage.message_type,
+    LiveChatMessage.is_internal,
+    LiveChatMessage.attachment_url,
+    LiveChatMessage.attachment_name,
+)
+
+
+def _sender_name(sender_name: Optional[str], sender_type: str) -> str:
+    return sender_name or ("Agent" if sender_type == SenderType.AGENT else "Customer")
+
+
+def _format_message(row) -> Dict:
+    return {
+        "id": row.id,
+        "content": row.content,
+        "sender_type": row.sender_type,
+        "sender_name": _sender_name(row.sender_name, row.sender_type),
+        "sent_at": row.sent_at,
+        "message_type": row.message_type,
+        "is_internal": row.is_internal,
+        "attachment_url": row.attachment_url,
+        "attachment_name": row.attachment_name
+    }
+
+
+def _buffered(parts: Iterable[str], min_chars: int) -> Iterator[str]:
+    """Join small rendered pieces into chunks of about min_chars for the response body"""
+    buffer: List[str] = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= min_chars:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
 class EmailTranscriptService:
-    """Service for sending conversation transcripts via email"""
+    """Service for sending conversation transcripts via email
+    
+    Requests only validate access and queue the email; the transcript is loaded
+    and rendered by the email outbox worker (render_transcript_email).
+    """
     
     def __init__(self, db: Session):
         self.db = db
     
+    def _queue_transcript(
+        self,
+        conversation: LiveChatConversation,
+        agent: Agent,
+        recipient_email: str,
+        subject: str,
+        context: Dict[str, Any]
+    ) -> Tuple[int, bool]:
+        payload = email_service.conversation_transcript_params(
+            to_email=recipient_email,
+            subject=subject,
+            conversation_id=conversation.id,
+            agent_name=agent.display_name
+        )
+        # A repeated click sends one email: same request, same recipient, same minute
+        idempotency_key = make_idempotency_key(
+            TRANSCRIPT_TEMPLATE, conversation.id, agent.id, recipient_email, subject,
+            json.dumps(context, sort_keys=True), datetime.utcnow().strftime("%Y%m%d%H%M")
+        )
+        return enqueue_email(
+            self.db,
+            TRANSCRIPT_TEMPLATE,
+            payload,
+            idempotency_key=idempotency_key,
+            tenant_id=conversation.tenant_id,
+            template=TRANSCRIPT_TEMPLATE,
+            context=context
+        )
+    
     async def send_conversation_transcript(
         self, 
         conversation_id: int, 
@@ -29,8 +121,11 @@ class EmailTranscriptService:
         include_agent_notes: bool = True,
         include_system_messages: bool = False
     ) -> Dict[str, Any]:
-        """Send complete conversation transcript via email"""
+        """Queue complete conversation transcript for email delivery"""
         try:
+            if not email_service.enabled:
+                return {"success": False, "error": "Failed to send email: Email service not configured"}
+            
             # Get conversation details
             conversation = self.db.query(LiveChatConversation).filter(
                 LiveChatConversation.id == conversation_id
@@ -48,23 +143,7 @@ class EmailTranscriptService:
             if conversation.tenant_id != agent.tenant_id:
                 return {"success": False, "error": "Access denied"}
             
-            # Get messages
-            messages = await self._get_formatted_messages(
-                conversation_id, 
-                include_system_messages
-            )
-            
-            # Generate transcript
-            transcript_data = await self._generate_transcript_data(
-                conversation, 
-                messages, 
-                agent, 
-                include_agent_notes
-            )
-            
-            # Generate email content
-            html_content = await self._generate_html_transcript(transcript_data)
-            plain_content = await self._generate_plain_transcript(transcript_data)
+            message_count = self._message_query(conversation_id, include_system_messages).count()
             
             # Prepare email subject
             if not subject:
@@ -72,42 +151,33 @@ class EmailTranscriptService:
                 if conversation.customer_name:
                     subject += f" with {conversation.customer_name}"
             
-            # Send email
-            email_result = await email_service.send_conversation_transcript(
-                to_email=recipient_email,
-                subject=subject,
-                html_content=html_content,
-                plain_content=plain_content,
-                conversation_id=conversation_id,
-                agent_name=agent.display_name
+            outbox_id, _ = self._queue_transcript(conversation, agent, recipient_email, subject, {
+                "conversation_id": conversation_id,
+                "agent_id": agent_id,
+                "include_agent_notes": include_agent_notes,
+                "include_system_messages": include_system_messages
+            })
+            
+            await self._log_transcript_send(
+                conversation_id, 
+                agent_id, 
+                recipient_email, 
+                outbox_id,
+                message_count=message_count
             )
             
-            if email_result["success"]:
-                await self._log_transcript_send(
-                    conversation_id, 
-                    agent_id, 
-                    recipient_email, 
-                    email_result.get("email_id")
-                )
-                
-                logger.info(f"Transcript sent for conversation {conversation_id} to {recipient_email}")
-                
-                return {
-                    "success": True,
-                    "message": f"Transcript sent successfully to {recipient_email}",
-                    "email_id": email_result.get("email_id"),
-                    "conversation_id": conversation_id,
-                    "message_count": len(messages),
-                    "sent_at": datetime.utcnow().isoformat()
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Failed to send email: {email_result.get('error', 'Unknown error')}"
-                }
+            return {
+                "success": True,
+                "message": f"Transcript queued for delivery to {recipient_email}",
+                "email_id": None,
+                "outbox_id": outbox_id,
+                "conversation_id": conversation_id,
+                "message_count": message_count,
+                "sent_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
-            logger.error(f"Error sending conversation transcript: {str(e)}")
+            logger.error(f"Error queueing conversation transcript: {str(e)}")
             return {"success": False, "error": str(e)}
     
     async def send_selected_messages(
@@ -119,8 +189,11 @@ class EmailTranscriptService:
         subject: Optional[str] = None,
         additional_notes: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Send selected messages from a conversation"""
+        """Queue selected messages from a conversation for email delivery"""
         try:
+            if not email_service.enabled:
+                return {"success": False, "error": "Failed to send email: Email service not configured"}
+            
             # Get conversation and agent
             conversation = self.db.query(LiveChatConversation).filter(
                 LiveChatConversation.id == conversation_id
@@ -135,137 +208,192 @@ class EmailTranscriptService:
             if conversation.tenant_id != agent.tenant_id:
                 return {"success": False, "error": "Access denied"}
             
-            # Get selected messages
-            messages = self.db.query(LiveChatMessage).filter(
+            # Check the selection exists
+            message_count = self.db.query(LiveChatMessage).filter(
                 and_(
                     LiveChatMessage.conversation_id == conversation_id,
                     LiveChatMessage.id.in_(message_ids)
                 )
-            ).order_by(LiveChatMessage.sent_at.asc()).all()
+            ).count()
             
-            if not messages:
+            if not message_count:
                 return {"success": False, "error": "No messages found with provided IDs"}
             
-            # Format messages
-            formatted_messages = []
-            for msg in messages:
-                formatted_messages.append({
-                    "id": msg.id,
-                    "content": msg.content,
-                    "sender_type": msg.sender_type,
-                    "sender_name": msg.sender_name or ("Agent" if msg.sender_type == SenderType.AGENT else "Customer"),
-                    "sent_at": msg.sent_at,
-                    "message_type": msg.message_type,
-                    "is_internal": msg.is_internal
-                })
-            
-            # Generate transcript data
-            transcript_data = {
-                "conversation": {
-                    "id": conversation.id,
-                    "customer_name": conversation.customer_name or "Customer",
-                    "customer_email": conversation.customer_email,
-                    "created_at": conversation.created_at,
-                    "status": conversation.status
-                },
-                "messages": formatted_messages,
-                "agent": {
-                    "name": agent.display_name,
-                    "email": agent.email
-                },
-                "metadata": {
-                    "total_messages": len(formatted_messages),
-                    "selection_type": "selected_messages",
-                    "generated_at": datetime.utcnow(),
-                    "additional_notes": additional_notes
-                }
-            }
-            
-            # Generate email content
-            html_content = await self._generate_html_transcript(transcript_data)
-            plain_content = await self._generate_plain_transcript(transcript_data)
-            
             # Prepare subject
             if not subject:
                 subject = f"Selected Messages - Conversation #{conversation_id}"
                 if conversation.customer_name:
                     subject += f" with {conversation.customer_name}"
             
-            # Send email
-            email_result = await email_service.send_conversation_transcript(
-                to_email=recipient_email,
-                subject=subject,
-                html_content=html_content,
-                plain_content=plain_content,
-                conversation_id=conversation_id,
-                agent_name=agent.display_name
+            outbox_id, _ = self._queue_transcript(conversation, agent, recipient_email, subject, {
+                "conversation_id": conversation_id,
+                "agent_id": agent_id,
+                "message_ids": sorted(message_ids),
+                "additional_notes": additional_notes
+            })
+            
+            await self._log_transcript_send(
+                conversation_id, 
+                agent_id, 
+                recipient_email, 
+                outbox_id,
+                selection_type="selected_messages",
+                message_count=message_count
             )
             
-            if email_result["success"]:
-                await self._log_transcript_send(
-                    conversation_id, 
-                    agent_id, 
-                    recipient_email, 
-                    email_result.get("email_id"),
-                    selection_type="selected_messages",
-                    message_count=len(messages)
-                )
-                
-                return {
-                    "success": True,
-                    "message": f"Selected messages sent to {recipient_email}",
-                    "email_id": email_result.get("email_id"),
-                    "message_count": len(messages)
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Failed to send email: {email_result.get('error')}"
-                }
+            return {
+                "success": True,
+                "message": f"Selected messages queued for delivery to {recipient_email}",
+                "email_id": None,
+                "outbox_id": outbox_id,
+                "message_count": message_count
+            }
                 
         except Exception as e:
-            logger.error(f"Error sending selected messages: {str(e)}")
+            logger.error(f"Error queueing selected messages: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    async def _get_formatted_messages(
-        self, 
-        conversation_id: int, 
-        include_system_messages: bool = False
-    ) -> List[Dict]:
-        """Get and format conversation messages"""
-        query = self.db.query(LiveChatMessage).filter(
+    def _message_query(self, conversation_id: int, include_system_messages: bool = False, *columns):
+        query = self.db.query(*(columns or (LiveChatMessage,))).filter(
             LiveChatMessage.conversation_id == conversation_id
         )
         
         if not include_system_messages:
             query = query.filter(LiveChatMessage.sender_type != SenderType.SYSTEM)
         
-        messages = query.order_by(LiveChatMessage.sent_at.asc()).all()
+        return query
+    
+    def _get_selected_transcript_data(
+        self,
+        conversation: LiveChatConversation,
+        agent: Agent,
+        message_ids: List[int],
+        additional_notes: Optional[str] = None
+    ) -> Dict:
+        """Transcript data for a hand-picked set of messages"""
+        messages = self.db.query(LiveChatMessage).filter(
+            and_(
+                LiveChatMessage.conversation_id == conversation.id,
+                LiveChatMessage.id.in_(message_ids)
+            )
+        ).order_by(LiveChatMessage.sent_at.asc()).all()
         
+        # Format messages
         formatted_messages = []
         for msg in messages:
             formatted_messages.append({
                 "id": msg.id,
                 "content": msg.content,
                 "sender_type": msg.sender_type,
-                "sender_name": msg.sender_name or ("Agent" if msg.sender_type == SenderType.AGENT else "Customer"),
+                "sender_name": _sender_name(msg.sender_name, msg.sender_type),
                 "sent_at": msg.sent_at,
                 "message_type": msg.message_type,
-                "is_internal": msg.is_internal,
-                "attachment_url": msg.attachment_url,
-                "attachment_name": msg.attachment_name
+                "is_internal": msg.is_internal
             })
         
-        return formatted_messages
+        return {
+            "conversation": {
+                "id": conversation.id,
+                "customer_name": conversation.customer_name or "Customer",
+                "customer_email": conversation.customer_email,
+                "created_at": conversation.created_at,
+                "status": conversation.status
+            },
+            "messages": formatted_messages,
+            "agent": {
+                "name": agent.display_name,
+                "email": agent.email
+            },
+            "metadata": {
+                "total_messages": len(formatted_messages),
+                "selection_type": "selected_messages",
+                "generated_at": datetime.utcnow(),
+                "additional_notes": additional_notes
+            }
+        }
     
-    async def _generate_transcript_data(
+    def iter_formatted_messages(
+        self, 
+        conversation_id: int, 
+        include_system_messages: bool = False,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """Formatted conversation messages in (sent_at, id) order, read a page at a time
+        
+        Keyset pagination: each page starts after the last row of the previous one,
+        so memory stays at one page however long the conversation is.
+        """
+        chunk_size = chunk_size or settings.TRANSCRIPT_CHUNK_SIZE
+        after = None
+        while True:
+            query = self._message_query(conversation_id, include_system_messages, *_MESSAGE_COLUMNS)
+            if after is not None:
+                query = query.filter(or_(
+                    LiveChatMessage.sent_at > after.sent_at,
+                    and_(LiveChatMessage.sent_at == after.sent_at, LiveChatMessage.id > after.id)
+                ))
+            rows = query.order_by(LiveChatMessage.sent_at.asc(), LiveChatMessage.id.asc()).limit(chunk_size).all()
+            for row in rows:
+                yield _format_message(row)
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1]
+    
+    def transcript_summary(
+        self, 
+        conversation_id: int, 
+        include_system_messages: bool = False,
+        sample_size: int = 3
+    ) -> Dict[str, Any]:
+        """Preview figures from aggregate queries; only the sample messages are loaded"""
+        message_count, estimated_length, started, ended = self._message_query(
+            conversation_id,
+            include_system_messages,
+            func.count(LiveChatMessage.id),
+            func.coalesce(func.sum(func.length(LiveChatMessage.content)), 0),
+            func.min(LiveChatMessage.sent_at),
+            func.max(LiveChatMessage.sent_at)
+        ).one()
+        
+        senders = self._message_query(
+            conversation_id, include_system_messages, LiveChatMessage.sender_name, LiveChatMessage.sender_type
+        ).distinct().all()
+        
+        includes_attachments = self.db.query(
+            self._message_query(conversation_id, include_system_messages, LiveChatMessage.id).filter(
+                LiveChatMessage.attachment_url.isnot(None),
+                LiveChatMessage.attachment_url != ""
+            ).exists()
+        ).scalar()
+        
+        return {
+            "message_count": message_count,
+            "estimated_length": int(estimated_length or 0),
+            "participants": sorted({_sender_name(name, sender_type) for name, sender_type in senders}),
+            "date_range": {
+                "start": started.isoformat() if started else None,
+                "end": ended.isoformat() if ended else None
+            },
+            "includes_attachments": bool(includes_attachments),
+            "sample_messages": list(islice(
+                self.iter_formatted_messages(conversation_id, include_system_messages, chunk_size=sample_size),
+                sample_size
+            ))
+        }
+    
+    def _generate_transcript_data(
         self, 
         conversation: LiveChatConversation, 
-        messages: List[Dict], 
+        messages: Iterable[Dict], 
         agent: Agent,
-        include_agent_notes: bool = True
+        include_agent_notes: bool = True,
+        total_messages: Optional[int] = None
     ) -> Dict:
-        """Generate comprehensive transcript data"""
+        """Generate comprehensive transcript data
+        
+        messages may be a lazy iterator (iter_formatted_messages); pass its
+        total_messages since it can't be counted without consuming it.
+        """
         transcript_data = {
             "conversation": {
                 "id": conversation.id,
@@ -287,7 +415,7 @@ class EmailTranscriptService:
                 "email": agent.email
             },
             "metadata": {
-                "total_messages": len(messages),
+                "total_messages": len(messages) if total_messages is None else total_messages,
                 "generated_at": datetime.utcnow(),
                 "generated_by": agent.display_name,
                 "include_agent_notes": include_agent_notes
@@ -300,8 +428,28 @@ class EmailTranscriptService:
         
         return transcript_data
     
-    async def _generate_html_transcript(self, transcript_data: Dict) -> str:
+    def _streamed_transcript_data(
+        self,
+        conversation: LiveChatConversation,
+        agent: Agent,
+        include_agent_notes: bool = True,
+        include_system_messages: bool = False
+    ) -> Dict:
+        """Transcript data whose messages are read lazily, page by page, when rendered"""
+        return self._generate_transcript_data(
+            conversation,
+            self.iter_formatted_messages(conversation.id, include_system_messages),
+            agent,
+            include_agent_notes,
+            total_messages=self._message_query(conversation.id, include_system_messages).count()
+        )
+    
+    def _generate_html_transcript(self, transcript_data: Dict) -> str:
         """Generate HTML email content for transcript"""
+        return "".join(self.iter_html_transcript(transcript_data))
+    
+    def iter_html_transcript(self, transcript_data: Dict) -> Iterator[str]:
+        """HTML transcript as a header, one block per message and a footer"""
         conversation = transcript_data["conversation"]
         messages = transcript_data["messages"]
         agent = transcript_data["agent"]
@@ -310,7 +458,7 @@ class EmailTranscriptService:
         # Format dates
         created_at_str = conversation["created_at"].strftime("%B %d, %Y at %I:%M %p UTC")
         
-        html_content = f"""
+        yield f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -348,7 +496,7 @@ class EmailTranscriptService:
                     <div class="info-grid">
                         <div class="info-item">
                             <div class="info-label">Customer</div>
-                            <div class="info-value">{conversation["customer_name"]}</div>
+                            <div class="info-value">{escape(conversation["customer_name"])}</div>
                         </div>
                         <div class="info-item">
                             <div class="info-label">Started</div>
@@ -370,39 +518,41 @@ class EmailTranscriptService:
             sender_class = message["sender_type"].lower()
             timestamp = message["sent_at"].strftime("%I:%M %p")
             
-            html_content += f"""
+            yield f"""
                     <div class="message {sender_class}">
                         <div class="message-header">
-                            <span class="sender">{message["sender_name"]}</span>
+                            <span class="sender">{escape(message["sender_name"])}</span>
                             <span class="timestamp">{timestamp}</span>
                         </div>
-                        <div class="message-content">{message["content"]}</div>
+                        <div class="message-content">{escape(message["content"] or "")}</div>
                     </div>
             """
         
-        html_content += f"""
+        yield f"""
                 </div>
                 
                 <div class="footer">
-                    <p>Generated by {agent["name"]} on {metadata["generated_at"].strftime("%B %d, %Y at %I:%M %p UTC")}</p>
+                    <p>Generated by {escape(agent["name"])} on {metadata["generated_at"].strftime("%B %d, %Y at %I:%M %p UTC")}</p>
                     <p>Total Messages: {metadata["total_messages"]}</p>
                 </div>
             </div>
         </body>
         </html>
         """
-        
-        return html_content
     
-    async def _generate_plain_transcript(self, transcript_data: Dict) -> str:
+    def _generate_plain_transcript(self, transcript_data: Dict) -> str:
         """Generate plain text version of transcript"""
+        return "".join(self.iter_plain_transcript(transcript_data))
+    
+    def iter_plain_transcript(self, transcript_data: Dict) -> Iterator[str]:
+        """Plain text transcript as a header, one line per message and a footer"""
         conversation = transcript_data["conversation"]
         messages = transcript_data["messages"]
         agent = transcript_data["agent"]
         metadata = transcript_data["metadata"]
         
         # Header
-        plain_content = f"""
+        yield f"""
 CHAT TRANSCRIPT - Conversation #{conversation["id"]}
 {'=' * 50}
 
@@ -420,19 +570,17 @@ MESSAGES
         # Messages
         for message in messages:
             timestamp = message["sent_at"].strftime("%Y-%m-%d %I:%M %p")
-            plain_content += f"[{timestamp}] {message['sender_name']}: {message['content']}\n\n"
+            yield f"[{timestamp}] {message['sender_name']}: {message['content']}\n\n"
         
         # Footer
-        plain_content += f"\n{'=' * 50}\nGenerated by {agent['name']} on {metadata['generated_at'].strftime('%B %d, %Y at %I:%M %p UTC')}\n"
-        
-        return plain_content
+        yield f"\n{'=' * 50}\nGenerated by {agent['name']} on {metadata['generated_at'].strftime('%B %d, %Y at %I:%M %p UTC')}\n"
     
     async def _log_transcript_send(
         self, 
         conversation_id: int, 
         agent_id: int, 
         recipient_email: str, 
-        email_id: Optional[str] = None,
+        outbox_id: Optional[int] = None,
         selection_type: str = "full_transcript",
         message_count: Optional[int] = None
     ):
@@ -442,13 +590,75 @@ MESSAGES
                 "conversation_id": conversation_id,
                 "agent_id": agent_id,
                 "recipient_email": recipient_email,
-                "email_id": email_id,
+                "outbox_id": outbox_id,
                 "selection_type": selection_type,
                 "message_count": message_count,
-                "sent_at": datetime.utcnow()
+                "queued_at": datetime.utcnow()
             }
             
-            logger.info(f"Transcript sent: {json.dumps(log_data)}")
+            logger.info(f"Transcript queued: {json.dumps(log_data, default=str)}")
             
         except Exception as e:
-            logger.error(f"Error logging transcript send: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error logging transcript send: {str(e)}")
+
+
+def render_transcript_email(db: Session, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Email outbox renderer: load the conversation and build the transcript bodies (worker thread)"""
+    service = EmailTranscriptService(db)
+    conversation = db.query(LiveChatConversation).filter(
+        LiveChatConversation.id == context["conversation_id"]
+    ).first()
+    agent = db.query(Agent).filter(Agent.id == context["agent_id"]).first()
+    if not conversation or not agent:
+        raise ValueError("Conversation or agent no longer exists")
+    
+    if context.get("message_ids"):
+        transcript_data = service._get_selected_transcript_data(
+            conversation, agent, context["message_ids"], context.get("additional_notes")
+        )
+        return {
+            "html": service._generate_html_transcript(transcript_data),
+            "text": service._generate_plain_transcript(transcript_data)
+        }
+    
+    # Each body streams the conversation once instead of holding every message for both
+    options = (context.get("include_agent_notes", True), context.get("include_system_messages", False))
+    return {
+        "html": service._generate_html_transcript(service._streamed_transcript_data(conversation, agent, *options)),
+        "text": service._generate_plain_transcript(service._streamed_transcript_data(conversation, agent, *options))
+    }
+
+
+def stream_transcript(
+    conversation_id: int,
+    agent_id: int,
+    output_format: str = "html",
+    include_agent_notes: bool = True,
+    include_system_messages: bool = False
+) -> Iterator[str]:
+    """Transcript body in chunks for a StreamingResponse
+    
+    Opens its own session: the response is iterated after the request's session
+    is closed. Access must be checked by the caller.
+    """
+    db = SessionLocal()
+    try:
+        service = EmailTranscriptService(db)
+        conversation = db.query(LiveChatConversation).filter(LiveChatConversation.id == conversation_id).first()
+        agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        if not conversation or not agent:
+            return
+        
+        transcript_data = service._streamed_transcript_data(
+            conversation, agent, include_agent_notes, include_system_messages
+        )
+        if output_format == "html":
+            parts = service.iter_html_transcript(transcript_data)
+        else:
+            parts = service.iter_plain_transcript(transcript_data)
+        yield from _buffered(parts, settings.TRANSCRIPT_STREAM_FLUSH_CHARS)
+    finally:
+        db.close()
+
+
+register_email_renderer(TRANSCRIPT_TEMPLATE, render_transcript_email)
@@ -2,24 +2,21 @@
 
 import logging
 import asyncio
-import hashlib
-from datetime import datetime, timedelta
 from typing import Optional, Dict, List
-import httpx
 from functools import lru_cache
+from app.services.http_client import get_http_client
+from app.live_chat.geoip_resolver import get_geoip_resolver
 
 logger = logging.getLogger(__name__)
 
 class FreeGeolocationService:
     """
     Free geolocation service using multiple API providers
-    No database downloads required - works out of the box!
+    Lookups go through the shared GeoIPResolver (local database + caches);
+    the providers are only called by its rate-limited background enrichment
     """
     
     def __init__(self):
-        self.cache = {}  # Simple in-memory cache
-        self.cache_ttl = timedelta(hours=24)  # Cache for 24 hours
-        
         # Free API providers (in order of preference)
         self.providers = [
             {
@@ -43,50 +40,48 @@ class FreeGeolocationService:
         ]
     
     async def get_location(self, ip_address: str) -> Dict[str, any]:
-        """Get geolocation using free APIs with caching and fallbacks"""
+        """Get geolocation from the local database or cache; never waits on an external API"""
         try:
             # Skip private/local IPs
             if not self._is_public_ip(ip_address):
                 return self._get_fallback_location("private_ip")
             
-            # Check cache first
-            cached_result = self._get_from_cache(ip_address)
-            if cached_result:
-                logger.debug(f"Using cached location for {ip_address}")
-                return cached_result
-            
-            # Try each provider until one succeeds
-            for provider in self.providers:
-                try:
-                    location_data = await self._query_provider(provider, ip_address)
-                    if location_data and location_data.get("country"):
-                        # Cache the successful result
-                        self._cache_result(ip_address, location_data)
-                        return location_data
-                except Exception as e:
-                    logger.warning(f"Provider {provider['name']} failed: {str(e)}")
-                    continue
+            location = get_geoip_resolver().resolve(ip_address)
+            if location:
+                return {**self._get_fallback_location("none"), **location, "ip_address": ip_address}
             
-            # All providers failed - return fallback
-            logger.warning(f"All geolocation providers failed for {ip_address}")
-            return self._get_fallback_location("api_failure")
+            # Unknown for now - enrichment has been queued in the background
+            return self._get_fallback_location("pending_enrichment")
             
         except Exception as e:
             logger.error(f"Geolocation service error: {str(e)}")
             return self._get_fallback_location("service_error")
     
+    async def fetch_external(self, ip_address: str) -> Optional[Dict]:
+        """Try each provider until one succeeds (background enrichment only)"""
+        for provider in self.providers:
+            try:
+                location_data = await self._query_provider(provider, ip_address)
+                if location_data and location_data.get("country"):
+                    return location_data
+            except Exception as e:
+                logger.warning(f"Provider {provider['name']} failed: {str(e)}")
+                continue
+        
+        logger.warning(f"All geolocation providers failed for {ip_address}")
+        return None
+    
     async def _query_provider(self, provider: Dict, ip_address: str) -> Optional[Dict]:
         """Query a specific geolocation provider"""
         url = provider["url"].format(ip=ip_address)
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            return self._normalize_response(provider["name"], data)
+        response = await get_http_client().request("geolocation", "GET", url, timeout=5.0)
+        
+        if response.status_code != 200:
+            return None
+        
+        data = response.json()
+        return self._normalize_response(provider["name"], data)
     
     def _normalize_response(self, provider: str, data: Dict) -> Dict:
         """Normalize different API responses to common format"""
@@ -155,31 +150,6 @@ class FreeGeolocationService:
         except ValueError:
             return False
     
-    def _get_from_cache(self, ip: str) -> Optional[Dict]:
-        """Get cached result if not expired"""
-        cache_key = hashlib.md5(ip.encode()).hexdigest()
-        
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if datetime.utcnow() - timestamp < self.cache_ttl:
-                cached_data["detection_method"] += "_cached"
-                return cached_data
-            else:
-                # Remove expired cache
-                del self.cache[cache_key]
-        
-        return None
-    
-    def _cache_result(self, ip: str, data: Dict):
-        """Cache successful result"""
-        cache_key = hashlib.md5(ip.encode()).hexdigest()
-        self.cache[cache_key] = (data.copy(), datetime.utcnow())
-        
-        # Simple cache cleanup - remove old entries
-        if len(self.cache) > 1000:  # Keep cache size reasonable
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
-    
     def _get_fallback_location(self, reason: str) -> Dict:
         """Return fallback location data when geolocation fails"""
         return {
@@ -222,10 +192,8 @@ class FreeGeolocationService:
     def get_usage_stats(self) -> Dict:
         """Get usage statistics"""
         return {
-            "cache_size": len(self.cache),
             "providers_available": len(self.providers),
-            "cache_hit_ratio": "N/A",  # Would need request tracking
-            "total_requests": "N/A"   # Would need request tracking
+            **get_geoip_resolver().stats()
         }
 
 
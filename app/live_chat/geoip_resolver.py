@@ -0,0 +1,265 @@
+"""
+Visitor IP -> location, local first.
+
+    location = get_geoip_resolver().resolve(ip)  # dict in the detection format, or None
+
+Order of resolution:
+1. positive cache, keyed by network prefix (IPv4 /24, IPv6 /64 by default);
+   locations in a GeoLite database rarely differ inside a prefix
+2. negative cache: prefixes that recently resolved to nothing
+3. the local MaxMind database (GEOIP_DATABASE_PATH), opened memory-mapped;
+   a lookup costs microseconds and no request leaves the process
+4. nothing: the prefix is queued for background enrichment and None is
+   returned right away
+
+Enrichment runs the FreeGeolocationService providers from one background
+worker, at most GEOIP_ENRICH_PER_MINUTE requests. Results land in the positive
+cache for the next visitor from that prefix. Request paths never wait on an
+external API.
+"""
+import asyncio
+import ipaddress
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.utils.bounded_cache import BoundedTTLCache
+
+try:
+    import geoip2.database
+    import geoip2.errors
+    import maxminddb
+    GEOIP2_AVAILABLE = True
+except ImportError:
+    GEOIP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATHS = (
+    "data/GeoLite2-City.mmdb",
+    "/opt/geoip/GeoLite2-City.mmdb",
+    "./GeoLite2-City.mmdb",
+)
+
+
+def prefix_key(ip_address: str) -> Optional[str]:
+    """Cache key for an IP: its /GEOIP_CACHE_PREFIX_V4 or /GEOIP_CACHE_PREFIX_V6 network"""
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return None
+    prefix = settings.GEOIP_CACHE_PREFIX_V4 if ip.version == 4 else settings.GEOIP_CACHE_PREFIX_V6
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+class GeoIPResolver:
+
+    def __init__(self, database_path: Optional[str] = None):
+        self._reader = None
+        self._city = False
+        self.database_path = None
+        self._open_database(database_path)
+
+        self._cache = BoundedTTLCache(
+            max_entries=settings.GEOIP_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.GEOIP_CACHE_TTL_SECONDS,
+        )
+        self._negative = BoundedTTLCache(
+            max_entries=settings.GEOIP_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.GEOIP_NEGATIVE_TTL_SECONDS,
+        )
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending = set()
+        self._task: Optional[asyncio.Task] = None
+        self.is_running = False
+
+        self.local_hits = 0
+        self.local_misses = 0
+        self.local_lookup_ms = 0.0
+        self.enriched = 0
+        self.enrich_failed = 0
+        self.enrich_dropped = 0
+
+    # ============ LOCAL DATABASE ============
+
+    def _open_database(self, database_path: Optional[str]):
+        if not GEOIP2_AVAILABLE:
+            logger.warning("⚠️ geoip2 not installed - local GeoIP lookups disabled")
+            return
+        candidates = [database_path] if database_path else [settings.GEOIP_DATABASE_PATH, *DATABASE_PATHS]
+        for candidate in candidates:
+            if not candidate:
+                continue
+            path = Path(candidate)
+            if not path.is_file():
+                continue
+            try:
+                self._reader = geoip2.database.Reader(str(path), mode=maxminddb.MODE_MMAP)
+                database_type = self._reader.metadata().database_type
+                self._city = "City" in database_type
+                self.database_path = str(path)
+                logger.info(f"🌍 GeoIP database loaded (memory-mapped): {path} ({database_type})")
+                return
+            except Exception as e:
+                logger.error(f"❌ Failed to open GeoIP database {path}: {e}")
+        logger.warning("⚠️ No GeoIP database found - locations come from background enrichment only")
+
+    def _lookup_local(self, ip_address: str) -> Optional[Dict[str, Any]]:
+        if self._reader is None:
+            return None
+        started = time.perf_counter()
+        try:
+            response = self._reader.city(ip_address) if self._city else self._reader.country(ip_address)
+        except geoip2.errors.AddressNotFoundError:
+            self.local_misses += 1
+            return None
+        except Exception as e:
+            logger.error(f"GeoIP2 lookup error: {e}")
+            return None
+        finally:
+            self.local_lookup_ms += (time.perf_counter() - started) * 1000
+
+        self.local_hits += 1
+        location = {
+            "country": response.country.name,
+            "country_code": response.country.iso_code,
+            "detection_method": "geoip2_local",
+            "accuracy": "high" if self._city else "medium"
+        }
+        if self._city:
+            location.update({
+                "region": response.subdivisions.most_specific.name,
+                "city": response.city.name,
+                "latitude": float(response.location.latitude) if response.location.latitude is not None else None,
+                "longitude": float(response.location.longitude) if response.location.longitude is not None else None,
+                "timezone": response.location.time_zone,
+            })
+        return location if location["country"] else None
+
+    # ============ RESOLUTION ============
+
+    def resolve(self, ip_address: str) -> Optional[Dict[str, Any]]:
+        """Location for a public IP without network I/O; None if unknown (enrichment is queued)"""
+        key = prefix_key(ip_address)
+        if key is None:
+            return None
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        if self._negative.get(key) is not None:
+            return None
+
+        location = self._lookup_local(ip_address)
+        if location:
+            self._cache.set(key, location)
+            return dict(location)
+
+        # Unknown locally: don't look again for a while, let the background worker try
+        self._negative.set(key, True)
+        self._schedule_enrichment(key, ip_address)
+        return None
+
+    # ============ BACKGROUND ENRICHMENT ============
+
+    def _schedule_enrichment(self, key: str, ip_address: str):
+        if not self.is_running or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, key, ip_address)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+
+    def _enqueue(self, key: str, ip_address: str):
+        if key in self._pending:
+            return
+        try:
+            self._queue.put_nowait((key, ip_address))
+            self._pending.add(key)
+        except asyncio.QueueFull:
+            self.enrich_dropped += 1
+
+    async def _enrich(self, key: str, ip_address: str):
+        from app.live_chat.free_geolocation_service import FreeGeolocationService
+
+        location = await FreeGeolocationService().fetch_external(ip_address)
+        if location and location.get("country"):
+            location = {field: value for field, value in location.items() if field != "ip_address"}
+            self._cache.set(key, location)
+            self._negative.pop(key)
+            self.enriched += 1
+        else:
+            self.enrich_failed += 1
+
+    async def run_forever(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=settings.GEOIP_ENRICH_QUEUE_SIZE)
+        self.is_running = True
+        interval = 60.0 / max(settings.GEOIP_ENRICH_PER_MINUTE, 1)
+        logger.info(f"🌍 GeoIP enrichment worker started ({settings.GEOIP_ENRICH_PER_MINUTE}/min)")
+        try:
+            while self.is_running:
+                key, ip_address = await self._queue.get()
+                try:
+                    await self._enrich(key, ip_address)
+                except Exception as e:
+                    self.enrich_failed += 1
+                    logger.error(f"❌ GeoIP enrichment failed for {key}: {e}")
+                finally:
+                    self._pending.discard(key)
+                # Rate limit: external providers allow a few dozen requests a minute
+                await asyncio.sleep(interval)
+        finally:
+            self.is_running = False
+
+    def stop(self):
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.local_misses
+        return {
+            "database": self.database_path,
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses,
+            "avg_local_lookup_ms": round(self.local_lookup_ms / lookups, 4) if lookups else None,
+            "cache": self._cache.stats(),
+            "negative_cache": self._negative.stats(),
+            "enrichment": {
+                "running": self.is_running,
+                "queued": self._queue.qsize() if self._queue else 0,
+                "enriched": self.enriched,
+                "failed": self.enrich_failed,
+                "dropped": self.enrich_dropped,
+                "per_minute": settings.GEOIP_ENRICH_PER_MINUTE,
+            },
+        }
+
+
+_resolver: Optional[GeoIPResolver] = None
+
+
+def get_geoip_resolver() -> GeoIPResolver:
+    global _resolver
+    if _resolver is None:
+        _resolver = GeoIPResolver()
+    return _resolver
+
+
+async def start_geoip_enrichment():
+    resolver = get_geoip_resolver()
+    if resolver.is_running:
+        return
+    resolver._task = asyncio.current_task()
+    await resolver.run_forever()
+
+
+def stop_geoip_enrichment():
+    if _resolver is not None:
+        _resolver.stop()
+        logger.info("🛑 GeoIP enrichment worker stopped")
@@ -4,6 +4,7 @@ import json
 import logging
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Header, Query, Request
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import and_, desc
 from typing import Optional, List, Dict
@@ -13,10 +14,10 @@ from typing import List, Dict, Any, Optional
 from fastapi.security import HTTPBearer
 from fastapi import Security
 from fastapi import File, Form, UploadFile
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy import and_, or_, desc, func, select
 
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.live_chat.websocket_manager import websocket_manager, LiveChatMessageHandler
 from app.live_chat.queue_service import LiveChatQueueService
 from app.live_chat.agent_dashboard_service import AgentDashboardService
@@ -134,6 +135,50 @@ def get_current_agent(token: str = Depends(oauth2_scheme), db: Session = Depends
         )
 
 
+async def get_current_agent_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """get_current_agent for endpoints on the async engine"""
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Authentication token required"
+        )
+    
+    try:
+        from app.core.security import verify_token
+        
+        payload = verify_token(token)
+        agent_id = payload.get("sub")
+        
+        if payload.get("type") != "agent":
+            raise HTTPException(
+                status_code=403,
+                detail="Invalid user type - agent token required"
+            )
+        
+        agent = (await db.execute(
+            select(Agent).where(
+                Agent.id == int(agent_id),
+                Agent.status == AgentStatus.ACTIVE,
+                Agent.is_active == True
+            )
+        )).scalars().first()
+        
+        if not agent:
+            raise HTTPException(
+                status_code=404,
+                detail="Agent not found or inactive"
+            )
+        
+        return agent
+        
+    except Exception as e:
+        logger.error(f"Error verifying agent token: {str(e)}")
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials"
+        )
+
+
 
 
 
@@ -966,26 +1011,31 @@ async def get_assignable_agents(
 
 @router.get("/conversations/active")
 async def get_active_conversations(
-    current_agent: Agent = Depends(get_current_agent),
-    db: Session = Depends(get_db)
+    current_agent: Agent = Depends(get_current_agent_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all active conversations for agent's tenant with last message previews"""
     try:
-        # Import TextPreviewService for generating message previews
-        from app.live_chat.agent_dashboard_service import TextPreviewService
-        
-        conversations = db.query(LiveChatConversation).filter(
-            LiveChatConversation.tenant_id == current_agent.tenant_id,
-            LiveChatConversation.status.in_([
-                ConversationStatus.QUEUED,
-                ConversationStatus.ASSIGNED,
-                ConversationStatus.ACTIVE
-            ])
-        ).order_by(LiveChatConversation.created_at.desc()).all()
+        conversations = (await db.execute(
+            select(LiveChatConversation).where(
+                LiveChatConversation.tenant_id == current_agent.tenant_id,
+                LiveChatConversation.status.in_([
+                    ConversationStatus.QUEUED,
+                    ConversationStatus.ASSIGNED,
+                    ConversationStatus.ACTIVE
+                ])
+            ).order_by(LiveChatConversation.created_at.desc())
+        )).scalars().all()
 
-        logger.info(f"Found {len(conversations)} conversations:")
-        for conv in conversations:
-            logger.info(f"  Conv {conv.id}: status={conv.status}, customer={conv.customer_identifier}")
+        logger.info(f"Found {len(conversations)} active conversations for tenant {current_agent.tenant_id}")
+        
+        # Assigned agents' names in one query
+        agent_ids = {conv.assigned_agent_id for conv in conversations if conv.assigned_agent_id}
+        agent_names = {}
+        if agent_ids:
+            agent_names = dict((await db.execute(
+                select(Agent.id, Agent.display_name).where(Agent.id.in_(agent_ids))
+            )).all())
         
         conversation_list = []
         current_time = datetime.utcnow()  # Use naive datetime
@@ -993,8 +1043,7 @@ async def get_active_conversations(
         for conv in conversations:
             agent_name = None
             if conv.assigned_agent_id:
-                agent = db.query(Agent).filter(Agent.id == conv.assigned_agent_id).first()
-                agent_name = agent.display_name if agent else "Unknown Agent"
+                agent_name = agent_names.get(conv.assigned_agent_id, "Unknown Agent")
             
             # 🔧 FIXED: Safe datetime calculations
             wait_time = None
@@ -1048,25 +1097,29 @@ async def get_active_conversations(
 @router.get("/conversations/{conversation_id}/history")
 async def get_conversation_history(
     conversation_id: int,
-    current_agent: Agent = Depends(get_current_agent),
+    current_agent: Agent = Depends(get_current_agent_async),
     limit: int = Query(50, ge=1, le=200),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get message history for a conversation"""
     try:
         # Verify conversation belongs to agent's tenant
-        conversation = db.query(LiveChatConversation).filter(
-            LiveChatConversation.id == conversation_id,
-            LiveChatConversation.tenant_id == current_agent.tenant_id
-        ).first()
+        conversation = (await db.execute(
+            select(LiveChatConversation).where(
+                LiveChatConversation.id == conversation_id,
+                LiveChatConversation.tenant_id == current_agent.tenant_id
+            )
+        )).scalars().first()
         
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Get messages
-        messages = db.query(LiveChatMessage).filter(
-            LiveChatMessage.conversation_id == conversation_id
-        ).order_by(LiveChatMessage.sent_at.desc()).limit(limit).all()
+        messages = (await db.execute(
+            select(LiveChatMessage).where(
+                LiveChatMessage.conversation_id == conversation_id
+            ).order_by(LiveChatMessage.sent_at.desc()).limit(limit)
+        )).scalars().all()
         
         message_list = []
         for msg in reversed(messages):  # Reverse to get chronological order
@@ -2,8 +2,9 @@
 
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Header, Query, Security
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
@@ -15,8 +16,8 @@ from typing import Optional
 
 from app.database import get_db
 from app.live_chat.auth_router import get_current_agent
-from app.live_chat.email_transcript_service import EmailTranscriptService
-from app.live_chat.models import Agent, LiveChatConversation
+from app.live_chat.email_transcript_service import EmailTranscriptService, TRANSCRIPT_FORMATS, stream_transcript
+from app.live_chat.models import Agent, AgentStatus, LiveChatConversation
 from app.tenants.models import Tenant
 from app.tenants.router import get_tenant_from_api_key
 
@@ -27,6 +28,91 @@ bearer_scheme = HTTPBearer(auto_error=False)
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
+def _resolve_admin_tenant(api_key: Optional[str], token, db: Session) -> Tuple[Tenant, Optional[Agent]]:
+    """Tenant (and agent, for bearer tokens) behind an admin request - API key or agent token"""
+    # Try API key first
+    if api_key:
+        return get_tenant_from_api_key(api_key, db), None
+    # Try bearer token
+    if not token:
+        raise HTTPException(status_code=401, detail="API key or agent authentication required")
+    
+    actual_token = token.credentials if hasattr(token, 'credentials') else token
+    
+    from app.core.security import verify_token
+    
+    payload = verify_token(actual_token)
+    agent_id = payload.get("sub")
+    user_type = payload.get("type")
+    
+    if user_type != "agent":
+        raise HTTPException(status_code=401, detail="Invalid token type")
+    
+    agent = db.query(Agent).filter(
+        Agent.id == int(agent_id),
+        Agent.status == AgentStatus.ACTIVE,
+        Agent.is_active == True
+    ).first()
+    
+    if not agent:
+        raise HTTPException(status_code=401, detail="Invalid agent token")
+    
+    tenant = db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Agent's tenant not found")
+    return tenant, agent
+
+
+def _representative_agent(db: Session, conversation: LiveChatConversation, tenant_id: int) -> Agent:
+    """Agent a transcript is generated as when an admin asks: the assigned agent or any active agent"""
+    agent = None
+    if conversation.assigned_agent_id:
+        agent = db.query(Agent).filter(Agent.id == conversation.assigned_agent_id).first()
+    
+    if not agent:
+        # Get any active agent from this tenant
+        agent = db.query(Agent).filter(
+            Agent.tenant_id == tenant_id,
+            Agent.is_active == True
+        ).first()
+    
+    if not agent:
+        raise HTTPException(
+            status_code=404,
+            detail="No agents found for this tenant"
+        )
+    return agent
+
+
+def _transcript_download(
+    conversation_id: int,
+    agent_id: int,
+    output_format: str,
+    include_agent_notes: bool,
+    include_system_messages: bool
+) -> StreamingResponse:
+    if output_format not in TRANSCRIPT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format, expected one of: {', '.join(TRANSCRIPT_FORMATS)}"
+        )
+    
+    media_type, extension = TRANSCRIPT_FORMATS[output_format]
+    return StreamingResponse(
+        stream_transcript(
+            conversation_id,
+            agent_id,
+            output_format,
+            include_agent_notes,
+            include_system_messages
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="transcript-conversation-{conversation_id}.{extension}"'
+        }
+    )
+
 # Pydantic Models
 class SendTranscriptRequest(BaseModel):
     conversation_id: int
@@ -301,18 +387,16 @@ async def get_transcript_preview(
         # Initialize transcript service
         transcript_service = EmailTranscriptService(db)
         
-        # Get formatted messages
-        messages = await transcript_service._get_formatted_messages(
-            conversation_id, 
-            include_system_messages
-        )
+        # Counts, participants and date range come from aggregates, not from loading every message
+        summary = transcript_service.transcript_summary(conversation_id, include_system_messages)
         
         # Generate transcript data
-        transcript_data = await transcript_service._generate_transcript_data(
+        transcript_data = transcript_service._generate_transcript_data(
             conversation, 
-            messages, 
+            summary["sample_messages"], 
             current_agent, 
-            include_agent_notes
+            include_agent_notes,
+            total_messages=summary["message_count"]
         )
         
         # Return preview data
@@ -321,18 +405,15 @@ async def get_transcript_preview(
             "conversation_id": conversation_id,
             "preview": {
                 "conversation_info": transcript_data["conversation"],
-                "message_count": len(messages),
-                "estimated_length": sum(len(msg["content"]) for msg in messages if msg["content"]),
-                "participants": list(set(msg["sender_name"] for msg in messages if msg["sender_name"])),
-                "date_range": {
-                    "start": messages[0]["sent_at"].isoformat() if messages else None,
-                    "end": messages[-1]["sent_at"].isoformat() if messages else None
-                },
-                "includes_attachments": any(msg.get("attachment_url") for msg in messages),
+                "message_count": summary["message_count"],
+                "estimated_length": summary["estimated_length"],
+                "participants": summary["participants"],
+                "date_range": summary["date_range"],
+                "includes_attachments": summary["includes_attachments"],
                 "includes_agent_notes": include_agent_notes and bool(conversation.agent_notes),
                 "includes_system_messages": include_system_messages
             },
-            "sample_messages": messages[:3] if messages else []  # First 3 messages as sample
+            "sample_messages": summary["sample_messages"]  # First 3 messages as sample
         }
         
     except HTTPException:
@@ -342,6 +423,32 @@ async def get_transcript_preview(
         raise HTTPException(status_code=500, detail="Failed to get preview")
 
 
+@router.get("/conversation/{conversation_id}/transcript/download")
+async def download_transcript(
+    conversation_id: int,
+    current_agent: Agent = Depends(get_current_agent),
+    format: str = Query("html"),
+    include_agent_notes: bool = Query(True),
+    include_system_messages: bool = Query(False),
+    db: Session = Depends(get_db)
+):
+    """Download the full transcript; streamed page by page, so any length fits in bounded memory"""
+    conversation = db.query(LiveChatConversation).filter(
+        LiveChatConversation.id == conversation_id,
+        LiveChatConversation.tenant_id == current_agent.tenant_id
+    ).first()
+    
+    if not conversation:
+        raise HTTPException(
+            status_code=404, 
+            detail="Conversation not found or access denied"
+        )
+    
+    return _transcript_download(
+        conversation_id, current_agent.id, format, include_agent_notes, include_system_messages
+    )
+
+
 @router.get("/conversation/{conversation_id}/transcript-history")
 async def get_transcript_history(
     conversation_id: int,
@@ -468,36 +575,7 @@ async def admin_send_transcript(
 ):
     """Admin endpoint to send conversation transcript - supports both API key and agent token"""
     try:
-        # Try API key first
-        if api_key:
-            tenant = get_tenant_from_api_key(api_key, db)
-        # Try bearer token
-        elif token:
-            actual_token = token.credentials if hasattr(token, 'credentials') else token
-            
-            from app.core.security import verify_token
-            
-            payload = verify_token(actual_token)
-            agent_id = payload.get("sub")
-            user_type = payload.get("type")
-            
-            if user_type == "agent":
-                agent = db.query(Agent).filter(
-                    Agent.id == int(agent_id),
-                    Agent.status == AgentStatus.ACTIVE,
-                    Agent.is_active == True
-                ).first()
-                
-                if agent:
-                    tenant = db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
-                    if not tenant:
-                        raise HTTPException(status_code=404, detail="Agent's tenant not found")
-                else:
-                    raise HTTPException(status_code=401, detail="Invalid agent token")
-            else:
-                raise HTTPException(status_code=401, detail="Invalid token type")
-        else:
-            raise HTTPException(status_code=401, detail="API key or agent authentication required")
+        tenant, _ = _resolve_admin_tenant(api_key, token, db)
         
         # Verify conversation belongs to tenant
         conversation = db.query(LiveChatConversation).filter(
@@ -511,23 +589,7 @@ async def admin_send_transcript(
                 detail="Conversation not found"
             )
         
-        # Get a representative agent (could be the assigned agent or any active agent)
-        agent_for_transcript = None
-        if conversation.assigned_agent_id:
-            agent_for_transcript = db.query(Agent).filter(Agent.id == conversation.assigned_agent_id).first()
-        
-        if not agent_for_transcript:
-            # Get any active agent from this tenant
-            agent_for_transcript = db.query(Agent).filter(
-                Agent.tenant_id == tenant.id,
-                Agent.is_active == True
-            ).first()
-        
-        if not agent_for_transcript:
-            raise HTTPException(
-                status_code=404,
-                detail="No agents found for this tenant"
-            )
+        agent_for_transcript = _representative_agent(db, conversation, tenant.id)
         
         # Initialize transcript service
         transcript_service = EmailTranscriptService(db)
@@ -648,36 +710,7 @@ async def admin_get_transcript_options(
 ):
     """Get transcript options and metadata for admin - supports both API key and agent token"""
     try:
-        # Try API key first
-        if api_key:
-            tenant = get_tenant_from_api_key(api_key, db)
-        # Try bearer token
-        elif token:
-            actual_token = token.credentials if hasattr(token, 'credentials') else token
-            
-            from app.core.security import verify_token
-            
-            payload = verify_token(actual_token)
-            agent_id = payload.get("sub")
-            user_type = payload.get("type")
-            
-            if user_type == "agent":
-                agent = db.query(Agent).filter(
-                    Agent.id == int(agent_id),
-                    Agent.status == AgentStatus.ACTIVE,
-                    Agent.is_active == True
-                ).first()
-                
-                if agent:
-                    tenant = db.query(Tenant).filter(Tenant.id == agent.tenant_id).first()
-                    if not tenant:
-                        raise HTTPException(status_code=404, detail="Agent's tenant not found")
-                else:
-                    raise HTTPException(status_code=401, detail="Invalid agent token")
-            else:
-                raise HTTPException(status_code=401, detail="Invalid token type")
-        else:
-            raise HTTPException(status_code=401, detail="API key or agent authentication required")
+        tenant, _ = _resolve_admin_tenant(api_key, token, db)
         
         # Verify conversation
         conversation = db.query(LiveChatConversation).filter(
@@ -740,6 +773,33 @@ async def admin_get_transcript_options(
         raise HTTPException(status_code=500, detail="Failed to get options")
 
 
+@router.get("/admin/conversation/{conversation_id}/transcript/download")
+async def admin_download_transcript(
+    conversation_id: int,
+    format: str = Query("html"),
+    include_agent_notes: bool = Query(True),
+    include_system_messages: bool = Query(False),
+    api_key: Optional[str] = Header(None, alias="X-API-Key"),
+    token: Optional[str] = Security(bearer_scheme),
+    db: Session = Depends(get_db)
+):
+    """Admin transcript export - supports both API key and agent token; streamed like download_transcript"""
+    tenant, agent = _resolve_admin_tenant(api_key, token, db)
+    
+    conversation = db.query(LiveChatConversation).filter(
+        LiveChatConversation.id == conversation_id,
+        LiveChatConversation.tenant_id == tenant.id
+    ).first()
+    
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    agent = agent or _representative_agent(db, conversation, tenant.id)
+    return _transcript_download(
+        conversation_id, agent.id, format, include_agent_notes, include_system_messages
+    )
+
+
 # =============================================================================
 # WEBSOCKET MESSAGE HANDLERS FOR TRANSCRIPT FEATURES
 # =============================================================================
@@ -909,8 +969,8 @@ async def preview_email_template(
         transcript_service = EmailTranscriptService(db)
         
         # Generate preview
-        html_content = await transcript_service._generate_html_transcript(sample_transcript_data)
-        plain_content = await transcript_service._generate_plain_transcript(sample_transcript_data)
+        html_content = transcript_service._generate_html_transcript(sample_transcript_data)
+        plain_content = transcript_service._generate_plain_transcript(sample_transcript_data)
         
         return {
             "success": True,
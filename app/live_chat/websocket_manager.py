@@ -1059,26 +1059,20 @@ class LiveChatMessageHandler:
             # Initialize transcript service
             transcript_service = EmailTranscriptService(self.db)
             
-            # Get formatted messages
-            messages = await transcript_service._get_formatted_messages(
-                conversation_id, 
-                include_system_messages
-            )
+            # Counts, participants and date range come from aggregates, not from loading every message
+            summary = transcript_service.transcript_summary(conversation_id, include_system_messages)
             
             # Generate preview data
             preview_data = {
                 "conversation_id": conversation_id,
-                "message_count": len(messages),
-                "participants": list(set(msg["sender_name"] for msg in messages if msg["sender_name"])),
-                "date_range": {
-                    "start": messages[0]["sent_at"].isoformat() if messages else None,
-                    "end": messages[-1]["sent_at"].isoformat() if messages else None
-                },
-                "estimated_size": sum(len(msg["content"]) for msg in messages if msg["content"]),
-                "includes_attachments": any(msg.get("attachment_url") for msg in messages),
+                "message_count": summary["message_count"],
+                "participants": summary["participants"],
+                "date_range": summary["date_range"],
+                "estimated_size": summary["estimated_length"],
+                "includes_attachments": summary["includes_attachments"],
                 "includes_agent_notes": include_agent_notes and bool(conversation.agent_notes),
                 "includes_system_messages": include_system_messages,
-                "sample_messages": messages[:3] if messages else []
+                "sample_messages": summary["sample_messages"]
             }
             
             response_msg = WebSocketMessage(
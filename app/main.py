@@ -21,10 +21,12 @@ from datetime import datetime
 from fastapi.staticfiles import StaticFiles
 from app.database import create_tables_with_retry, initialize_database_with_retry
 
-from app.chatbot.models import ChatSession, ChatMessage
+from app.chatbot.models import ChatSession, ChatMessage, ChatMessageArchive
 from app.pricing.models import PricingPlan, TenantSubscription 
 from app.tenants.models import Tenant
 from app.auth.models import User, TenantCredentials
+from app.webhooks.models import WebhookInboxEvent
+from app.email.models import EmailOutboxMessage
 from app.database import engine, Base, get_db
 from app.auth.router import router as auth_router
 from app.tenants.router import router as tenants_router
@@ -36,6 +38,7 @@ from app.admin.router import router as admin_router
 from app.discord.router import router as discord_router, get_bot_manager as get_discord_bot_manager
 from app.pricing.router import router as pricing_router
 from app.pricing.middleware import PricingMiddleware
+from app.services.pool_metrics import PoolRouteMiddleware
 from app.slack.router import router as slack_router, get_bot_manager as get_slack_bot_manager
 from app.slack.thread_memory import SlackThreadMemory, SlackChannelContext
 from app.payments.router import router as payments_router
@@ -166,6 +169,9 @@ if settings.requires_security_validation():
 # Add pricing middleware
 app.add_middleware(PricingMiddleware)
 
+# Attribute DB connection hold time to routes (outermost, so every endpoint is covered)
+app.add_middleware(PoolRouteMiddleware)
+
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -255,6 +261,110 @@ def health_check():
 
 
 
+@app.get("/health/async-db")
+async def async_database_health():
+    """Async engine health and pool counters, same shape as the "database" block of /health"""
+    from app.database import async_database_health_check
+    
+    db_health = await async_database_health_check()
+    return {
+        "status": "healthy" if db_health["status"] == "healthy" else "degraded",
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": db_health
+    }
+
+
+@app.get("/health/db-pool")
+def database_pool_metrics():
+    """Checkout waits, timeouts, hold time per route and suspected leaks for each DB pool"""
+    from app.services.pool_metrics import get_all_pool_metrics
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "adaptive": settings.DB_POOL_ADAPTIVE,
+        "pools": get_all_pool_metrics()
+    }
+
+
+@app.get("/health/llm")
+def llm_gateway_health():
+    """Concurrency, circuit breaker state and per-call-site latency/tokens of the LLM gateway"""
+    from app.services.llm_gateway import get_llm_gateway
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_llm_gateway().get_metrics()
+    }
+
+
+@app.get("/health/fast-path")
+def fast_path_health():
+    """Share of greeting / escalation decisions made without the LLM and the time saved"""
+    from app.chatbot.message_triage import get_triage_stats
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_triage_stats()
+    }
+
+
+@app.get("/health/geoip")
+def geoip_health():
+    """Local GeoIP database, cache hit rates and background enrichment progress"""
+    from app.live_chat.geoip_resolver import get_geoip_resolver
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_geoip_resolver().stats()
+    }
+
+
+@app.get("/health/translation")
+def translation_health():
+    """Language detection cache, translation memory hit rates and backend batching"""
+    from app.utils.language_service import language_service
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **language_service.stats()
+    }
+
+
+@app.get("/health/outbound-http")
+def outbound_http_health():
+    """Per-host latency, error and retry counters of the shared outbound HTTP client"""
+    from app.services.http_client import get_http_client
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_http_client().get_metrics()
+    }
+
+
+@app.get("/health/email-outbox")
+def email_outbox_health():
+    """Outbox depth by status, oldest pending email and delivery counters"""
+    from app.email.outbox import get_email_outbox
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_email_outbox().get_status()
+    }
+
+
+@app.get("/health/webhooks")
+def webhook_queue_health():
+    """Inbox depth, dispatcher counters and redelivery dedup stats for inbound webhooks"""
+    from app.webhooks.queue import get_webhook_queue
+    from app.services.dedup import get_dedup_stats
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **get_webhook_queue().get_status(),
+        "dedup": get_dedup_stats()
+    }
+
+
 @app.get("/health/live-chat")
 async def live_chat_health_check():
     """Health check endpoint for live chat system"""
@@ -316,6 +426,52 @@ async def startup_event():
             logger.error(f"❌ Failed to start background training: {e}")
 
 
+        try:
+            from app.pricing.metering import start_usage_metering
+            asyncio.create_task(start_usage_metering())
+            logger.info("📊 Usage metering started")
+        except Exception as e:
+            logger.error(f"❌ Failed to start usage metering: {e}")
+
+        try:
+            from app.webhooks.queue import start_webhook_queue
+            asyncio.create_task(start_webhook_queue())
+            logger.info("📥 Webhook ingestion queue started")
+        except Exception as e:
+            logger.error(f"❌ Failed to start webhook ingestion queue: {e}")
+
+        try:
+            from app.email.outbox import start_email_outbox
+            asyncio.create_task(start_email_outbox())
+            logger.info("📧 Email outbox worker started")
+        except Exception as e:
+            logger.error(f"❌ Failed to start email outbox worker: {e}")
+
+        try:
+            from app.chatbot.message_partitions import start_partition_maintenance
+            asyncio.create_task(start_partition_maintenance())
+        except Exception as e:
+            logger.error(f"❌ Failed to start chat_messages partition maintenance: {e}")
+
+        try:
+            from app.services.retention import start_retention_jobs
+            asyncio.create_task(start_retention_jobs())
+        except Exception as e:
+            logger.error(f"❌ Failed to start retention sweep: {e}")
+
+        try:
+            from app.services.pool_metrics import start_pool_monitor
+            asyncio.create_task(start_pool_monitor())
+        except Exception as e:
+            logger.error(f"❌ Failed to start DB pool monitor: {e}")
+
+        try:
+            from app.live_chat.geoip_resolver import start_geoip_enrichment
+            asyncio.create_task(start_geoip_enrichment())
+        except Exception as e:
+            logger.error(f"❌ Failed to start GeoIP enrichment: {e}")
+
+
         from app.database import retry_database_initialization
         
         try:
@@ -474,8 +630,88 @@ async def shutdown_event():
             logger.info("🛑 Background fine-tuning system stopped")
         except Exception as e:
             logger.error(f"❌ Error stopping background training: {e}")
+
+        try:
+            from app.pricing.metering import stop_usage_metering
+            stop_usage_metering()
+        except Exception as e:
+            logger.error(f"❌ Error flushing usage metering: {e}")
+
+        try:
+            from app.chatbot.message_partitions import stop_partition_maintenance
+            stop_partition_maintenance()
+        except Exception as e:
+            logger.error(f"❌ Error stopping partition maintenance: {e}")
+
+        try:
+            from app.services.retention import stop_retention_jobs
+            stop_retention_jobs()
+        except Exception as e:
+            logger.error(f"❌ Error stopping retention sweep: {e}")
+
+        try:
+            from app.services.pool_metrics import stop_pool_monitor
+            stop_pool_monitor()
+        except Exception as e:
+            logger.error(f"❌ Error stopping DB pool monitor: {e}")
+
+        try:
+            from app.live_chat.geoip_resolver import stop_geoip_enrichment
+            stop_geoip_enrichment()
+        except Exception as e:
+            logger.error(f"❌ Error stopping GeoIP enrichment: {e}")
+
+        try:
+            from app.utils.language_service import language_service
+            language_service.shutdown()
+        except Exception as e:
+            logger.error(f"❌ Error stopping translation workers: {e}")
+
+        try:
+            from app.services.llm_gateway import close_llm_gateway
+            close_llm_gateway()
+        except Exception as e:
+            logger.error(f"❌ Error stopping LLM gateway: {e}")
+
+        try:
+            from app.knowledge_base.bulk_ingestion import shutdown_ingestion_pool
+            shutdown_ingestion_pool()
+        except Exception as e:
+            logger.error(f"❌ Error stopping bulk ingestion pool: {e}")
+
+        try:
+            from app.webhooks.queue import stop_webhook_queue
+            await stop_webhook_queue()
+        except Exception as e:
+            logger.error(f"❌ Error stopping webhook ingestion queue: {e}")
+
+        try:
+            from app.email.outbox import stop_email_outbox
+            stop_email_outbox()
+        except Exception as e:
+            logger.error(f"❌ Error stopping email outbox worker: {e}")
+
+        try:
+            from app.services.http_client import close_http_client
+            await close_http_client()
+        except Exception as e:
+            logger.error(f"❌ Error closing outbound HTTP client: {e}")
+
+        try:
+            from app.database import dispose_async_engine
+            await dispose_async_engine()
+        except Exception as e:
+            logger.error(f"❌ Error closing async database pool: {e}")
+        
+        # Slack bots are event-driven and don't need explicit stopping;
+        # just write out thread messages still waiting for a batched insert
+        try:
+            slack_manager = get_slack_bot_manager()
+            for thread_manager in slack_manager.thread_managers.values():
+                thread_manager.flush_pending_messages()
+        except Exception as e:
+            logger.error(f"❌ Error flushing Slack thread memory: {e}")
         
-        # Slack bots are event-driven and don't need explicit stopping
         logger.info("✅ Slack bots shutdown completed")
         
         logger.info("🏁 Bot integration shutdown completed")
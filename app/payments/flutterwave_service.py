@@ -1,8 +1,8 @@
-import requests
 import os
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 import logging
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +11,7 @@ class FlutterwaveService:
         self.secret_key = os.getenv("FLUTTERWAVE_SECRET_KEY")
         self.public_key = os.getenv("FLUTTERWAVE_PUBLIC_KEY")
         self.base_url = "https://api.flutterwave.com/v3"
+        self.http = get_http_client()
         
         if not self.secret_key:
             raise ValueError("FLUTTERWAVE_SECRET_KEY environment variable is required")
@@ -59,7 +60,8 @@ class FlutterwaveService:
                 }
             }
             
-            response = requests.post(
+            response = self.http.request_sync(
+                "flutterwave", "POST",
                 f"{self.base_url}/payments",
                 json=payload,
                 headers=self._get_headers()
@@ -87,7 +89,8 @@ class FlutterwaveService:
         Verify payment status from Flutterwave
         """
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "flutterwave", "GET",
                 f"{self.base_url}/transactions/{transaction_id}/verify",
                 headers=self._get_headers()
             )
@@ -131,7 +134,8 @@ class FlutterwaveService:
                 "currency": currency
             }
             
-            response = requests.post(
+            response = self.http.request_sync(
+                "flutterwave", "POST",
                 f"{self.base_url}/payment-plans",
                 json=payload,
                 headers=self._get_headers()
@@ -198,7 +202,8 @@ class FlutterwaveService:
     def verify_payment_detailed(self, transaction_id: str) -> Dict[str, Any]:
         """Enhanced payment verification with more details"""
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "flutterwave", "GET",
                 f"{self.base_url}/transactions/{transaction_id}/verify",
                 headers=self._get_headers()
             )
@@ -235,7 +240,8 @@ class FlutterwaveService:
     def save_customer_card(self, tx_ref: str) -> Dict[str, Any]:
         """Get customer and card details after successful payment for future charges"""
         try:
-            response = requests.get(
+            response = self.http.request_sync(
+                "flutterwave", "GET",
                 f"{self.base_url}/transactions/{tx_ref}/verify",
                 headers=self._get_headers()
             )
@@ -290,7 +296,8 @@ class FlutterwaveService:
                 }
             }
             
-            response = requests.post(
+            response = self.http.request_sync(
+                "flutterwave", "POST",
                 f"{self.base_url}/tokenized-charges",
                 json=payload,
                 headers=self._get_headers()
@@ -327,7 +334,8 @@ class FlutterwaveService:
                 "tx_ref": f"validation_{int(datetime.now().timestamp())}"
             }
             
-            response = requests.post(
+            response = self.http.request_sync(
+                "flutterwave", "POST",
                 f"{self.base_url}/tokenized-charges",
                 json=test_payload,
                 headers=self._get_headers()
@@ -8,6 +8,7 @@ from fastapi import HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.pricing.service import PricingService
+from app.pricing.metering import get_usage_meter, is_metering_enabled
 from app.database import get_db
 import logging
 from datetime import datetime, timedelta
@@ -28,6 +29,11 @@ def check_message_limit_dependency(tenant_id: int, db: Session = Depends(get_db)
 def is_super_tenant_unlimited(tenant_id: int, db: Session) -> bool:
     """Check if tenant is super tenant with unlimited privileges"""
     try:
+        if is_metering_enabled():
+            cached = get_usage_meter().is_super_tenant(db, tenant_id)
+            if cached is not None:
+                return cached
+        
         tenant = db.query(Tenant).filter(
             Tenant.id == tenant_id,
             Tenant.is_super_tenant == True,
@@ -0,0 +1,610 @@
+# app/pricing/metering.py
+"""
+Write-behind usage metering.
+
+Message/conversation usage is counted in memory (or Redis, shared by all
+workers) and answered from those counters on the chat path. A background
+loop flushes pending usage to the database in batches:
+
+- UsageLog rows are bulk-inserted with their original timestamps
+- TenantSubscription.messages_used_current_period is bumped with an atomic
+  UPDATE ... SET col = col + :delta, so concurrent flushers never lose counts
+
+Every counted event ends up as exactly one UsageLog row and one increment,
+so billing reconciles with the synchronous implementation:
+
+- a flush claims a batch by moving events to a processing list under a new
+  flush id; they leave Redis only once the rows are committed
+- the rows carry the flush id, so a batch left behind by a crash is resolved
+  from the database: committed batches are acknowledged, others requeued
+- acknowledging a batch (dropping it and decrementing the pending
+  conversation counters) happens once per flush id, in one Redis script
+ That holds only
+when pending events outlive the process and conversation windows are shared,
+i.e. with Redis: metering stays off (synchronous writes) until
+USAGE_METERING_REDIS_URL is set. The in-memory backend is an explicit opt-in
+for single-process development.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.pricing.models import TenantSubscription, UsageLog
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_WINDOW_SECONDS = 24 * 3600
+FLUSH_BATCH_SIZE = 1000
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ============================================================================
+# COUNTER BACKENDS
+# ============================================================================
+
+class InMemoryCounterBackend:
+    """Per-process counters guarded by a lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending_conversations: Dict[int, int] = {}
+        self._conversation_windows: Dict[int, float] = {}  # tenant_id -> window expiry (epoch)
+        self._events: List[dict] = []
+        self._batches: Dict[str, List[dict]] = {}  # flush id -> claimed events
+
+    def claim_conversation_window(self, tenant_id: int, now: float, window_seconds: int) -> bool:
+        """Start a new 24h conversation window unless one is open; True if this call opened it"""
+        with self._lock:
+            if self._conversation_windows.get(tenant_id, 0) > now:
+                return False
+            self._conversation_windows[tenant_id] = now + window_seconds
+            return True
+
+    def has_open_window(self, tenant_id: int, now: float) -> bool:
+        with self._lock:
+            return self._conversation_windows.get(tenant_id, 0) > now
+
+    def seed_conversation_window(self, tenant_id: int, expires_at: float):
+        with self._lock:
+            if self._conversation_windows.get(tenant_id, 0) < expires_at:
+                self._conversation_windows[tenant_id] = expires_at
+
+    def incr_pending_conversations(self, tenant_id: int, delta: int) -> int:
+        with self._lock:
+            value = self._pending_conversations.get(tenant_id, 0) + delta
+            if value:
+                self._pending_conversations[tenant_id] = value
+            else:
+                self._pending_conversations.pop(tenant_id, None)
+            return value
+
+    def get_pending_conversations(self, tenant_id: int) -> int:
+        with self._lock:
+            return self._pending_conversations.get(tenant_id, 0)
+
+    def push_events(self, events: List[dict]):
+        with self._lock:
+            self._events.extend(events)
+
+    def claim_events(self, limit: int) -> Tuple[str, List[dict]]:
+        flush_id = uuid.uuid4().hex
+        with self._lock:
+            batch, self._events = self._events[:limit], self._events[limit:]
+            if batch:
+                self._batches[flush_id] = batch
+            return flush_id, batch
+
+    def ack_batch(self, flush_id: str, conversation_deltas: Dict[int, int]) -> bool:
+        with self._lock:
+            if self._batches.pop(flush_id, None) is None:
+                return False
+            for tenant_id, delta in conversation_deltas.items():
+                value = self._pending_conversations.get(tenant_id, 0) - delta
+                if value:
+                    self._pending_conversations[tenant_id] = value
+                else:
+                    self._pending_conversations.pop(tenant_id, None)
+            return True
+
+    def requeue_batch(self, flush_id: str) -> int:
+        with self._lock:
+            batch = self._batches.pop(flush_id, None) or []
+            self._events[:0] = batch
+            return len(batch)
+
+    def unfinished_batches(self, lease_seconds: float) -> List[Tuple[str, List[dict]]]:
+        # Claims never outlive the process, and a flush resolves its own batch before returning
+        return []
+
+    def pending_event_count(self) -> int:
+        with self._lock:
+            return len(self._events) + sum(len(batch) for batch in self._batches.values())
+
+
+# KEYS: batches hash, processing list, pending hash; ARGV: flush id, then tenant id / delta pairs
+_ACK_BATCH = """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[3], ARGV[i], -tonumber(ARGV[i + 1]))
+end
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# KEYS: batches hash, processing list, events list; ARGV: flush id
+_REQUEUE_BATCH = """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+    redis.call('LPUSH', KEYS[3], items[i])
+end
+redis.call('DEL', KEYS[2])
+return #items
+"""
+
+
+class RedisCounterBackend:
+    """Counters shared across workers; windows use SET NX so only one worker opens a conversation
+
+    Flushes move events from the events list to usage_meter:processing:<flush id>
+    and register the batch in usage_meter:batches (owner, claim time) until it
+    is acknowledged or requeued.
+    """
+
+    PREFIX = "usage_meter"
+
+    def __init__(self, redis_url: str):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._ack_script = self.redis.register_script(_ACK_BATCH)
+        self._requeue_script = self.redis.register_script(_REQUEUE_BATCH)
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.PREFIX, *[str(p) for p in parts]])
+
+    def claim_conversation_window(self, tenant_id: int, now: float, window_seconds: int) -> bool:
+        return bool(self.redis.set(self._key("window", tenant_id), now, nx=True, ex=window_seconds))
+
+    def has_open_window(self, tenant_id: int, now: float) -> bool:
+        return bool(self.redis.exists(self._key("window", tenant_id)))
+
+    def seed_conversation_window(self, tenant_id: int, expires_at: float):
+        remaining = int(expires_at - time.time())
+        if remaining > 0:
+            self.redis.set(self._key("window", tenant_id), expires_at, nx=True, ex=remaining)
+
+    def incr_pending_conversations(self, tenant_id: int, delta: int) -> int:
+        return int(self.redis.hincrby(self._key("pending"), tenant_id, delta))
+
+    def get_pending_conversations(self, tenant_id: int) -> int:
+        return int(self.redis.hget(self._key("pending"), tenant_id) or 0)
+
+    def push_events(self, events: List[dict]):
+        if events:
+            self.redis.rpush(self._key("events"), *[json.dumps(e) for e in events])
+
+    def claim_events(self, limit: int) -> Tuple[str, List[dict]]:
+        flush_id = uuid.uuid4().hex
+        count = min(limit, int(self.redis.llen(self._key("events"))))
+        if not count:
+            return flush_id, []
+        # Registered before the move, so a crash mid-claim leaves a batch recovery can find
+        self.redis.hset(self._key("batches"), flush_id,
+                        json.dumps({"worker": self.worker_id, "claimed_at": time.time()}))
+        pipe = self.redis.pipeline(transaction=True)
+        for _ in range(count):
+            pipe.lmove(self._key("events"), self._key("processing", flush_id), "LEFT", "RIGHT")
+        raw_events = [e for e in pipe.execute() if e is not None]
+        if not raw_events:
+            self.redis.hdel(self._key("batches"), flush_id)
+        return flush_id, [json.loads(e) for e in raw_events]
+
+    def ack_batch(self, flush_id: str, conversation_deltas: Dict[int, int]) -> bool:
+        args = [flush_id]
+        for tenant_id, delta in conversation_deltas.items():
+            args += [tenant_id, delta]
+        keys = [self._key("batches"), self._key("processing", flush_id), self._key("pending")]
+        return bool(self._ack_script(keys=keys, args=args))
+
+    def requeue_batch(self, flush_id: str) -> int:
+        keys = [self._key("batches"), self._key("processing", flush_id), self._key("events")]
+        return int(self._requeue_script(keys=keys, args=[flush_id]))
+
+    def unfinished_batches(self, lease_seconds: float) -> List[Tuple[str, List[dict]]]:
+        """Batches of this worker (not in flight between flushes) or of anyone past the lease"""
+        now = time.time()
+        batches = []
+        for flush_id, raw in self.redis.hgetall(self._key("batches")).items():
+            try:
+                info = json.loads(raw)
+            except ValueError:
+                info = {}
+            if info.get("worker") != self.worker_id and now - info.get("claimed_at", 0) < lease_seconds:
+                continue
+            raw_events = self.redis.lrange(self._key("processing", flush_id), 0, -1)
+            batches.append((flush_id, [json.loads(e) for e in raw_events]))
+        return batches
+
+    def pending_event_count(self) -> int:
+        pending = int(self.redis.llen(self._key("events")))
+        for flush_id in self.redis.hkeys(self._key("batches")):
+            pending += int(self.redis.llen(self._key("processing", flush_id)))
+        return pending
+
+
+# ============================================================================
+# METER
+# ============================================================================
+
+@dataclass
+class TenantMeterSnapshot:
+    """Database view of a tenant's subscription, refreshed every SNAPSHOT_TTL"""
+    subscription_id: int
+    limit: Optional[int]  # None = unlimited / malformed plan
+    committed_used: int
+    period_end: datetime
+    is_super_tenant: bool
+    loaded_at: float
+
+
+class UsageMeter:
+    """Answers limit checks from counters and records usage for write-behind flushing"""
+
+    SNAPSHOT_TTL = 60
+    API_KEY_TTL = 300
+
+    def __init__(self, backend=None, flush_interval: Optional[float] = None):
+        self.backend = backend or InMemoryCounterBackend()
+        self.flush_interval = flush_interval or settings.USAGE_METERING_FLUSH_SECONDS
+        self._snapshots: Dict[int, TenantMeterSnapshot] = {}
+        self._api_keys: Dict[str, tuple] = {}  # api_key -> (tenant_id, cached_at)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.is_running = False
+        self.stats = {"recorded_events": 0, "flushed_events": 0, "flushes": 0, "flush_failures": 0}
+
+    # ----- snapshots -----
+
+    def _get_snapshot(self, db: Session, tenant_id: int, force: bool = False) -> Optional[TenantMeterSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(tenant_id)
+        if snapshot and not force and time.time() - snapshot.loaded_at < self.SNAPSHOT_TTL:
+            return snapshot
+        return self._load_snapshot(db, tenant_id)
+
+    def _load_snapshot(self, db: Session, tenant_id: int) -> Optional[TenantMeterSnapshot]:
+        from app.pricing.service import PricingService
+        from app.tenants.models import Tenant
+
+        pricing_service = PricingService(db)
+        subscription = pricing_service.get_tenant_subscription(tenant_id)
+        if not subscription or not subscription.plan:
+            # Let the synchronous path heal missing subscriptions/plans
+            return None
+
+        limit = getattr(subscription.plan, 'max_messages_monthly', None)
+        tenant = db.query(Tenant.is_super_tenant, Tenant.is_active).filter(Tenant.id == tenant_id).first()
+
+        snapshot = TenantMeterSnapshot(
+            subscription_id=subscription.id,
+            limit=limit,
+            committed_used=subscription.messages_used_current_period or 0,
+            period_end=pricing_service._ensure_timezone_aware(subscription.current_period_end),
+            is_super_tenant=bool(tenant and tenant.is_super_tenant and tenant.is_active),
+            loaded_at=time.time()
+        )
+
+        # Seed the 24h conversation window from the last counted conversation
+        if not self.backend.has_open_window(tenant_id, time.time()):
+            last_conversation = db.query(UsageLog.created_at).filter(
+                UsageLog.tenant_id == tenant_id,
+                UsageLog.usage_type == "conversation",
+                UsageLog.created_at > _utc_now() - timedelta(seconds=CONVERSATION_WINDOW_SECONDS)
+            ).order_by(UsageLog.created_at.desc()).first()
+            if last_conversation:
+                last_at = pricing_service._ensure_timezone_aware(last_conversation.created_at)
+                self.backend.seed_conversation_window(tenant_id, last_at.timestamp() + CONVERSATION_WINDOW_SECONDS)
+
+        with self._lock:
+            self._snapshots[tenant_id] = snapshot
+        return snapshot
+
+    def invalidate(self, tenant_id: int):
+        """Drop cached subscription state (plan change, period reset, manual adjustment)"""
+        with self._lock:
+            self._snapshots.pop(tenant_id, None)
+
+    def _roll_period_if_needed(self, db: Session, tenant_id: int, snapshot: TenantMeterSnapshot) -> Optional[TenantMeterSnapshot]:
+        if _utc_now() <= snapshot.period_end:
+            return snapshot
+
+        from app.pricing.service import PricingService
+        # Pending usage belongs to the period that just ended
+        self.flush(db)
+        pricing_service = PricingService(db)
+        subscription = pricing_service.get_tenant_subscription(tenant_id)
+        if subscription and _utc_now() > pricing_service._ensure_timezone_aware(subscription.current_period_end):
+            pricing_service.reset_usage_for_new_period(subscription)
+        return self._load_snapshot(db, tenant_id)
+
+    # ----- API key cache (middleware) -----
+
+    def get_cached_tenant_id(self, api_key: str) -> Optional[int]:
+        with self._lock:
+            cached = self._api_keys.get(api_key)
+        if cached and time.time() - cached[1] < self.API_KEY_TTL:
+            return cached[0]
+        return None
+
+    def cache_tenant_id(self, api_key: str, tenant_id: int):
+        with self._lock:
+            self._api_keys[api_key] = (tenant_id, time.time())
+
+    # ----- limit checks -----
+
+    def used_conversations(self, tenant_id: int, snapshot: TenantMeterSnapshot) -> int:
+        return snapshot.committed_used + self.backend.get_pending_conversations(tenant_id)
+
+    def check_limit(self, db: Session, tenant_id: int) -> Optional[bool]:
+        """True/False from counters, or None when the synchronous check must decide"""
+        snapshot = self._get_snapshot(db, tenant_id)
+        if not snapshot:
+            return None
+        snapshot = self._roll_period_if_needed(db, tenant_id, snapshot)
+        if not snapshot:
+            return None
+        if snapshot.limit is None:
+            return True
+        return self.used_conversations(tenant_id, snapshot) < snapshot.limit
+
+    def check_limit_cached(self, tenant_id: int) -> Optional[bool]:
+        """Limit check without touching the database; None if no fresh snapshot is cached"""
+        with self._lock:
+            snapshot = self._snapshots.get(tenant_id)
+        if not snapshot or time.time() - snapshot.loaded_at >= self.SNAPSHOT_TTL or _utc_now() > snapshot.period_end:
+            return None
+        if snapshot.limit is None:
+            return True
+        return self.used_conversations(tenant_id, snapshot) < snapshot.limit
+
+    def is_super_tenant(self, db: Session, tenant_id: int) -> Optional[bool]:
+        snapshot = self._get_snapshot(db, tenant_id)
+        return snapshot.is_super_tenant if snapshot else None
+
+    # ----- recording -----
+
+    def record_message(self, db: Session, tenant_id: int, count: int = 1) -> Optional[bool]:
+        """
+        Write-behind equivalent of PricingService.log_message_usage.
+        Returns None when no snapshot can be built, so the caller falls back.
+        """
+        snapshot = self._get_snapshot(db, tenant_id)
+        if not snapshot:
+            return None
+        snapshot = self._roll_period_if_needed(db, tenant_id, snapshot)
+        if not snapshot:
+            return None
+
+        now = _utc_now()
+        events = []
+
+        # A conversation is any length of interaction within 24 hours
+        if not self.backend.has_open_window(tenant_id, now.timestamp()):
+            if snapshot.limit is not None and self.used_conversations(tenant_id, snapshot) >= snapshot.limit:
+                return False
+            if self.backend.claim_conversation_window(tenant_id, now.timestamp(), CONVERSATION_WINDOW_SECONDS):
+                self.backend.incr_pending_conversations(tenant_id, 1)
+                events.append(self._event(tenant_id, snapshot, "conversation", 1, now))
+
+        # Always log individual message for tracking
+        events.append(self._event(tenant_id, snapshot, "message", count, now))
+        self.backend.push_events(events)
+        self.stats["recorded_events"] += len(events)
+        return True
+
+    @staticmethod
+    def _event(tenant_id: int, snapshot: TenantMeterSnapshot, usage_type: str, count: int, now: datetime) -> dict:
+        return {
+            "tenant_id": tenant_id,
+            "subscription_id": snapshot.subscription_id,
+            "usage_type": usage_type,
+            "count": count,
+            "created_at": now.isoformat(),
+        }
+
+    def pending_conversations(self, tenant_id: int) -> int:
+        return self.backend.get_pending_conversations(tenant_id)
+
+    # ----- flushing -----
+
+    def flush(self, db: Session) -> int:
+        """Write pending usage to the database; returns the number of events flushed"""
+        flushed = 0
+        with self._flush_lock:
+            flushed += self._recover_batches(db)
+            while True:
+                flush_id, events = self.backend.claim_events(FLUSH_BATCH_SIZE)
+                if not events:
+                    break
+                try:
+                    self._write_batch(db, flush_id, events)
+                except Exception as e:
+                    db.rollback()
+                    self.stats["flush_failures"] += 1
+                    logger.error(f"💥 Usage metering flush {flush_id} failed ({len(events)} events): {e}")
+                    # The commit may have gone through before the error: resolve from the database
+                    self._resolve_batch(db, flush_id, events)
+                    break
+                self._ack(flush_id, events)
+                flushed += len(events)
+
+        if flushed:
+            self.stats["flushed_events"] += flushed
+            self.stats["flushes"] += 1
+            logger.info(f"📊 Flushed {flushed} usage events")
+        return flushed
+
+    @staticmethod
+    def _conversation_deltas(events: List[dict]) -> Dict[tuple, int]:
+        """(tenant_id, subscription_id) -> conversations in the batch"""
+        deltas: Dict[tuple, int] = {}
+        for event in events:
+            if event["usage_type"] == "conversation":
+                key = (event["tenant_id"], event["subscription_id"])
+                deltas[key] = deltas.get(key, 0) + event["count"]
+        return deltas
+
+    def _write_batch(self, db: Session, flush_id: str, events: List[dict]):
+        rows = [{
+            "subscription_id": event["subscription_id"],
+            "tenant_id": event["tenant_id"],
+            "usage_type": event["usage_type"],
+            "count": event["count"],
+            "created_at": datetime.fromisoformat(event["created_at"]),
+            "flush_id": flush_id,
+        } for event in events]
+
+        db.bulk_insert_mappings(UsageLog, rows)
+        for (_, subscription_id), delta in self._conversation_deltas(events).items():
+            db.execute(
+                update(TenantSubscription)
+                .where(TenantSubscription.id == subscription_id)
+                .values(messages_used_current_period=TenantSubscription.messages_used_current_period + delta)
+            )
+        db.commit()
+
+    def _ack(self, flush_id: str, events: List[dict]):
+        """Drop a committed batch and move its conversations from pending to committed, once"""
+        tenant_deltas: Dict[int, int] = {}
+        for (tenant_id, _), delta in self._conversation_deltas(events).items():
+            tenant_deltas[tenant_id] = tenant_deltas.get(tenant_id, 0) + delta
+        if not self.backend.ack_batch(flush_id, tenant_deltas):
+            return  # already acknowledged (or requeued) by another flusher
+        for tenant_id, delta in tenant_deltas.items():
+            with self._lock:
+                snapshot = self._snapshots.get(tenant_id)
+                if snapshot:
+                    snapshot.committed_used += delta
+
+    def _resolve_batch(self, db: Session, flush_id: str, events: List[dict]) -> bool:
+        """Acknowledge a batch whose rows are committed, requeue it otherwise; True if committed"""
+        try:
+            committed = db.query(UsageLog.id).filter(UsageLog.flush_id == flush_id).first() is not None
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Could not check usage flush {flush_id}, left for recovery: {e}")
+            return False
+        if committed:
+            self._ack(flush_id, events)
+        else:
+            requeued = self.backend.requeue_batch(flush_id)
+            if requeued:
+                logger.warning(f"🔁 Requeued {requeued} usage events from flush {flush_id}")
+        return committed
+
+    def _recover_batches(self, db: Session) -> int:
+        """Resolve batches left by a crashed or failed flush; returns events found committed"""
+        recovered = 0
+        for flush_id, events in self.backend.unfinished_batches(settings.USAGE_METERING_BATCH_LEASE_SECONDS):
+            if self._resolve_batch(db, flush_id, events):
+                recovered += len(events)
+        return recovered
+
+    async def run_flush_loop(self):
+        """Background loop started from main.py"""
+        from app.database import SessionLocal
+
+        if self.is_running:
+            return
+        self.is_running = True
+        logger.info(f"📊 Usage metering started (flush every {self.flush_interval}s)")
+
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self._flush_with_session, SessionLocal)
+
+    def _flush_with_session(self, session_factory):
+        db = session_factory()
+        try:
+            self.flush(db)
+        except Exception as e:
+            logger.error(f"💥 Usage metering flush error: {e}")
+        finally:
+            db.close()
+
+    def stop(self):
+        """Stop the loop and flush whatever is pending"""
+        from app.database import SessionLocal
+
+        self.is_running = False
+        self._flush_with_session(SessionLocal)
+        logger.info("📊 Usage metering stopped")
+
+    def get_status(self) -> dict:
+        return {
+            "enabled": is_metering_enabled(),
+            "backend": type(self.backend).__name__,
+            "is_running": self.is_running,
+            "pending_events": self.backend.pending_event_count(),
+            "cached_tenants": len(self._snapshots),
+            **self.stats,
+        }
+
+
+# Global meter instance
+_global_meter: Optional[UsageMeter] = None
+
+
+def get_usage_meter() -> UsageMeter:
+    """Get the process-wide usage meter"""
+    global _global_meter
+    if _global_meter is None:
+        if settings.USAGE_METERING_BACKEND == "memory":
+            logger.warning("⚠️ Usage metering uses in-memory counters: per process, unflushed usage is lost on restart")
+            backend = InMemoryCounterBackend()
+        else:
+            backend = RedisCounterBackend(settings.USAGE_METERING_REDIS_URL)
+        _global_meter = UsageMeter(backend)
+    return _global_meter
+
+
+def is_metering_enabled() -> bool:
+    """Metering needs Redis unless the in-memory backend is chosen explicitly"""
+    if not settings.USAGE_METERING_ENABLED:
+        return False
+    if settings.USAGE_METERING_BACKEND == "memory":
+        return True
+    return bool(settings.USAGE_METERING_REDIS_URL)
+
+
+async def start_usage_metering():
+    """Start the flush loop - called from main.py startup"""
+    if is_metering_enabled():
+        await get_usage_meter().run_flush_loop()
+
+
+def stop_usage_metering():
+    """Stop the flush loop and flush pending usage"""
+    if _global_meter:
+        _global_meter.stop()
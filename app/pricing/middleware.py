@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.pricing.service import PricingService
+from app.pricing.metering import get_usage_meter, is_metering_enabled
 from app.tenants.router import get_tenant_from_api_key
 import logging
 
@@ -84,11 +85,26 @@ class PricingMiddleware:
             # Skip if no API key (might be admin endpoint)
             return
         
+        # Answer from the usage meter without a database session when possible
+        if is_metering_enabled():
+            meter = get_usage_meter()
+            tenant_id = meter.get_cached_tenant_id(api_key)
+            allowed = meter.check_limit_cached(tenant_id) if tenant_id else None
+            if allowed is not None:
+                if not allowed:
+                    raise HTTPException(
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail="Message limit exceeded for your current plan. Please upgrade to continue."
+                    )
+                return
+        
         # Get database session
         db = next(get_db())
         try:
             # Get tenant from API key
             tenant = get_tenant_from_api_key(api_key, db)
+            if is_metering_enabled():
+                get_usage_meter().cache_tenant_id(api_key, tenant.id)
             
             # Check and log message usage
             pricing_service = PricingService(db)
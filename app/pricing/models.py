@@ -133,6 +133,8 @@ class UsageLog(Base):
     session_id = Column(String, nullable=True)  # Link to chat session if applicable
     user_identifier = Column(String, nullable=True)  # User who triggered the usage
     platform = Column(String, nullable=True)  # "web", "slack", "discord", etc.
+    # Write-behind metering batch that wrote the row (app/pricing/metering.py)
+    flush_id = Column(String(32), nullable=True, index=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
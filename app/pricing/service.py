@@ -16,6 +16,7 @@ from app.pricing.schemas import (
     PricingPlanCreate, SubscriptionCreate, UsageStatsOut, PlanType
 )
 from app.tenants.models import Tenant
+from app.pricing.metering import get_usage_meter, is_metering_enabled
 
 
 class PricingService:
@@ -230,6 +231,15 @@ class PricingService:
         """
         Check if tenant can send more messages (conversations) - WITH PROPER NULL CHECKS
         """
+        # Answer from the usage meter's counters when it has the tenant's subscription cached
+        if is_metering_enabled():
+            try:
+                allowed = get_usage_meter().check_limit(self.db, tenant_id)
+                if allowed is not None:
+                    return allowed
+            except Exception as e:
+                logger.error(f"Usage meter limit check failed for tenant {tenant_id}, using database: {e}")
+        
         try:
             subscription = self.get_tenant_subscription(tenant_id)
             
@@ -241,8 +251,6 @@ class PricingService:
             
             # CRITICAL FIX: Check if plan exists
             if not subscription.plan:
-                import logging
-                logger = logging.getLogger(__name__)
                 logger.error(f"🚨 No plan found for tenant {tenant_id} subscription ID {subscription.id}")
                 
                 # Try to assign free plan
@@ -275,8 +283,6 @@ class PricingService:
             return subscription.messages_used_current_period < subscription.plan.max_messages_monthly
             
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"💥 Error checking message limit for tenant {tenant_id}: {e}")
             import traceback
             logger.error(traceback.format_exc())
@@ -298,7 +304,18 @@ class PricingService:
         """
         Log message usage and check if limit is exceeded - WITH PROPER NULL CHECKS
         Note: A conversation is any length of interaction within 24 hours
+        
+        With metering enabled this only touches in-memory counters; the usage
+        meter flushes UsageLog rows and the period counter in batches.
         """
+        if is_metering_enabled():
+            try:
+                recorded = get_usage_meter().record_message(self.db, tenant_id, count)
+                if recorded is not None:
+                    return recorded
+            except Exception as e:
+                logger.error(f"Usage meter failed for tenant {tenant_id}, logging synchronously: {e}")
+        
         try:
             subscription = self.get_tenant_subscription(tenant_id)
             
@@ -365,8 +382,6 @@ class PricingService:
             return True
             
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"💥 Error logging message usage for tenant {tenant_id}: {e}")
             import traceback
             logger.error(traceback.format_exc())
@@ -410,6 +425,8 @@ class PricingService:
             subscription.current_period_end = subscription.current_period_start + timedelta(days=365)
         
         self.db.commit()
+        if is_metering_enabled():
+            get_usage_meter().invalidate(subscription.tenant_id)
     
     def get_usage_stats(self, tenant_id: int) -> UsageStatsOut:
         """Get current usage statistics for tenant"""
@@ -426,14 +443,19 @@ class PricingService:
         if now > period_end:
             self.reset_usage_for_new_period(subscription)
         
+        # Include usage the meter has recorded but not flushed yet
+        messages_used = subscription.messages_used_current_period or 0
+        if is_metering_enabled():
+            messages_used += get_usage_meter().pending_conversations(tenant_id)
+        
         return UsageStatsOut(
-            messages_used=subscription.messages_used_current_period,
+            messages_used=messages_used,
             messages_limit=subscription.plan.max_messages_monthly,
             integrations_used=subscription.integrations_count,
             integrations_limit=subscription.plan.max_integrations,
             period_start=subscription.current_period_start,
             period_end=subscription.current_period_end,
-            can_send_messages=subscription.messages_used_current_period < subscription.plan.max_messages_monthly,
+            can_send_messages=messages_used < subscription.plan.max_messages_monthly,
             can_add_integrations=subscription.plan.max_integrations == -1 or subscription.integrations_count < subscription.plan.max_integrations
         )
     
@@ -448,6 +470,10 @@ class PricingService:
                 detail="Plan not found"
             )
         
+        # Settle metered usage against the old subscription before switching
+        if is_metering_enabled():
+            get_usage_meter().flush(self.db)
+        
         if current_subscription:
             # Deactivate current subscription
             current_subscription.is_active = False
@@ -470,6 +496,9 @@ class PricingService:
         self.db.commit()
         self.db.refresh(new_subscription)
         
+        if is_metering_enabled():
+            get_usage_meter().invalidate(tenant_id)
+        
         return new_subscription
     
     def check_feature_access(self, tenant_id: int, feature: str) -> bool:
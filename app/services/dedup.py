@@ -0,0 +1,165 @@
+"""
+Redelivery deduplication for bot platforms.
+
+Slack retries events it thinks timed out, the Discord gateway replays events
+after a RESUME and Telegram re-sends updates that were not acknowledged.
+Handlers claim an id before doing any work; only the first claim succeeds:
+
+    dedup = get_dedup_store("slack", ttl_seconds=600)
+    if not dedup.claim(f"{tenant_id}:{message_id}"):
+        return  # already handled here or on another worker
+
+The in-memory store is a ring of per-bucket sets: a claim goes into the set of
+the current time bucket and a bucket is discarded wholesale when the ring wraps
+around to it, so expiry never scans ids. With DEDUP_BACKEND=redis every worker
+claims through SET NX EX, so a retry landing on another process is caught too.
+"""
+import math
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = 10
+
+
+class TimeBucketedDedupStore:
+    """Ids remembered for at least ttl_seconds (and under ttl_seconds + one bucket)"""
+
+    backend = "memory"
+
+    def __init__(self, ttl_seconds: float, buckets: int = DEFAULT_BUCKETS):
+        self.ttl_seconds = ttl_seconds
+        self.bucket_seconds = ttl_seconds / buckets
+        # One extra slot so a full ttl_seconds of history survives the current partial bucket
+        self._ring: List[Tuple[int, Set[str]]] = [(-1, set()) for _ in range(buckets + 1)]
+        self._lock = threading.Lock()
+        self.claims = 0
+        self.duplicates = 0
+
+    def _epoch(self, now: Optional[float] = None) -> int:
+        return int((now if now is not None else time.time()) // self.bucket_seconds)
+
+    def _live_sets(self, epoch: int):
+        oldest = epoch - len(self._ring) + 1
+        for slot_epoch, ids in self._ring:
+            if slot_epoch >= oldest:
+                yield ids
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            return any(key in ids for ids in self._live_sets(self._epoch()))
+
+    def claim(self, key: str) -> bool:
+        """Record key; False if it was already claimed within the TTL"""
+        epoch = self._epoch()
+        with self._lock:
+            if any(key in ids for ids in self._live_sets(epoch)):
+                self.duplicates += 1
+                return False
+
+            slot = epoch % len(self._ring)
+            slot_epoch, ids = self._ring[slot]
+            if slot_epoch != epoch:
+                # Expire the whole bucket this slot held on the previous lap
+                ids = set()
+                self._ring[slot] = (epoch, ids)
+            ids.add(key)
+            self.claims += 1
+            return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live = sum(len(ids) for ids in self._live_sets(self._epoch()))
+        return {
+            "backend": self.backend,
+            "ttl_seconds": self.ttl_seconds,
+            "tracked_ids": live,
+            "claims": self.claims,
+            "duplicates": self.duplicates,
+        }
+
+
+class RedisDedupStore:
+    """Cross-worker dedup: each claim is one SET NX EX round trip"""
+
+    backend = "redis"
+
+    def __init__(self, redis_client, namespace: str, ttl_seconds: float):
+        self.redis = redis_client
+        self.namespace = namespace
+        self.ttl_seconds = max(1, math.ceil(ttl_seconds))
+        # Used when Redis is unreachable so a blip degrades to per-process dedup
+        self._fallback = TimeBucketedDedupStore(ttl_seconds)
+        self.claims = 0
+        self.duplicates = 0
+
+    def _key(self, key: str) -> str:
+        return f"dedup:{self.namespace}:{key}"
+
+    def seen(self, key: str) -> bool:
+        try:
+            return bool(self.redis.exists(self._key(key)))
+        except Exception as e:
+            logger.warning(f"⚠️ Redis dedup lookup failed, using local store: {e}")
+            return self._fallback.seen(key)
+
+    def claim(self, key: str) -> bool:
+        try:
+            claimed = bool(self.redis.set(self._key(key), 1, nx=True, ex=self.ttl_seconds))
+        except Exception as e:
+            logger.warning(f"⚠️ Redis dedup claim failed, using local store: {e}")
+            return self._fallback.claim(key)
+
+        if claimed:
+            self.claims += 1
+        else:
+            self.duplicates += 1
+        return claimed
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "ttl_seconds": self.ttl_seconds,
+            "claims": self.claims,
+            "duplicates": self.duplicates,
+            "fallback": self._fallback.stats(),
+        }
+
+
+_stores: Dict[str, object] = {}
+_stores_lock = threading.Lock()
+
+
+def _create_store(namespace: str, ttl_seconds: float):
+    backend = (settings.DEDUP_BACKEND or "memory").lower()
+    if backend == "redis":
+        try:
+            import redis
+            client = redis.Redis.from_url(settings.DEDUP_REDIS_URL, socket_timeout=0.5)
+            client.ping()
+            logger.info(f"✅ Using Redis dedup store for {namespace}")
+            return RedisDedupStore(client, namespace, ttl_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis dedup unavailable for {namespace}, using in-memory store: {e}")
+    return TimeBucketedDedupStore(ttl_seconds)
+
+
+def get_dedup_store(namespace: str, ttl_seconds: float = 600):
+    """One store per namespace (platform); the TTL of the first caller wins"""
+    store = _stores.get(namespace)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(namespace)
+            if store is None:
+                store = _stores[namespace] = _create_store(namespace, ttl_seconds)
+    return store
+
+
+def get_dedup_stats() -> Dict[str, Dict]:
+    return {namespace: store.stats() for namespace, store in _stores.items()}
@@ -0,0 +1,358 @@
+"""
+Process-wide outbound HTTP client.
+
+Every third-party call (Telegram, Instagram Graph API, Calendly, Flutterwave,
+IP geolocation) goes through one pair of httpx clients, so connections are
+kept alive per host instead of being opened per update or per call.
+httpx async connections and asyncio semaphores belong to one event loop, so
+the async client and the provider semaphores are kept per running loop (bots or
+CLIs on their own loop get their own); close_http_client() at shutdown closes
+them all.
+Each provider has a policy with its own concurrency cap, timeout and retry
+budget, and per-host latency/error counters are kept for /health/outbound-http.
+
+    client = get_http_client()
+    response = await client.request("telegram", "POST", url, json=payload)
+    response = client.request_sync("calendly", "GET", url, headers=headers)
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional, FrozenSet
+from urllib.parse import urlsplit
+
+import httpx
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+LATENCY_SAMPLES = 512  # recent latencies kept per host for percentiles
+MAX_RETRY_AFTER_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class ProviderPolicy:
+    name: str
+    max_concurrency: int = 20
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({429, 502, 503, 504}))
+
+
+PROVIDER_POLICIES: Dict[str, ProviderPolicy] = {
+    "default": ProviderPolicy("default"),
+    # Telegram allows ~30 msg/s per bot; 429s carry retry_after
+    "telegram": ProviderPolicy("telegram", max_concurrency=30, timeout=30.0, max_retries=3),
+    "instagram": ProviderPolicy("instagram", max_concurrency=10, timeout=30.0),
+    "calendly": ProviderPolicy("calendly", max_concurrency=5, timeout=15.0),
+    # Payment calls are never retried automatically past connect failures / 429
+    "flutterwave": ProviderPolicy("flutterwave", max_concurrency=5, timeout=30.0, max_retries=1),
+    "geolocation": ProviderPolicy("geolocation", max_concurrency=5, timeout=5.0, connect_timeout=3.0,
+                                  max_retries=0),
+    # The email outbox schedules its own retries with idempotency keys
+    "resend": ProviderPolicy("resend", max_concurrency=2, timeout=30.0, max_retries=0),
+}
+
+
+def get_provider_policy(provider: str) -> ProviderPolicy:
+    return PROVIDER_POLICIES.get(provider) or PROVIDER_POLICIES["default"]
+
+
+class HostMetrics:
+    """Request/error counters and a bounded latency sample for one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.status_counts: Dict[int, int] = {}
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, latency_ms: float, status_code: Optional[int]):
+        self.requests += 1
+        self.latencies_ms.append(latency_ms)
+        if status_code is None or status_code >= 500:
+            self.errors += 1
+        if status_code is not None:
+            self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+
+    def snapshot(self) -> Dict:
+        samples = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "status_counts": dict(self.status_counts),
+        }
+
+
+def _http2_available() -> bool:
+    if not settings.OUTBOUND_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("⚠️ OUTBOUND_HTTP2 is set but the h2 package is missing; using HTTP/1.1")
+        return False
+
+
+@dataclass
+class _LoopResources:
+    """The async client and provider semaphores of one event loop"""
+    client: httpx.AsyncClient
+    semaphores: Dict[str, asyncio.Semaphore] = field(default_factory=dict)
+
+
+class OutboundHTTPClient:
+    """Shared keep-alive httpx clients with per-provider limits, retries and per-host metrics"""
+
+    def __init__(self):
+        self.http2 = _http2_available()
+        # Weak keys: a loop that is gone takes its entry with it
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopResources]" = \
+            weakref.WeakKeyDictionary()
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._metrics: Dict[str, HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.OUTBOUND_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OUTBOUND_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.OUTBOUND_HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def _new_async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(http2=self.http2, limits=self._limits())
+
+    def _loop_resources(self) -> _LoopResources:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            resources = self._loops.get(loop)
+            if resources is None:
+                resources = self._loops[loop] = _LoopResources(self._new_async_client())
+            elif resources.client.is_closed:
+                resources.client = self._new_async_client()
+            return resources
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """The running loop's client"""
+        return self._loop_resources().client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                # Sync callers run in worker threads; HTTP/1.1 keeps that path simple
+                self._sync_client = httpx.Client(limits=self._limits())
+            return self._sync_client
+
+    def _async_semaphore(self, policy: ProviderPolicy) -> asyncio.Semaphore:
+        """The running loop's semaphore for the provider (the cap applies per loop)"""
+        semaphores = self._loop_resources().semaphores
+        semaphore = semaphores.get(policy.name)
+        if semaphore is None:
+            semaphore = semaphores[policy.name] = asyncio.Semaphore(policy.max_concurrency)
+        return semaphore
+
+    def _sync_semaphore(self, policy: ProviderPolicy) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._sync_semaphores.get(policy.name)
+            if semaphore is None:
+                semaphore = self._sync_semaphores[policy.name] = threading.BoundedSemaphore(policy.max_concurrency)
+            return semaphore
+
+    def _host_metrics(self, url: str) -> HostMetrics:
+        host = urlsplit(url).netloc or "unknown"
+        with self._lock:
+            metrics = self._metrics.get(host)
+            if metrics is None:
+                metrics = self._metrics[host] = HostMetrics()
+            return metrics
+
+    # ----- retry policy -----
+
+    @staticmethod
+    def _should_retry_error(method: str, error: Exception) -> bool:
+        # A connect failure never reached the server, so even POSTs are safe to resend
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        return method in IDEMPOTENT_METHODS and isinstance(error, httpx.TransportError)
+
+    @staticmethod
+    def _should_retry_status(method: str, policy: ProviderPolicy, status_code: int) -> bool:
+        if status_code not in policy.retry_statuses:
+            return False
+        # 429 means the request was rejected before processing
+        return status_code == 429 or method in IDEMPOTENT_METHODS
+
+    @staticmethod
+    def _retry_delay(policy: ProviderPolicy, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is None and response.status_code == 429:
+                try:
+                    # Telegram reports it in the body as parameters.retry_after
+                    retry_after = response.json().get("parameters", {}).get("retry_after")
+                except Exception:
+                    retry_after = None
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+                except (TypeError, ValueError):
+                    pass
+        delay = min(policy.backoff_base * (2 ** attempt), policy.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    def _timeout(self, policy: ProviderPolicy, timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(timeout or policy.timeout, connect=policy.connect_timeout)
+
+    # ----- requests -----
+
+    async def request(self, provider: str, method: str, url: str,
+                      timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Send a request under the provider's policy; raises httpx errors once retries are exhausted"""
+        policy = get_provider_policy(provider)
+        method = method.upper()
+        metrics = self._host_metrics(url)
+        request_timeout = self._timeout(policy, timeout)
+
+        attempt = 0
+        while True:
+            response = None
+            started = time.perf_counter()
+            try:
+                async with self._async_semaphore(policy):
+                    response = await self.async_client.request(method, url, timeout=request_timeout, **kwargs)
+                metrics.record((time.perf_counter() - started) * 1000, response.status_code)
+            except httpx.HTTPError as e:
+                metrics.record((time.perf_counter() - started) * 1000, None)
+                if attempt >= policy.max_retries or not self._should_retry_error(method, e):
+                    raise
+            else:
+                if attempt >= policy.max_retries or not self._should_retry_status(method, policy, response.status_code):
+                    return response
+
+            delay = self._retry_delay(policy, attempt, response)
+            attempt += 1
+            metrics.retries += 1
+            logger.warning(f"🔁 Retrying {provider} {method} {urlsplit(url).path} "
+                           f"(attempt {attempt}/{policy.max_retries}) in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def request_sync(self, provider: str, method: str, url: str,
+                     timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Blocking variant for sync services (Calendly, Flutterwave, Instagram Graph API)"""
+        policy = get_provider_policy(provider)
+        method = method.upper()
+        metrics = self._host_metrics(url)
+        request_timeout = self._timeout(policy, timeout)
+
+        attempt = 0
+        while True:
+            response = None
+            started = time.perf_counter()
+            try:
+                with self._sync_semaphore(policy):
+                    response = self.sync_client.request(method, url, timeout=request_timeout, **kwargs)
+                metrics.record((time.perf_counter() - started) * 1000, response.status_code)
+            except httpx.HTTPError as e:
+                metrics.record((time.perf_counter() - started) * 1000, None)
+                if attempt >= policy.max_retries or not self._should_retry_error(method, e):
+                    raise
+            else:
+                if attempt >= policy.max_retries or not self._should_retry_status(method, policy, response.status_code):
+                    return response
+
+            delay = self._retry_delay(policy, attempt, response)
+            attempt += 1
+            metrics.retries += 1
+            logger.warning(f"🔁 Retrying {provider} {method} {urlsplit(url).path} "
+                           f"(attempt {attempt}/{policy.max_retries}) in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            hosts = {host: metrics.snapshot() for host, metrics in self._metrics.items()}
+            loops = len(self._loops)
+        return {
+            "http2": self.http2,
+            "event_loops": loops,
+            "hosts": hosts,
+            "providers": {
+                name: {"max_concurrency": policy.max_concurrency, "max_retries": policy.max_retries,
+                       "timeout": policy.timeout}
+                for name, policy in PROVIDER_POLICIES.items()
+            },
+        }
+
+    async def close_loop(self):
+        """Close the running loop's client; call before a private event loop ends"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            resources = self._loops.pop(loop, None)
+        if resources is not None and not resources.client.is_closed:
+            await resources.client.aclose()
+
+    async def close(self):
+        """Close every loop's client and the sync client"""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            loops = list(self._loops.items())
+            self._loops.clear()
+        for loop, resources in loops:
+            if resources.client.is_closed:
+                continue
+            try:
+                if loop is current:
+                    await resources.client.aclose()
+                elif loop.is_running():
+                    closing = asyncio.run_coroutine_threadsafe(resources.client.aclose(), loop)
+                    await asyncio.wait_for(asyncio.wrap_future(closing), timeout=5)
+                # A closed loop's connections went with it
+            except Exception as e:
+                logger.warning(f"⚠️ Could not close an outbound HTTP client: {e}")
+        with self._lock:
+            if self._sync_client is not None and not self._sync_client.is_closed:
+                self._sync_client.close()
+
+
+_global_http_client: Optional[OutboundHTTPClient] = None
+
+
+def get_http_client() -> OutboundHTTPClient:
+    global _global_http_client
+    if _global_http_client is None:
+        _global_http_client = OutboundHTTPClient()
+    return _global_http_client
+
+
+async def close_http_client():
+    global _global_http_client
+    if _global_http_client is not None:
+        await _global_http_client.close()
+        _global_http_client = None
+        logger.info("🛑 Outbound HTTP client closed")
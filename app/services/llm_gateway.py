@@ -0,0 +1,442 @@
+"""
+Shared gateway for chat-model calls.
+
+Components ask the gateway for a model handle instead of building ChatOpenAI:
+
+    self.llm = get_llm_gateway().chat_model("escalation", temperature=0.2, tenant_id=tenant_id)
+    result = self.llm.invoke(prompt)          # sync callers
+    result = await self.llm.ainvoke(prompt)   # async callers
+
+Every call runs on one gateway event loop (its own thread), so sync and async
+callers share the same limits:
+
+- a global cap (LLM_MAX_CONCURRENT) and a per-tenant cap
+  (LLM_MAX_CONCURRENT_PER_TENANT) on calls in flight; waiting for a slot is
+  bounded by LLM_QUEUE_TIMEOUT_SECONDS
+- identical prompts to the same model/temperature that are already in flight
+  are coalesced onto the first call's result
+- each call is bounded by LLM_TIMEOUT_SECONDS; timeouts and upstream errors
+  feed a per-model circuit breaker that fails calls fast while the provider
+  is down and lets a single probe through after LLM_BREAKER_RESET_SECONDS
+- latency, queue wait, errors and token usage are recorded per call site
+
+Failures surface as LLMGatewayError subclasses; call sites already fall back
+on exceptions, so an open circuit means an immediate fallback rather than a
+pile of blocked requests.
+
+Tests and local runs can plug in a fake chat model:
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    set_llm_gateway(LLMGateway(model_factory=lambda model, temperature: FakeListChatModel(responses=["ok"])))
+"""
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+LATENCY_SAMPLES = 512
+# Upstream errors that say the request was bad, not that the provider is unhealthy
+NON_TRIPPING_STATUS = {400, 404, 413, 422}
+
+
+class LLMGatewayError(Exception):
+    """Base class for calls the gateway refused or gave up on"""
+
+
+class LLMCircuitOpenError(LLMGatewayError):
+    pass
+
+
+class LLMGatewayBusyError(LLMGatewayError):
+    pass
+
+
+class LLMGatewayTimeoutError(LLMGatewayError):
+    pass
+
+
+def _default_model_factory(model: str, temperature: float):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model_name=model,
+        temperature=temperature,
+        openai_api_key=settings.OPENAI_API_KEY,
+        max_retries=settings.LLM_UPSTREAM_RETRIES,
+    )
+
+
+def _prompt_text(prompt: Any) -> str:
+    """Stable text form of a prompt, used as the coalescing key"""
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_messages"):
+        prompt = prompt.to_messages()
+    if isinstance(prompt, (list, tuple)):
+        return "\x1e".join(
+            f"{getattr(message, 'type', type(message).__name__)}:{getattr(message, 'content', message)}"
+            for message in prompt
+        )
+    return repr(prompt)
+
+
+def _token_usage(result: Any) -> Tuple[int, int]:
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(result, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open probe after reset_seconds"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("✅ LLM circuit closed again")
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """The probe ended without telling us anything about the provider"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+                logger.warning(f"🔌 LLM circuit opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+class CallSiteMetrics:
+    """Counters and bounded latency samples for one call site"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.queue_waits_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self) -> Dict:
+        def percentile(values, p: float) -> Optional[float]:
+            samples = sorted(values)
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "p50_ms": percentile(self.latencies_ms, 0.50),
+            "p95_ms": percentile(self.latencies_ms, 0.95),
+            "queue_wait_p95_ms": percentile(self.queue_waits_ms, 0.95),
+        }
+
+
+class GatewayChatModel:
+    """Drop-in for the .invoke()/.ainvoke() surface the components use"""
+
+    def __init__(self, gateway: "LLMGateway", call_site: str, model: str, temperature: float,
+                 tenant_id: Optional[int] = None, timeout: Optional[float] = None):
+        self.gateway = gateway
+        self.call_site = call_site
+        self.model = model
+        self.temperature = temperature
+        self.tenant_id = tenant_id
+        self.timeout = timeout
+
+    def _options(self, tenant_id: Optional[int]) -> Dict:
+        return {
+            "call_site": self.call_site,
+            "model": self.model,
+            "temperature": self.temperature,
+            "tenant_id": tenant_id if tenant_id is not None else self.tenant_id,
+            "timeout": self.timeout,
+        }
+
+    def invoke(self, prompt: Any, tenant_id: Optional[int] = None):
+        return self.gateway.invoke(prompt, **self._options(tenant_id))
+
+    async def ainvoke(self, prompt: Any, tenant_id: Optional[int] = None):
+        return await self.gateway.ainvoke(prompt, **self._options(tenant_id))
+
+
+class LLMGateway:
+
+    def __init__(self, model_factory: Optional[Callable[[str, float], Any]] = None):
+        self.model_factory = model_factory or _default_model_factory
+        self.max_concurrent = settings.LLM_MAX_CONCURRENT
+        self.max_per_tenant = settings.LLM_MAX_CONCURRENT_PER_TENANT
+        self.queue_timeout = settings.LLM_QUEUE_TIMEOUT_SECONDS
+        self.default_timeout = settings.LLM_TIMEOUT_SECONDS
+
+        self._models: Dict[Tuple[str, float], Any] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._metrics: Dict[str, CallSiteMetrics] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tenant_semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._active = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # ---- loop management ----
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+
+                    def run():
+                        asyncio.set_event_loop(loop)
+                        self._global_semaphore = asyncio.Semaphore(self.max_concurrent)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    self._thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+                    self._thread.start()
+                    ready.wait()
+                    self._loop = loop
+                    logger.info(f"🧠 LLM gateway started (max {self.max_concurrent} concurrent, "
+                                f"{self.max_per_tenant} per tenant)")
+        return self._loop
+
+    def close(self):
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+            logger.info("🛑 LLM gateway stopped")
+
+    # ---- public API ----
+
+    def chat_model(self, call_site: str, model: str = DEFAULT_MODEL, temperature: float = 0.3,
+                   tenant_id: Optional[int] = None, timeout: Optional[float] = None) -> GatewayChatModel:
+        return GatewayChatModel(self, call_site, model, temperature, tenant_id, timeout)
+
+    def invoke(self, prompt: Any, **options):
+        """Blocking call for sync code; must not be called from the gateway loop itself"""
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("LLMGateway.invoke called from the gateway loop; use ainvoke")
+        return asyncio.run_coroutine_threadsafe(self._call(prompt, **options), loop).result()
+
+    async def ainvoke(self, prompt: Any, **options):
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._call(prompt, **options)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._call(prompt, **options), loop))
+
+    # ---- gateway loop ----
+
+    def _model(self, model: str, temperature: float):
+        key = (model, temperature)
+        instance = self._models.get(key)
+        if instance is None:
+            instance = self._models[key] = self.model_factory(model, temperature)
+        return instance
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS
+            )
+        return breaker
+
+    def _site(self, call_site: str) -> CallSiteMetrics:
+        metrics = self._metrics.get(call_site)
+        if metrics is None:
+            metrics = self._metrics[call_site] = CallSiteMetrics()
+        return metrics
+
+    async def _call(self, prompt: Any, call_site: str, model: str = DEFAULT_MODEL, temperature: float = 0.3,
+                    tenant_id: Optional[int] = None, timeout: Optional[float] = None):
+        metrics = self._site(call_site)
+        key = hashlib.sha1(f"{model}|{temperature}|{_prompt_text(prompt)}".encode("utf-8")).hexdigest()
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            metrics.coalesced += 1
+            return await asyncio.shield(leader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._call_upstream(prompt, metrics, model, temperature, tenant_id, timeout)
+        except asyncio.CancelledError:
+            # Followers did not ask to be cancelled: they get an ordinary gateway error
+            future.set_exception(LLMGatewayError("Coalesced LLM call was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers see it; don't warn about an unretrieved exception when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _call_upstream(self, prompt: Any, metrics: CallSiteMetrics, model: str, temperature: float,
+                             tenant_id: Optional[int], timeout: Optional[float]):
+        breaker = self._breaker(model)
+        if not breaker.allow():
+            metrics.rejected += 1
+            raise LLMCircuitOpenError(f"LLM circuit open for {model}")
+
+        # Set once the breaker has heard how this call went. Anything else ending the
+        # probe (no slot, a bad request, cancellation) must hand it back
+        probe = breaker.state == "half_open"
+        settled = False
+        try:
+            queued_at = time.perf_counter()
+            tenant_semaphore = None
+            if tenant_id is not None:
+                tenant_semaphore = self._tenant_semaphores.get(tenant_id)
+                if tenant_semaphore is None:
+                    tenant_semaphore = self._tenant_semaphores[tenant_id] = asyncio.Semaphore(self.max_per_tenant)
+
+            acquired = []
+            try:
+                for semaphore in filter(None, (tenant_semaphore, self._global_semaphore)):
+                    remaining = self.queue_timeout - (time.perf_counter() - queued_at)
+                    await asyncio.wait_for(semaphore.acquire(), max(remaining, 0.001))
+                    acquired.append(semaphore)
+            except asyncio.TimeoutError:
+                for semaphore in acquired:
+                    semaphore.release()
+                metrics.rejected += 1
+                raise LLMGatewayBusyError(f"No LLM slot within {self.queue_timeout}s (tenant {tenant_id})")
+            except asyncio.CancelledError:
+                for semaphore in acquired:
+                    semaphore.release()
+                raise
+
+            metrics.queue_waits_ms.append((time.perf_counter() - queued_at) * 1000)
+            metrics.calls += 1
+            self._active += 1
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self._model(model, temperature).ainvoke(prompt),
+                    timeout or self.default_timeout,
+                )
+            except asyncio.TimeoutError:
+                metrics.timeouts += 1
+                breaker.record_failure()
+                settled = True
+                raise LLMGatewayTimeoutError(f"LLM call timed out after {timeout or self.default_timeout}s")
+            except Exception as e:
+                metrics.errors += 1
+                if getattr(e, "status_code", None) not in NON_TRIPPING_STATUS:
+                    breaker.record_failure()
+                    settled = True
+                raise
+            finally:
+                self._active -= 1
+                for semaphore in acquired:
+                    semaphore.release()
+
+            breaker.record_success()
+            settled = True
+        finally:
+            if probe and not settled:
+                breaker.release_probe()
+
+        metrics.latencies_ms.append((time.perf_counter() - started) * 1000)
+        prompt_tokens, completion_tokens = _token_usage(result)
+        metrics.prompt_tokens += prompt_tokens
+        metrics.completion_tokens += completion_tokens
+        return result
+
+    def get_metrics(self) -> Dict:
+        return {
+            "running": self._loop is not None,
+            "active_calls": self._active,
+            "max_concurrent": self.max_concurrent,
+            "max_concurrent_per_tenant": self.max_per_tenant,
+            "inflight_prompts": len(self._inflight),
+            "breakers": {model: breaker.snapshot() for model, breaker in self._breakers.items()},
+            "call_sites": {site: metrics.snapshot() for site, metrics in self._metrics.items()},
+        }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_llm_gateway(gateway: Optional[LLMGateway]):
+    """Swap the shared gateway, e.g. for one backed by a fake chat model"""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    if previous is not None and previous is not gateway:
+        previous.close()
+
+
+def close_llm_gateway():
+    global _gateway
+    if _gateway is not None:
+        _gateway.close()
+        _gateway = None
@@ -0,0 +1,404 @@
+"""
+Database connection pool instrumentation.
+
+The engines in app.database are built with InstrumentedQueuePool /
+InstrumentedAsyncQueuePool and attached with instrument_pool(), which records:
+
+- checkout wait: time spent waiting for a connection, as a bucketed histogram
+  plus p50/p95/p99, with counters for checkouts that opened an overflow
+  connection and for checkouts that hit pool_timeout
+- hold time per route: how long each endpoint keeps a connection checked out,
+  so handlers that hold one across an LLM call stand out
+- leaks: connections checked out for longer than DB_POOL_LEAK_SECONDS are
+  reported once with the route (and optionally the stack) that took them
+
+Routes are attributed through PoolRouteMiddleware, which puts the ASGI scope in
+a context variable; FastAPI fills in scope["route"] once the request is matched.
+Connections taken outside a request are attributed to "background".
+
+With DB_POOL_ADAPTIVE the monitor loop resizes max_overflow so the pool's total
+capacity follows the peak concurrency seen in the last interval (with headroom),
+between DB_POOL_ADAPTIVE_MIN_TOTAL and DB_POOL_ADAPTIVE_MAX_TOTAL.
+"""
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+SAMPLES = 1024  # recent waits / holds kept for percentiles
+MAX_ROUTES = 500  # distinct route labels tracked per pool
+
+_current_scope: ContextVar[Optional[dict]] = ContextVar("db_pool_route_scope", default=None)
+
+
+def current_route() -> str:
+    """Route template of the request running in this context"""
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', 'WS')} {path}"
+
+
+class PoolRouteMiddleware:
+    """Plain ASGI middleware so the scope is visible to sync endpoints in the threadpool too"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def _percentiles(values) -> Dict[str, Optional[float]]:
+    samples = sorted(values)
+
+    def percentile(p: float) -> Optional[float]:
+        if not samples:
+            return None
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+    return {"p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+
+class RouteHoldStats:
+    """Connection hold times of one route"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.holds_ms = deque(maxlen=256)
+
+    def record(self, hold_ms: float):
+        self.checkouts += 1
+        self.total_ms += hold_ms
+        self.max_ms = max(self.max_ms, hold_ms)
+        self.holds_ms.append(hold_ms)
+
+    def snapshot(self) -> Dict:
+        return {
+            "checkouts": self.checkouts,
+            "avg_ms": round(self.total_ms / self.checkouts, 2) if self.checkouts else None,
+            "max_ms": round(self.max_ms, 2),
+            "total_seconds": round(self.total_ms / 1000, 2),
+            **_percentiles(self.holds_ms),
+        }
+
+
+class PoolMetrics:
+    """Counters for one engine's pool; updated from event hooks on any thread"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.waits_ms = deque(maxlen=SAMPLES)
+        self.holds_ms = deque(maxlen=SAMPLES)
+        self.routes: Dict[str, RouteHoldStats] = {}
+
+        # id(connection_record) -> (checked out at, route, stack)
+        self.checked_out: Dict[int, tuple] = {}
+        self.peak_checked_out = 0
+        self.window_peak = 0
+        self.window_timeouts = 0
+        self.leaks_reported = 0
+        self._reported_leaks = set()
+        self.resizes: deque = deque(maxlen=20)
+
+    def record_wait(self, wait_ms: float, opened_overflow: bool):
+        with self._lock:
+            self.wait_histogram[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.waits_ms.append(wait_ms)
+            if opened_overflow:
+                self.overflow_checkouts += 1
+
+    def record_timeout(self, wait_ms: float):
+        route = current_route()
+        with self._lock:
+            self.timeouts += 1
+            self.window_timeouts += 1
+            self.wait_histogram[-1] += 1
+        logger.warning(
+            f"⏳ {self.name} pool timed out after {wait_ms:.0f}ms for {route}; "
+            f"{len(self.checked_out)} connections checked out by {self._top_holders()}"
+        )
+
+    def on_checkout(self, connection_record):
+        route = current_route()
+        stack = traceback.format_stack(limit=12)[:-3] if settings.DB_POOL_LEAK_CAPTURE_STACK else None
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out[id(connection_record)] = (time.monotonic(), route, stack)
+            in_use = len(self.checked_out)
+            self.peak_checked_out = max(self.peak_checked_out, in_use)
+            self.window_peak = max(self.window_peak, in_use)
+
+    def on_checkin(self, connection_record):
+        key = id(connection_record)
+        with self._lock:
+            entry = self.checked_out.pop(key, None)
+            self._reported_leaks.discard(key)
+            if entry is None:
+                return
+            since, route, _ = entry
+            hold_ms = (time.monotonic() - since) * 1000
+            self.holds_ms.append(hold_ms)
+            stats = self.routes.get(route)
+            if stats is None:
+                if len(self.routes) >= MAX_ROUTES:
+                    route = "other"
+                stats = self.routes.setdefault(route, RouteHoldStats())
+            stats.record(hold_ms)
+
+    def _top_holders(self, limit: int = 3) -> str:
+        counts: Dict[str, int] = {}
+        for _, route, _ in list(self.checked_out.values()):
+            counts[route] = counts.get(route, 0) + 1
+        top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return ", ".join(f"{route} x{count}" for route, count in top) or "nobody"
+
+    def find_leaks(self, older_than: float) -> List[Dict]:
+        """Connections checked out for longer than older_than seconds"""
+        now = time.monotonic()
+        with self._lock:
+            held = list(self.checked_out.items())
+        return [
+            {"key": key, "route": route, "held_seconds": round(now - since, 1), "stack": stack}
+            for key, (since, route, stack) in held
+            if now - since > older_than
+        ]
+
+    def report_leaks(self, older_than: float) -> int:
+        """Log each long-held connection once"""
+        leaks = self.find_leaks(older_than)
+        for leak in leaks:
+            with self._lock:
+                if leak["key"] in self._reported_leaks:
+                    continue
+                self._reported_leaks.add(leak["key"])
+                self.leaks_reported += 1
+            where = "".join(leak["stack"]) if leak["stack"] else "(set DB_POOL_LEAK_CAPTURE_STACK for a stack)"
+            logger.warning(
+                f"🚰 Possible leaked {self.name} DB session: held {leak['held_seconds']}s by {leak['route']}\n{where}"
+            )
+        return len(leaks)
+
+    def take_window(self):
+        """Peak connections in use and timeouts since the previous call"""
+        with self._lock:
+            peak, self.window_peak = self.window_peak, len(self.checked_out)
+            timeouts, self.window_timeouts = self.window_timeouts, 0
+        return peak, timeouts
+
+    def snapshot(self, routes: int = 20) -> Dict:
+        with self._lock:
+            histogram = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_histogram)}
+            histogram["gt_30000ms"] = self.wait_histogram[-1]
+            waits = _percentiles(self.waits_ms)
+            holds = _percentiles(self.holds_ms)
+            route_stats = sorted(self.routes.items(), key=lambda item: item[1].total_ms, reverse=True)[:routes]
+            route_snapshot = {route: stats.snapshot() for route, stats in route_stats}
+            in_use = len(self.checked_out)
+
+        pool = {}
+        if self.pool is not None:
+            pool = {
+                "pool_size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "overflow": self.pool.overflow(),
+                "max_overflow": self.pool._max_overflow,
+                "timeout_seconds": self.pool.timeout(),
+            }
+
+        leak_age = settings.DB_POOL_LEAK_SECONDS
+        return {
+            "pool": pool,
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "in_use": in_use,
+            "peak_in_use": self.peak_checked_out,
+            "wait": {**waits, "histogram": histogram},
+            "hold": holds,
+            "routes_by_total_hold": route_snapshot,
+            "suspected_leaks": [
+                {"route": leak["route"], "held_seconds": leak["held_seconds"]}
+                for leak in self.find_leaks(leak_age)
+            ] if leak_age else [],
+            "leaks_reported": self.leaks_reported,
+            "resizes": list(self.resizes),
+        }
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    metrics = _metrics.get(name)
+    if metrics is None:
+        metrics = _metrics.setdefault(name, PoolMetrics(name))
+    return metrics
+
+
+class _WaitTimingMixin:
+    """Times _do_get, the call that blocks when every connection is in use"""
+
+    metrics_name = "sync"
+
+    def _do_get(self):
+        metrics = get_pool_metrics(self.metrics_name)
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.record_timeout((time.perf_counter() - started) * 1000)
+            raise
+        metrics.record_wait((time.perf_counter() - started) * 1000, self._overflow > overflow_before)
+        return connection
+
+    def recreate(self):
+        # The new pool inherits our event listeners; only the reference needs updating
+        pool = super().recreate()
+        get_pool_metrics(self.metrics_name).pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    metrics_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def instrument_pool(pool, name: str) -> PoolMetrics:
+    """Attach hold-time and leak tracking to a pool (any pool class)"""
+    metrics = get_pool_metrics(name)
+    metrics.pool = pool if isinstance(pool, QueuePool) else None
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_conn, connection_record, connection_proxy):
+        metrics.on_checkout(connection_record)
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_conn, connection_record):
+        metrics.on_checkin(connection_record)
+
+    return metrics
+
+
+def get_all_pool_metrics() -> Dict[str, Dict]:
+    return {name: metrics.snapshot() for name, metrics in _metrics.items()}
+
+
+class PoolMonitor:
+    """Periodic leak scan and, with DB_POOL_ADAPTIVE, max_overflow tuning"""
+
+    def __init__(self):
+        self.interval = settings.DB_POOL_MONITOR_INTERVAL_SECONDS
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def tick(self):
+        leak_age = settings.DB_POOL_LEAK_SECONDS
+        for metrics in list(_metrics.values()):
+            if leak_age:
+                metrics.report_leaks(leak_age)
+            peak, timeouts = metrics.take_window()
+            if settings.DB_POOL_ADAPTIVE and metrics.pool is not None:
+                self._resize(metrics, peak, timeouts)
+
+    def _resize(self, metrics: PoolMetrics, peak: int, timeouts: int):
+        pool = metrics.pool
+        size = pool.size()
+        # Timeouts in the window mean demand exceeded capacity; grow past the observed peak
+        pressure = 2.0 if timeouts else 1.25
+        target = int(peak * pressure) + 1
+        target = max(settings.DB_POOL_ADAPTIVE_MIN_TOTAL, min(settings.DB_POOL_ADAPTIVE_MAX_TOTAL, target))
+        new_overflow = max(0, target - size)
+        if new_overflow == pool._max_overflow:
+            return
+        # Shrink gradually so one quiet interval doesn't undo the headroom
+        if new_overflow < pool._max_overflow:
+            new_overflow = max(new_overflow, pool._max_overflow - max(1, pool._max_overflow // 4))
+        logger.info(
+            f"📐 {metrics.name} pool max_overflow {pool._max_overflow} -> {new_overflow} "
+            f"(peak {peak} in use, pool_size {size})"
+        )
+        metrics.resizes.append({
+            "at": time.time(),
+            "peak_in_use": peak,
+            "max_overflow_from": pool._max_overflow,
+            "max_overflow_to": new_overflow,
+        })
+        pool._max_overflow = new_overflow
+
+    async def run_forever(self):
+        self.is_running = True
+        logger.info(f"📊 DB pool monitor started (every {self.interval}s, adaptive={settings.DB_POOL_ADAPTIVE})")
+        while self.is_running:
+            try:
+                await asyncio.sleep(self.interval)
+                self.tick()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ DB pool monitor error: {e}")
+        self.is_running = False
+
+    def stop(self):
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+
+
+_monitor: Optional[PoolMonitor] = None
+
+
+def get_pool_monitor() -> PoolMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = PoolMonitor()
+    return _monitor
+
+
+async def start_pool_monitor():
+    monitor = get_pool_monitor()
+    if monitor.is_running:
+        return
+    monitor._task = asyncio.current_task()
+    await monitor.run_forever()
+
+
+def stop_pool_monitor():
+    if _monitor is not None:
+        _monitor.stop()
+        logger.info("🛑 DB pool monitor stopped")
@@ -0,0 +1,369 @@
+"""
+Set-based retention jobs for conversation data.
+
+Every policy is applied in chunks of RETENTION_BATCH_SIZE rows:
+
+    UPDATE chat_sessions SET is_active = false
+    WHERE id IN (SELECT id FROM chat_sessions WHERE <policy> ORDER BY id LIMIT :n)
+
+with one short transaction per chunk, so no run holds long row or table locks.
+On Postgres the inner select also uses FOR UPDATE SKIP LOCKED, so rows that
+foreground requests are writing are skipped, and a lock_timeout aborts a chunk
+instead of queueing behind them. Between chunks the sweep sleeps so it spends
+at most RETENTION_DUTY_CYCLE of the time working.
+
+    engine = get_retention_engine()
+    report = engine.run(dry_run=True)                         # counts only
+    engine.run_policy("chat_sessions", tenant_id=5, days=30)  # one tenant, one policy
+
+The per-tenant cleanup methods of the memory managers delegate here; the
+background sweep covers all tenants in one pass. The sweep only runs with
+RETENTION_ENABLED, and the destructive policies (content scrub, deletion)
+stay disabled until their day settings are set above 0.
+"""
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, exists, func, select, text, update
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.chatbot.models import ChatSession, ChatMessage
+from app.slack.thread_memory import SlackThreadMemory, SlackThreadMessage
+from app.instagram.models import InstagramConversation, InstagramMessage
+
+
+logger = logging.getLogger(__name__)
+
+CLEANED_CONTENT_MARKER = "[CONTENT_CLEANED_FOR_PRIVACY]"
+MAX_LOCK_RETRIES = 3
+SESSION_EXPIRED_AFTER = timedelta(days=7)  # SimpleChatbotMemory.EXPIRED_THRESHOLD
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    name: str
+    model: Any
+    days_setting: str  # settings attribute holding the default age in days; <= 0 disables
+    # (cutoff, tenant_id or None) -> WHERE clause selecting the rows to act on
+    condition: Callable[[datetime, Optional[int]], Any]
+    values: Optional[Callable[[], Dict[str, Any]]] = None  # UPDATE values; None means DELETE
+    description: str = ""
+
+    @property
+    def action(self) -> str:
+        return "update" if self.values else "delete"
+
+
+def _tenant_sessions(tenant_id: int):
+    return select(ChatSession.id).where(ChatSession.tenant_id == tenant_id)
+
+
+def _inactive_sessions(cutoff: datetime, tenant_id: Optional[int]):
+    recent_message = exists().where(and_(
+        ChatMessage.session_id == ChatSession.id,
+        ChatMessage.created_at >= cutoff
+    ))
+    condition = and_(ChatSession.is_active == True, ChatSession.created_at < cutoff, ~recent_message)
+    if tenant_id is not None:
+        condition = and_(condition, ChatSession.tenant_id == tenant_id)
+    return condition
+
+
+def _expired_sessions(cutoff: datetime, tenant_id: Optional[int]):
+    activity_cutoff = datetime.utcnow() - SESSION_EXPIRED_AFTER
+    any_message = exists().where(ChatMessage.session_id == ChatSession.id)
+    recent_message = exists().where(and_(
+        ChatMessage.session_id == ChatSession.id,
+        ChatMessage.created_at > activity_cutoff
+    ))
+    condition = and_(ChatSession.is_active == True, ChatSession.created_at < cutoff, any_message, ~recent_message)
+    if tenant_id is not None:
+        condition = and_(condition, ChatSession.tenant_id == tenant_id)
+    return condition
+
+
+def _old_message_content(cutoff: datetime, tenant_id: Optional[int]):
+    condition = and_(
+        ChatMessage.created_at < cutoff,
+        ChatMessage.content.isnot(None),
+        # Already-cleaned rows would otherwise be rewritten on every run
+        ChatMessage.content != CLEANED_CONTENT_MARKER
+    )
+    if tenant_id is not None:
+        condition = and_(condition, ChatMessage.session_id.in_(_tenant_sessions(tenant_id)))
+    return condition
+
+
+def _old_messages(cutoff: datetime, tenant_id: Optional[int]):
+    condition = ChatMessage.created_at < cutoff
+    if tenant_id is not None:
+        condition = and_(condition, ChatMessage.session_id.in_(_tenant_sessions(tenant_id)))
+    return condition
+
+
+def _inactive_slack_threads(cutoff: datetime, tenant_id: Optional[int]):
+    condition = and_(SlackThreadMemory.is_active == True, SlackThreadMemory.last_activity < cutoff)
+    if tenant_id is not None:
+        condition = and_(condition, SlackThreadMemory.tenant_id == tenant_id)
+    return condition
+
+
+def _archived_slack_thread_messages(cutoff: datetime, tenant_id: Optional[int]):
+    threads = select(SlackThreadMemory.id).where(and_(
+        SlackThreadMemory.is_active == False,
+        SlackThreadMemory.last_activity < cutoff
+    ))
+    if tenant_id is not None:
+        threads = threads.where(SlackThreadMemory.tenant_id == tenant_id)
+    return SlackThreadMessage.thread_memory_id.in_(threads)
+
+
+def _inactive_instagram_conversations(cutoff: datetime, tenant_id: Optional[int]):
+    recent_message = exists().where(and_(
+        InstagramMessage.conversation_id == InstagramConversation.id,
+        InstagramMessage.created_at > cutoff
+    ))
+    condition = and_(
+        InstagramConversation.is_active == True,
+        InstagramConversation.created_at < cutoff,
+        ~recent_message
+    )
+    if tenant_id is not None:
+        condition = and_(condition, InstagramConversation.tenant_id == tenant_id)
+    return condition
+
+
+RETENTION_POLICIES: Dict[str, RetentionPolicy] = {policy.name: policy for policy in [
+    RetentionPolicy(
+        "chat_sessions", ChatSession, "RETENTION_SESSION_INACTIVE_DAYS", _inactive_sessions,
+        values=lambda: {"is_active": False},
+        description="Archive chat sessions with no messages since the cutoff"
+    ),
+    RetentionPolicy(
+        "chat_message_content", ChatMessage, "RETENTION_MESSAGE_CONTENT_DAYS", _old_message_content,
+        values=lambda: {"content": CLEANED_CONTENT_MARKER},
+        description="Clear message content for privacy, keeping metadata for analytics"
+    ),
+    RetentionPolicy(
+        "chat_messages", ChatMessage, "RETENTION_MESSAGE_DELETE_DAYS", _old_messages,
+        description="Delete chat messages older than the cutoff"
+    ),
+    RetentionPolicy(
+        "slack_threads", SlackThreadMemory, "RETENTION_SLACK_THREAD_DAYS", _inactive_slack_threads,
+        values=lambda: {"is_active": False},
+        description="Deactivate Slack threads without activity since the cutoff"
+    ),
+    RetentionPolicy(
+        "slack_thread_messages", SlackThreadMessage, "RETENTION_MESSAGE_DELETE_DAYS",
+        _archived_slack_thread_messages,
+        description="Delete messages of deactivated Slack threads older than the cutoff"
+    ),
+    RetentionPolicy(
+        "instagram_conversations", InstagramConversation, "RETENTION_INSTAGRAM_DAYS",
+        _inactive_instagram_conversations,
+        values=lambda: {"is_active": False, "conversation_status": "archived"},
+        description="Archive Instagram conversations with no messages since the cutoff"
+    ),
+]}
+
+# SimpleChatbotMemory.cleanup_old_sessions' predicate, kept out of the sweep: sessions
+# older than the cutoff whose last message is over SESSION_EXPIRED_AFTER old
+# (SimpleChatbotMemory.EXPIRED_THRESHOLD); sessions without messages are left alone
+EXPIRED_CHAT_SESSIONS = RetentionPolicy(
+    "expired_chat_sessions", ChatSession, "RETENTION_SESSION_INACTIVE_DAYS", _expired_sessions,
+    values=lambda: {"is_active": False},
+    description="Archive chat sessions older than the cutoff whose last message is over 7 days old"
+)
+
+# The indexes these policies rely on are declared on the models and added to
+# existing databases by the retention_indexes_20261021 migration
+
+
+class RetentionEngine:
+    """Runs retention policies as chunked, throttled set-based statements"""
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from app.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.running = False
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _policy_days(policy: RetentionPolicy, days: Optional[int]) -> int:
+        return days if days is not None else getattr(settings, policy.days_setting, 0)
+
+    def _count(self, policy: RetentionPolicy, cutoff: datetime, tenant_id: Optional[int]) -> int:
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(func.count()).select_from(policy.model).where(policy.condition(cutoff, tenant_id))
+            ).scalar() or 0
+        finally:
+            db.close()
+
+    def _apply_batch(self, policy: RetentionPolicy, cutoff: datetime, tenant_id: Optional[int],
+                     batch_size: int) -> int:
+        db = self.session_factory()
+        try:
+            table_id = policy.model.id
+            postgres = db.get_bind().dialect.name == "postgresql"
+            # correlate(None): the subselect must scan the table itself, not the UPDATE/DELETE target
+            ids = (select(table_id).where(policy.condition(cutoff, tenant_id))
+                   .order_by(table_id).limit(batch_size).correlate(None))
+            if postgres:
+                ids = ids.with_for_update(skip_locked=True)
+                db.execute(text(f"SET LOCAL lock_timeout = '{int(settings.RETENTION_LOCK_TIMEOUT_MS)}ms'"))
+
+            if policy.values:
+                statement = update(policy.model).where(table_id.in_(ids)).values(**policy.values())
+            else:
+                statement = delete(policy.model).where(table_id.in_(ids))
+            affected = db.execute(statement.execution_options(synchronize_session=False)).rowcount
+            db.commit()
+            return affected or 0
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def run_policy(self, name: str, tenant_id: Optional[int] = None, days: Optional[int] = None,
+                   dry_run: bool = False, throttle: bool = False) -> Dict[str, Any]:
+        """Apply one policy; throttle paces chunks for background sweeps"""
+        return self.apply(RETENTION_POLICIES[name], tenant_id=tenant_id, days=days, dry_run=dry_run,
+                          throttle=throttle)
+
+    def apply(self, policy: RetentionPolicy, tenant_id: Optional[int] = None, days: Optional[int] = None,
+              dry_run: bool = False, throttle: bool = False) -> Dict[str, Any]:
+        """run_policy for a policy outside RETENTION_POLICIES (e.g. EXPIRED_CHAT_SESSIONS)"""
+        name = policy.name
+        days = self._policy_days(policy, days)
+        result: Dict[str, Any] = {
+            "policy": name,
+            "action": policy.action,
+            "days": days,
+            "tenant_id": tenant_id,
+            "affected": 0,
+            "batches": 0,
+        }
+        if days <= 0:
+            result["skipped"] = "disabled"
+            return result
+
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        result["cutoff"] = cutoff.isoformat()
+        if dry_run:
+            matched = self._count(policy, cutoff, tenant_id)
+            result["matched"] = matched
+            result["estimated_batches"] = -(-matched // settings.RETENTION_BATCH_SIZE)
+            return result
+
+        started = time.perf_counter()
+        lock_failures = 0
+        while result["batches"] < settings.RETENTION_MAX_BATCHES_PER_RUN:
+            batch_started = time.perf_counter()
+            try:
+                affected = self._apply_batch(policy, cutoff, tenant_id, settings.RETENTION_BATCH_SIZE)
+            except OperationalError as e:
+                # lock_timeout hit: foreground traffic holds these rows, back off and retry
+                lock_failures += 1
+                if lock_failures > MAX_LOCK_RETRIES:
+                    logger.warning(f"⚠️ Retention {name} giving up after {lock_failures} lock timeouts: {e}")
+                    result["error"] = "lock_timeout"
+                    break
+                time.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS * (2 ** lock_failures))
+                continue
+
+            result["batches"] += 1
+            result["affected"] += affected
+            if affected < settings.RETENTION_BATCH_SIZE:
+                break
+            if throttle:
+                elapsed = time.perf_counter() - batch_started
+                duty = min(max(settings.RETENTION_DUTY_CYCLE, 0.05), 1.0)
+                time.sleep(max(settings.RETENTION_BATCH_PAUSE_SECONDS, elapsed * (1 - duty) / duty))
+
+        result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        if result["affected"]:
+            logger.info(f"🧹 Retention {name}: {policy.action}d {result['affected']} rows "
+                        f"in {result['batches']} batches ({result['elapsed_seconds']}s)")
+        return result
+
+    def run(self, policies: Optional[List[str]] = None, tenant_id: Optional[int] = None,
+            dry_run: bool = False, throttle: bool = True) -> Dict[str, Any]:
+        """Apply policies in order (archive before delete) across all tenants unless tenant_id is given"""
+        started = datetime.utcnow()
+        results = []
+        for name in policies or list(RETENTION_POLICIES):
+            try:
+                results.append(self.run_policy(name, tenant_id=tenant_id, dry_run=dry_run, throttle=throttle))
+            except Exception as e:
+                logger.error(f"❌ Retention policy {name} failed: {e}")
+                results.append({"policy": name, "error": str(e)})
+
+        report = {
+            "dry_run": dry_run,
+            "tenant_id": tenant_id,
+            "started_at": started.isoformat(),
+            "finished_at": datetime.utcnow().isoformat(),
+            "policies": results,
+        }
+        if not dry_run:
+            self.last_report = report
+        return report
+
+    async def run_forever(self):
+        """Background sweep - called from main.py startup"""
+        self.running = True
+        logger.info("🧹 Retention sweep started")
+        await asyncio.sleep(settings.RETENTION_INITIAL_DELAY_SECONDS)
+        while self.running:
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error(f"❌ Retention sweep failed: {e}")
+            await asyncio.sleep(settings.RETENTION_INTERVAL_HOURS * 3600)
+
+    def stop(self):
+        self.running = False
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "policy": policy.name,
+                "table": policy.model.__tablename__,
+                "action": policy.action,
+                "days": self._policy_days(policy, None),
+                "description": policy.description,
+            }
+            for policy in RETENTION_POLICIES.values()
+        ]
+
+
+_global_engine: Optional[RetentionEngine] = None
+
+
+def get_retention_engine() -> RetentionEngine:
+    global _global_engine
+    if _global_engine is None:
+        _global_engine = RetentionEngine()
+    return _global_engine
+
+
+async def start_retention_jobs():
+    if not settings.RETENTION_ENABLED:
+        logger.info("🧹 Retention sweep disabled")
+        return
+    await get_retention_engine().run_forever()
+
+
+def stop_retention_jobs():
+    if _global_engine:
+        _global_engine.stop()
@@ -1,32 +1,44 @@
 import os
 import io
+import json
+import shutil
 import tempfile
 import logging
 import uuid
 import time
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Union
 from supabase import create_client, Client
 from app.config import settings
 from fastapi import UploadFile
 from typing import Optional, Tuple
 from PIL import Image
+from app.services.storage_backends import StorageBackend, create_storage_backend
+from app.services.storage_cache import ContentAddressedCache, file_sha256
 
 logger = logging.getLogger(__name__)
 
+VECTOR_STORE_MANIFEST = "manifest.json"
+LEGACY_VECTOR_STORE_FILES = ["index.faiss", "index.pkl"]
+
+
+class StorageChecksumError(Exception):
+    """Downloaded content does not match the checksum recorded at upload"""
+
+
 class SupabaseStorageService:
-    """Handles all file operations with Supabase Storage"""
+    """Handles all file operations with object storage (Supabase by default, pluggable backend)"""
     
-    def __init__(self):
-        if not settings.SUPABASE_URL or not settings.SUPABASE_SERVICE_KEY:
-            raise ValueError("Supabase URL and SERVICE_KEY must be configured")
-        
-        self.client: Client = create_client(
-            settings.SUPABASE_URL, 
-            settings.SUPABASE_SERVICE_KEY
-        )
+    def __init__(self, backend: Optional[StorageBackend] = None, cache: Optional[ContentAddressedCache] = None):
+        self.backend = backend or create_storage_backend(settings)
+        # Raw SDK client, only present for the Supabase backend
+        self.client: Optional[Client] = getattr(self.backend, "client", None)
+        self.cache = cache or ContentAddressedCache(settings.STORAGE_CACHE_DIR, settings.STORAGE_CACHE_MAX_BYTES)
+        self.transfer_workers = max(1, settings.STORAGE_TRANSFER_WORKERS)
         self.knowledge_base_bucket = "knowledge-base-files"
         self.vector_store_bucket = "vector-stores"
         self.live_chat_bucket = "live-chat-files"
+        self.chat_archive_bucket = settings.CHAT_ARCHIVE_BUCKET
         # Ensure buckets exist
         self._ensure_buckets_exist()
        
@@ -51,72 +63,31 @@ class SupabaseStorageService:
             self.upload_file(self.live_chat_bucket, filename, content)
             
             # Generate signed URL (24hr expiry)
-            url = self.client.storage.from_(self.live_chat_bucket).create_signed_url(
-                filename, 86400  # 24 hours
+            url = self.backend.create_signed_url(
+                self.live_chat_bucket, filename, 86400  # 24 hours
             )
             
-            return True, "File uploaded", url['signedURL']
+            return True, "File uploaded", url
         except Exception as e:
             return False, str(e), None
     
 
     
     def _ensure_buckets_exist(self):
-        """Create storage buckets if they don't exist - ENHANCED"""
-        try:
-            # List existing buckets
-            buckets_response = self.client.storage.list_buckets()
-            
-            if hasattr(buckets_response, 'data') and buckets_response.data:
-                existing_buckets = [bucket.name for bucket in buckets_response.data]
-            elif isinstance(buckets_response, list):
-                existing_buckets = [bucket.name for bucket in buckets_response]
-            else:
-                logger.warning("Could not determine existing buckets, attempting to create anyway")
-                existing_buckets = []
-            
-            # Create knowledge-base-files bucket if not exists
-            if self.knowledge_base_bucket not in existing_buckets:
-                try:
-                    self.client.storage.create_bucket(self.knowledge_base_bucket, {"public": False})
-                    logger.info(f"Created bucket: {self.knowledge_base_bucket}")
-                except Exception as e:
-                    logger.warning(f"Could not create {self.knowledge_base_bucket}: {e}")
-            
-            # Create vector-stores bucket if not exists
-            if self.vector_store_bucket not in existing_buckets:
-                try:
-                    self.client.storage.create_bucket(self.vector_store_bucket, {"public": False})
-                    logger.info(f"Created bucket: {self.vector_store_bucket}")
-                except Exception as e:
-                    logger.warning(f"Could not create {self.vector_store_bucket}: {e}")
-
-            if self.live_chat_bucket not in existing_buckets:
-                try:
-                    self.client.storage.create_bucket(self.live_chat_bucket)
-                    logger.info(f"Created bucket: {self.live_chat_bucket}")
-                except Exception as e:
-                    logger.warning(f"Could not create {self.live_chat_bucket}: {e}")
-            
-            # Create tenant-logos bucket if not exists
-            logo_bucket = getattr(self, 'bucket_name', 'tenant-logos')
-            if logo_bucket not in existing_buckets:
-                try:
-                    self.client.storage.create_bucket(logo_bucket, {"public": True})  # Logos should be public
-                    logger.info(f"Created bucket: {logo_bucket}")
-                except Exception as e:
-                    logger.warning(f"Could not create {logo_bucket}: {e}")
-                    
-        except Exception as e:
-            logger.warning(f"Could not verify/create buckets: {e}")
-            # Continue anyway - buckets might exist but we can't list them
+        """Create storage buckets if they don't exist"""
+        logo_bucket = getattr(self, 'bucket_name', 'tenant-logos')
+        self.backend.ensure_buckets({
+            self.knowledge_base_bucket: False,
+            self.vector_store_bucket: False,
+            self.live_chat_bucket: False,
+            self.chat_archive_bucket: False,
+            logo_bucket: True,  # Logos should be public
+        })
     
-    def upload_file(self, bucket: str, path: str, file_content: bytes) -> bool:
-        """Upload file to Supabase Storage"""
+    def upload_file(self, bucket: str, path: str, file_content: Union[bytes, str], upsert: bool = False) -> bool:
+        """Upload file to storage; file_content may be bytes or a local file path (streamed)"""
         try:
-            response = self.client.storage.from_(bucket).upload(path, file_content)
-            if hasattr(response, 'error') and response.error:
-                raise Exception(f"Upload failed: {response.error}")
+            self.backend.upload(bucket, path, file_content, upsert=upsert)
             logger.info(f"Uploaded file to {bucket}/{path}")
             return True
         except Exception as e:
@@ -124,24 +95,47 @@ class SupabaseStorageService:
             raise
     
     def download_file(self, bucket: str, path: str) -> bytes:
-        """Download file from Supabase Storage"""
+        """Download file from storage into memory (prefer download_to_path for large files)"""
         try:
-            response = self.client.storage.from_(bucket).download(path)
-            if isinstance(response, bytes):
-                logger.info(f"Downloaded file from {bucket}/{path}")
-                return response
-            else:
-                raise Exception(f"Download failed: {response}")
+            content = self.backend.download(bucket, path)
+            logger.info(f"Downloaded file from {bucket}/{path}")
+            return content
+        except Exception as e:
+            logger.error(f"Failed to download {path} from {bucket}: {e}")
+            raise
+    
+    def download_to_path(self, bucket: str, path: str, dest_path: str, expected_sha256: Optional[str] = None):
+        """Stream file from storage to dest_path, serving from the local cache when the checksum is known"""
+        if expected_sha256 and self.cache.materialize(expected_sha256, dest_path):
+            logger.info(f"Served {bucket}/{path} from local cache")
+            return
+        
+        staging_path = self.cache.staging_path()
+        try:
+            self.backend.download_to_path(bucket, path, staging_path)
+            if expected_sha256:
+                actual_sha256 = file_sha256(staging_path)
+                if actual_sha256 != expected_sha256:
+                    raise StorageChecksumError(
+                        f"Checksum mismatch for {bucket}/{path}: expected {expected_sha256}, got {actual_sha256}"
+                    )
+                try:
+                    self.cache.put(staging_path, expected_sha256)
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not cache {bucket}/{path}: {e}")
+            shutil.move(staging_path, dest_path)
+            logger.info(f"Downloaded file from {bucket}/{path}")
         except Exception as e:
             logger.error(f"Failed to download {path} from {bucket}: {e}")
             raise
+        finally:
+            if os.path.exists(staging_path):
+                os.unlink(staging_path)
     
     def delete_file(self, bucket: str, path: str) -> bool:
-        """Delete file from Supabase Storage"""
+        """Delete file from storage"""
         try:
-            response = self.client.storage.from_(bucket).remove([path])
-            if hasattr(response, 'error') and response.error:
-                raise Exception(f"Delete failed: {response.error}")
+            self.backend.remove(bucket, [path])
             logger.info(f"Deleted file from {bucket}/{path}")
             return True
         except Exception as e:
@@ -152,17 +146,14 @@ class SupabaseStorageService:
         """Delete all files in a folder"""
         try:
             # List files in folder
-            files_response = self.client.storage.from_(bucket).list(folder_path)
-            if not files_response:
+            names = self.backend.list(bucket, folder_path)
+            if not names:
                 logger.info(f"No files found in {bucket}/{folder_path}")
                 return True
             
             # Delete all files
-            file_paths = [f"{folder_path}/{file.name}" for file in files_response]
-            response = self.client.storage.from_(bucket).remove(file_paths)
-            
-            if hasattr(response, 'error') and response.error:
-                raise Exception(f"Folder delete failed: {response.error}")
+            file_paths = [f"{folder_path}/{name}" for name in names]
+            self.backend.remove(bucket, file_paths)
             
             logger.info(f"Deleted folder {bucket}/{folder_path} with {len(file_paths)} files")
             return True
@@ -171,78 +162,147 @@ class SupabaseStorageService:
             return False
     
     def download_to_temp(self, bucket: str, path: str) -> str:
-        """Download file to temporary location and return path"""
+        """Stream file to a temporary location and return its path"""
+        # Create temp file with proper extension
+        file_extension = os.path.splitext(path)[1]
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
+        temp_file.close()
+        
         try:
-            content = self.download_file(bucket, path)
-            
-            # Create temp file with proper extension
-            file_extension = os.path.splitext(path)[1]
-            temp_file = tempfile.NamedTemporaryFile(
-                delete=False, 
-                suffix=file_extension
-            )
-            temp_file.write(content)
-            temp_file.close()
-            
+            self.download_to_path(bucket, path, temp_file.name)
             logger.info(f"Downloaded {bucket}/{path} to temp file: {temp_file.name}")
             return temp_file.name
         except Exception as e:
+            os.unlink(temp_file.name)
             logger.error(f"Failed to download {path} to temp: {e}")
             raise
     
     def upload_knowledge_base_file(self, tenant_id: int, filename: str, content: bytes) -> str:
         """Upload knowledge base file and return cloud path"""
-        import uuid
         cloud_path = f"tenant_{tenant_id}/uploads/{uuid.uuid4()}_{filename}"
         self.upload_file(self.knowledge_base_bucket, cloud_path, content)
         return cloud_path
     
-    def upload_vector_store_files(self, tenant_id: int, vector_store_id: str, local_dir: str):
-        """Upload all vector store files from local directory"""
-        for filename in os.listdir(local_dir):
+    def _vector_store_prefix(self, tenant_id: int, vector_store_id: str) -> str:
+        return f"tenant_{tenant_id}/vector_stores/{vector_store_id}"
+    
+    def upload_vector_store_files(self, tenant_id: int, vector_store_id: str, local_dir: str, upsert: bool = False):
+        """
+        Upload all vector store files concurrently, then a manifest of their SHA-256 checksums.
+        The manifest goes last so readers never see a half-uploaded store as complete.
+        Pass upsert=True to overwrite files of an existing store in place.
+        """
+        prefix = self._vector_store_prefix(tenant_id, vector_store_id)
+        filenames = [name for name in sorted(os.listdir(local_dir)) if name != VECTOR_STORE_MANIFEST]
+        
+        def _upload_one(filename: str) -> Tuple[str, dict]:
             local_file_path = os.path.join(local_dir, filename)
-            cloud_path = f"tenant_{tenant_id}/vector_stores/{vector_store_id}/{filename}"
-            
-            with open(local_file_path, 'rb') as f:
-                content = f.read()
-            
-            self.upload_file(self.vector_store_bucket, cloud_path, content)
+            checksum = file_sha256(local_file_path)
+            self.upload_file(self.vector_store_bucket, f"{prefix}/{filename}", local_file_path, upsert=upsert)
+            # Writer's copy warms the local cache for the next load
+            self.cache.put(local_file_path, checksum)
+            return filename, {"sha256": checksum, "size": os.path.getsize(local_file_path)}
+        
+        with ThreadPoolExecutor(max_workers=min(self.transfer_workers, max(1, len(filenames)))) as pool:
+            files = dict(pool.map(_upload_one, filenames))
+        
+        manifest = {"version": 1, "files": files}
+        self.upload_file(
+            self.vector_store_bucket,
+            f"{prefix}/{VECTOR_STORE_MANIFEST}",
+            json.dumps(manifest).encode(),
+            upsert=True
+        )
+        logger.info(f"Uploaded vector store {vector_store_id} ({len(files)} files)")
+    
+    def get_vector_store_manifest(self, tenant_id: int, vector_store_id: str) -> Optional[dict]:
+        """Checksum manifest for a vector store, or None for stores uploaded before manifests existed"""
+        path = f"{self._vector_store_prefix(tenant_id, vector_store_id)}/{VECTOR_STORE_MANIFEST}"
+        # Only a missing manifest means legacy; other errors must not skip verification
+        if not self.backend.exists(self.vector_store_bucket, path):
+            return None
+        return json.loads(self.backend.download(self.vector_store_bucket, path))
+    
+    def verify_vector_store_files(self, tenant_id: int, vector_store_id: str, local_dir: str):
+        """
+        Check an uploaded store against local_dir: the manifest must list exactly the local
+        files with their checksums, and each remote file is re-downloaded (bypassing the
+        local cache) and hashed. Raises StorageChecksumError on any mismatch.
+        """
+        prefix = self._vector_store_prefix(tenant_id, vector_store_id)
+        manifest = self.get_vector_store_manifest(tenant_id, vector_store_id)
+        if not manifest:
+            raise StorageChecksumError(f"Vector store {vector_store_id} has no manifest")
+        
+        expected = {
+            name: file_sha256(os.path.join(local_dir, name))
+            for name in os.listdir(local_dir) if name != VECTOR_STORE_MANIFEST
+        }
+        recorded = {name: info.get("sha256") for name, info in manifest["files"].items()}
+        if recorded != expected:
+            raise StorageChecksumError(f"Manifest of vector store {vector_store_id} does not match the local files")
+        
+        def _verify_one(item):
+            filename, checksum = item
+            staging_path = self.cache.staging_path()
+            try:
+                self.backend.download_to_path(self.vector_store_bucket, f"{prefix}/{filename}", staging_path)
+                actual_sha256 = file_sha256(staging_path)
+                if actual_sha256 != checksum:
+                    raise StorageChecksumError(
+                        f"Checksum mismatch for {prefix}/{filename}: expected {checksum}, got {actual_sha256}"
+                    )
+            finally:
+                if os.path.exists(staging_path):
+                    os.unlink(staging_path)
+        
+        with ThreadPoolExecutor(max_workers=min(self.transfer_workers, max(1, len(recorded)))) as pool:
+            list(pool.map(_verify_one, recorded.items()))
+        logger.info(f"Verified vector store {vector_store_id} ({len(recorded)} files)")
     
     def download_vector_store_files(self, tenant_id: int, vector_store_id: str) -> str:
-        """Download vector store files to temp directory and return path"""
+        """Download vector store files concurrently to a temp directory and return its path"""
         temp_dir = tempfile.mkdtemp()
+        prefix = self._vector_store_prefix(tenant_id, vector_store_id)
         
         try:
-            # Download required FAISS files
-            for filename in ["index.faiss", "index.pkl"]:
-                cloud_path = f"tenant_{tenant_id}/vector_stores/{vector_store_id}/{filename}"
-                content = self.download_file(self.vector_store_bucket, cloud_path)
-                
-                local_path = os.path.join(temp_dir, filename)
-                with open(local_path, 'wb') as f:
-                    f.write(content)
+            manifest = self.get_vector_store_manifest(tenant_id, vector_store_id)
+            if manifest:
+                files = {name: info.get("sha256") for name, info in manifest["files"].items()}
+            else:
+                # Legacy store: no checksums, so no cache and no verification
+                files = {name: None for name in LEGACY_VECTOR_STORE_FILES}
+            
+            def _download_one(item):
+                filename, checksum = item
+                self.download_to_path(
+                    self.vector_store_bucket,
+                    f"{prefix}/{filename}",
+                    os.path.join(temp_dir, filename),
+                    expected_sha256=checksum
+                )
+            
+            with ThreadPoolExecutor(max_workers=min(self.transfer_workers, len(files))) as pool:
+                list(pool.map(_download_one, files.items()))
             
             logger.info(f"Downloaded vector store {vector_store_id} to {temp_dir}")
             return temp_dir
         except Exception as e:
             # Clean up on failure
-            import shutil
             shutil.rmtree(temp_dir, ignore_errors=True)
             raise
     
     def delete_vector_store(self, tenant_id: int, vector_store_id: str) -> bool:
         """Delete all vector store files"""
-        folder_path = f"tenant_{tenant_id}/vector_stores/{vector_store_id}"
-        return self.delete_folder(self.vector_store_bucket, folder_path)
+        return self.delete_folder(self.vector_store_bucket, self._vector_store_prefix(tenant_id, vector_store_id))
+    
+    def delete_vector_store_file(self, tenant_id: int, vector_store_id: str, filename: str) -> bool:
+        """Delete one file of a vector store"""
+        return self.delete_file(self.vector_store_bucket, f"{self._vector_store_prefix(tenant_id, vector_store_id)}/{filename}")
     
     def file_exists(self, bucket: str, path: str) -> bool:
         """Check if file exists in storage"""
-        try:
-            # Try to get file info
-            self.client.storage.from_(bucket).get_public_url(path)
-            return True
-        except:
-            return False
+        return self.backend.exists(bucket, path)
         
 
 class LogoUploadService:
@@ -0,0 +1,212 @@
+import shutil
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Union
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+# bytes are uploaded as-is, a str is treated as a local file path and streamed
+UploadSource = Union[bytes, str]
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class StorageBackend(ABC):
+    """Minimal object-store interface used by SupabaseStorageService"""
+
+    name = "base"
+
+    def ensure_buckets(self, buckets: Dict[str, bool]):
+        """Create missing buckets; maps bucket name -> public flag"""
+
+    @abstractmethod
+    def upload(self, bucket: str, path: str, source: UploadSource, upsert: bool = False):
+        ...
+
+    @abstractmethod
+    def download(self, bucket: str, path: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def download_to_path(self, bucket: str, path: str, dest_path: str):
+        """Stream an object to a local file without holding it in memory"""
+
+    @abstractmethod
+    def remove(self, bucket: str, paths: List[str]):
+        ...
+
+    @abstractmethod
+    def list(self, bucket: str, prefix: str) -> List[str]:
+        """Return object names directly under prefix"""
+
+    @abstractmethod
+    def create_signed_url(self, bucket: str, path: str, expires_in: int) -> str:
+        ...
+
+    @abstractmethod
+    def exists(self, bucket: str, path: str) -> bool:
+        """Whether an object exists; errors other than not-found propagate"""
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """Supabase Storage via the supabase-py SDK; large downloads stream through signed URLs"""
+
+    name = "supabase"
+
+    def __init__(self, url: str, service_key: str):
+        from supabase import create_client, Client
+
+        if not url or not service_key:
+            raise ValueError("Supabase URL and SERVICE_KEY must be configured")
+        self.client: Client = create_client(url, service_key)
+        # Shared keep-alive client for streamed downloads
+        self.http = httpx.Client(timeout=httpx.Timeout(60.0, connect=10.0))
+
+    def ensure_buckets(self, buckets: Dict[str, bool]):
+        try:
+            buckets_response = self.client.storage.list_buckets()
+
+            if hasattr(buckets_response, 'data') and buckets_response.data:
+                existing_buckets = [bucket.name for bucket in buckets_response.data]
+            elif isinstance(buckets_response, list):
+                existing_buckets = [bucket.name for bucket in buckets_response]
+            else:
+                logger.warning("Could not determine existing buckets, attempting to create anyway")
+                existing_buckets = []
+
+            for bucket, public in buckets.items():
+                if bucket in existing_buckets:
+                    continue
+                try:
+                    self.client.storage.create_bucket(bucket, {"public": public})
+                    logger.info(f"Created bucket: {bucket}")
+                except Exception as e:
+                    logger.warning(f"Could not create {bucket}: {e}")
+
+        except Exception as e:
+            logger.warning(f"Could not verify/create buckets: {e}")
+            # Continue anyway - buckets might exist but we can't list them
+
+    def upload(self, bucket: str, path: str, source: UploadSource, upsert: bool = False):
+        file_options = {"upsert": "true"} if upsert else None
+        if isinstance(source, bytes):
+            response = self.client.storage.from_(bucket).upload(path, source, file_options)
+        else:
+            # The SDK streams open file objects as multipart bodies
+            with open(source, 'rb') as f:
+                response = self.client.storage.from_(bucket).upload(path, f, file_options)
+        if hasattr(response, 'error') and response.error:
+            raise Exception(f"Upload failed: {response.error}")
+
+    def download(self, bucket: str, path: str) -> bytes:
+        response = self.client.storage.from_(bucket).download(path)
+        if not isinstance(response, bytes):
+            raise Exception(f"Download failed: {response}")
+        return response
+
+    def download_to_path(self, bucket: str, path: str, dest_path: str):
+        signed_url = self.create_signed_url(bucket, path, 300)
+        with self.http.stream("GET", signed_url) as response:
+            response.raise_for_status()
+            with open(dest_path, 'wb') as f:
+                for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+    def remove(self, bucket: str, paths: List[str]):
+        response = self.client.storage.from_(bucket).remove(paths)
+        if hasattr(response, 'error') and response.error:
+            raise Exception(f"Delete failed: {response.error}")
+
+    def list(self, bucket: str, prefix: str) -> List[str]:
+        files_response = self.client.storage.from_(bucket).list(prefix)
+        names = []
+        for item in files_response or []:
+            names.append(item["name"] if isinstance(item, dict) else item.name)
+        return names
+
+    def exists(self, bucket: str, path: str) -> bool:
+        # A search by name, since a plain listing of the folder stops at 100 entries
+        folder, _, name = path.rpartition("/")
+        files_response = self.client.storage.from_(bucket).list(folder, {"search": name, "limit": 100})
+        for item in files_response or []:
+            if (item["name"] if isinstance(item, dict) else item.name) == name:
+                return True
+        return False
+
+    def create_signed_url(self, bucket: str, path: str, expires_in: int) -> str:
+        response = self.client.storage.from_(bucket).create_signed_url(path, expires_in)
+        return response.get('signedURL') or response.get('signedUrl')
+
+
+class LocalStorageBackend(StorageBackend):
+    """Filesystem-backed storage for development and tests: <root>/<bucket>/<path>"""
+
+    name = "local"
+
+    def __init__(self, root_dir: str):
+        self.root = Path(root_dir).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _resolve(self, bucket: str, path: str) -> Path:
+        resolved = (self.root / bucket / path).resolve()
+        if self.root not in resolved.parents:
+            raise ValueError(f"Path escapes storage root: {bucket}/{path}")
+        return resolved
+
+    def ensure_buckets(self, buckets: Dict[str, bool]):
+        for bucket in buckets:
+            (self.root / bucket).mkdir(parents=True, exist_ok=True)
+
+    def upload(self, bucket: str, path: str, source: UploadSource, upsert: bool = False):
+        target = self._resolve(bucket, path)
+        if target.exists() and not upsert:
+            raise Exception(f"Upload failed: {bucket}/{path} already exists")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(source, bytes):
+            target.write_bytes(source)
+        else:
+            shutil.copyfile(source, target)
+
+    def download(self, bucket: str, path: str) -> bytes:
+        target = self._resolve(bucket, path)
+        if not target.is_file():
+            raise FileNotFoundError(f"{bucket}/{path}")
+        return target.read_bytes()
+
+    def download_to_path(self, bucket: str, path: str, dest_path: str):
+        target = self._resolve(bucket, path)
+        if not target.is_file():
+            raise FileNotFoundError(f"{bucket}/{path}")
+        shutil.copyfile(target, dest_path)
+
+    def remove(self, bucket: str, paths: List[str]):
+        for path in paths:
+            target = self._resolve(bucket, path)
+            if target.is_file():
+                target.unlink()
+
+    def list(self, bucket: str, prefix: str) -> List[str]:
+        folder = self._resolve(bucket, prefix) if prefix else self.root / bucket
+        if not folder.is_dir():
+            return []
+        return sorted(entry.name for entry in folder.iterdir())
+
+    def exists(self, bucket: str, path: str) -> bool:
+        return self._resolve(bucket, path).is_file()
+
+    def create_signed_url(self, bucket: str, path: str, expires_in: int) -> str:
+        return self._resolve(bucket, path).as_uri()
+
+
+def create_storage_backend(settings) -> StorageBackend:
+    """Pick the backend from settings.STORAGE_BACKEND ('supabase' or 'local')"""
+    backend_name = (settings.STORAGE_BACKEND or "supabase").lower()
+    if backend_name == "local":
+        return LocalStorageBackend(settings.STORAGE_LOCAL_ROOT)
+    if backend_name == "supabase":
+        return SupabaseStorageBackend(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend_name}")
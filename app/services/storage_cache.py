@@ -0,0 +1,148 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentAddressedCache:
+    """
+    Local disk cache keyed by SHA-256 of the object content.
+
+    Objects are immutable, so entries never go stale; the least recently used
+    objects (by mtime, refreshed on every hit) are evicted once the cache grows
+    past max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._size = self._scan_size()
+        logger.info(f"🗄️ Storage cache at {cache_dir} ({self._size / (1024 * 1024):.1f}MB / {max_bytes / (1024 * 1024):.0f}MB)")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _scan_size(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the cached object path, or None on miss"""
+        object_path = self._object_path(digest)
+        try:
+            os.utime(object_path)  # LRU touch
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return object_path
+
+    def put(self, src_path: str, digest: str, move: bool = False) -> str:
+        """Insert a local file under its digest; returns the cached object path"""
+        object_path = self._object_path(digest)
+        if os.path.exists(object_path):
+            if move:
+                os.unlink(src_path)
+            os.utime(object_path)
+            return object_path
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if move:
+            os.replace(src_path, object_path)
+        else:
+            # Copy next to the target then rename, so readers never see partial files
+            fd, staging_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+            os.close(fd)
+            shutil.copyfile(src_path, staging_path)
+            os.replace(staging_path, object_path)
+
+        with self._lock:
+            self._size += os.path.getsize(object_path)
+        self._evict_if_needed(keep=object_path)
+        return object_path
+
+    def staging_path(self) -> str:
+        """Temp path on the cache filesystem, so put(..., move=True) is a rename"""
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        os.close(fd)
+        return path
+
+    def materialize(self, digest: str, dest_path: str) -> bool:
+        """Copy a cached object to dest_path; False on miss"""
+        object_path = self.get(digest)
+        if not object_path:
+            return False
+        # A copy, not a hard link: callers may write to dest_path
+        try:
+            shutil.copyfile(object_path, dest_path)
+        except FileNotFoundError:
+            # Evicted since get()
+            return False
+        return True
+
+    def _evict_if_needed(self, keep: Optional[str] = None):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+
+            entries = []
+            for root, _, files in os.walk(self.objects_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            for _, size, path in sorted(entries):
+                if self._size <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.unlink(path)
+                    self._size -= size
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        return {
+            "cache_dir": self.cache_dir,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -7,7 +7,6 @@ import asyncio
 import logging
 import re
 from typing import Dict, Optional, List, Set, Any, Tuple, Union, TYPE_CHECKING
-import time
 from dataclasses import dataclass
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
@@ -16,6 +15,7 @@ from slack_sdk.errors import SlackApiError
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.tenants.models import Tenant
+from app.services.dedup import get_dedup_store
 
 # CHANGE THIS IMPORT PATH to match where your unified_intelligent_engine.py is located:
 from app.chatbot.unified_intelligent_engine import get_unified_intelligent_engine
@@ -139,45 +139,17 @@ class SlackBotManager:
         self.chunkers: Dict[int, SlackResponseChunker] = {}  # NEW: Per-tenant chunkers
         self.is_initialized = False
         
-        # Message deduplication (unchanged)
-        self.processed_messages: Dict[str, float] = {}
-        self.processing_messages: Set[str] = set()
-        self.cleanup_interval = 300
-        self.last_cleanup = time.time()
-    
-    # Keep all your existing helper methods unchanged:
-    def _cleanup_old_messages(self):
-        """Clean up old processed messages to prevent memory leaks"""
-        current_time = time.time()
-        if current_time - self.last_cleanup < self.cleanup_interval:
-            return
-            
-        cutoff_time = current_time - 600
-        old_messages = [msg_id for msg_id, timestamp in self.processed_messages.items() 
-                       if timestamp < cutoff_time]
-        
-        for msg_id in old_messages:
-            self.processed_messages.pop(msg_id, None)
-        
-        self.last_cleanup = current_time
+        # Message deduplication, shared across workers when DEDUP_BACKEND=redis
+        self.dedup = get_dedup_store("slack", ttl_seconds=600)
     
     def _get_message_id(self, event: dict) -> str:
         """Generate unique message ID for deduplication"""
         thread_ts = event.get('thread_ts', event.get('ts', ''))
         return f"{event.get('ts', '')}_{event.get('user', '')}_{event.get('channel', '')}_{thread_ts}"
     
-    def _is_message_processed(self, message_id: str) -> bool:
-        """Check if message was already processed"""
-        return message_id in self.processed_messages or message_id in self.processing_messages
-    
-    def _mark_message_processing(self, message_id: str):
-        """Mark message as currently being processed"""
-        self.processing_messages.add(message_id)
-    
-    def _mark_message_processed(self, message_id: str):
-        """Mark message as processed"""
-        self.processing_messages.discard(message_id)
-        self.processed_messages[message_id] = time.time()
+    def _claim_message(self, message_id: str) -> bool:
+        """True for the first delivery of a message; retries and the message/app_mention pair get False"""
+        return self.dedup.claim(message_id)
     
     async def initialize_bots(self, db: Session):
         """Initialize all Slack bots for active tenants - UPDATED"""
@@ -265,138 +237,128 @@ class SlackBotManager:
         @app.event("message")
         async def handle_message(event, say, client):
             try:
-                self._cleanup_old_messages()
-                
                 # Skip bot messages and certain subtypes
                 if event.get("bot_id") or event.get("subtype") in ["message_deleted", "message_changed"]:
                     return
                 
                 message_id = self._get_message_id(event)
                 
-                if self._is_message_processed(message_id):
+                if not self._claim_message(message_id):
                     logger.info(f"⏭️ Skipping already processed message {message_id}")
                     return
                 
-                self._mark_message_processing(message_id)
+                # Extract message details (same as before)
+                user_id = event["user"]
+                channel_id = event["channel"]
+                message_text = event.get("text", "")
+                message_ts = event.get("ts")
+                thread_ts = event.get("thread_ts")
                 
-                try:
-                    # Extract message details (same as before)
-                    user_id = event["user"]
-                    channel_id = event["channel"]
-                    message_text = event.get("text", "")
-                    message_ts = event.get("ts")
-                    thread_ts = event.get("thread_ts")
-                    
-                    is_thread_reply = bool(thread_ts and thread_ts != message_ts)
-                    thread_identifier = thread_ts if is_thread_reply else None
-                    
-                    logger.info(f"📨💬 Processing Slack message from {user_id}: '{message_text[:50]}...'")
-                    
-                    # Channel info and response logic (same as before)
-                    channel_info = await client.conversations_info(channel=channel_id)
-                    is_dm = channel_info["channel"]["is_im"]
-                    
-                    bot_user_id = await self._get_bot_user_id(client)
-                    is_mentioned = f"<@{bot_user_id}>" in message_text
-                    
-                    # Determine if should respond (same logic)
-                    should_respond = False
-                    if is_dm:
+                is_thread_reply = bool(thread_ts and thread_ts != message_ts)
+                thread_identifier = thread_ts if is_thread_reply else None
+                
+                logger.info(f"📨💬 Processing Slack message from {user_id}: '{message_text[:50]}...'")
+                
+                # Channel info and response logic (same as before)
+                channel_info = await client.conversations_info(channel=channel_id)
+                is_dm = channel_info["channel"]["is_im"]
+                
+                bot_user_id = await self._get_bot_user_id(client)
+                is_mentioned = f"<@{bot_user_id}>" in message_text
+                
+                # Determine if should respond (same logic)
+                should_respond = False
+                if is_dm:
+                    should_respond = True
+                elif is_thread_reply and thread_manager:
+                    if is_mentioned:
                         should_respond = True
-                    elif is_thread_reply and thread_manager:
-                        if is_mentioned:
-                            should_respond = True
-                        else:
-                            thread_history = thread_manager.get_thread_conversation_history(
-                                channel_id, user_id, thread_identifier, max_messages=50
-                            )
-                            bot_participated = any(not msg["is_from_user"] for msg in thread_history)
-                            should_respond = bot_participated
                     else:
-                        should_respond = is_mentioned
-                    
-                    if not should_respond:
-                        logger.info(f"⏭️ Not responding - conditions not met")
-                        self._mark_message_processed(message_id)
-                        return
-                    
-                    # Clean message
-                    cleaned_text = self._clean_message_text(message_text, bot_user_id)
-                    
-                    # Store in thread memory
-                    if thread_manager:
-                        thread_manager.add_message_to_thread(
-                            channel_id=channel_id,
-                            user_id=user_id,
-                            message=cleaned_text,
-                            is_from_user=True,
-                            thread_ts=thread_identifier,
-                            message_ts=message_ts
+                        thread_history = thread_manager.get_thread_conversation_history(
+                            channel_id, user_id, thread_identifier, max_messages=50
                         )
-                    
-                    # 🚀 NEW: Use unified intelligent engine
-                    engine = get_unified_intelligent_engine(next(get_db()))
-                    user_identifier = f"slack_{user_id}_{channel_id}"
-                    
-                    # Process with unified engine
-                    result = await engine.process_message(
-                        api_key=tenant.api_key,
-                        user_message=cleaned_text,
-                        user_identifier=user_identifier,
-                        platform="slack"
+                        bot_participated = any(not msg["is_from_user"] for msg in thread_history)
+                        should_respond = bot_participated
+                else:
+                    should_respond = is_mentioned
+                
+                if not should_respond:
+                    logger.info(f"⏭️ Not responding - conditions not met")
+                    return
+                
+                # Clean message
+                cleaned_text = self._clean_message_text(message_text, bot_user_id)
+                
+                # Store in thread memory
+                if thread_manager:
+                    thread_manager.add_message_to_thread(
+                        channel_id=channel_id,
+                        user_id=user_id,
+                        message=cleaned_text,
+                        is_from_user=True,
+                        thread_ts=thread_identifier,
+                        message_ts=message_ts
                     )
+                
+                # 🚀 NEW: Use unified intelligent engine
+                engine = get_unified_intelligent_engine(next(get_db()))
+                user_identifier = f"slack_{user_id}_{channel_id}"
+                
+                # Process with unified engine
+                result = await engine.process_message(
+                    api_key=tenant.api_key,
+                    user_message=cleaned_text,
+                    user_identifier=user_identifier,
+                    platform="slack"
+                )
+                
+                if result.get("success"):
+                    response_content = result["response"]
                     
-                    if result.get("success"):
-                        response_content = result["response"]
+                    # 🧩 NEW: Intelligent chunking
+                    if chunker:
+                        chunks = chunker.chunk_by_content_type(
+                            response=response_content,
+                            content_type=chunker.analyze_content_type(response_content, result),
+                            engagement_level=result.get('engagement_level', 'medium')
+                        )
                         
-                        # 🧩 NEW: Intelligent chunking
-                        if chunker:
-                            chunks = chunker.chunk_by_content_type(
-                                response=response_content,
-                                content_type=chunker.analyze_content_type(response_content, result),
-                                engagement_level=result.get('engagement_level', 'medium')
-                            )
-                            
-                            logger.info(f"🧩 Chunked response into {len(chunks)} chunks")
-                            
-                            # Determine threading
+                        logger.info(f"🧩 Chunked response into {len(chunks)} chunks")
+                        
+                        # Determine threading
+                        response_thread_ts = None
+                        if is_dm:
                             response_thread_ts = None
-                            if is_dm:
-                                response_thread_ts = None
-                            elif is_thread_reply:
-                                response_thread_ts = thread_ts
-                            else:
-                                response_thread_ts = message_ts
-                            
-                            # Send chunked response
-                            await self._send_chunked_response(
-                                client=client,
-                                channel=channel_id,
-                                chunks=chunks,
-                                thread_ts=response_thread_ts,
-                                engagement_level=result.get('engagement_level', 'medium'),
-                                chunker=chunker
-                            )
+                        elif is_thread_reply:
+                            response_thread_ts = thread_ts
                         else:
-                            # Fallback to single message
-                            await say(text=response_content, channel=channel_id)
-                        
-                        # Enhanced logging
-                        log_msg = f"✅ Unified response sent to {user_id} | Intent: {result.get('intent', 'unknown')}"
-                        logger.info(log_msg)
+                            response_thread_ts = message_ts
                         
+                        # Send chunked response
+                        await self._send_chunked_response(
+                            client=client,
+                            channel=channel_id,
+                            chunks=chunks,
+                            thread_ts=response_thread_ts,
+                            engagement_level=result.get('engagement_level', 'medium'),
+                            chunker=chunker
+                        )
                     else:
-                        error_message = "I'm having trouble processing your message right now. Please try again later."
-                        await say(text=error_message, channel=channel_id)
-                        logger.error(f"❌ Unified engine failed: {result.get('error')}")
-                        
-                finally:
-                    self._mark_message_processed(message_id)
+                        # Fallback to single message
+                        await say(text=response_content, channel=channel_id)
+                    
+                    # Enhanced logging
+                    log_msg = f"✅ Unified response sent to {user_id} | Intent: {result.get('intent', 'unknown')}"
+                    logger.info(log_msg)
+                    
+                else:
+                    error_message = "I'm having trouble processing your message right now. Please try again later."
+                    await say(text=error_message, channel=channel_id)
+                    logger.error(f"❌ Unified engine failed: {result.get('error')}")
+                    
                     
             except Exception as e:
                 logger.error(f"💥 Error handling Slack message for tenant {tenant.id}: {e}")
-                if 'message_id' in locals():
-                    self._mark_message_processed(message_id)
         
         # Keep your existing app mention handler but update the processing part
         @app.event("app_mention")
@@ -405,63 +367,56 @@ class SlackBotManager:
             try:
                 message_id = self._get_message_id(event)
                 
-                if self._is_message_processed(message_id):
+                if not self._claim_message(message_id):
                     return
                 
-                self._mark_message_processing(message_id)
+                user_id = event["user"]
+                channel_id = event["channel"]
+                message_text = event.get("text", "")
+                message_ts = event.get("ts")
+                thread_ts = event.get("thread_ts")
                 
-                try:
-                    user_id = event["user"]
-                    channel_id = event["channel"]
-                    message_text = event.get("text", "")
-                    message_ts = event.get("ts")
-                    thread_ts = event.get("thread_ts")
-                    
-                    bot_user_id = await self._get_bot_user_id(client)
-                    cleaned_text = self._clean_message_text(message_text, bot_user_id)
-                    
-                    # Use unified engine
-                    engine = get_unified_intelligent_engine(next(get_db()))
-                    user_identifier = f"slack_{user_id}_{channel_id}"
-                    
-                    result = await asyncio.to_thread(
-                        engine.process_message,
-                        api_key=tenant.api_key,
-                        user_message=cleaned_text,
-                        user_identifier=user_identifier,
-                        platform="slack"
-                    )
+                bot_user_id = await self._get_bot_user_id(client)
+                cleaned_text = self._clean_message_text(message_text, bot_user_id)
+                
+                # Use unified engine
+                engine = get_unified_intelligent_engine(next(get_db()))
+                user_identifier = f"slack_{user_id}_{channel_id}"
+                
+                result = await asyncio.to_thread(
+                    engine.process_message,
+                    api_key=tenant.api_key,
+                    user_message=cleaned_text,
+                    user_identifier=user_identifier,
+                    platform="slack"
+                )
+                
+                if result.get("success"):
+                    response_content = result["response"]
                     
-                    if result.get("success"):
-                        response_content = result["response"]
-                        
-                        if chunker:
-                            chunks = chunker.chunk_by_content_type(
-                                response=response_content,
-                                content_type=chunker.analyze_content_type(response_content, result),
-                                engagement_level=result.get('engagement_level', 'medium')
-                            )
-                            
-                            await self._send_chunked_response(
-                                client=client,
-                                channel=channel_id,
-                                chunks=chunks,
-                                thread_ts=thread_ts or message_ts,
-                                engagement_level=result.get('engagement_level', 'medium'),
-                                chunker=chunker
-                            )
-                        else:
-                            await say(text=response_content, thread_ts=thread_ts or message_ts)
+                    if chunker:
+                        chunks = chunker.chunk_by_content_type(
+                            response=response_content,
+                            content_type=chunker.analyze_content_type(response_content, result),
+                            engagement_level=result.get('engagement_level', 'medium')
+                        )
                         
-                        logger.info(f"✅ Responded to mention from {user_id}")
+                        await self._send_chunked_response(
+                            client=client,
+                            channel=channel_id,
+                            chunks=chunks,
+                            thread_ts=thread_ts or message_ts,
+                            engagement_level=result.get('engagement_level', 'medium'),
+                            chunker=chunker
+                        )
+                    else:
+                        await say(text=response_content, thread_ts=thread_ts or message_ts)
                     
-                finally:
-                    self._mark_message_processed(message_id)
+                    logger.info(f"✅ Responded to mention from {user_id}")
+                
                     
             except Exception as e:
                 logger.error(f"💥 Error handling mention: {e}")
-                if 'message_id' in locals():
-                    self._mark_message_processed(message_id)
         
         # Keep your existing channel event handlers unchanged
         @app.event("channel_created")
@@ -7,6 +7,7 @@ Handles Slack webhook events and management endpoints
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -19,10 +20,12 @@ import hashlib
 import time
 import json
 
-from app.database import get_db
+from app.database import get_db, get_async_db, SessionLocal
 from app.tenants.models import Tenant
 from app.tenants.router import get_tenant_from_api_key, get_current_tenant
+from slack_bolt.request.async_request import AsyncBoltRequest
 from app.slack.bot_manager import get_slack_bot_manager
+from app.webhooks.queue import InboxEvent, enqueue_webhook_event_async, register_webhook_handler
 from app.auth.models import User
 from app.auth.router import get_current_user
 
@@ -85,6 +88,47 @@ class UnifiedEngineResponse(BaseModel):
     token_efficiency: str
 
 
+async def process_slack_inbox_batch(events: List[InboxEvent]) -> bool:
+    """
+    Replay queued events from one channel to the tenant's Bolt app, in order.
+    Signatures were checked at ingestion, so requests are dispatched in socket
+    mode, which skips Bolt's timestamp-bound verification.
+    """
+    tenant_id = events[0].tenant_id
+    bot_manager = get_slack_bot_manager()
+    app = bot_manager.bots.get(tenant_id)
+    
+    if not app:
+        db = SessionLocal()
+        try:
+            tenant = db.query(Tenant).filter(Tenant.id == tenant_id, Tenant.is_active == True).first()
+            if not tenant or not tenant.slack_enabled:
+                logger.warning(f"Dropping {len(events)} queued Slack events: Slack disabled for tenant {tenant_id}")
+                return False
+            logger.info(f"🔧 Initializing Slack bot for tenant {tenant_id}")
+            await bot_manager.create_bot_for_tenant(tenant, db)
+        finally:
+            db.close()
+        app = bot_manager.bots.get(tenant_id)
+        if not app:
+            logger.error(f"❌ Failed to initialize Slack bot for tenant {tenant_id}")
+            return False
+    
+    for event in events:
+        bolt_request = AsyncBoltRequest(
+            body=json.dumps(event.payload),
+            headers={"content-type": "application/json"},
+            mode="socket_mode"
+        )
+        await app.async_dispatch(bolt_request)
+    
+    logger.info(f"✅ {len(events)} Slack events processed for tenant {tenant_id}")
+    return True
+
+
+register_webhook_handler("slack", process_slack_inbox_batch)
+
+
 def verify_slack_signature(request_body: bytes, timestamp: str, signature: str, signing_secret: str) -> bool:
     """Verify Slack request signature"""
     try:
@@ -138,7 +182,7 @@ async def handle_slack_events(request: Request):
 async def slack_webhook(
     tenant_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Slack webhook endpoint for a specific tenant - CHALLENGE FIRST VERSION
@@ -161,15 +205,8 @@ async def slack_webhook(
         headers = request.headers
         logger.info(f"📨 Received Slack webhook for tenant {tenant_id}")
         
-        # DEBUG: Check all tenants first
-        all_tenants = db.query(Tenant).all()
-        logger.info(f"🔍 DEBUG: Found {len(all_tenants)} total tenants in database")
-        
-        for tenant in all_tenants:
-            logger.info(f"   Tenant {tenant.id}: name={tenant.name}, active={tenant.is_active}, slack_enabled={getattr(tenant, 'slack_enabled', 'MISSING')}")
-        
         # Get specific tenant with detailed logging
-        tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+        tenant = await db.get(Tenant, tenant_id)
         
         if not tenant:
             logger.error(f"❌ Tenant {tenant_id} does not exist in database at all!")
@@ -210,27 +247,28 @@ async def slack_webhook(
             event_type = event.get("type")
             logger.info(f"📢 Received Slack event: {event_type}")
             
-            # Get bot manager and handler for event processing
-            bot_manager = get_slack_bot_manager()
-            handler = bot_manager.get_handler(tenant_id)
-            
-            if not handler:
-                logger.info(f"🔧 Initializing Slack bot for tenant {tenant_id}")
-                await bot_manager.create_bot_for_tenant(tenant, db)
-                handler = bot_manager.get_handler(tenant_id)
-                
-                if not handler:
-                    logger.error(f"❌ Failed to initialize Slack bot for tenant {tenant_id}")
-                    return JSONResponse(content={"status": "ok"})
-            
-            # Process the request
+            # Verify the request ourselves: the queued event is replayed to Bolt later
+            timestamp = headers.get("X-Slack-Request-Timestamp", "")
+            signature = headers.get("X-Slack-Signature", "")
             try:
-                response = await handler.handle(request)
-                logger.info(f"✅ Slack event processed successfully for tenant {tenant_id}")
-                return response if response else JSONResponse(content={"status": "ok"})
-            except Exception as e:
-                logger.error(f"❌ Error processing Slack event: {e}")
-                return JSONResponse(content={"status": "ok"})
+                fresh = abs(time.time() - int(timestamp)) < 60 * 5
+            except ValueError:
+                fresh = False
+            if not fresh or not verify_slack_signature(body, timestamp, signature, tenant.slack_signing_secret):
+                logger.warning(f"❌ Invalid Slack signature for tenant {tenant_id}")
+                raise HTTPException(status_code=401, detail="Invalid signature")
+            
+            # Persist and acknowledge within Slack's 3s window; retries dedupe on event_id
+            event_id = payload.get("event_id") or f"{event.get('channel')}:{event.get('event_ts') or event.get('ts')}"
+            await enqueue_webhook_event_async(
+                db,
+                platform="slack",
+                dedupe_key=f"{tenant_id}:{event_id}",
+                ordering_key=f"{tenant_id}:{event.get('channel') or event_type}",
+                payload=payload,
+                tenant_id=tenant_id
+            )
+            return JSONResponse(content={"status": "ok"})
         
         # Return OK for any other event types
         logger.info(f"📝 Unhandled Slack event type: {payload.get('type', 'unknown')}")
@@ -6,14 +6,17 @@ Handles separate conversation contexts for each thread while maintaining channel
 
 import logging
 import json
+import asyncio
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
+from app.config import settings
 from app.database import Base
 from app.chatbot.models import ChatSession
+from app.utils.bounded_cache import BoundedTTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,23 @@ class SlackThreadMemory(Base):
         Index('idx_slack_thread_tenant_channel', 'tenant_id', 'channel_id'),
         Index('idx_slack_thread_user_activity', 'user_id', 'last_activity'),
         Index('idx_slack_thread_ts', 'thread_ts'),
+        Index('idx_slack_thread_active_activity', 'is_active', 'last_activity'),
+    )
+
+class SlackThreadMessage(Base):
+    """One message of a thread, appended instead of rewriting the thread's JSON history"""
+    __tablename__ = "slack_thread_messages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    thread_memory_id = Column(Integer, ForeignKey("slack_thread_memory.id"), nullable=False)
+    is_from_user = Column(Boolean, nullable=False, default=True)
+    user_id = Column(String(50), nullable=True)
+    content = Column(Text, nullable=False)
+    message_ts = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_slack_thread_messages_thread', 'thread_memory_id', 'id'),
     )
 
 class SlackChannelContext(Base):
@@ -85,6 +105,7 @@ class ThreadContext:
     topic_summary: Optional[str] = None
     user_preferences: Optional[Dict[str, Any]] = None
     last_activity: Optional[datetime] = None
+    memory_id: Optional[int] = None  # SlackThreadMemory row
 
 @dataclass 
 class ChannelContext:
@@ -96,14 +117,63 @@ class ChannelContext:
     personality: Optional[str] = None
     common_questions: Optional[List[str]] = None
 
+MAX_THREAD_MESSAGES = 50  # history kept in memory per thread
+MESSAGE_OVERHEAD_BYTES = 200  # rough per-message dict/str overhead for the memory budget
+
+
+def _thread_context_size(context: ThreadContext) -> int:
+    return sum(len(msg.get("content") or "") + MESSAGE_OVERHEAD_BYTES for msg in context.messages) + 500
+
+
+# Shared by every tenant's manager so the whole process stays within one budget.
+# Keys are (tenant_id, thread_id, user_id) and (tenant_id, channel_id).
+_thread_cache = BoundedTTLCache(
+    max_entries=settings.SLACK_THREAD_CACHE_MAX_THREADS,
+    ttl_seconds=settings.SLACK_THREAD_CACHE_TTL_SECONDS,
+    max_bytes=settings.SLACK_THREAD_CACHE_MAX_BYTES,
+    sizeof=_thread_context_size
+)
+_channel_cache = BoundedTTLCache(
+    max_entries=settings.SLACK_CHANNEL_CACHE_MAX_CHANNELS,
+    ttl_seconds=settings.SLACK_THREAD_CACHE_TTL_SECONDS
+)
+
+
+class _TenantChannelCache:
+    """Dict-style view of the shared channel cache for one tenant (router code deletes from it)"""
+    
+    def __init__(self, tenant_id: int):
+        self.tenant_id = tenant_id
+    
+    def __contains__(self, channel_id: str) -> bool:
+        return (self.tenant_id, channel_id) in _channel_cache
+    
+    def __getitem__(self, channel_id: str) -> ChannelContext:
+        context = _channel_cache.get((self.tenant_id, channel_id))
+        if context is None:
+            raise KeyError(channel_id)
+        return context
+    
+    def __setitem__(self, channel_id: str, context: ChannelContext):
+        _channel_cache.set((self.tenant_id, channel_id), context)
+    
+    def __delitem__(self, channel_id: str):
+        _channel_cache.pop((self.tenant_id, channel_id))
+
+
 class SlackThreadMemoryManager:
     """Manages thread-aware conversations and channel context"""
     
     def __init__(self, db: Session, tenant_id: int):
         self.db = db
         self.tenant_id = tenant_id
-        self.memory_cache: Dict[str, ThreadContext] = {}
-        self.channel_cache: Dict[str, ChannelContext] = {}
+        self.channel_cache = _TenantChannelCache(tenant_id)
+        # Messages waiting for the next batched insert
+        self._pending_messages: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+    
+    def _cache_key(self, thread_id: str, user_id: str) -> Tuple[int, str, str]:
+        return (self.tenant_id, thread_id, user_id)
         
     def get_thread_identifier(self, channel_id: str, thread_ts: Optional[str] = None) -> str:
         """Generate unique thread identifier"""
@@ -117,8 +187,8 @@ class SlackThreadMemoryManager:
         thread_id = self.get_thread_identifier(channel_id, thread_ts)
         
         # Check cache first
-        if thread_id in self.memory_cache:
-            context = self.memory_cache[thread_id]
+        context = _thread_cache.get(self._cache_key(thread_id, user_id))
+        if context is not None:
             # Update activity timestamp
             context.last_activity = datetime.utcnow()
             return context
@@ -134,7 +204,7 @@ class SlackThreadMemoryManager:
         
         if thread_memory:
             # Load existing context
-            messages = json.loads(thread_memory.conversation_context or "[]")
+            messages = self._load_thread_messages(thread_memory)
             preferences = json.loads(thread_memory.user_preferences or "{}")
             
             context = ThreadContext(
@@ -144,7 +214,8 @@ class SlackThreadMemoryManager:
                 messages=messages,
                 topic_summary=thread_memory.topic_summary,
                 user_preferences=preferences,
-                last_activity=thread_memory.last_activity
+                last_activity=thread_memory.last_activity,
+                memory_id=thread_memory.id
             )
         else:
             # Create new context
@@ -173,11 +244,49 @@ class SlackThreadMemoryManager:
                 self.db.rollback()
                 logger.error(f"Error creating thread memory: {e}")
                 raise
+            context.memory_id = thread_memory.id
         
         # Cache the context
-        self.memory_cache[thread_id] = context
+        _thread_cache.set(self._cache_key(thread_id, user_id), context)
         return context
     
+    def _load_thread_messages(self, thread_memory: SlackThreadMemory) -> List[Dict[str, Any]]:
+        """Last MAX_THREAD_MESSAGES messages of a thread, converting a legacy JSON history on first load"""
+        rows = self.db.query(SlackThreadMessage).filter(
+            SlackThreadMessage.thread_memory_id == thread_memory.id
+        ).order_by(SlackThreadMessage.id.desc()).limit(MAX_THREAD_MESSAGES).all()
+        
+        if not rows:
+            legacy_messages = json.loads(thread_memory.conversation_context or "[]")
+            if legacy_messages:
+                self.db.bulk_insert_mappings(SlackThreadMessage, [
+                    {
+                        "thread_memory_id": thread_memory.id,
+                        "is_from_user": msg.get("is_from_user", True),
+                        "user_id": msg.get("user_id"),
+                        "content": msg.get("content") or "",
+                        "message_ts": msg.get("timestamp"),
+                    }
+                    for msg in legacy_messages
+                ])
+                thread_memory.conversation_context = "[]"
+                try:
+                    self.db.commit()
+                except Exception as e:
+                    self.db.rollback()
+                    logger.error(f"Error converting legacy thread history: {e}")
+            return legacy_messages[-MAX_THREAD_MESSAGES:]
+        
+        return [
+            {
+                "content": row.content,
+                "is_from_user": row.is_from_user,
+                "timestamp": row.message_ts or row.created_at.isoformat(),
+                "user_id": row.user_id
+            }
+            for row in reversed(rows)
+        ]
+    
     def add_message_to_thread(self, channel_id: str, user_id: str, message: str, 
                             is_from_user: bool, thread_ts: Optional[str] = None,
                             message_ts: Optional[str] = None) -> bool:
@@ -198,11 +307,23 @@ class SlackThreadMemoryManager:
             context.last_activity = datetime.utcnow()
             
             # Limit message history (keep last 50 messages per thread)
-            if len(context.messages) > 50:
-                context.messages = context.messages[-50:]
-            
-            # Update database
-            self._save_thread_context(context)
+            if len(context.messages) > MAX_THREAD_MESSAGES:
+                context.messages = context.messages[-MAX_THREAD_MESSAGES:]
+            # Re-measure the entry against the cache's memory budget
+            _thread_cache.set(self._cache_key(context.thread_id, user_id), context)
+            
+            # Append to the database in the next batch
+            if context.memory_id is None:
+                return False
+            self._pending_messages.append({
+                "thread_memory_id": context.memory_id,
+                "is_from_user": is_from_user,
+                "user_id": message_entry["user_id"],
+                "content": message,
+                "message_ts": message_ts,
+                "created_at": context.last_activity,
+            })
+            self._schedule_flush()
             
             logger.info(f"Added message to thread {context.thread_id}")
             return True
@@ -223,10 +344,58 @@ class SlackThreadMemoryManager:
         logger.info(f"Retrieved {len(messages)} messages for thread {context.thread_id}")
         return messages
     
+    def _schedule_flush(self):
+        """Debounce writes: one batched insert per SLACK_THREAD_FLUSH_SECONDS window"""
+        if len(self._pending_messages) >= settings.SLACK_THREAD_FLUSH_BATCH:
+            self.flush_pending_messages()
+            return
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests): write through
+            self.flush_pending_messages()
+            return
+        self._flush_handle = loop.call_later(settings.SLACK_THREAD_FLUSH_SECONDS, self.flush_pending_messages)
+    
+    def flush_pending_messages(self) -> int:
+        """Insert buffered messages and bump per-thread counters in one commit"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_messages:
+            return 0
+        
+        pending, self._pending_messages = self._pending_messages, []
+        counts: Dict[int, int] = {}
+        last_activity: Dict[int, datetime] = {}
+        for row in pending:
+            counts[row["thread_memory_id"]] = counts.get(row["thread_memory_id"], 0) + 1
+            last_activity[row["thread_memory_id"]] = row["created_at"]
+        
+        try:
+            self.db.bulk_insert_mappings(SlackThreadMessage, pending)
+            for memory_id, count in counts.items():
+                self.db.query(SlackThreadMemory).filter(
+                    SlackThreadMemory.id == memory_id
+                ).update({
+                    SlackThreadMemory.message_count: SlackThreadMemory.message_count + count,
+                    SlackThreadMemory.last_activity: last_activity[memory_id]
+                }, synchronize_session=False)
+            self.db.commit()
+            logger.debug(f"Flushed {len(pending)} Slack thread messages for tenant {self.tenant_id}")
+            return len(pending)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error flushing Slack thread messages: {e}")
+            return 0
+    
     def get_channel_context(self, channel_id: str) -> Optional[ChannelContext]:
         """Get channel-level context and settings"""
-        if channel_id in self.channel_cache:
-            return self.channel_cache[channel_id]
+        cached = _channel_cache.get((self.tenant_id, channel_id))
+        if cached is not None:
+            return cached
         
         channel_data = self.db.query(SlackChannelContext).filter(
             SlackChannelContext.tenant_id == self.tenant_id,
@@ -351,21 +520,15 @@ class SlackThreadMemoryManager:
         return "\n".join(prompt_parts)
     
     def _save_thread_context(self, context: ThreadContext):
-        """Save thread context to database"""
+        """Save thread metadata (messages are appended separately by flush_pending_messages)"""
         try:
             thread_memory = self.db.query(SlackThreadMemory).filter(
-                SlackThreadMemory.tenant_id == self.tenant_id,
-                SlackThreadMemory.channel_id == context.channel_id,
-                SlackThreadMemory.thread_ts == context.thread_id.split(":")[-1] if ":" in context.thread_id else None,
-                SlackThreadMemory.user_id == context.user_id,
-                SlackThreadMemory.is_active == True
-            ).first()
+                SlackThreadMemory.id == context.memory_id
+            ).first() if context.memory_id else None
             
             if thread_memory:
-                thread_memory.conversation_context = json.dumps(context.messages)
                 thread_memory.user_preferences = json.dumps(context.user_preferences or {})
                 thread_memory.topic_summary = context.topic_summary
-                thread_memory.message_count = len(context.messages)
                 thread_memory.last_activity = context.last_activity or datetime.utcnow()
                 
                 try:
@@ -382,29 +545,16 @@ class SlackThreadMemoryManager:
     def cleanup_old_threads(self, days_old: int = 30):
         """Clean up inactive threads older than specified days"""
         try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days_old)
+            self.flush_pending_messages()
             
-            old_threads = self.db.query(SlackThreadMemory).filter(
-                SlackThreadMemory.tenant_id == self.tenant_id,
-                SlackThreadMemory.last_activity < cutoff_date,
-                SlackThreadMemory.is_active == True
-            ).all()
+            from app.services.retention import get_retention_engine
+            result = get_retention_engine().run_policy("slack_threads", tenant_id=self.tenant_id, days=days_old)
             
-            for thread in old_threads:
-                thread.is_active = False
+            # Drop this tenant's threads from the shared cache
+            _thread_cache.discard_where(lambda key: key[0] == self.tenant_id)
             
-            try:
-                self.db.commit()
-            except Exception as e:
-                self.db.rollback()
-                logger.error(f"Error cleaning up old threads: {e}")
-                raise
-            
-            # Clear from cache
-            self.memory_cache.clear()
-            
-            logger.info(f"Cleaned up {len(old_threads)} old threads")
-            return len(old_threads)
+            logger.info(f"Cleaned up {result['affected']} old threads")
+            return result["affected"]
             
         except Exception as e:
             logger.error(f"Error cleaning up old threads: {e}")
@@ -413,6 +563,8 @@ class SlackThreadMemoryManager:
     def get_thread_statistics(self) -> Dict[str, Any]:
         """Get statistics about thread usage"""
         try:
+            self.flush_pending_messages()
+            
             # Active threads
             active_threads = self.db.query(SlackThreadMemory).filter(
                 SlackThreadMemory.tenant_id == self.tenant_id,
@@ -439,7 +591,9 @@ class SlackThreadMemoryManager:
                 "active_threads": active_threads,
                 "recent_active_threads": recent_threads,
                 "average_messages_per_thread": round(avg_messages, 2),
-                "cached_threads": len(self.memory_cache)
+                "cached_threads": _thread_cache.count_where(lambda key: key[0] == self.tenant_id),
+                "pending_messages": len(self._pending_messages),
+                "cache": get_thread_cache_stats()
             }
             
         except Exception as e:
@@ -483,4 +637,8 @@ class SlackThreadMemoryManager:
             
         except Exception as e:
             logger.error(f"Error getting user preferences: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+def get_thread_cache_stats() -> Dict[str, Any]:
+    """Process-wide thread/channel cache usage"""
+    return {"threads": _thread_cache.stats(), "channels": _channel_cache.stats()}
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.chatbot.unified_intelligent_engine import get_unified_intelligent_engine
 from app.telegram.service import TelegramService
+from app.services.dedup import get_dedup_store
 from app.telegram.models import TelegramIntegration, TelegramChat
 from app.telegram.utils import TelegramUtils
 from app.tenants.models import Tenant
@@ -30,6 +31,9 @@ class TelegramMessageHandler:
         self.db = db
         # Initialize unified intelligent engine instead of chatbot engine
         self.unified_engine = get_unified_intelligent_engine(db)
+        # Updates re-run after a worker crash (lease reclaim) must not be answered twice;
+        # an update is recorded only once handled, so a failed one is still retried
+        self.dedup = get_dedup_store("telegram", ttl_seconds=3600)
     
     async def process_update(self, update: Dict[str, Any], integration: TelegramIntegration) -> bool:
         """
@@ -42,6 +46,11 @@ class TelegramMessageHandler:
         Returns:
             bool: Success status
         """
+        dedupe_key = f"{integration.tenant_id}:{update.get('update_id')}"
+        if self.dedup.seen(dedupe_key):
+            logger.info(f"⏭️ Skipping already processed Telegram update {update.get('update_id')}")
+            return True
+        
         try:
             # Initialize Telegram service
             telegram_service = TelegramService(integration.bot_token)
@@ -59,6 +68,7 @@ class TelegramMessageHandler:
             
             # Update integration stats
             if success:
+                self.dedup.claim(dedupe_key)
                 integration.total_messages_received += 1
                 integration.last_webhook_received = datetime.utcnow()
                 integration.error_count = 0  # Reset error count on success
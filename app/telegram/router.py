@@ -5,13 +5,15 @@ Handles Telegram webhook endpoints and management APIs
 """
 
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Header, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
 import json
 
-from app.database import get_db
+from app.database import get_db, get_async_db, SessionLocal
 from app.telegram.bot_manager import get_telegram_bot_manager
 from app.telegram.models import TelegramIntegration, TelegramChat
 from app.telegram.message_handler import TelegramMessageHandler
@@ -21,6 +23,7 @@ from app.tenants.router import get_tenant_from_api_key
 from app.tenants.models import Tenant
 from app.auth.router import get_admin_user
 from app.auth.models import User
+from app.webhooks.queue import InboxEvent, enqueue_webhook_event_async, register_webhook_handler
 
 logger = logging.getLogger(__name__)
 
@@ -58,8 +61,7 @@ class TelegramTestMessageRequest(BaseModel):
 async def telegram_webhook(
     tenant_id: int,
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_telegram_bot_api_secret_token: Optional[str] = Header(None)
 ):
     """
@@ -81,10 +83,12 @@ async def telegram_webhook(
             raise HTTPException(status_code=400, detail="Invalid JSON")
         
         # Get Telegram integration
-        integration = db.query(TelegramIntegration).filter(
-            TelegramIntegration.tenant_id == tenant_id,
-            TelegramIntegration.is_active == True
-        ).first()
+        integration = (await db.execute(
+            select(TelegramIntegration).where(
+                TelegramIntegration.tenant_id == tenant_id,
+                TelegramIntegration.is_active == True
+            )
+        )).scalars().first()
         
         if not integration:
             logger.warning(f"No active Telegram integration found for tenant {tenant_id}")
@@ -101,8 +105,15 @@ async def telegram_webhook(
             logger.warning(f"Invalid webhook update format for tenant {tenant_id}")
             raise HTTPException(status_code=400, detail="Invalid update format")
         
-        # Process update in background
-        background_tasks.add_task(process_telegram_update, update, integration, db)
+        # Persist the update; the ingestion queue processes it after we acknowledge
+        await enqueue_webhook_event_async(
+            db,
+            platform="telegram",
+            dedupe_key=f"{tenant_id}:{update['update_id']}",
+            ordering_key=f"{tenant_id}:{TelegramUtils.get_update_chat_id(update) or 'bot'}",
+            payload=update,
+            tenant_id=tenant_id
+        )
         
         # Return success immediately
         return {"ok": True}
@@ -113,21 +124,36 @@ async def telegram_webhook(
         logger.error(f"💥 Error in Telegram webhook for tenant {tenant_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-async def process_telegram_update(update: Dict[str, Any], integration: TelegramIntegration, db: Session):
+async def process_telegram_inbox_batch(events: List[InboxEvent]) -> bool:
     """
-    Background task to process Telegram update
+    Handle queued updates from one chat, in order, with a session of our own
     """
+    tenant_id = events[0].tenant_id
+    db = SessionLocal()
     try:
+        integration = db.query(TelegramIntegration).filter(
+            TelegramIntegration.tenant_id == tenant_id,
+            TelegramIntegration.is_active == True
+        ).first()
+        
+        if not integration:
+            logger.warning(f"Dropping {len(events)} queued Telegram updates: no active integration for tenant {tenant_id}")
+            return False
+        
         handler = TelegramMessageHandler(db)
-        success = await handler.process_update(update, integration)
+        success = True
+        for update in TelegramUtils.coalesce_updates([event.payload for event in events]):
+            success = await handler.process_update(update, integration) and success
         
         if success:
-            logger.info(f"✅ Successfully processed Telegram update for tenant {integration.tenant_id}")
+            logger.info(f"✅ Successfully processed {len(events)} Telegram updates for tenant {tenant_id}")
         else:
-            logger.error(f"❌ Failed to process Telegram update for tenant {integration.tenant_id}")
-            
-    except Exception as e:
-        logger.error(f"💥 Error processing Telegram update: {str(e)}")
+            logger.error(f"❌ Failed to process Telegram updates for tenant {tenant_id}")
+        return success
+    finally:
+        db.close()
+
+register_webhook_handler("telegram", process_telegram_inbox_batch)
 
 # ============ MANAGEMENT ENDPOINTS ============
 
@@ -4,14 +4,14 @@ Telegram Bot API Service
 Handles all Telegram API communications
 """
 
-import asyncio
-import aiohttp
+import httpx
 import logging
 from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import json
 import os
 from urllib.parse import urljoin
+from app.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -27,39 +27,31 @@ class TelegramService:
         self.bot_token = bot_token
         self.api_url = f"{self.BASE_URL}{bot_token}/"
         self.file_api_url = f"{self.FILE_URL}{bot_token}/"
-        self.session: Optional[aiohttp.ClientSession] = None
-    
-    async def _ensure_session(self):
-        """Ensure aiohttp session exists"""
-        if self.session is None or self.session.closed:
-            timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+        self.http = get_http_client()
     
     async def close(self):
-        """Close aiohttp session"""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """Kept for callers; connections belong to the shared pooled client (one per event loop),
+        which close_http_client() closes at shutdown"""
+        pass
     
     async def _make_request(self, method: str, **kwargs) -> Dict[str, Any]:
         """
         Make API request to Telegram Bot API
         """
-        await self._ensure_session()
-        
         url = urljoin(self.api_url, method)
         
         try:
-            async with self.session.post(url, json=kwargs) as response:
-                data = await response.json()
-                
-                if data.get("ok"):
-                    return {"success": True, "result": data.get("result")}
-                else:
-                    error_msg = data.get("description", "Unknown error")
-                    logger.error(f"Telegram API error for {method}: {error_msg}")
-                    return {"success": False, "error": error_msg, "error_code": data.get("error_code")}
+            response = await self.http.request("telegram", "POST", url, json=kwargs)
+            data = response.json()
+            
+            if data.get("ok"):
+                return {"success": True, "result": data.get("result")}
+            else:
+                error_msg = data.get("description", "Unknown error")
+                logger.error(f"Telegram API error for {method}: {error_msg}")
+                return {"success": False, "error": error_msg, "error_code": data.get("error_code")}
                     
-        except asyncio.TimeoutError:
+        except httpx.TimeoutException:
             logger.error(f"Timeout error for Telegram API method: {method}")
             return {"success": False, "error": "Request timeout"}
         except Exception as e:
@@ -403,4 +403,39 @@ class TelegramUtils:
             elif entity_type == "bot_command":
                 extracted["bot_commands"].append(entity_text)
         
-        return extracted
\ No newline at end of file
+        return extracted
+    
+    @staticmethod
+    def get_update_chat_id(update: Dict[str, Any]) -> Optional[str]:
+        """Chat an update belongs to (message, edited message or callback query)"""
+        message = (update.get("message") or update.get("edited_message")
+                   or (update.get("callback_query") or {}).get("message") or {})
+        chat_id = (message.get("chat") or {}).get("id")
+        return str(chat_id) if chat_id is not None else None
+    
+    @staticmethod
+    def coalesce_updates(updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge runs of consecutive plain-text messages from the same user into one
+        update so a burst ("hi" / "I need help" / "with my order") gets one answer.
+        Commands, callbacks, edits and media are kept as separate updates, in order.
+        """
+        coalesced: List[Dict[str, Any]] = []
+        
+        def is_plain_text(update: Dict[str, Any]) -> bool:
+            text = (update.get("message") or {}).get("text", "")
+            return bool(text.strip()) and not text.startswith("/")
+        
+        for update in updates:
+            if coalesced and is_plain_text(update) and is_plain_text(coalesced[-1]):
+                previous = coalesced[-1]["message"]
+                current = update["message"]
+                if (previous.get("from") or {}).get("id") == (current.get("from") or {}).get("id"):
+                    merged_message = dict(current)
+                    merged_message["text"] = f"{previous['text']}\n{current['text']}"
+                    merged_message.pop("entities", None)  # offsets no longer line up
+                    coalesced[-1] = {**update, "message": merged_message}
+                    continue
+            coalesced.append(update)
+        
+        return coalesced
@@ -9,7 +9,8 @@ from collections import defaultdict
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Request
 from fastapi import File, UploadFile
 from typing import List, Optional
@@ -68,6 +69,15 @@ def get_tenant_from_api_key(api_key: str, db: Session) -> Tenant:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid API key or inactive tenant")
     return tenant
 
+async def get_tenant_from_api_key_async(api_key: str, db: AsyncSession) -> Tenant:
+    """get_tenant_from_api_key for endpoints on the async engine."""
+    tenant = (await db.execute(
+        select(Tenant).where(Tenant.api_key == api_key, Tenant.is_active == True)
+    )).scalars().first()
+    if not tenant:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid API key or inactive tenant")
+    return tenant
+
 router = APIRouter()
 
 # Pydantic models
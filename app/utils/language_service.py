@@ -1,13 +1,45 @@
 """
 Language detection and translation service for the chatbot
+
+    language = language_service.detect_language(text)                               # cached
+    translated, changed = language_service.translate(text, "es", tenant_id=7)         # translation memory
+    translated, changed = await language_service.translate_async(text, "en", tenant_id=7)
+    reply, changed = await language_service.translate_outbound(reply, "es", tenant_id=7)  # sentence chunks, batched
+
+Detection results are cached by normalized text. langdetect is seeded so the same
+text always gets the same answer, and text shorter than LANGUAGE_DETECT_MIN_CHARS
+is not detected at all (on a few characters langdetect is both slow to settle
+and usually wrong).
+
+Translations go through a bounded translation memory keyed by tenant, language
+pair and normalized text. Misses are sent to the backend in batches of up to
+TRANSLATION_BATCH_MAX_CHARS, so a reply split into sentences costs one request
+and its recurring sentences ("Is there anything else I can help with?") cost none.
+The async variants run on a small dedicated thread pool, off the event loop.
+
+Backends are pluggable (TRANSLATION_BACKEND): "google" uses deep-translator with
+one reused translator per language pair and thread; "local" is an offline phrase
+table for tests and development. register_translator_backend() adds others.
+
+Scope: this is the layer the inbound and outbound legs should use, but no chat
+turn calls it yet. The engine and router import the singleton without translating
+messages or replies, so enabling translation per tenant is a separate change.
 """
+import re
+import time
+import asyncio
 import logging
-from typing import Optional, Tuple
-# import os # os was imported but not used, can be removed if not needed elsewhere
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.bounded_cache import BoundedTTLCache
 
 logger = logging.getLogger(__name__)
 
-# --- Define TRANSLATION_AVAILABLE at the module level first ---
+# --- Define availability flags at the module level first ---
+DETECTION_AVAILABLE = False
 TRANSLATION_AVAILABLE = False
 # These will store the actual imported modules/classes if successful
 _langdetect_detect = None
@@ -16,24 +48,26 @@ _GoogleTranslator = None
 
 # Try to import the language detection and translation libraries
 try:
+    from langdetect import DetectorFactory
     from langdetect import detect as langdetect_detect_imported, LangDetectException as LangDetectException_imported
-    from deep_translator import GoogleTranslator as GoogleTranslator_imported
-    
-    # If imports are successful, update the flags and assign the imported items
+
+    # langdetect is randomized; a fixed seed makes a text's language stable between calls
+    DetectorFactory.seed = 0
     _langdetect_detect = langdetect_detect_imported
     _LangDetectException = LangDetectException_imported
+    DETECTION_AVAILABLE = True
+except ImportError:
+    logger.warning("langdetect not installed - language detection disabled. To enable it, run: pip install langdetect")
+
+try:
+    from deep_translator import GoogleTranslator as GoogleTranslator_imported
+
     _GoogleTranslator = GoogleTranslator_imported
     TRANSLATION_AVAILABLE = True
-    logger.info("Successfully imported langdetect and deep-translator. Translation and detection features are available.")
-
 except ImportError:
-    # TRANSLATION_AVAILABLE remains False (its default value)
     logger.warning(
-        "Language detection/translation libraries (langdetect, deep-translator) not installed. "
-        "Translation and detection features will be disabled. To enable them, run: "
-        "pip install langdetect deep-translator"
+        "deep-translator not installed - Google translation disabled. To enable it, run: pip install deep-translator"
     )
-    # _langdetect_detect, _LangDetectException, _GoogleTranslator remain None
 
 # Define supported languages with their codes
 SUPPORTED_LANGUAGES = {
@@ -74,93 +108,340 @@ LANGDETECT_TO_GOOGLE = {
     # Add other mappings if langdetect returns codes different from what GoogleTranslator expects
 }
 
+AUTO = 'auto'
+BATCH_SEPARATOR = "\n"  # survives translation; texts containing it are sent on their own
+
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+# Sentence boundaries (kept, so the reply can be reassembled as written) and line breaks
+_SENTENCE_BREAK = re.compile(r"(\n+|(?<=[.!?])[ \t]+)")
+_NOT_DETECTED = ""  # cached marker for text langdetect could not place
+
+
+def _normalize(text: str) -> str:
+    return _SPACES.sub(" ", text or "").strip()
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences at even positions, the separators between them at odd positions"""
+    return _SENTENCE_BREAK.split(text or "")
+
+
+# ============ BACKENDS ============
+
+class TranslatorBackend:
+    """Translates a batch of texts between one language pair; None for a text it could not translate"""
+    name = "base"
+    available = True
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        raise NotImplementedError
+
+
+class GoogleTranslatorBackend(TranslatorBackend):
+    """deep-translator's GoogleTranslator, one request per batch"""
+    name = "google"
+
+    def __init__(self):
+        self.available = TRANSLATION_AVAILABLE
+        # GoogleTranslator keeps per-request state on the instance, so instances are reused per thread
+        self._local = threading.local()
+
+    def _translator(self, source: str, target: str):
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            translator = translators[(source, target)] = _GoogleTranslator(source=source, target=target)
+        return translator
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        translator = self._translator(source, target)
+        if len(texts) == 1:
+            return [translator.translate(texts[0])]
+        joined = translator.translate(BATCH_SEPARATOR.join(texts))
+        parts = joined.split(BATCH_SEPARATOR) if joined else []
+        if len(parts) == len(texts):
+            return [part.strip() for part in parts]
+        # Lines merged or split in translation: one request per text instead
+        logger.debug(f"Batch of {len(texts)} texts came back as {len(parts)} lines; translating one by one")
+        return [translator.translate(text) for text in texts]
+
+
+class LocalTranslatorBackend(TranslatorBackend):
+    """Offline backend: phrase table lookups, anything else comes back tagged with the target language
+
+        backend = LocalTranslatorBackend({("en", "es"): {"Hello!": "¡Hola!"}})
+        service = LanguageService(backend=backend)
+    """
+    name = "local"
+
+    def __init__(self, phrases: Optional[Dict[Tuple[str, str], Dict[str, str]]] = None):
+        self.phrases = phrases or {}
+        self.calls = 0
+
+    def add(self, source: str, target: str, phrases: Dict[str, str]):
+        self.phrases.setdefault((source, target), {}).update(phrases)
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        self.calls += 1
+        table = self.phrases.get((source, target), {})
+        return [table.get(text, f"[{target}] {text}") for text in texts]
+
+
+_BACKENDS: Dict[str, Callable[[], TranslatorBackend]] = {
+    "google": GoogleTranslatorBackend,
+    "local": LocalTranslatorBackend,
+}
+
+
+def register_translator_backend(name: str, factory: Callable[[], TranslatorBackend]):
+    """Make a backend selectable with TRANSLATION_BACKEND=<name>"""
+    _BACKENDS[name] = factory
+
+
+def create_translator_backend(name: str) -> TranslatorBackend:
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        logger.error(f"❌ Unknown translation backend {name!r}, using google")
+        factory = GoogleTranslatorBackend
+    return factory()
+
+
+def _batches(texts: List[str], max_chars: int) -> List[List[str]]:
+    """Group texts into requests of at most max_chars (joined with the separator)"""
+    batches: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        if BATCH_SEPARATOR in text:
+            batches.append([text])
+            continue
+        if current and size + len(BATCH_SEPARATOR) + len(text) > max_chars:
+            batches.append(current)
+            current, size = [], 0
+        size += len(text) + (len(BATCH_SEPARATOR) if current else 0)
+        current.append(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+# ============ SERVICE ============
+
 class LanguageService:
     """Service for language detection and translation"""
-    
-    def __init__(self):
+
+    def __init__(self, backend: Optional[TranslatorBackend] = None):
         """Initialize the language service"""
-        self.translator_operational = TRANSLATION_AVAILABLE
-        logger.info(f"Translation service initialized. Operational: {self.translator_operational}")
-    
+        self.backend = backend or create_translator_backend(settings.TRANSLATION_BACKEND)
+        self.translator_operational = self.backend.available
+        self._detections = BoundedTTLCache(max_entries=settings.LANGUAGE_DETECT_CACHE_MAX_ENTRIES)
+        self._memory = BoundedTTLCache(
+            max_entries=settings.TRANSLATION_MEMORY_MAX_ENTRIES,
+            ttl_seconds=settings.TRANSLATION_MEMORY_TTL_SECONDS,
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.backend_calls = 0
+        self.backend_texts = 0
+        self.backend_errors = 0
+        self.backend_ms = 0.0
+        logger.info(
+            f"Translation service initialized. Backend: {self.backend.name}, "
+            f"operational: {self.translator_operational}, detection: {DETECTION_AVAILABLE}"
+        )
+
+    def set_backend(self, backend: TranslatorBackend):
+        """Swap the translation backend (e.g. LocalTranslatorBackend offline); clears the translation memory"""
+        self.backend = backend
+        self.translator_operational = backend.available
+        self._memory.clear()
+
+    # ============ DETECTION ============
+
     def detect_language(self, text: str) -> Optional[str]:
         """
         Detect the language of the text.
-        Returns language code (e.g., 'en', 'es', etc.) or None if detection fails or libraries are unavailable.
+        Returns language code (e.g., 'en', 'es', etc.) or None if detection fails, the text is too
+        short to tell, or langdetect is unavailable.
         """
-        if not TRANSLATION_AVAILABLE or not _langdetect_detect or not text:
-            # This check ensures that the 'detect' function from langdetect was actually imported
-            if text: # Only log if text was provided but detection is unavailable
-                 logger.debug("Language detection libraries not available or text is empty. Cannot detect language.")
+        if not DETECTION_AVAILABLE or not text:
             return None
-        
+
+        normalized = _normalize(text).lower()
+        if len(normalized) < settings.LANGUAGE_DETECT_MIN_CHARS:
+            return None
+
+        cached = self._detections.get(normalized)
+        if cached is not None:
+            return cached or None
+
         try:
-            lang_code = _langdetect_detect(text) 
+            lang_code = _langdetect_detect(normalized)
             # Map langdetect's output to what GoogleTranslator might expect, if necessary
             mapped_lang_code = LANGDETECT_TO_GOOGLE.get(lang_code, lang_code)
-            
-            # Check if it's a language your system explicitly supports (optional, but good for consistency)
-            if mapped_lang_code in SUPPORTED_LANGUAGES:
-                logger.debug(f"Detected language: {SUPPORTED_LANGUAGES.get(mapped_lang_code, mapped_lang_code)} ({mapped_lang_code})")
-                return mapped_lang_code
-            else:
-                # If you want to allow any language detected by langdetect, even if not in your SUPPORTED_LANGUAGES list:
+            if mapped_lang_code not in SUPPORTED_LANGUAGES:
                 logger.debug(f"Detected language (not in explicit support list): {mapped_lang_code}")
-                return mapped_lang_code # Or return None if you only want to handle explicitly supported ones
-        except _LangDetectException as e: # Use the imported LangDetectException
+        except _LangDetectException as e:
             logger.warning(f"Language detection failed for text \"{text[:30]}...\": {e}")
-            return None
+            mapped_lang_code = _NOT_DETECTED
         except Exception as e: # Catch any other unexpected errors
             logger.error(f"Unexpected error during language detection for text \"{text[:30]}...\": {e}")
             return None
-    
-    def translate(self, text: str, target_lang: str = 'en', source_lang: Optional[str] = None) -> Tuple[str, bool]:
+
+        self._detections.set(normalized, mapped_lang_code)
+        return mapped_lang_code or None
+
+    # ============ TRANSLATION ============
+
+    def _call_backend(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        started = time.perf_counter()
+        try:
+            results = self.backend.translate_batch(texts, source, target)
+            failed = False
+        except Exception as e:
+            logger.error(f"Error during translation from {source} to {target} ({len(texts)} texts): {e}")
+            results, failed = [None] * len(texts), True
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self.backend_calls += 1
+            self.backend_texts += len(texts)
+            self.backend_ms += elapsed_ms
+            self.backend_errors += failed
+        return results
+
+    def _translate_texts(self, texts: List[str], source: str, target: str,
+                         tenant_id: Optional[int]) -> List[Optional[str]]:
+        """Translation per text from memory or the backend; None where translation failed"""
+        results: List[Optional[str]] = [None] * len(texts)
+        misses: Dict[str, List[int]] = {}  # normalized text -> positions, so repeats cost one lookup
+        for position, text in enumerate(texts):
+            normalized = _normalize(text)
+            if not normalized:
+                results[position] = text
+                continue
+            cached = self._memory.get((tenant_id, source, target, normalized))
+            if cached is not None:
+                results[position] = cached
+            else:
+                misses.setdefault(normalized, []).append(position)
+
+        for batch in _batches(list(misses), settings.TRANSLATION_BATCH_MAX_CHARS):
+            for original, translated in zip(batch, self._call_backend(batch, source, target)):
+                if not translated:
+                    continue
+                self._memory.set((tenant_id, source, target, original), translated)
+                for position in misses[original]:
+                    results[position] = translated
+        return results
+
+    def _needs_translation(self, text: str, target_lang: str, source_lang: Optional[str]) -> bool:
+        if not self.translator_operational or not text or not text.strip():
+            return False
+        # If source and target are the same, no need to translate
+        if source_lang and source_lang != AUTO:
+            return source_lang != target_lang
+        # Without a source, detect first to avoid translating text that is already in the target language
+        return self.detect_language(text) != target_lang
+
+    def translate(self, text: str, target_lang: str = 'en', source_lang: Optional[str] = None,
+                  tenant_id: Optional[int] = None) -> Tuple[str, bool]:
         """
         Translate text to the target language.
         Returns (translated_text, was_translated_boolean).
         """
-        if not self.translator_operational or not _GoogleTranslator or not text:
-            # If translation is not operational or no text, return original
-            if text: # Only log if text was provided but translation is unavailable
-                logger.debug("Translation not operational or text is empty. Cannot translate.")
+        if not self._needs_translation(text, target_lang, source_lang):
             return text, False
-        
-        # Determine the source language
-        actual_source_lang = source_lang if source_lang else 'auto'
-        
-        # If source and target are the same, no need to translate
-        if actual_source_lang != 'auto' and actual_source_lang == target_lang:
-            logger.debug(f"Source language ({actual_source_lang}) and target language ({target_lang}) are the same. No translation needed.")
-            return text, False
-        
-        # If source is 'auto', we should attempt detection first to avoid unnecessary translation
-        if actual_source_lang == 'auto':
-            detected_lang = self.detect_language(text)
-            if detected_lang and detected_lang == target_lang:
-                logger.debug(f"Detected language ({detected_lang}) is the same as target language ({target_lang}). No translation needed.")
-                return text, False
-        
-        try:
-            # Create a translator instance for this specific translation
-            # deep-translator requires a new instance for each source/target pair
-            translator = _GoogleTranslator(source=actual_source_lang, target=target_lang)
-            
-            # Perform the translation
-            translated_text = translator.translate(text)
-            
-            if translated_text:
-                logger.info(f"Translated from {actual_source_lang} to {target_lang}: \"{text[:30]}...\" -> \"{translated_text[:30]}...\"")
-                return translated_text, True
-            else:
-                logger.error(f"Translation attempt from {actual_source_lang} to {target_lang} did not return expected result.")
-                return text, False
-        except Exception as e:
-            logger.error(f"Error during translation from {actual_source_lang} to {target_lang} for text \"{text[:30]}...\": {e}")
+        translated = self._translate_texts([text], source_lang or AUTO, target_lang, tenant_id)[0]
+        if not translated:
             return text, False # Fallback to original text on error
-    
+        return translated, True
+
+    def translate_chunks(self, texts: List[str], target_lang: str = 'en', source_lang: Optional[str] = None,
+                         tenant_id: Optional[int] = None) -> List[str]:
+        """Translate several texts with as few backend requests as possible; untranslatable ones come back as-is"""
+        if not self.translator_operational or not texts:
+            return list(texts)
+        if source_lang and source_lang != AUTO and source_lang == target_lang:
+            return list(texts)
+        translated = self._translate_texts(texts, source_lang or AUTO, target_lang, tenant_id)
+        return [result or text for result, text in zip(translated, texts)]
+
+    def translate_sentences(self, text: str, target_lang: str = 'en', source_lang: Optional[str] = None,
+                            tenant_id: Optional[int] = None) -> Tuple[str, bool]:
+        """translate() for longer replies: sentence by sentence (one batched request), line breaks kept"""
+        if not self._needs_translation(text, target_lang, source_lang):
+            return text, False
+        pieces = split_sentences(text)
+        sentences = pieces[0::2]
+        translated = self.translate_chunks(sentences, target_lang, source_lang, tenant_id)
+        pieces[0::2] = translated
+        return "".join(pieces), translated != sentences
+
+    # ============ ASYNC (off the event loop) ============
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.TRANSLATION_MAX_WORKERS, thread_name_prefix="translation"
+                    )
+        return self._executor
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), function, *args)
+
+    async def detect_language_async(self, text: str) -> Optional[str]:
+        return await self._run(self.detect_language, text)
+
+    async def translate_async(self, text: str, target_lang: str = 'en', source_lang: Optional[str] = None,
+                              tenant_id: Optional[int] = None) -> Tuple[str, bool]:
+        """Inbound leg: the user's message, usually to the tenant's working language"""
+        return await self._run(self.translate, text, target_lang, source_lang, tenant_id)
+
+    async def translate_outbound(self, text: str, target_lang: str, source_lang: Optional[str] = None,
+                                 tenant_id: Optional[int] = None) -> Tuple[str, bool]:
+        """Outbound leg: a bot reply into the user's language, sentence chunks batched"""
+        return await self._run(self.translate_sentences, text, target_lang, source_lang, tenant_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ============ HOUSEKEEPING ============
+
+    def clear_translation_memory(self, tenant_id: Optional[int] = None) -> int:
+        """Forget cached translations (one tenant's, or all), e.g. after its glossary changes"""
+        if tenant_id is None:
+            count = len(self._memory)
+            self._memory.clear()
+            return count
+        return self._memory.discard_where(lambda key: key[0] == tenant_id)
+
     def get_language_name(self, lang_code: str) -> str:
         """Get the full language name from a language code."""
         return SUPPORTED_LANGUAGES.get(lang_code, lang_code)
 
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            calls = self.backend_calls
+            return {
+                "backend": self.backend.name,
+                "operational": self.translator_operational,
+                "detection_available": DETECTION_AVAILABLE,
+                "detection_cache": self._detections.stats(),
+                "translation_memory": self._memory.stats(),
+                "backend_calls": calls,
+                "backend_texts": self.backend_texts,
+                "backend_errors": self.backend_errors,
+                "avg_texts_per_call": round(self.backend_texts / calls, 2) if calls else None,
+                "avg_backend_ms": round(self.backend_ms / calls, 1) if calls else None,
+            }
+
 # Create a singleton instance of the service
 # This will be created when the module is first imported.
-language_service = LanguageService()
\ No newline at end of file
+language_service = LanguageService()
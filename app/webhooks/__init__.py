@@ -0,0 +1,22 @@
+# app/webhooks/__init__.py
+"""
+Durable ingestion queue for inbound Telegram, Instagram and Slack webhooks
+"""
+
+from .models import WebhookInboxEvent
+from .queue import (
+    InboxEvent,
+    WebhookIngestionQueue,
+    enqueue_webhook_event,
+    get_webhook_queue,
+    register_webhook_handler,
+)
+
+__all__ = [
+    "WebhookInboxEvent",
+    "InboxEvent",
+    "WebhookIngestionQueue",
+    "enqueue_webhook_event",
+    "get_webhook_queue",
+    "register_webhook_handler",
+]
@@ -0,0 +1,66 @@
+# app/webhooks/models.py
+"""
+Durable inbox for inbound platform webhooks
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, UniqueConstraint, Index
+from datetime import datetime
+from app.database import Base
+
+
+class WebhookInboxEvent(Base):
+    """
+    One raw inbound update (Telegram update, Instagram messaging event, Slack event_callback).
+    Rows are written before the webhook is acknowledged and drained by WebhookIngestionQueue.
+    """
+    __tablename__ = "webhook_inbox_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String(20), nullable=False)  # telegram, instagram, slack
+    tenant_id = Column(Integer, nullable=True, index=True)
+    
+    # Platform-provided id (update_id, message mid, event_id) used to drop redeliveries
+    dedupe_key = Column(String(255), nullable=False)
+    # Events sharing an ordering key (one chat/conversation/channel) are handled in order
+    ordering_key = Column(String(255), nullable=False)
+    
+    payload = Column(JSON, nullable=False)
+    headers = Column(JSON, nullable=True)
+    
+    # Processing state: pending, processing, done, failed
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    claimed_by = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("platform", "dedupe_key", name="uq_webhook_inbox_platform_dedupe"),
+        Index("ix_webhook_inbox_status_id", "status", "id"),
+        Index("ix_webhook_inbox_lane", "platform", "ordering_key", "status"),
+    )
+    
+    def __repr__(self):
+        return f"<WebhookInboxEvent {self.platform}:{self.dedupe_key} {self.status}>"
+
+
+class WebhookInboxLane(Base):
+    """
+    Ownership of one ordering lane (platform + ordering_key) across workers.
+    Only the worker holding a live lease claims the lane's events, so a chat's
+    updates are never handled by two processes at once.
+    """
+    __tablename__ = "webhook_inbox_lanes"
+    
+    platform = Column(String(20), primary_key=True)
+    ordering_key = Column(String(255), primary_key=True)
+    
+    # Free when claimed_by is NULL or claimed_at is older than WEBHOOK_LEASE_SECONDS
+    claimed_by = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f"<WebhookInboxLane {self.platform}:{self.ordering_key} {self.claimed_by}>"
@@ -0,0 +1,560 @@
+# app/webhooks/queue.py
+"""
+Webhook ingestion queue.
+
+Webhook endpoints only verify the request and append the raw update to
+webhook_inbox_events (deduplicated on platform + dedupe_key), then return.
+A single dispatcher per process claims pending rows and hands them to lanes:
+
+- one lane per (platform, ordering_key), so a chat's updates run in order
+- updates that pile up in a lane while it waits or works are handed to the
+  platform handler together, which can coalesce a burst into one engine call
+- a global worker cap and a per-tenant cap bound concurrent handler calls
+- the number of claimed-but-unfinished events is capped, so a spike stays in
+  the table instead of turning into unbounded tasks
+
+A lane is owned by one process at a time through webhook_inbox_lanes: a
+worker only claims events of lanes it holds, and releases a lane once it has
+drained it locally. The dispatcher renews the lease on held lanes and events
+every WEBHOOK_LEASE_SECONDS / 3, so a slow handler or a long retry backoff
+keeps its events; lanes and rows of a process that died are taken over once
+their lease runs out.
+"""
+
+import os
+import uuid
+import time
+import socket
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.webhooks.models import WebhookInboxEvent, WebhookInboxLane
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+MAX_BATCH_EVENTS = 50  # events handed to one handler call
+MAINTENANCE_INTERVAL = 60  # seconds between lease recovery / purge passes
+
+
+@dataclass
+class InboxEvent:
+    """Detached copy of a claimed inbox row handed to platform handlers"""
+    id: int
+    platform: str
+    tenant_id: Optional[int]
+    ordering_key: str
+    payload: Dict[str, Any]
+    headers: Optional[Dict[str, Any]]
+    attempts: int
+    received_at: datetime
+
+    @classmethod
+    def from_row(cls, row: WebhookInboxEvent) -> "InboxEvent":
+        return cls(
+            id=row.id,
+            platform=row.platform,
+            tenant_id=row.tenant_id,
+            ordering_key=row.ordering_key,
+            payload=row.payload,
+            headers=row.headers,
+            attempts=row.attempts,
+            received_at=row.received_at,
+        )
+
+
+# A handler receives the events of one lane in arrival order and returns False
+# for a permanent failure; raising marks the batch for retry.
+WebhookHandler = Callable[[List[InboxEvent]], Awaitable[bool]]
+
+_handlers: Dict[str, WebhookHandler] = {}
+
+
+def register_webhook_handler(platform: str, handler: WebhookHandler):
+    """Called by platform routers at import time"""
+    _handlers[platform] = handler
+
+
+def _new_inbox_row(platform: str, dedupe_key: str, ordering_key: str, payload: Dict[str, Any],
+                   tenant_id: Optional[int], headers: Optional[Dict[str, Any]]) -> WebhookInboxEvent:
+    return WebhookInboxEvent(
+        platform=platform,
+        tenant_id=tenant_id,
+        dedupe_key=str(dedupe_key)[:255],
+        ordering_key=str(ordering_key)[:255],
+        payload=payload,
+        headers=headers,
+        status=STATUS_PENDING,
+        attempts=0,
+        received_at=datetime.utcnow(),
+    )
+
+
+def _notify_queue():
+    queue = _global_queue
+    if queue is not None:
+        queue.notify()
+
+
+def enqueue_webhook_event(db: Session, platform: str, dedupe_key: str, ordering_key: str,
+                          payload: Dict[str, Any], tenant_id: Optional[int] = None,
+                          headers: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Durably append an inbound update. Returns False if it was already received
+    (platform redelivery), in which case the caller should still acknowledge it.
+    """
+    db.add(_new_inbox_row(platform, dedupe_key, ordering_key, payload, tenant_id, headers))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        logger.info(f"🔁 Duplicate {platform} webhook {dedupe_key} ignored")
+        return False
+
+    _notify_queue()
+    return True
+
+
+async def enqueue_webhook_event_async(db: AsyncSession, platform: str, dedupe_key: str, ordering_key: str,
+                                      payload: Dict[str, Any], tenant_id: Optional[int] = None,
+                                      headers: Optional[Dict[str, Any]] = None) -> bool:
+    """enqueue_webhook_event for endpoints on the async engine"""
+    db.add(_new_inbox_row(platform, dedupe_key, ordering_key, payload, tenant_id, headers))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        logger.info(f"🔁 Duplicate {platform} webhook {dedupe_key} ignored")
+        return False
+
+    _notify_queue()
+    return True
+
+
+class WebhookIngestionQueue:
+    """Drains webhook_inbox_events with per-lane ordering and bounded concurrency"""
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from app.database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.max_inflight = settings.WEBHOOK_MAX_INFLIGHT
+        self.coalesce_seconds = settings.WEBHOOK_COALESCE_MS / 1000.0
+        self.max_attempts = settings.WEBHOOK_MAX_ATTEMPTS
+        self.poll_interval = settings.WEBHOOK_POLL_SECONDS
+
+        self._lanes: Dict[str, Deque[InboxEvent]] = {}
+        # Lanes leased in webhook_inbox_lanes and the event ids held in memory
+        self._owned_lanes: Set[Tuple[str, str]] = set()
+        self._held: Set[int] = set()
+        self._lane_tasks: Dict[str, asyncio.Task] = {}
+        self._tenant_semaphores: Dict[Optional[int], asyncio.Semaphore] = {}
+        self._workers: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._inflight = 0
+        self._last_maintenance = 0.0
+        self._last_heartbeat = 0.0
+        self.is_running = False
+
+        self.stats = {"processed": 0, "failed": 0, "retried": 0, "coalesced": 0, "batches": 0}
+
+    # ----- wakeups -----
+
+    def notify(self):
+        """Wake the dispatcher after an enqueue instead of waiting for the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ----- database bookkeeping (runs in a worker thread) -----
+
+    @staticmethod
+    def _lane_key(platform: str, ordering_key: str) -> str:
+        return f"{platform}:{ordering_key}"
+
+    @staticmethod
+    def _lanes_filter(model, lanes):
+        return or_(*[
+            and_(model.platform == platform, model.ordering_key == ordering_key)
+            for platform, ordering_key in lanes
+        ])
+
+    def _acquire_lanes(self, db: Session, lanes: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Lease lanes that are free, expired or already ours. The conditional UPDATE
+        is atomic per row, so of two workers racing for a lane only one matches.
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+        db.query(WebhookInboxLane).filter(
+            self._lanes_filter(WebhookInboxLane, lanes),
+            or_(
+                WebhookInboxLane.claimed_by.is_(None),
+                WebhookInboxLane.claimed_by == self.worker_id,
+                WebhookInboxLane.claimed_at < stale,
+            )
+        ).update({
+            WebhookInboxLane.claimed_by: self.worker_id,
+            WebhookInboxLane.claimed_at: now,
+        }, synchronize_session=False)
+        db.commit()
+
+        rows = db.query(
+            WebhookInboxLane.platform, WebhookInboxLane.ordering_key, WebhookInboxLane.claimed_by
+        ).filter(self._lanes_filter(WebhookInboxLane, lanes)).all()
+        owners = {(row.platform, row.ordering_key): row.claimed_by for row in rows}
+
+        owned = []
+        for lane in lanes:
+            if lane not in owners:
+                # First event of a new lane: whoever inserts the row owns it
+                db.add(WebhookInboxLane(platform=lane[0], ordering_key=lane[1],
+                                        claimed_by=self.worker_id, claimed_at=now))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    continue
+            elif owners[lane] != self.worker_id:
+                continue
+            owned.append(lane)
+        return owned
+
+    def _release_lanes(self, lanes: List[Tuple[str, str]]):
+        """Hand lanes with nothing left locally back to other workers"""
+        db = self.session_factory()
+        try:
+            db.query(WebhookInboxLane).filter(
+                self._lanes_filter(WebhookInboxLane, lanes),
+                WebhookInboxLane.claimed_by == self.worker_id
+            ).update({WebhookInboxLane.claimed_by: None}, synchronize_session=False)
+            db.commit()
+            self._owned_lanes.difference_update(lanes)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error releasing webhook lanes: {e}")
+        finally:
+            db.close()
+
+    def _claim_batch(self, limit: int, idle_lanes: Optional[List[Tuple[str, str]]] = None) -> List[InboxEvent]:
+        if idle_lanes:
+            self._release_lanes(idle_lanes)
+
+        db = self.session_factory()
+        try:
+            stale = datetime.utcnow() - timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+            lane_leased_elsewhere = exists().where(and_(
+                WebhookInboxLane.platform == WebhookInboxEvent.platform,
+                WebhookInboxLane.ordering_key == WebhookInboxEvent.ordering_key,
+                WebhookInboxLane.claimed_by != self.worker_id,
+                WebhookInboxLane.claimed_at >= stale,
+            ))
+            # Rows a dead worker still holds keep their lane blocked until reclaimed,
+            # so later updates never overtake them
+            busy = aliased(WebhookInboxEvent)
+            lane_busy_elsewhere = exists().where(and_(
+                busy.platform == WebhookInboxEvent.platform,
+                busy.ordering_key == WebhookInboxEvent.ordering_key,
+                busy.status == STATUS_PROCESSING,
+                busy.claimed_by != self.worker_id,
+            ))
+
+            candidates = db.query(WebhookInboxEvent.platform, WebhookInboxEvent.ordering_key).filter(
+                WebhookInboxEvent.status == STATUS_PENDING,
+                ~lane_leased_elsewhere,
+                ~lane_busy_elsewhere
+            ).order_by(WebhookInboxEvent.id).limit(limit).all()
+            lanes = list(dict.fromkeys((row.platform, row.ordering_key) for row in candidates))
+            if not lanes:
+                return []
+
+            owned = self._acquire_lanes(db, lanes)
+            self._owned_lanes.update(owned)
+            if not owned:
+                return []
+
+            query = db.query(WebhookInboxEvent).filter(
+                WebhookInboxEvent.status == STATUS_PENDING,
+                self._lanes_filter(WebhookInboxEvent, owned)
+            ).order_by(WebhookInboxEvent.id).limit(limit)
+
+            if db.bind.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True, of=WebhookInboxEvent)
+
+            rows = query.all()
+            now = datetime.utcnow()
+            for row in rows:
+                row.status = STATUS_PROCESSING
+                row.claimed_by = self.worker_id
+                row.claimed_at = now
+                row.attempts = (row.attempts or 0) + 1
+            events = [InboxEvent.from_row(row) for row in rows]
+            db.commit()
+            return events
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error claiming webhook events: {e}")
+            return []
+        finally:
+            db.close()
+
+    def _heartbeat(self, event_ids: List[int], lanes: List[Tuple[str, str]]):
+        """Renew the lease on everything this worker still holds"""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            if event_ids:
+                db.query(WebhookInboxEvent).filter(
+                    WebhookInboxEvent.id.in_(event_ids),
+                    WebhookInboxEvent.status == STATUS_PROCESSING,
+                    WebhookInboxEvent.claimed_by == self.worker_id
+                ).update({WebhookInboxEvent.claimed_at: now}, synchronize_session=False)
+            if lanes:
+                db.query(WebhookInboxLane).filter(
+                    self._lanes_filter(WebhookInboxLane, lanes),
+                    WebhookInboxLane.claimed_by == self.worker_id
+                ).update({WebhookInboxLane.claimed_at: now}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error renewing webhook leases: {e}")
+        finally:
+            db.close()
+
+    def _finish(self, event_ids: List[int], status: str, error: Optional[str] = None):
+        db = self.session_factory()
+        try:
+            db.query(WebhookInboxEvent).filter(
+                WebhookInboxEvent.id.in_(event_ids)
+            ).update({
+                WebhookInboxEvent.status: status,
+                WebhookInboxEvent.last_error: error[:2000] if error else None,
+                WebhookInboxEvent.processed_at: datetime.utcnow(),
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Error updating webhook events {event_ids[:5]}: {e}")
+        finally:
+            db.close()
+
+    def _maintenance(self):
+        """Reclaim rows whose lease ran out and purge handled rows past the dedupe window"""
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            # Held rows are renewed by the heartbeat, so an expired lease is never in
+            # use - including this worker's own rows left behind by a failed _finish
+            reclaimed = db.query(WebhookInboxEvent).filter(
+                WebhookInboxEvent.status == STATUS_PROCESSING,
+                WebhookInboxEvent.claimed_at < now - timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+            ).update({
+                WebhookInboxEvent.status: STATUS_PENDING,
+                WebhookInboxEvent.claimed_by: None,
+            }, synchronize_session=False)
+
+            purged = db.query(WebhookInboxEvent).filter(
+                WebhookInboxEvent.status.in_([STATUS_DONE, STATUS_FAILED]),
+                WebhookInboxEvent.received_at < now - timedelta(hours=settings.WEBHOOK_RETENTION_HOURS)
+            ).delete(synchronize_session=False)
+            db.query(WebhookInboxLane).filter(
+                WebhookInboxLane.claimed_by.is_(None),
+                WebhookInboxLane.claimed_at < now - timedelta(hours=settings.WEBHOOK_RETENTION_HOURS)
+            ).delete(synchronize_session=False)
+            db.commit()
+
+            if reclaimed or purged:
+                logger.info(f"🧹 Webhook inbox: reclaimed {reclaimed} stale, purged {purged} handled events")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"💥 Webhook inbox maintenance error: {e}")
+        finally:
+            db.close()
+
+    # ----- dispatch -----
+
+    def _tenant_semaphore(self, tenant_id: Optional[int]) -> asyncio.Semaphore:
+        semaphore = self._tenant_semaphores.get(tenant_id)
+        if semaphore is None:
+            semaphore = self._tenant_semaphores[tenant_id] = asyncio.Semaphore(settings.WEBHOOK_TENANT_CONCURRENCY)
+        return semaphore
+
+    def _dispatch(self, event: InboxEvent):
+        lane_key = self._lane_key(event.platform, event.ordering_key)
+        lane = self._lanes.get(lane_key)
+        if lane is None:
+            lane = self._lanes[lane_key] = deque()
+        lane.append(event)
+        self._held.add(event.id)
+        self._inflight += 1
+
+        if lane_key not in self._lane_tasks:
+            self._lane_tasks[lane_key] = asyncio.create_task(self._run_lane(lane_key))
+
+    async def _run_lane(self, lane_key: str):
+        lane = self._lanes[lane_key]
+        try:
+            while lane:
+                # Give a burst from the same chat a moment to arrive before handling it
+                wait = self.coalesce_seconds - (datetime.utcnow() - lane[0].received_at).total_seconds()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                batch = [lane.popleft() for _ in range(min(len(lane), MAX_BATCH_EVENTS))]
+                self.stats["batches"] += 1
+                self.stats["coalesced"] += len(batch) - 1
+                attempt = batch[0].attempts
+                while True:
+                    async with self._workers, self._tenant_semaphore(batch[0].tenant_id):
+                        retry_in = await self._process_batch(batch, attempt)
+                    if retry_in is None:
+                        break
+                    # Back off holding no worker or tenant slot; the lane itself stays
+                    # blocked, so later updates from the same chat keep waiting behind this one
+                    await asyncio.sleep(retry_in)
+                    attempt += 1
+                self._held.difference_update(event.id for event in batch)
+                self._inflight -= len(batch)
+        finally:
+            self._lane_tasks.pop(lane_key, None)
+            self._lanes.pop(lane_key, None)
+            self.notify()
+
+    async def _process_batch(self, batch: List[InboxEvent], attempt: int) -> Optional[float]:
+        """One attempt at a batch: the backoff in seconds before retrying it, or None once it is finished"""
+        platform = batch[0].platform
+        event_ids = [event.id for event in batch]
+        handler = _handlers.get(platform)
+        if handler is None:
+            logger.error(f"❌ No webhook handler registered for {platform}")
+            await asyncio.to_thread(self._finish, event_ids, STATUS_FAILED, "no handler registered")
+            return None
+
+        try:
+            success = await handler(batch)
+            status = STATUS_DONE if success else STATUS_FAILED
+            await asyncio.to_thread(self._finish, event_ids, status, None if success else "handler reported failure")
+            self.stats["processed" if success else "failed"] += len(batch)
+            return None
+        except Exception as e:
+            if attempt >= self.max_attempts:
+                logger.error(f"💥 {platform} webhook batch {event_ids[:5]} failed after {attempt} attempts: {e}")
+                await asyncio.to_thread(self._finish, event_ids, STATUS_FAILED, str(e))
+                self.stats["failed"] += len(batch)
+                return None
+
+            delay = min(2 ** attempt, 30)
+            logger.warning(f"🔁 Retrying {platform} webhook batch in {delay}s (attempt {attempt}): {e}")
+            self.stats["retried"] += len(batch)
+            return delay
+
+    async def run(self):
+        """Dispatcher loop started from main.py"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._workers = asyncio.Semaphore(settings.WEBHOOK_WORKERS)
+        self._wakeup = asyncio.Event()
+        logger.info(f"📥 Webhook ingestion queue started ({self.worker_id})")
+
+        while self.is_running:
+            try:
+                if time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL:
+                    self._last_maintenance = time.monotonic()
+                    await asyncio.to_thread(self._maintenance)
+
+                if time.monotonic() - self._last_heartbeat > settings.WEBHOOK_LEASE_SECONDS / 3:
+                    self._last_heartbeat = time.monotonic()
+                    await asyncio.to_thread(self._heartbeat, list(self._held), list(self._owned_lanes))
+
+                # Released in the same worker call that claims, so no lane can be
+                # dispatched locally between picking it as idle and releasing it
+                idle_lanes = [lane for lane in self._owned_lanes if self._lane_key(*lane) not in self._lanes]
+                capacity = self.max_inflight - self._inflight
+                if capacity > 0 or idle_lanes:
+                    for event in await asyncio.to_thread(self._claim_batch, max(capacity, 0), idle_lanes):
+                        self._dispatch(event)
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"💥 Webhook dispatcher error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop claiming and give in-flight lanes a chance to finish; the rest is reclaimed later"""
+        self.is_running = False
+        self.notify()
+        tasks = list(self._lane_tasks.values())
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        idle_lanes = [lane for lane in self._owned_lanes if self._lane_key(*lane) not in self._lanes]
+        if idle_lanes:
+            await asyncio.to_thread(self._release_lanes, idle_lanes)
+        logger.info("📥 Webhook ingestion queue stopped")
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
+            "running": self.is_running,
+            "worker_id": self.worker_id,
+            "inflight": self._inflight,
+            "active_lanes": len(self._lane_tasks),
+            "owned_lanes": len(self._owned_lanes),
+            "max_inflight": self.max_inflight,
+            "handlers": sorted(_handlers),
+            **self.stats,
+        }
+        db = self.session_factory()
+        try:
+            counts = db.query(
+                WebhookInboxEvent.status, func.count(WebhookInboxEvent.id)
+            ).group_by(WebhookInboxEvent.status).all()
+            status["inbox"] = {row[0]: row[1] for row in counts}
+        except Exception as e:
+            status["inbox_error"] = str(e)
+        finally:
+            db.close()
+        return status
+
+
+_global_queue: Optional[WebhookIngestionQueue] = None
+
+
+def get_webhook_queue() -> WebhookIngestionQueue:
+    global _global_queue
+    if _global_queue is None:
+        _global_queue = WebhookIngestionQueue()
+    return _global_queue
+
+
+async def start_webhook_queue():
+    """Start the dispatcher - called from main.py startup"""
+    await get_webhook_queue().run()
+
+
+async def stop_webhook_queue():
+    if _global_queue:
+        await _global_queue.stop()
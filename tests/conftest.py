@@ -0,0 +1,4 @@
+# Register the models the app loads at startup, so Tenant's relationship() names resolve
+import app.database  # noqa: F401  (imports the core models)
+import app.live_chat.models  # noqa: F401
+import app.telegram.models  # noqa: F401
@@ -0,0 +1,50 @@
+"""
+Bulk upload name resolution and chunk dedup scope.
+
+Needs langchain (the ingestion module builds Documents); skipped without it.
+"""
+import pytest
+
+bulk_ingestion = pytest.importorskip("app.knowledge_base.bulk_ingestion")
+
+
+def _worker_result(source, *texts):
+    return {"source": source, "chunks": [(text, {}) for text in texts], "error": None}
+
+
+@pytest.fixture
+def service():
+    return bulk_ingestion.BulkIngestionService(tenant_id=1)
+
+
+def test_renamed_duplicates_do_not_collide_with_uploaded_names(service):
+    files, rejected = service.expand_uploads([
+        ("a.txt", b"1"), ("a.txt", b"2"), ("a_1.txt", b"3"), ("a.txt", b"4"),
+    ])
+
+    assert rejected == {}
+    assert [source_file.filename for source_file in files] == ["a.txt", "a_2.txt", "a_1.txt", "a_3.txt"]
+
+
+def test_combined_mode_dedups_across_files(service):
+    result = service.deduplicate_chunks([
+        _worker_result("a", "one", "two"),
+        _worker_result("b", "one", "three"),
+        _worker_result("c", "two"),
+    ])
+
+    assert {source: len(docs) for source, docs in result.chunks_by_source.items()} == {"a": 2, "b": 1}
+    assert result.duplicate_chunks == 2
+    assert "c" in result.errors
+
+
+def test_per_file_mode_dedups_within_each_file_only(service):
+    result = service.deduplicate_chunks([
+        _worker_result("a", "one", "two"),
+        _worker_result("b", "one", "three", "three"),
+        _worker_result("c", "two"),
+    ], across_files=False)
+
+    assert {source: len(docs) for source, docs in result.chunks_by_source.items()} == {"a": 2, "b": 2, "c": 1}
+    assert result.duplicate_chunks == 1
+    assert result.errors == {}
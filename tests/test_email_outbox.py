@@ -0,0 +1,373 @@
+"""
+EmailOutboxWorker against FakeEmailProvider and a SQLite outbox table.
+
+Delivery passes are driven by hand (claim, then deliver) instead of through
+run(), so each test controls exactly when rows are picked up.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.email import outbox
+from app.email.models import EmailOutboxMessage
+from app.email.outbox import (
+    DeliveryResult,
+    EmailOutboxWorker,
+    FakeEmailProvider,
+    RateLimiter,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_SENT,
+    RESULT_RETRY,
+    enqueue_email,
+    register_email_renderer,
+)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}", connect_args={"check_same_thread": False})
+    EmailOutboxMessage.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeEmailProvider()
+    monkeypatch.setitem(outbox._providers, "fake", provider)
+    return provider
+
+
+@pytest.fixture
+def worker(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_MAX_ATTEMPTS", 3)
+    return EmailOutboxWorker(session_factory=session_factory)
+
+
+def _enqueue(session_factory, count, **kwargs):
+    db = session_factory()
+    try:
+        return [
+            enqueue_email(db, "test", {"to": [f"user{index}@example.com"], "subject": f"hello {index}"},
+                          provider="fake", **kwargs)[0]
+            for index in range(count)
+        ]
+    finally:
+        db.close()
+
+
+def _deliver_pending(worker):
+    emails = worker._claim_batch()
+    asyncio.run(worker._deliver(emails))
+    return emails
+
+
+def _rows(session_factory):
+    db = session_factory()
+    try:
+        return {row.id: row for row in db.query(EmailOutboxMessage).all()}
+    finally:
+        db.close()
+
+
+def _make_due(session_factory):
+    """Pretend the retry backoff has elapsed"""
+    db = session_factory()
+    try:
+        db.query(EmailOutboxMessage).update({EmailOutboxMessage.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+    finally:
+        db.close()
+
+
+# ============ ENQUEUE ============
+
+def test_enqueue_same_key_is_a_noop(session_factory):
+    db = session_factory()
+    try:
+        first = enqueue_email(db, "test", {"to": ["a@example.com"]}, idempotency_key="invite:1", provider="fake")
+        second = enqueue_email(db, "test", {"to": ["a@example.com"]}, idempotency_key="invite:1", provider="fake")
+    finally:
+        db.close()
+
+    assert first[1] is True
+    assert second == (first[0], False)
+    assert len(_rows(session_factory)) == 1
+
+
+# ============ BATCHED DELIVERY ============
+
+def test_first_attempts_go_out_in_provider_batches(session_factory, provider, worker):
+    ids = _enqueue(session_factory, 150)
+
+    _deliver_pending(worker)
+
+    # 100 + 50: two requests for 150 emails
+    assert provider.requests == 2
+    assert worker.stats["batched_requests"] == 2
+    assert len(provider.sent) == 150
+    rows = _rows(session_factory)
+    assert all(rows[outbox_id].status == STATUS_SENT for outbox_id in ids)
+    assert all(rows[outbox_id].provider_message_id for outbox_id in ids)
+
+
+def test_rejected_batch_is_resent_one_by_one(session_factory, worker, monkeypatch):
+    class StrictProvider(FakeEmailProvider):
+        async def send_batch(self, emails):
+            self.requests += 1
+            if any(email.payload["to"] == ["bad"] for email in emails):
+                return [DeliveryResult(STATUS_FAILED, error="422: invalid recipient")] * len(emails)
+            return await super().send_batch(emails)
+
+        async def send(self, email):
+            if email.payload["to"] == ["bad"]:
+                self.requests += 1
+                return DeliveryResult(STATUS_FAILED, error="422: invalid recipient")
+            return await super().send(email)
+
+    strict = StrictProvider()
+    monkeypatch.setitem(outbox._providers, "fake", strict)
+    good = _enqueue(session_factory, 2)
+    db = session_factory()
+    try:
+        bad, _ = enqueue_email(db, "test", {"to": ["bad"]}, provider="fake")
+    finally:
+        db.close()
+
+    _deliver_pending(worker)
+
+    rows = _rows(session_factory)
+    assert [rows[outbox_id].status for outbox_id in good] == [STATUS_SENT, STATUS_SENT]
+    assert rows[bad].status == STATUS_FAILED
+    assert len(strict.sent) == 2
+
+
+def test_batch_with_lost_response_is_retried_whole(session_factory, worker, monkeypatch):
+    class LossyProvider(FakeEmailProvider):
+        """Accepts the first batch but the response never arrives"""
+        lost = False
+
+        async def send_batch(self, emails):
+            results = await super().send_batch(emails)
+            if not self.lost:
+                self.lost = True
+                return [DeliveryResult(RESULT_RETRY, error="ReadTimeout")] * len(emails)
+            return results
+
+    lossy = LossyProvider()
+    monkeypatch.setitem(outbox._providers, "fake", lossy)
+    ids = _enqueue(session_factory, 3)
+    _deliver_pending(worker)
+
+    rows = _rows(session_factory)
+    assert {rows[outbox_id].status for outbox_id in ids} == {STATUS_PENDING}
+    assert len({rows[outbox_id].batch_key for outbox_id in ids}) == 1
+    assert len({rows[outbox_id].next_attempt_at for outbox_id in ids}) == 1
+
+    # The claim limit would split the batch; its members are claimed together
+    worker.claim_limit = 2
+    _make_due(session_factory)
+    retried = _deliver_pending(worker)
+
+    assert sorted(email.id for email in retried) == ids
+    rows = _rows(session_factory)
+    assert [rows[outbox_id].status for outbox_id in ids] == [STATUS_SENT] * 3
+    # The retry reused the batch key, so nothing was delivered twice
+    assert len(lossy.sent) == 3
+    assert lossy.requests == 2
+
+
+def test_rejected_batch_members_leave_the_batch(session_factory, worker, monkeypatch):
+    class RejectingProvider(FakeEmailProvider):
+        async def send_batch(self, emails):
+            self.requests += 1
+            return [DeliveryResult(STATUS_FAILED, error="422: invalid")] * len(emails)
+
+    rejecting = RejectingProvider()
+    rejecting.fail_next(1, error="503: unavailable")
+    monkeypatch.setitem(outbox._providers, "fake", rejecting)
+    ids = _enqueue(session_factory, 2)
+
+    _deliver_pending(worker)
+
+    # Nothing of the batch was accepted: the email left for retry goes out alone
+    rows = _rows(session_factory)
+    assert [rows[outbox_id].batch_key for outbox_id in ids] == [None, None]
+    assert [rows[outbox_id].status for outbox_id in ids] == [STATUS_PENDING, STATUS_SENT]
+
+
+# ============ RETRY AND DEAD LETTER ============
+
+def test_transient_failure_is_retried_once_delivered(session_factory, provider, worker):
+    [outbox_id] = _enqueue(session_factory, 1)
+    provider.fail_next(1, error="503: unavailable")
+
+    _deliver_pending(worker)
+
+    row = _rows(session_factory)[outbox_id]
+    assert row.status == STATUS_PENDING
+    assert row.attempts == 1
+    assert row.last_error == "503: unavailable"
+    assert row.next_attempt_at > datetime.utcnow()
+    # Not due yet: the next pass claims nothing
+    assert worker._claim_batch() == []
+
+    _make_due(session_factory)
+    [retried] = _deliver_pending(worker)
+
+    row = _rows(session_factory)[outbox_id]
+    assert retried.attempts == 2
+    assert row.status == STATUS_SENT
+    assert row.last_error is None
+    assert len(provider.sent) == 1
+    assert worker.stats["retried"] == 1
+    assert worker.stats["sent"] == 1
+
+
+def test_retry_reuses_idempotency_key(session_factory, provider, worker):
+    [outbox_id] = _enqueue(session_factory, 1, idempotency_key="transcript:42")
+    _deliver_pending(worker)
+
+    # A retry of an email the provider already accepted (e.g. after a timeout) is not sent again
+    db = session_factory()
+    try:
+        db.query(EmailOutboxMessage).update({EmailOutboxMessage.status: STATUS_PENDING,
+                                             EmailOutboxMessage.next_attempt_at: datetime.utcnow()})
+        db.commit()
+    finally:
+        db.close()
+    _deliver_pending(worker)
+
+    assert len(provider.sent) == 1
+    assert _rows(session_factory)[outbox_id].status == STATUS_SENT
+
+
+def test_gives_up_after_max_attempts(session_factory, provider, worker):
+    [outbox_id] = _enqueue(session_factory, 1)
+    provider.fail_next(3, error="429: rate limited")
+
+    for _ in range(3):
+        _make_due(session_factory)
+        _deliver_pending(worker)
+
+    row = _rows(session_factory)[outbox_id]
+    assert row.status == STATUS_FAILED
+    assert row.attempts == 3
+    assert row.last_error == "429: rate limited"
+    assert worker.stats["retried"] == 2
+    assert worker.stats["failed"] == 1
+    assert provider.sent == []
+
+    _make_due(session_factory)
+    assert worker._claim_batch() == []
+
+
+def test_rejected_email_fails_without_retry(session_factory, provider, worker):
+    [outbox_id] = _enqueue(session_factory, 1)
+    provider.fail_next(1, status=STATUS_FAILED, error="422: invalid from address")
+
+    _deliver_pending(worker)
+
+    row = _rows(session_factory)[outbox_id]
+    assert row.status == STATUS_FAILED
+    assert row.attempts == 1
+    assert worker.stats["retried"] == 0
+
+
+def test_unknown_template_fails(session_factory, provider, worker):
+    [outbox_id] = _enqueue(session_factory, 1, template="missing_template")
+
+    _deliver_pending(worker)
+
+    row = _rows(session_factory)[outbox_id]
+    assert row.status == STATUS_FAILED
+    assert "no renderer registered" in row.last_error
+    assert provider.requests == 0
+
+
+def test_render_database_error_is_retried(session_factory, provider, worker, monkeypatch):
+    calls = []
+
+    def renderer(db, context):
+        calls.append(context)
+        if len(calls) == 1:
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+        return {"html": "<p>transcript</p>"}
+
+    monkeypatch.setitem(outbox._renderers, "flaky_template", renderer)
+    [outbox_id] = _enqueue(session_factory, 1, template="flaky_template", context={"conversation_id": 1})
+
+    _deliver_pending(worker)
+    row = _rows(session_factory)[outbox_id]
+    assert row.status == STATUS_PENDING
+    assert "render failed" in row.last_error
+
+    _make_due(session_factory)
+    _deliver_pending(worker)
+    assert _rows(session_factory)[outbox_id].status == STATUS_SENT
+    assert provider.sent[0]["html"] == "<p>transcript</p>"
+
+
+# ============ LEASES ============
+
+def test_maintenance_reclaims_expired_leases_of_any_owner(session_factory, worker):
+    ids = _enqueue(session_factory, 2)
+    worker._claim_batch()
+
+    # e.g. recording the results failed: the rows stay "sending" under our own worker id
+    db = session_factory()
+    try:
+        db.query(EmailOutboxMessage).update({
+            EmailOutboxMessage.claimed_at: datetime.utcnow() - timedelta(seconds=settings.EMAIL_LEASE_SECONDS + 1)
+        })
+        db.commit()
+    finally:
+        db.close()
+    worker._maintenance()
+
+    rows = _rows(session_factory)
+    assert [rows[outbox_id].status for outbox_id in ids] == [STATUS_PENDING, STATUS_PENDING]
+
+
+# ============ RATE LIMITING ============
+
+def test_rate_limiter_allows_one_second_burst_then_paces():
+    async def acquire(limiter, count):
+        started = time.monotonic()
+        for _ in range(count):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    limiter = RateLimiter(20)
+    assert asyncio.run(acquire(limiter, 20)) < 0.1
+    # The bucket is empty: 10 more requests at 20/s
+    assert 0.4 < asyncio.run(acquire(limiter, 10)) < 1.5
+
+
+def test_worker_paces_requests_per_provider(session_factory, provider, worker):
+    provider.rate_per_second = 20
+    _enqueue(session_factory, 30)
+    _make_due(session_factory)
+    db = session_factory()
+    try:
+        # Retries go one request per email
+        db.query(EmailOutboxMessage).update({EmailOutboxMessage.attempts: 1})
+        db.commit()
+    finally:
+        db.close()
+
+    started = time.monotonic()
+    _deliver_pending(worker)
+    elapsed = time.monotonic() - started
+
+    assert provider.requests == 30
+    assert len(provider.sent) == 30
+    # 20 from the initial burst, 10 more at 20/s
+    assert elapsed > 0.4
@@ -0,0 +1,280 @@
+"""
+GeoIPResolver against a small generated GeoLite2-City style database.
+
+The fixture .mmdb is written by _write_mmdb below (MaxMind DB format 2.0,
+IPv4 tree, 24-bit records), so no real GeoLite2 download is needed.
+"""
+import asyncio
+import struct
+
+import pytest
+
+pytest.importorskip("geoip2")
+
+from app.config import settings
+from app.live_chat import geoip_resolver
+from app.live_chat.geoip_resolver import GeoIPResolver, prefix_key
+
+
+NETWORKS = {
+    "81.2.69.0/24": {
+        "city": {"names": {"en": "London"}},
+        "country": {"iso_code": "GB", "names": {"en": "United Kingdom"}},
+        "location": {"latitude": 51.5142, "longitude": -0.0931, "time_zone": "Europe/London"},
+        "subdivisions": [{"iso_code": "ENG", "names": {"en": "England"}}],
+    },
+    "175.16.199.0/24": {
+        "city": {"names": {"en": "Changchun"}},
+        "country": {"iso_code": "CN", "names": {"en": "China"}},
+        "location": {"latitude": 43.88, "longitude": 125.3228, "time_zone": "Asia/Harbin"},
+        "subdivisions": [{"iso_code": "22", "names": {"en": "Jilin Sheng"}}],
+    },
+    "89.160.20.0/24": {
+        "city": {"names": {"en": "Linköping"}},
+        "country": {"iso_code": "SE", "names": {"en": "Sweden"}},
+        "location": {"latitude": 58.4167, "longitude": 15.6167, "time_zone": "Europe/Stockholm"},
+        "subdivisions": [{"iso_code": "E", "names": {"en": "Östergötland County"}}],
+    },
+}
+
+
+# ============ FIXTURE DATABASE ============
+
+def _control(type_id: int, size: int) -> bytes:
+    if size < 29:
+        head, extra = size, b""
+    elif size < 285:
+        head, extra = 29, bytes([size - 29])
+    elif size < 65821:
+        head, extra = 30, (size - 285).to_bytes(2, "big")
+    else:
+        head, extra = 31, (size - 65821).to_bytes(3, "big")
+    if type_id <= 7:
+        return bytes([(type_id << 5) | head]) + extra
+    return bytes([head, type_id - 7]) + extra
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+        return _control(2, len(data)) + data
+    if isinstance(value, float):
+        return _control(3, 8) + struct.pack(">d", value)
+    if isinstance(value, int):
+        data = value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big") if value else b""
+        return _control(9, len(data)) + data  # uint64
+    if isinstance(value, dict):
+        return _control(7, len(value)) + b"".join(_encode(k) + _encode(v) for k, v in value.items())
+    if isinstance(value, list):
+        return _control(11, len(value)) + b"".join(_encode(item) for item in value)
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+def _write_mmdb(path, networks):
+    """Minimal MaxMind DB writer: one data record per IPv4 network"""
+    data_section = b""
+    nodes = [[None, None]]
+    for network, record in networks.items():
+        address, length = network.split("/")
+        bits = int.from_bytes(bytes(int(part) for part in address.split(".")), "big")
+        offset = len(data_section)
+        data_section += _encode(record)
+        node = nodes[0]
+        for depth in range(int(length)):
+            bit = (bits >> (31 - depth)) & 1
+            if depth == int(length) - 1:
+                node[bit] = ("data", offset)
+            else:
+                if node[bit] is None:
+                    nodes.append([None, None])
+                    node[bit] = len(nodes) - 1
+                node = nodes[node[bit]]
+
+    node_count = len(nodes)
+
+    def record_value(child):
+        if child is None:
+            return node_count
+        if isinstance(child, tuple):
+            return node_count + 16 + child[1]
+        return child
+
+    tree = b"".join(
+        record_value(left).to_bytes(3, "big") + record_value(right).to_bytes(3, "big")
+        for left, right in nodes
+    )
+    metadata = {
+        "binary_format_major_version": 2,
+        "binary_format_minor_version": 0,
+        "build_epoch": 1700000000,
+        "database_type": "GeoLite2-City",
+        "description": {"en": "test fixture"},
+        "ip_version": 4,
+        "languages": ["en"],
+        "node_count": node_count,
+        "record_size": 24,
+    }
+    with open(path, "wb") as handle:
+        handle.write(tree + bytes(16) + data_section + b"\xab\xcd\xefMaxMind.com" + _encode(metadata))
+
+
+@pytest.fixture(scope="module")
+def database_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("geoip") / "GeoLite2-City.mmdb"
+    _write_mmdb(path, NETWORKS)
+    return str(path)
+
+
+@pytest.fixture
+def resolver(database_path):
+    return GeoIPResolver(database_path)
+
+
+# ============ LOOKUP ============
+
+def test_resolves_city_from_local_database(resolver, database_path):
+    location = resolver.resolve("81.2.69.160")
+
+    assert resolver.database_path == database_path
+    assert location == {
+        "country": "United Kingdom",
+        "country_code": "GB",
+        "region": "England",
+        "city": "London",
+        "latitude": 51.5142,
+        "longitude": -0.0931,
+        "timezone": "Europe/London",
+        "detection_method": "geoip2_local",
+        "accuracy": "high",
+    }
+    assert resolver.local_hits == 1
+
+
+def test_same_prefix_is_served_from_cache(resolver):
+    first = resolver.resolve("175.16.199.1")
+    first["city"] = "changed by caller"
+
+    second = resolver.resolve("175.16.199.250")
+
+    assert second["city"] == "Changchun"
+    assert resolver.local_hits == 1
+    assert resolver.stats()["cache"]["hits"] == 1
+
+
+def test_prefix_key():
+    assert prefix_key("81.2.69.160") == "81.2.69.0/24"
+    assert prefix_key("2001:db8::1") == "2001:db8::/64"
+    assert prefix_key("not-an-ip") is None
+
+
+# ============ CACHE BOUNDS ============
+
+def test_cache_is_bounded(monkeypatch, database_path):
+    monkeypatch.setattr(settings, "GEOIP_CACHE_MAX_ENTRIES", 2)
+    resolver = GeoIPResolver(database_path)
+
+    for ip in ("81.2.69.1", "175.16.199.1", "89.160.20.1"):
+        assert resolver.resolve(ip) is not None
+
+    cache = resolver.stats()["cache"]
+    assert cache["entries"] == 2
+    assert cache["evictions"] == 1
+
+    # The least recently used prefix was evicted and goes back to the database
+    assert resolver.resolve("81.2.69.2")["city"] == "London"
+    assert resolver.local_hits == 4
+
+
+def test_negative_cache_is_bounded(monkeypatch, database_path):
+    monkeypatch.setattr(settings, "GEOIP_CACHE_MAX_ENTRIES", 2)
+    resolver = GeoIPResolver(database_path)
+
+    for ip in ("8.8.8.8", "9.9.9.9", "1.1.1.1"):
+        assert resolver.resolve(ip) is None
+
+    assert resolver.stats()["negative_cache"]["entries"] == 2
+
+
+# ============ PRIVATE AND UNKNOWN ADDRESSES ============
+
+def test_unknown_address_is_negative_cached(resolver):
+    assert resolver.resolve("8.8.8.8") is None
+    assert resolver.resolve("8.8.8.9") is None
+
+    # The second address shares the /24 and never reaches the database
+    assert resolver.local_misses == 1
+    assert resolver.stats()["negative_cache"]["entries"] == 1
+
+
+def test_unknown_address_is_queued_for_enrichment_once(resolver):
+    async def scenario():
+        resolver._loop = asyncio.get_running_loop()
+        resolver._queue = asyncio.Queue(maxsize=10)
+        resolver.is_running = True
+
+        resolver.resolve("8.8.8.8")
+        resolver._negative.clear()
+        resolver.resolve("8.8.8.9")
+        await asyncio.sleep(0)
+        return resolver._queue.qsize()
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_enrichment_result_replaces_negative_entry(resolver, monkeypatch):
+    class Provider:
+        async def fetch_external(self, ip_address):
+            return {"ip_address": ip_address, "country": "United States", "country_code": "US",
+                    "detection_method": "ipapi"}
+
+    import app.live_chat.free_geolocation_service as free_geolocation_service
+    monkeypatch.setattr(free_geolocation_service, "FreeGeolocationService", Provider)
+
+    assert resolver.resolve("8.8.8.8") is None
+    asyncio.run(resolver._enrich(prefix_key("8.8.8.8"), "8.8.8.8"))
+
+    location = resolver.resolve("8.8.8.20")
+    assert location == {"country": "United States", "country_code": "US", "detection_method": "ipapi"}
+    assert resolver.enriched == 1
+
+
+def test_invalid_and_ipv6_addresses(resolver):
+    assert resolver.resolve("not-an-ip") is None
+    # IPv6 against an IPv4-only database is a lookup error, not a crash
+    assert resolver.resolve("2001:db8::1") is None
+    assert resolver.local_hits == 0
+
+
+def test_missing_database_falls_back_to_enrichment_only(tmp_path):
+    resolver = GeoIPResolver(str(tmp_path / "missing.mmdb"))
+
+    assert resolver.database_path is None
+    assert resolver.resolve("81.2.69.160") is None
+    assert resolver.stats()["negative_cache"]["entries"] == 1
+
+
+def test_private_address_skips_resolver(monkeypatch):
+    from app.live_chat.customer_detection_service import CustomerDetectionService
+
+    def unexpected():
+        raise AssertionError("private addresses must not reach the GeoIP resolver")
+
+    monkeypatch.setattr("app.live_chat.customer_detection_service.get_geoip_resolver", unexpected)
+    service = CustomerDetectionService.__new__(CustomerDetectionService)
+
+    location = asyncio.run(service._detect_geolocation("192.168.1.20"))
+
+    assert location["detection_method"] == "localhost_fallback"
+
+
+def test_detection_uses_local_database(monkeypatch, resolver):
+    from app.live_chat.customer_detection_service import CustomerDetectionService
+
+    monkeypatch.setattr(geoip_resolver, "_resolver", resolver)
+    service = CustomerDetectionService.__new__(CustomerDetectionService)
+
+    location = asyncio.run(service._detect_geolocation("89.160.20.112"))
+
+    assert location["ip_address"] == "89.160.20.112"
+    assert location["city"] == "Linköping"
+    assert location["detection_method"] == "geoip2_local"
@@ -0,0 +1,86 @@
+"""
+OutboundHTTPClient keeps one async client and one set of provider semaphores
+per event loop, and close() shuts all of them.
+
+Requests go to an httpx.MockTransport, so nothing leaves the process.
+"""
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.services.http_client import OutboundHTTPClient, get_provider_policy
+
+TELEGRAM = get_provider_policy("telegram")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = OutboundHTTPClient()
+    created = []
+
+    def new_async_client():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True}))
+        created.append(httpx.AsyncClient(transport=transport))
+        return created[-1]
+
+    monkeypatch.setattr(client, "_new_async_client", new_async_client)
+    client.created = created
+    return client
+
+
+async def _send(client):
+    response = await client.request("telegram", "POST", "https://api.telegram.org/botTOKEN/getMe")
+    return response.json(), client.async_client, client._async_semaphore(TELEGRAM)
+
+
+def test_each_event_loop_gets_its_own_client_and_semaphores(client):
+    first = asyncio.run(_send(client))
+    second = asyncio.run(_send(client))
+
+    assert first[0] == second[0] == {"ok": True}
+    assert first[1] is not second[1]
+    assert first[2] is not second[2]
+
+
+def test_client_is_reused_within_a_loop(client):
+    async def scenario():
+        await asyncio.gather(*(_send(client) for _ in range(5)))
+        return client.get_metrics()["event_loops"]
+
+    assert asyncio.run(scenario()) == 1
+    assert len(client.created) == 1
+
+
+def test_close_closes_clients_of_other_running_loops(client):
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(_send(client), other_loop).result(timeout=5)
+
+        async def shutdown():
+            await _send(client)
+            await client.close()
+
+        asyncio.run(shutdown())
+
+        assert len(client.created) == 2
+        assert all(created.is_closed for created in client.created)
+        assert client.get_metrics()["event_loops"] == 0
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
+
+
+def test_close_loop_only_closes_the_running_loops_client(client):
+    async def scenario():
+        await _send(client)
+        await client.close_loop()
+
+    asyncio.run(scenario())
+
+    assert client.created[0].is_closed
+    assert client.get_metrics()["event_loops"] == 0
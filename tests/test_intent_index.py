@@ -0,0 +1,44 @@
+"""
+TenantIntentIndex accuracy on the labelled intent benchmark fixture.
+
+The floors sit a little under what the index scores today (94.8% accuracy,
+100% precision on the messages it decides), so a tokenizer or threshold change
+that costs routing quality fails here before it reaches the LLM bill.
+"""
+from app.chatbot.intent_benchmark import DEFAULT_FIXTURE, _evaluate, _load
+from app.chatbot.intent_index import TenantIntentIndex
+
+MIN_ACCURACY = 0.90
+MIN_PRECISION = 0.98
+MAX_DEFERRED_SHARE = 0.10
+
+
+def _index_only(index):
+    def predict(text):
+        match = index.classify(text)
+        if match.confident:
+            return match.pattern.document_id
+        return None if match.rejected else "deferred"
+    return predict
+
+
+def test_index_meets_accuracy_floor():
+    patterns, messages = _load(DEFAULT_FIXTURE)
+    index = TenantIntentIndex(patterns)
+
+    result = _evaluate("index", messages, _index_only(index))
+
+    assert result["accuracy"] >= MIN_ACCURACY, result["errors"]
+    assert result["precision_when_decided"] >= MIN_PRECISION, result["errors"]
+    assert result["deferred"] <= MAX_DEFERRED_SHARE * len(messages)
+
+
+def test_unrelated_messages_are_rejected_without_the_llm():
+    patterns, messages = _load(DEFAULT_FIXTURE)
+    index = TenantIntentIndex(patterns)
+    unrelated = [message["text"] for message in messages if message["document_id"] is None]
+
+    decided = [index.classify(text) for text in unrelated]
+
+    assert unrelated
+    assert not [match for match in decided if match.confident]
@@ -0,0 +1,135 @@
+"""
+LanguageService detection cache, translation memory and batching, offline.
+
+Translation runs on LocalTranslatorBackend; detection goes through a fake
+langdetect that counts its calls, so nothing reaches the network.
+"""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.utils import language_service as language_module
+from app.utils.language_service import LanguageService, LocalTranslatorBackend, split_sentences
+
+
+class FakeDetector:
+    """Stands in for langdetect.detect: 'es' when the text has a Spanish marker word, else 'en'"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return "es" if "hola" in text or "gracias" in text else "en"
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    detector = FakeDetector()
+    monkeypatch.setattr(language_module, "DETECTION_AVAILABLE", True)
+    monkeypatch.setattr(language_module, "_langdetect_detect", detector)
+    return detector
+
+
+@pytest.fixture
+def backend():
+    return LocalTranslatorBackend({("es", "en"): {"Hola, necesito ayuda": "Hello, I need help"}})
+
+
+@pytest.fixture
+def service(backend):
+    return LanguageService(backend=backend)
+
+
+# ============ DETECTION ============
+
+def test_detection_is_cached_by_normalized_text(service, detector):
+    assert service.detect_language("Hola, necesito  ayuda hoy") == "es"
+    assert service.detect_language("  hola, NECESITO ayuda hoy ") == "es"
+
+    assert detector.calls == 1
+    assert service.stats()["detection_cache"]["hits"] == 1
+
+
+def test_short_text_is_not_detected(service, detector):
+    assert service.detect_language("ok " * ((settings.LANGUAGE_DETECT_MIN_CHARS - 1) // 3)) is None
+    assert detector.calls == 0
+
+
+def test_text_in_the_target_language_is_not_sent(service, backend, detector):
+    assert service.translate("Where is my order today?", "en") == ("Where is my order today?", False)
+    assert backend.calls == 0
+
+
+# ============ TRANSLATION MEMORY ============
+
+def test_translation_memory_serves_repeats(service, backend):
+    assert service.translate("Hola, necesito ayuda", "en", "es", tenant_id=1) == ("Hello, I need help", True)
+    assert service.translate("Hola,  necesito ayuda ", "en", "es", tenant_id=1) == ("Hello, I need help", True)
+
+    assert backend.calls == 1
+    assert service.stats()["translation_memory"]["hits"] == 1
+
+
+def test_translation_memory_is_cleared_per_tenant(service, backend):
+    for tenant_id in (1, 2):
+        service.translate("Hola, necesito ayuda", "en", "es", tenant_id=tenant_id)
+
+    assert service.clear_translation_memory(tenant_id=1) == 1
+    service.translate("Hola, necesito ayuda", "en", "es", tenant_id=2)
+    assert backend.calls == 2
+    service.translate("Hola, necesito ayuda", "en", "es", tenant_id=1)
+    assert backend.calls == 3
+
+
+def test_failed_translation_falls_back_and_is_not_cached(service, backend, monkeypatch):
+    def broken(texts, source, target):
+        raise RuntimeError("backend unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(backend, "translate_batch", broken)
+        assert service.translate("Hola, necesito ayuda", "en", "es") == ("Hola, necesito ayuda", False)
+    assert service.stats()["backend_errors"] == 1
+
+    assert service.translate("Hola, necesito ayuda", "en", "es") == ("Hello, I need help", True)
+
+
+# ============ BATCHING ============
+
+def test_chunks_share_one_request_and_repeats_cost_nothing(service, backend):
+    texts = ["uno", "dos", "uno", "tres"]
+
+    assert service.translate_chunks(texts, "en", "es") == ["[en] uno", "[en] dos", "[en] uno", "[en] tres"]
+    assert backend.calls == 1
+    assert service.stats()["backend_texts"] == 3
+
+
+def test_batches_respect_max_chars(service, backend, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSLATION_BATCH_MAX_CHARS", 10)
+
+    service.translate_chunks(["aaaa", "bbbb", "cccc", "dd\nee"], "en", "es")
+
+    # "aaaa\nbbbb" fits, "cccc" starts the next batch, text with a line break goes alone
+    assert backend.calls == 3
+
+
+def test_reply_is_translated_sentence_by_sentence(service, backend):
+    reply = "Gracias por escribir. Tu pedido llega mañana!\nAlgo más?"
+
+    translated, changed = service.translate_sentences(reply, "en", "es")
+
+    assert changed is True
+    assert translated == "[en] Gracias por escribir. [en] Tu pedido llega mañana!\n[en] Algo más?"
+    assert backend.calls == 1
+    assert "".join(split_sentences(reply)) == reply
+
+
+def test_outbound_leg_runs_off_the_event_loop(service, backend):
+    async def scenario():
+        try:
+            return await service.translate_outbound("Hola, necesito ayuda", "en", "es", tenant_id=3)
+        finally:
+            service.shutdown()
+
+    assert asyncio.run(scenario()) == ("Hello, I need help", True)
@@ -0,0 +1,110 @@
+"""
+LLMGateway circuit breaker probes and prompt coalescing under cancellation.
+
+Calls go through LLMGateway._call on the test's own event loop, with a fake
+chat model whose ainvoke waits until the test lets it finish.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.llm_gateway import LLMGateway, LLMGatewayError
+
+
+class SlowModel:
+    """ainvoke blocks until release() is called; fail() makes the next calls raise"""
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+        self._release = None
+
+    def release(self):
+        self._release.set()
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if self._release is None:
+            self._release = asyncio.Event()
+        await self._release.wait()
+        return f"answer to {prompt}"
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 1)
+    monkeypatch.setattr(settings, "LLM_BREAKER_RESET_SECONDS", 0)
+    model = SlowModel()
+    gateway = LLMGateway(model_factory=lambda name, temperature: model)
+    gateway.model = model
+    return gateway
+
+
+async def _started(gateway, prompt):
+    gateway._global_semaphore = gateway._global_semaphore or asyncio.Semaphore(gateway.max_concurrent)
+    task = asyncio.create_task(gateway._call(prompt, "test"))
+    await asyncio.sleep(0.01)
+    return task
+
+
+def _open_breaker(gateway):
+    breaker = gateway._breaker("gpt-3.5-turbo")
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 1
+    return breaker
+
+
+def test_cancelled_probe_is_released(gateway):
+    breaker = _open_breaker(gateway)
+
+    async def scenario():
+        probe = await _started(gateway, "hello")
+        assert breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # The next caller gets to probe instead of failing fast forever
+        second = await _started(gateway, "hello again")
+        gateway.model.release()
+        return await second
+
+    assert asyncio.run(scenario()) == "answer to hello again"
+    assert breaker.state == "closed"
+
+
+def test_non_tripping_error_releases_probe(gateway):
+    breaker = _open_breaker(gateway)
+    error = RuntimeError("bad request")
+    error.status_code = 400
+    gateway.model.error = error
+
+    async def scenario():
+        gateway._global_semaphore = asyncio.Semaphore(gateway.max_concurrent)
+        with pytest.raises(RuntimeError):
+            await gateway._call("hello", "test")
+        assert breaker.allow() is True
+
+    asyncio.run(scenario())
+
+
+def test_followers_get_gateway_error_when_leader_is_cancelled(gateway):
+    async def scenario():
+        leader = await _started(gateway, "same prompt")
+        follower = await _started(gateway, "same prompt")
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(LLMGatewayError):
+            await follower
+        return gateway.get_metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert gateway.model.calls == 1
+    assert metrics["call_sites"]["test"]["coalesced"] == 1
+    assert metrics["inflight_prompts"] == 0
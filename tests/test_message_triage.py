@@ -0,0 +1,43 @@
+"""
+Local share and precision of the deterministic greeting / escalation tier.
+
+Runs the triage benchmark's evaluation over the shipped corpus. Today every
+local decision is correct and the tier answers 95% of greetings and 76% of
+escalation checks without the LLM; the floors leave a little room below that.
+"""
+import json
+
+import pytest
+
+from app.chatbot.message_triage import ESCALATION, GREETING
+from app.chatbot.triage_benchmark import DEFAULT_FIXTURE, _evaluate
+
+FLOORS = {
+    # task: (minimum local share, minimum precision)
+    GREETING: (0.85, 0.97),
+    ESCALATION: (0.65, 0.95),
+}
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    with open(DEFAULT_FIXTURE) as handle:
+        return json.load(handle)
+
+
+@pytest.mark.parametrize("task", [GREETING, ESCALATION])
+def test_local_tier_meets_floors(corpus, task):
+    min_share, min_precision = FLOORS[task]
+
+    result = _evaluate(task, corpus[task], llm_ms=0)
+
+    assert result["local_share"] >= min_share, result["errors"]
+    assert result["precision"] >= min_precision, result["errors"]
+
+
+@pytest.mark.parametrize("task", [GREETING, ESCALATION])
+def test_rules_are_as_precise_as_their_confidence(corpus, task):
+    result = _evaluate(task, corpus[task], llm_ms=0)
+
+    for rule, (decided, correct, confidence) in result["rules"].items():
+        assert correct / decided >= confidence, f"{rule}: {correct}/{decided} correct, confidence {confidence}"
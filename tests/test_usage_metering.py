@@ -0,0 +1,177 @@
+"""
+Write-behind usage metering flushes: claim, commit with a flush id, acknowledge.
+
+Redis-backed tests run on fakeredis (with Lua) and are skipped without it.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.pricing.metering import InMemoryCounterBackend, RedisCounterBackend, UsageMeter
+from app.pricing.models import TenantSubscription, UsageLog
+
+TENANT_ID = 7
+SUBSCRIPTION_ID = 70
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    for table in (TenantSubscription.__table__, UsageLog.__table__):
+        table.create(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    now = datetime.utcnow()
+    db.add(TenantSubscription(id=SUBSCRIPTION_ID, tenant_id=TENANT_ID, plan_id=1, messages_used_current_period=0,
+                              current_period_start=now, current_period_end=now + timedelta(days=30)))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url",
+                        classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs)))
+    return server
+
+
+def _record(backend, conversations=1, messages=2):
+    now = datetime.now(timezone.utc).isoformat()
+    events = [{"tenant_id": TENANT_ID, "subscription_id": SUBSCRIPTION_ID, "usage_type": "conversation",
+               "count": 1, "created_at": now} for _ in range(conversations)]
+    events += [{"tenant_id": TENANT_ID, "subscription_id": SUBSCRIPTION_ID, "usage_type": "message",
+                "count": 1, "created_at": now} for _ in range(messages)]
+    backend.incr_pending_conversations(TENANT_ID, conversations)
+    backend.push_events(events)
+
+
+def _usage(session_factory):
+    db = session_factory()
+    try:
+        rows = db.query(func.count(UsageLog.id)).scalar()
+        used = db.query(TenantSubscription.messages_used_current_period).scalar()
+        return rows, used
+    finally:
+        db.close()
+
+
+def _flush(meter, session_factory):
+    db = session_factory()
+    try:
+        return meter.flush(db)
+    finally:
+        db.close()
+
+
+def test_flush_writes_rows_with_flush_id(session_factory):
+    backend = InMemoryCounterBackend()
+    meter = UsageMeter(backend)
+    _record(backend)
+
+    assert _flush(meter, session_factory) == 3
+
+    assert _usage(session_factory) == (3, 1)
+    assert backend.get_pending_conversations(TENANT_ID) == 0
+    assert backend.pending_event_count() == 0
+    db = session_factory()
+    try:
+        flush_ids = {flush_id for (flush_id,) in db.query(UsageLog.flush_id).all()}
+    finally:
+        db.close()
+    assert len(flush_ids) == 1 and None not in flush_ids
+
+
+def test_failed_commit_keeps_events(session_factory, monkeypatch):
+    backend = InMemoryCounterBackend()
+    meter = UsageMeter(backend)
+    _record(backend)
+
+    def broken(db, flush_id, events):
+        raise RuntimeError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(meter, "_write_batch", broken)
+        assert _flush(meter, session_factory) == 0
+    assert backend.pending_event_count() == 3
+    assert backend.get_pending_conversations(TENANT_ID) == 1
+
+    assert _flush(meter, session_factory) == 3
+    assert _usage(session_factory) == (3, 1)
+    assert backend.get_pending_conversations(TENANT_ID) == 0
+
+
+def test_redis_ack_is_idempotent(redis_server):
+    backend = RedisCounterBackend("redis://fake")
+    _record(backend)
+    flush_id, events = backend.claim_events(100)
+
+    assert len(events) == 3
+    assert backend.ack_batch(flush_id, {TENANT_ID: 1}) is True
+    assert backend.ack_batch(flush_id, {TENANT_ID: 1}) is False
+    assert backend.get_pending_conversations(TENANT_ID) == 0
+    assert backend.pending_event_count() == 0
+
+
+def test_crash_before_commit_is_requeued(redis_server, session_factory, monkeypatch):
+    crashed = RedisCounterBackend("redis://fake")
+    _record(crashed)
+    crashed.claim_events(100)  # the process dies here
+    assert crashed.pending_event_count() == 3
+
+    # Another worker leaves the batch alone while the lease runs...
+    meter = UsageMeter(RedisCounterBackend("redis://fake"))
+    assert _flush(meter, session_factory) == 0
+    assert _usage(session_factory) == (0, 0)
+
+    # ...then requeues it: no rows carry its flush id
+    monkeypatch.setattr(settings, "USAGE_METERING_BATCH_LEASE_SECONDS", 0)
+    assert _flush(meter, session_factory) == 3
+    assert _usage(session_factory) == (3, 1)
+    assert meter.backend.get_pending_conversations(TENANT_ID) == 0
+    assert meter.backend.pending_event_count() == 0
+
+
+def test_crash_after_commit_is_acknowledged_once(redis_server, session_factory, monkeypatch):
+    backend = RedisCounterBackend("redis://fake")
+    meter = UsageMeter(backend)
+    _record(backend)
+
+    def crash(flush_id, deltas):
+        raise SystemExit  # not caught by flush, like the process dying
+
+    # Rows are committed, then the process dies before acknowledging the batch
+    with monkeypatch.context() as patch:
+        patch.setattr(backend, "ack_batch", crash)
+        with pytest.raises(SystemExit):
+            _flush(meter, session_factory)
+    assert _usage(session_factory) == (3, 1)
+    assert backend.get_pending_conversations(TENANT_ID) == 1
+
+    monkeypatch.setattr(settings, "USAGE_METERING_BATCH_LEASE_SECONDS", 0)
+    recovering = UsageMeter(RedisCounterBackend("redis://fake"))
+    assert _flush(recovering, session_factory) == 3
+
+    # Nothing written twice, pending decremented once
+    assert _usage(session_factory) == (3, 1)
+    assert backend.get_pending_conversations(TENANT_ID) == 0
+    assert backend.pending_event_count() == 0
+    assert _flush(recovering, session_factory) == 0
+    assert backend.get_pending_conversations(TENANT_ID) == 0
+
+
+def test_pending_count_includes_claimed_events(redis_server):
+    backend = RedisCounterBackend("redis://fake")
+    _record(backend)
+    backend.claim_events(2)
+
+    assert backend.pending_event_count() == 3
@@ -0,0 +1,220 @@
+"""
+WebhookIngestionQueue lane ownership and lease renewal on a SQLite inbox.
+
+Claims are driven by hand through _claim_batch / _heartbeat / _maintenance,
+with one queue instance per simulated worker process.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.webhooks import queue as queue_module
+from app.webhooks.models import WebhookInboxEvent, WebhookInboxLane
+from app.webhooks.queue import (
+    STATUS_PENDING,
+    STATUS_PROCESSING,
+    WebhookIngestionQueue,
+    enqueue_webhook_event,
+)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'inbox.db'}", connect_args={"check_same_thread": False})
+    for table in (WebhookInboxEvent.__table__, WebhookInboxLane.__table__):
+        table.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _enqueue(session_factory, *events):
+    db = session_factory()
+    try:
+        for dedupe_key, ordering_key in events:
+            enqueue_webhook_event(db, "telegram", dedupe_key, ordering_key, {"update_id": dedupe_key}, tenant_id=1)
+    finally:
+        db.close()
+
+
+def _age(session_factory, model, seconds):
+    """Pretend every lease was taken `seconds` ago"""
+    db = session_factory()
+    try:
+        db.query(model).update({model.claimed_at: datetime.utcnow() - timedelta(seconds=seconds)})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _statuses(session_factory):
+    db = session_factory()
+    try:
+        return {row.dedupe_key: (row.status, row.claimed_by) for row in db.query(WebhookInboxEvent).all()}
+    finally:
+        db.close()
+
+
+# ============ LANE OWNERSHIP ============
+
+def test_lane_is_claimed_by_one_worker(session_factory):
+    first = WebhookIngestionQueue(session_factory)
+    second = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"), ("2", "chat-b"))
+
+    assert [event.payload["update_id"] for event in first._claim_batch(1)] == ["1"]
+    # chat-a arrives again while the first worker holds the lane
+    _enqueue(session_factory, ("3", "chat-a"))
+
+    claimed = second._claim_batch(10)
+
+    assert [event.payload["update_id"] for event in claimed] == ["2"]
+    assert second._owned_lanes == {("telegram", "chat-b")}
+    assert [event.payload["update_id"] for event in first._claim_batch(10)] == ["3"]
+
+
+def test_lane_is_held_after_its_events_finish(session_factory):
+    first = WebhookIngestionQueue(session_factory)
+    second = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"))
+    [event] = first._claim_batch(10)
+    first._finish([event.id], "done")
+
+    # Finished rows no longer block the lane, the lease still does
+    _enqueue(session_factory, ("2", "chat-a"))
+    assert second._claim_batch(10) == []
+
+    first._release_lanes([("telegram", "chat-a")])
+    assert [event.payload["update_id"] for event in second._claim_batch(10)] == ["2"]
+    assert first._owned_lanes == set()
+
+
+def test_idle_lanes_are_released_by_the_dispatcher(session_factory):
+    queue = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"))
+    queue._claim_batch(10)
+
+    queue._claim_batch(10, idle_lanes=[("telegram", "chat-a")])
+
+    db = session_factory()
+    try:
+        lane = db.query(WebhookInboxLane).one()
+    finally:
+        db.close()
+    assert lane.claimed_by is None
+    assert queue._owned_lanes == set()
+
+
+def test_expired_lane_lease_is_taken_over(session_factory):
+    dead = WebhookIngestionQueue(session_factory)
+    alive = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"))
+    dead._claim_batch(10)
+
+    _age(session_factory, WebhookInboxEvent, settings.WEBHOOK_LEASE_SECONDS + 1)
+    _age(session_factory, WebhookInboxLane, settings.WEBHOOK_LEASE_SECONDS + 1)
+    alive._maintenance()
+
+    [event] = alive._claim_batch(10)
+    assert event.attempts == 2
+    assert _statuses(session_factory)["1"] == (STATUS_PROCESSING, alive.worker_id)
+
+
+# ============ LEASE RENEWAL ============
+
+def test_heartbeat_keeps_held_events(session_factory):
+    queue = WebhookIngestionQueue(session_factory)
+    other = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"))
+    [event] = queue._claim_batch(10)
+
+    # A handler (or its retry backoff) outlives the lease, but the dispatcher kept renewing it
+    _age(session_factory, WebhookInboxEvent, settings.WEBHOOK_LEASE_SECONDS + 1)
+    _age(session_factory, WebhookInboxLane, settings.WEBHOOK_LEASE_SECONDS + 1)
+    queue._heartbeat([event.id], [("telegram", "chat-a")])
+    other._maintenance()
+    _enqueue(session_factory, ("2", "chat-a"))
+
+    assert _statuses(session_factory)["1"] == (STATUS_PROCESSING, queue.worker_id)
+    assert other._claim_batch(10) == []
+
+
+def test_maintenance_reclaims_own_rows_no_longer_held(session_factory):
+    queue = WebhookIngestionQueue(session_factory)
+    _enqueue(session_factory, ("1", "chat-a"))
+    queue._claim_batch(10)
+
+    # e.g. _finish failed: the row is not held anymore and is never renewed
+    _age(session_factory, WebhookInboxEvent, settings.WEBHOOK_LEASE_SECONDS + 1)
+    queue._maintenance()
+
+    assert _statuses(session_factory)["1"] == (STATUS_PENDING, None)
+
+
+def test_dispatcher_tracks_held_events(session_factory, monkeypatch):
+    queue = WebhookIngestionQueue(session_factory)
+    queue.coalesce_seconds = 0
+    _enqueue(session_factory, ("1", "chat-a"))
+    seen = []
+
+    async def handler(batch):
+        seen.append(set(queue._held))
+        return True
+
+    async def scenario():
+        queue._workers = asyncio.Semaphore(1)
+        queue._wakeup = asyncio.Event()
+        for event in queue._claim_batch(10):
+            queue._dispatch(event)
+        await asyncio.gather(*queue._lane_tasks.values())
+
+    monkeypatch.setitem(queue_module._handlers, "telegram", handler)
+    asyncio.run(scenario())
+
+    assert len(seen) == 1 and len(seen[0]) == 1
+    assert queue._held == set()
+    assert queue._inflight == 0
+
+
+# ============ TELEGRAM DEDUP ============
+
+def test_telegram_update_is_recorded_only_after_success(monkeypatch):
+    message_handler = pytest.importorskip("app.telegram.message_handler")
+    from unittest.mock import MagicMock
+
+    from app.services.dedup import TimeBucketedDedupStore
+
+    class Service:
+        def __init__(self, token):
+            pass
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(message_handler, "TelegramService", Service)
+    handler = message_handler.TelegramMessageHandler.__new__(message_handler.TelegramMessageHandler)
+    handler.db = MagicMock()
+    handler.dedup = TimeBucketedDedupStore(3600)
+    integration = MagicMock(tenant_id=1, bot_token="token", total_messages_received=0, error_count=0)
+    update = {"update_id": 10, "message": {"text": "hi"}}
+    calls = []
+
+    async def failing(message, integration, service):
+        calls.append("failing")
+        raise RuntimeError("engine unavailable")
+
+    async def working(message, integration, service):
+        calls.append("working")
+        return True
+
+    monkeypatch.setattr(handler, "_handle_message", failing)
+    assert asyncio.run(handler.process_update(update, integration)) is False
+
+    # The failed update is retried, then skipped once handled
+    monkeypatch.setattr(handler, "_handle_message", working)
+    assert asyncio.run(handler.process_update(update, integration)) is True
+    assert asyncio.run(handler.process_update(update, integration)) is True
+    assert calls == ["failing", "working"]